@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Batched trajectory augmentation on padded batch tensors.
+
+Augmenting inside SwipeDataset.__getitem__ would run once per sample in
+Python. Instead, augmentations here operate on a whole collated batch with
+torch ops:
+  - point dropout (first and last points are always kept)
+  - resampling to a different sampling rate (linear interpolation in time)
+  - time warping (smooth, monotonic local speed changes)
+  - scale/offset around the trajectory centroid
+  - spatial jitter
+
+Velocity/acceleration features and nearest keys are then recomputed in-batch
+with the same formulas as SwipeDataset, so augmented batches are
+indistinguishable in layout from clean ones.
+
+Use it either as a DataLoader collate_fn (AugmentingCollate, runs in the
+loader workers) or directly on device tensors inside the training loop.
+"""
+
+from dataclasses import dataclass
+from typing import Dict
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data.dataloader import default_collate
+
+from train_character_model import KeyboardGrid, CharTokenizer
+
+
+@dataclass
+class AugmentationConfig:
+    """Per-sample probabilities and magnitudes of each augmentation."""
+    dropout_prob: float = 0.3        # probability a sample gets point dropout
+    dropout_rate: float = 0.15       # fraction of points dropped when applied
+    resample_prob: float = 0.3
+    resample_range: tuple = (0.7, 1.3)   # new/old point count ratio
+    time_warp_prob: float = 0.5
+    time_warp_sigma: float = 0.2     # std of log speed change
+    speed_range: tuple = (0.8, 1.25)     # global duration multiplier
+    scale_prob: float = 0.5
+    scale_range: tuple = (0.9, 1.1)
+    offset_std: float = 0.01         # in normalized keyboard units
+    jitter_prob: float = 0.5
+    jitter_std: float = 0.004        # in normalized keyboard units
+
+
+class BatchTrajectoryAugmenter:
+    """Applies trajectory augmentations to a collated SwipeDataset batch."""
+
+    def __init__(self, keyboard: KeyboardGrid, tokenizer: CharTokenizer,
+                 config: AugmentationConfig = None):
+        self.config = config or AugmentationConfig()
+        self.pad_idx = tokenizer.pad_idx
+        self.width = float(keyboard.width)
+        self.height = float(keyboard.height)
+
+        # Same candidate keys and token mapping as KeyboardGrid.get_nearest_key
+        labels = [k for k in keyboard.key_positions if k not in ('<unk>', '<pad>')]
+        self.key_centers = torch.tensor([keyboard.key_positions[k] for k in labels], dtype=torch.float32)
+        self.key_tokens = torch.tensor(
+            [tokenizer.char_to_idx.get(k, tokenizer.unk_idx) for k in labels], dtype=torch.long
+        )
+
+    def __call__(self, batch: Dict) -> Dict:
+        features = batch['traj_features']
+        device = features.device
+        B, L, _ = features.shape
+        lengths = torch.as_tensor(batch['seq_len'], device=device).clone()
+        cfg = self.config
+
+        x = features[..., 0].clone()
+        y = features[..., 1].clone()
+        t = batch['timestamps'].to(device).clone()
+
+        if cfg.dropout_prob > 0:
+            x, y, t, lengths = self._point_dropout(x, y, t, lengths)
+        if cfg.resample_prob > 0:
+            x, y, t, lengths = self._resample(x, y, t, lengths)
+        if cfg.time_warp_prob > 0:
+            t = self._time_warp(t, lengths)
+        x, y = self._spatial(x, y, lengths)
+
+        valid = torch.arange(L, device=device)[None, :] < lengths[:, None]
+        batch = dict(batch)
+        batch['traj_features'] = self._kinematics(x, y, t, valid)
+        batch['nearest_keys'] = self._nearest_keys(x, y, valid)
+        batch['timestamps'] = t
+        batch['seq_len'] = lengths
+        return batch
+
+    # ------------------------------------------------------------------
+    # Augmentations
+    # ------------------------------------------------------------------
+
+    def _sample_mask(self, B: int, prob: float, device) -> torch.Tensor:
+        return torch.rand(B, device=device) < prob
+
+    def _point_dropout(self, x, y, t, lengths):
+        """Drop random interior points and compact each row to the front."""
+        B, L = x.shape
+        device = x.device
+        positions = torch.arange(L, device=device)[None, :]
+        valid = positions < lengths[:, None]
+        applied = self._sample_mask(B, self.config.dropout_prob, device)
+
+        keep = torch.rand(B, L, device=device) >= self.config.dropout_rate
+        keep |= ~applied[:, None]
+        keep |= (positions == 0) | (positions == lengths[:, None] - 1)
+        keep &= valid
+
+        # Kept points move to their rank among kept points; dropped ones to a spill column
+        target = torch.where(keep, keep.long().cumsum(dim=1) - 1, torch.full_like(positions.expand(B, L), L))
+        new_lengths = keep.sum(dim=1)
+
+        def compact(values, pad_with_last):
+            out = torch.zeros(B, L + 1, dtype=values.dtype, device=device)
+            out.scatter_(1, target, values)
+            out = out[:, :L]
+            if pad_with_last:
+                last = out.gather(1, (new_lengths - 1).clamp(min=0)[:, None])
+                out = torch.where(positions < new_lengths[:, None], out, last)
+            return out
+
+        return compact(x, False), compact(y, False), compact(t, True), new_lengths
+
+    def _resample(self, x, y, t, lengths):
+        """Linearly re-interpolate rows to a new, uniformly spaced point count."""
+        B, L = x.shape
+        device = x.device
+        cfg = self.config
+        applied = self._sample_mask(B, cfg.resample_prob, device) & (lengths > 2)
+        if not applied.any():
+            return x, y, t, lengths
+
+        lo, hi = cfg.resample_range
+        ratio = torch.empty(B, device=device).uniform_(lo, hi)
+        new_lengths = torch.where(
+            applied, (lengths.float() * ratio).round().long().clamp(2, L), lengths
+        )
+
+        # Query times spread uniformly over each row's duration
+        positions = torch.arange(L, device=device, dtype=torch.float32)[None, :]
+        t_end = t.gather(1, (lengths - 1)[:, None])
+        u = (positions / (new_lengths[:, None] - 1).float()).clamp(max=1.0)
+        t_query = u * t_end
+
+        # Padded timestamps must stay sorted for searchsorted
+        valid = positions < lengths[:, None]
+        t_sorted = torch.where(valid, t, torch.full_like(t, float('inf')))
+        t_sorted = torch.cummax(t_sorted, dim=1).values
+        idx = torch.searchsorted(t_sorted.contiguous(), t_query.contiguous(), right=True)
+        idx = torch.minimum(idx.clamp(min=1), (lengths - 1)[:, None])
+        t0 = t_sorted.gather(1, idx - 1)
+        t1 = t_sorted.gather(1, idx)
+        w = ((t_query - t0) / (t1 - t0).clamp(min=1e-6)).clamp(0.0, 1.0)
+
+        def interp(values):
+            v0 = values.gather(1, idx - 1)
+            v1 = values.gather(1, idx)
+            return v0 + (v1 - v0) * w
+
+        sel = applied[:, None]
+        return (torch.where(sel, interp(x), x), torch.where(sel, interp(y), y),
+                torch.where(sel, t_query, t), new_lengths)
+
+    def _time_warp(self, t, lengths):
+        """Smoothly vary local speed and scale total duration (keeps t monotonic)."""
+        B, L = t.shape
+        device = t.device
+        cfg = self.config
+        applied = self._sample_mask(B, cfg.time_warp_prob, device)
+
+        dt = torch.diff(t, dim=1).clamp(min=0.0)
+        noise = torch.randn(B, 1, L - 1, device=device)
+        smooth = F.avg_pool1d(noise, kernel_size=9, stride=1, padding=4, count_include_pad=False)
+        smooth = smooth.squeeze(1) * (cfg.time_warp_sigma * 3.0)
+        lo, hi = cfg.speed_range
+        speed = torch.empty(B, 1, device=device).uniform_(lo, hi)
+        warped = torch.cat([torch.zeros(B, 1, device=device), (dt * smooth.exp() * speed).cumsum(dim=1)], dim=1)
+        return torch.where(applied[:, None], warped, t)
+
+    def _spatial(self, x, y, lengths):
+        """Scale around the centroid, translate, and add per-point jitter."""
+        B, L = x.shape
+        device = x.device
+        cfg = self.config
+        valid = (torch.arange(L, device=device)[None, :] < lengths[:, None]).float()
+        count = valid.sum(dim=1, keepdim=True).clamp(min=1.0)
+        cx = (x * valid).sum(dim=1, keepdim=True) / count
+        cy = (y * valid).sum(dim=1, keepdim=True) / count
+
+        scaled = self._sample_mask(B, cfg.scale_prob, device)[:, None]
+        lo, hi = cfg.scale_range
+        sx = torch.where(scaled, torch.empty(B, 1, device=device).uniform_(lo, hi), torch.ones(B, 1, device=device))
+        sy = torch.where(scaled, torch.empty(B, 1, device=device).uniform_(lo, hi), torch.ones(B, 1, device=device))
+        ox = torch.where(scaled, torch.randn(B, 1, device=device) * cfg.offset_std, torch.zeros(B, 1, device=device))
+        oy = torch.where(scaled, torch.randn(B, 1, device=device) * cfg.offset_std, torch.zeros(B, 1, device=device))
+        x = cx + (x - cx) * sx + ox
+        y = cy + (y - cy) * sy + oy
+
+        jittered = self._sample_mask(B, cfg.jitter_prob, device)[:, None].float()
+        x = x + torch.randn_like(x) * cfg.jitter_std * jittered
+        y = y + torch.randn_like(y) * cfg.jitter_std * jittered
+        return x, y
+
+    # ------------------------------------------------------------------
+    # Feature recomputation (mirrors SwipeDataset.__getitem__)
+    # ------------------------------------------------------------------
+
+    def _kinematics(self, x, y, t, valid):
+        dt = torch.diff(t, dim=1, prepend=t[:, :1]).clamp(min=1e-6)
+
+        vx = torch.zeros_like(x)
+        vy = torch.zeros_like(y)
+        vx[:, 1:] = torch.diff(x, dim=1) / dt[:, 1:]
+        vy[:, 1:] = torch.diff(y, dim=1) / dt[:, 1:]
+
+        ax = torch.zeros_like(x)
+        ay = torch.zeros_like(y)
+        ax[:, 1:] = torch.diff(vx, dim=1) / dt[:, 1:]
+        ay[:, 1:] = torch.diff(vy, dim=1) / dt[:, 1:]
+
+        features = torch.stack([
+            x, y,
+            vx.clamp(-10, 10), vy.clamp(-10, 10),
+            ax.clamp(-10, 10), ay.clamp(-10, 10)
+        ], dim=-1)
+        return features * valid[..., None]
+
+    def _nearest_keys(self, x, y, valid):
+        centers = self.key_centers.to(x.device)
+        tokens = self.key_tokens.to(x.device)
+        px = x * self.width
+        py = y * self.height
+        dist = (px[..., None] - centers[:, 0]) ** 2 + (py[..., None] - centers[:, 1]) ** 2
+        keys = tokens[dist.argmin(dim=-1)]
+        return torch.where(valid, keys, torch.full_like(keys, self.pad_idx))
+
+
+class AugmentingCollate:
+    """DataLoader collate_fn: default collation followed by batch augmentation."""
+
+    def __init__(self, augmenter: BatchTrajectoryAugmenter):
+        self.augmenter = augmenter
+
+    def __call__(self, samples):
+        return self.augmenter(default_collate(samples))
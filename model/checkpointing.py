@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Resumable training checkpoints with asynchronous writes.
+
+A checkpoint captures everything needed to continue a run exactly where it
+stopped: model, optimizer and scheduler state, Python/NumPy/torch RNG states
+and the position of the training sampler inside the current epoch.
+
+Saving is split in two: the training thread takes a CPU snapshot copy of
+the state (a fast memcpy), and a background thread serializes it with
+torch.save and atomically renames it into place. Training continues while
+the file is being written.
+"""
+
+import os
+import random
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+
+LAST_CHECKPOINT = 'last.ckpt'
+
+
+class ResumableRandomSampler(Sampler):
+    """
+    Random sampler whose order is a pure function of (seed, epoch), so a run
+    can be resumed from any sample index inside an epoch.
+    """
+
+    def __init__(self, data_source, seed: int = 0):
+        self.num_samples = len(data_source)
+        self.seed = seed
+        self.epoch = 0
+        self.start_index = 0
+
+    def set_epoch(self, epoch: int, start_index: int = 0):
+        """Select the permutation for an epoch and skip the first start_index samples."""
+        self.epoch = epoch
+        self.start_index = start_index
+
+    def __iter__(self) -> Iterator[int]:
+        generator = torch.Generator()
+        generator.manual_seed(self.seed + self.epoch)
+        order = torch.randperm(self.num_samples, generator=generator)
+        return iter(order[self.start_index:].tolist())
+
+    def __len__(self) -> int:
+        return self.num_samples - self.start_index
+
+    def state_dict(self) -> Dict:
+        return {'seed': self.seed, 'epoch': self.epoch, 'start_index': self.start_index}
+
+    def load_state_dict(self, state: Dict):
+        self.seed = state['seed']
+        self.set_epoch(state['epoch'], state['start_index'])
+
+
+def capture_rng_state() -> Dict:
+    """Snapshot all random number generator states used during training."""
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def restore_rng_state(state: Dict):
+    """Restore RNG states captured by capture_rng_state()."""
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def snapshot_to_cpu(obj):
+    """Recursively copy every tensor in a (nested) state structure to CPU memory."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: snapshot_to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot_to_cpu(v) for v in obj)
+    return obj
+
+
+class AsyncCheckpointWriter:
+    """
+    Writes checkpoints on a background thread.
+
+    At most one write is in flight; requesting a new save while the previous
+    one is still running waits for it, which bounds memory to two snapshots.
+    Files are written to a temporary name and renamed, so a crash mid-write
+    never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, checkpoint_dir: Path):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def save(self, state: Dict, filename: str):
+        """Snapshot state on the calling thread and serialize it in the background."""
+        snapshot = snapshot_to_cpu(state)
+        self.wait()
+
+        self._thread = threading.Thread(
+            target=self._write, args=(snapshot, self.checkpoint_dir / filename),
+            name='checkpoint-writer', daemon=True
+        )
+        self._thread.start()
+
+    def wait(self):
+        """Block until the in-flight write (if any) has finished."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Background checkpoint write failed: {error}") from error
+
+    def close(self):
+        self.wait()
+
+    def _write(self, snapshot: Dict, path: Path):
+        try:
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            torch.save(snapshot, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException as e:
+            self._error = e
+
+
+def find_resume_checkpoint(checkpoint_dir: Path) -> Optional[Path]:
+    """Return the rolling 'last' checkpoint of a run directory, if one exists."""
+    path = Path(checkpoint_dir) / LAST_CHECKPOINT
+    return path if path.exists() else None
+
+
+def load_resume_checkpoint(path: Path) -> Dict:
+    """Load a full training checkpoint (including optimizer and RNG state)."""
+    print(f"Resuming from checkpoint: {path}")
+    # RNG states must stay on CPU; model and optimizer state are moved to the
+    # right device by their load_state_dict()
+    return torch.load(path, map_location='cpu', weights_only=False)
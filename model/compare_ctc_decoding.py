@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Compare single-pass CTC decoding with the autoregressive encoder-decoder.
+
+CTC rows are measured end to end per swipe: one ONNX Runtime run of
+swipe_model_ctc.onnx on the padded trajectory (as the app feeds it) plus
+NumPy decoding of the valid frames (greedy, prefix beam search, and
+dictionary-constrained beam search).
+
+The autoregressive row uses PyTorch beam search for accuracy and the ORT
+encoder + (word length + 1) batched-beam decoder steps for latency, i.e.
+the same estimate onnx_benchmark.measure_ort_latency gives for the app.
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    build_character_model,
+    evaluate_word_accuracy
+)
+from export_character_model import export_to_onnx, export_ctc_to_onnx
+from onnx_benchmark import create_session, measure_ort_latency, format_latency_table
+from ctc_decoding import CharTrie, ctc_greedy_decode, ctc_prefix_beam_search
+from swipe_dictionary import load_language_dictionary
+from slim_checkpoints import load_model_checkpoint
+from trajectory_frontend import TrajectoryFrontEnd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CTC vs autoregressive decoding: accuracy and latency')
+    parser.add_argument('--checkpoint', required=True, help='Checkpoint with a CTC head')
+    parser.add_argument('--data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--max-samples', type=int, default=1000)
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--lang', default='en', help='Dictionary for the constrained CTC search')
+    parser.add_argument('--max-words', type=int, default=None, help='Use only the most frequent N words')
+    parser.add_argument('--output-dir', default='deployment_package/ctc_comparison')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--bench-runs', type=int, default=50)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("CTC vs Autoregressive Decoding")
+    print("="*60)
+
+    tokenizer = CharTokenizer()
+    state_dict, info = load_model_checkpoint(args.checkpoint)
+    model = build_character_model(info['model_config'], tokenizer.vocab_size, dropout=0.0)
+    model.load_state_dict(state_dict)
+    model.eval()
+    if model.ctc_proj is None:
+        raise ValueError("Checkpoint has no CTC head (train with --ctc-weight or --ctc-only)")
+    ctc_only = info.get('ctc_only', False)
+    frontend = TrajectoryFrontEnd.from_config(info['model_config'])
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ctc_info = export_ctc_to_onnx(model, output_dir, seq_len=frontend.max_len)
+
+    words = [w for w, _ in load_language_dictionary(args.lang, max_words=args.max_words)]
+    trie = CharTrie(words, tokenizer)
+    print(f"Dictionary: {len(trie):,} words, {len(trie.terminal):,} trie nodes")
+
+    dataset = SwipeDataset(args.data, max_samples=args.max_samples, frontend=frontend)
+    print(f"Samples: {len(dataset)}")
+
+    session = create_session(ctc_info['ctc_path'], threads=args.threads)
+    methods = ['ctc_greedy', 'ctc_beam', 'ctc_beam_dict']
+    correct = {m: 0 for m in methods}
+    times = {m: [] for m in methods}
+    for sample in tqdm(dataset, desc='CTC decode'):
+        length = sample['seq_len']
+        feeds = {
+            'trajectory_features': sample['traj_features'][None].numpy(),
+            'nearest_keys': sample['nearest_keys'][None].numpy(),
+            'src_mask': np.arange(sample['traj_features'].shape[0])[None, :] >= length,
+        }
+        start = time.perf_counter()
+        log_probs = session.run(None, feeds)[0][:, :length]
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        decoders = {
+            'ctc_greedy': lambda: ctc_greedy_decode(log_probs, [length], tokenizer)[0],
+            'ctc_beam': lambda: ctc_prefix_beam_search(log_probs[0], tokenizer, args.beam_size)[0][0],
+            'ctc_beam_dict': lambda: ctc_prefix_beam_search(log_probs[0], tokenizer, args.beam_size, trie)[0][0],
+        }
+        for method, decode in decoders.items():
+            start = time.perf_counter()
+            word = decode()
+            times[method].append(encode_ms + (time.perf_counter() - start) * 1000)
+            correct[method] += int(word == sample['word'])
+
+    rows = []
+    n = max(len(dataset), 1)
+    for method in methods:
+        t = np.array(times[method])
+        rows.append({
+            'method': method,
+            'word_acc': correct[method] / n,
+            'p50_ms': float(np.percentile(t, 50)),
+            'p90_ms': float(np.percentile(t, 90)),
+            'measured': 'per-swipe',
+        })
+
+    if not ctc_only:
+        loader = DataLoader(dataset, batch_size=64, shuffle=False)
+        ar_acc = evaluate_word_accuracy(model, loader, tokenizer, torch.device('cpu'),
+                                        beam_size=args.beam_size, desc='AR beam')
+        onnx_info = export_to_onnx(model, output_dir, seq_len=frontend.max_len)
+        mean_steps = int(round(np.mean([len(item['word']) for item in dataset.data]))) + 1
+        latency = measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                      seq_len=frontend.max_len, decoder_steps=mean_steps,
+                                      beam_size=args.beam_size,
+                                      runs=args.bench_runs, threads=args.threads)
+        rows.insert(0, {
+            'method': f'autoregressive_beam{args.beam_size}',
+            'word_acc': ar_acc,
+            'p50_ms': latency['total_ms'],
+            'p90_ms': latency['encoder']['p90_ms'] + mean_steps * latency['decoder_step']['p90_ms'],
+            'measured': f'estimate ({mean_steps} steps)',
+        })
+
+    table = [{
+        'method': r['method'],
+        'word_acc': f"{r['word_acc']:.2%}",
+        'p50_ms': f"{r['p50_ms']:.2f}",
+        'p90_ms': f"{r['p90_ms']:.2f}",
+        'measured': r['measured'],
+    } for r in rows]
+    print("\n" + format_latency_table(table, ['method', 'word_acc', 'p50_ms', 'p90_ms', 'measured']))
+
+    report_path = output_dir / 'ctc_comparison.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'checkpoint': str(args.checkpoint),
+            'data': args.data,
+            'samples': len(dataset),
+            'beam_size': args.beam_size,
+            'dictionary_words': len(trie),
+            'threads': args.threads,
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Key-segment vs per-point encoder input: sequence length, latency, accuracy.
+
+Both models are exported to ONNX at their padded input length (points for
+the baseline, --max-segments / the checkpoint's for key segments) and timed
+with ONNX Runtime; the decoder cross-attends over the shorter memory too, so
+the end-to-end estimate is reported next to the encoder. Models come from
+checkpoints (train with --key-segments) or are randomly initialized with the
+full-model architecture, which is enough for latency.
+
+With --data the tool also reports how long swipes are in points and in
+segments and what the segmentation costs per swipe; with both checkpoints
+it reports word accuracy as well.
+"""
+
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    evaluate_word_accuracy
+)
+from key_segments import KeySegmenter, SEGMENT_DIM
+from compare_local_attention import load_model
+from export_character_model import export_to_onnx
+from onnx_benchmark import measure_ort_latency, format_latency_table
+from slim_checkpoints import load_model_checkpoint
+
+
+def length_stats(dataset: SwipeDataset) -> dict:
+    lengths = np.array([dataset[i]['seq_len'] for i in range(len(dataset))])
+    return {
+        'mean': float(lengths.mean()),
+        'p50': float(np.percentile(lengths, 50)),
+        'p95': float(np.percentile(lengths, 95)),
+        'truncated': float((lengths >= dataset.max_seq_len).mean()),
+    }
+
+
+def segmentation_ms(dataset: SwipeDataset, runs: int = 200) -> float:
+    """Mean cost of collapsing one swipe's points into key segments."""
+    samples = [dataset.data[i] for i in range(min(runs, len(dataset)))]
+    inputs = []
+    for item in samples:
+        xs = np.array(item['x'], dtype=np.float32) / dataset.keyboard.width
+        ys = np.array(item['y'], dtype=np.float32) / dataset.keyboard.height
+        ts = np.array(item['t'], dtype=np.float32)
+        keys = np.array([dataset.tokenizer.char_to_idx.get(dataset.keyboard.get_nearest_key(x, y),
+                                                           dataset.tokenizer.unk_idx)
+                         for x, y in zip(item['x'], item['y'])], dtype=np.int64)
+        inputs.append((xs, ys, ts, keys))
+    start = time.perf_counter()
+    for xs, ys, ts, keys in inputs:
+        dataset.segmenter(xs, ys, ts, keys, dataset.key_xy)
+    return (time.perf_counter() - start) * 1000 / max(len(inputs), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Key-segment vs per-point encoder input')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint trained with --key-segments')
+    parser.add_argument('--baseline-checkpoint', default=None, help='Per-point checkpoint')
+    parser.add_argument('--max-segments', type=int, default=48, help='Segment budget for a random model')
+    parser.add_argument('--data', default=None, help='Swipe JSONL for length statistics and accuracy')
+    parser.add_argument('--max-samples', type=int, default=1000)
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--output-dir', default='deployment_package/key_segments')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--bench-runs', type=int, default=30)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Key Segments vs Per-Point Input")
+    print("="*60)
+
+    tokenizer = CharTokenizer()
+    segment_config = dict(FULL_MODEL_CONFIG, traj_dim=SEGMENT_DIM,
+                          key_segments=KeySegmenter(args.max_segments).to_config())
+    models = {}
+    for name, path, config in (('points', args.baseline_checkpoint, FULL_MODEL_CONFIG),
+                               ('segments', args.checkpoint, segment_config)):
+        config = load_model_checkpoint(path)[1].get('model_config', FULL_MODEL_CONFIG) if path else config
+        segmenter = KeySegmenter.from_config(config)
+        model, frontend = load_model(path, config, tokenizer.vocab_size, 150)
+        seq_len = segmenter.max_segments if segmenter else frontend.max_len
+        models[name] = {'model': model, 'frontend': frontend, 'segmenter': segmenter, 'seq_len': seq_len}
+    if models['segments']['segmenter'] is None:
+        raise ValueError("--checkpoint was not trained with --key-segments")
+    if models['points']['segmenter'] is not None:
+        raise ValueError("--baseline-checkpoint was trained with --key-segments")
+    print(f"Points: N={models['points']['seq_len']} ({models['points']['frontend'].spec}), "
+          f"segments: N={models['segments']['seq_len']}")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    datasets = {}
+    if args.data:
+        print("\nSequence lengths:")
+        for name, m in models.items():
+            datasets[name] = SwipeDataset(args.data, max_samples=args.max_samples,
+                                          frontend=m['frontend'], segmenter=m['segmenter'])
+            m['lengths'] = length_stats(datasets[name])
+            print(f"  {name:8s}: mean {m['lengths']['mean']:.1f}, p95 {m['lengths']['p95']:.0f}, "
+                  f"{m['lengths']['truncated']:.1%} truncated at {m['seq_len']}")
+        models['segments']['segmentation_ms'] = segmentation_ms(datasets['segments'])
+        print(f"  Segmentation: {models['segments']['segmentation_ms']:.3f} ms per swipe")
+        decoder_steps = int(round(np.mean([len(item['word']) for item in datasets['points'].data]))) + 1
+    else:
+        decoder_steps = 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, m in models.items():
+            onnx_dir = Path(tmp) / name
+            onnx_dir.mkdir()
+            onnx_info = export_to_onnx(m['model'], onnx_dir, seq_len=m['seq_len'])
+            m['latency'] = measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                               seq_len=m['seq_len'], decoder_steps=decoder_steps,
+                                               beam_size=args.beam_size, runs=args.bench_runs,
+                                               threads=args.threads)
+
+    if args.checkpoint and args.baseline_checkpoint and datasets:
+        for name, m in models.items():
+            loader = DataLoader(datasets[name], batch_size=64, shuffle=False)
+            m['word_acc'] = evaluate_word_accuracy(m['model'], loader, tokenizer, torch.device('cpu'),
+                                                   beam_size=args.beam_size, desc=name)
+
+    base = models['points']['latency']
+    table = [{
+        'input': name,
+        'N': str(m['seq_len']),
+        'mean_len': f"{m['lengths']['mean']:.1f}" if 'lengths' in m else '-',
+        'word_acc': f"{m['word_acc']:.2%}" if 'word_acc' in m else '-',
+        'enc_p50_ms': f"{m['latency']['encoder']['p50_ms']:.2f}",
+        'dec_step_p50_ms': f"{m['latency']['decoder_step']['p50_ms']:.2f}",
+        'total_ms': f"{m['latency']['total_ms']:.1f}",
+        'enc_speedup': f"{base['encoder']['p50_ms'] / m['latency']['encoder']['p50_ms']:.2f}x",
+    } for name, m in models.items()]
+    print(f"\nLatency ({args.threads} thread(s), p50, {decoder_steps} decoder steps x beam {args.beam_size}):")
+    print(format_latency_table(table, list(table[0].keys())))
+
+    report_path = output_dir / 'key_segments_report.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'checkpoint': args.checkpoint,
+            'baseline_checkpoint': args.baseline_checkpoint,
+            'data': args.data,
+            'threads': args.threads,
+            'results': {name: {k: v for k, v in m.items() if k not in ('model', 'frontend', 'segmenter')}
+                        for name, m in models.items()},
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Encoder latency vs trajectory length: full vs sliding-window attention.
+
+For every length the encoder of each model is exported to ONNX at that
+length (the exported graphs have a static sequence length, like the app's),
+checked against PyTorch, and timed with ONNX Runtime on a fixed thread
+budget. Models come from checkpoints (train with --attention-window) or are
+randomly initialized with the full-model architecture, which is enough for
+latency.
+
+With --data and both checkpoints, word accuracy is reported as well.
+"""
+
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    build_character_model,
+    evaluate_word_accuracy
+)
+from onnx_benchmark import create_session, dummy_encoder_inputs, time_session, format_latency_table
+from trajectory_frontend import TrajectoryFrontEnd
+from slim_checkpoints import load_model_checkpoint
+
+
+class EncoderWrapper(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, traj_features, nearest_keys, src_mask):
+        return self.model.encode_trajectory(traj_features, nearest_keys, src_mask)
+
+
+def load_model(checkpoint_path, config, vocab_size: int, max_seq_len: int):
+    """
+    Build a model able to encode max_seq_len points, optionally loading
+    checkpoint weights; returns (model, trajectory front end).
+    """
+    if checkpoint_path:
+        state_dict, info = load_model_checkpoint(checkpoint_path)
+        config = info.get('model_config', FULL_MODEL_CONFIG)
+    model = build_character_model(dict(config, max_seq_len=max_seq_len), vocab_size, dropout=0.0)
+    if checkpoint_path:
+        # The sinusoidal table is rebuilt for the longest benchmarked length
+        state = {k: v for k, v in state_dict.items() if k != 'pe'}
+        missing, unexpected = model.load_state_dict(state, strict=False)
+        if missing != ['pe'] or unexpected:
+            raise RuntimeError(f"Checkpoint mismatch: missing {missing}, unexpected {unexpected}")
+    return model.eval(), TrajectoryFrontEnd.from_config(config)
+
+
+def export_encoder(model, path: Path, seq_len: int):
+    traj_features = torch.randn(1, seq_len, model.traj_proj.in_features)
+    nearest_keys = torch.randint(4, 30, (1, seq_len))
+    src_mask = torch.zeros(1, seq_len, dtype=torch.bool)
+    src_mask[:, int(seq_len * 0.8):] = True
+    torch.onnx.export(
+        EncoderWrapper(model),
+        (traj_features, nearest_keys, src_mask),
+        path,
+        opset_version=14,
+        do_constant_folding=True,
+        input_names=['trajectory_features', 'nearest_keys', 'src_mask'],
+        output_names=['encoder_output']
+    )
+    with torch.no_grad():
+        expected = model.encode_trajectory(traj_features, nearest_keys, src_mask).numpy()
+    feeds = {'trajectory_features': traj_features.numpy(), 'nearest_keys': nearest_keys.numpy(),
+             'src_mask': src_mask.numpy()}
+    session = create_session(str(path))
+    valid = ~src_mask[0].numpy()
+    return float(np.abs(session.run(None, feeds)[0][:, valid] - expected[:, valid]).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encoder latency vs length: full vs local attention')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint trained with --attention-window')
+    parser.add_argument('--baseline-checkpoint', default=None, help='Full-attention checkpoint')
+    parser.add_argument('--window', type=int, default=16, help='Window radius for a random local model')
+    parser.add_argument('--global-tokens', type=int, default=2)
+    parser.add_argument('--lengths', default='50,100,150,200,250,300,400')
+    parser.add_argument('--data', default=None, help='Swipe JSONL for a word-accuracy comparison')
+    parser.add_argument('--max-samples', type=int, default=1000)
+    parser.add_argument('--output-dir', default='deployment_package/local_attention')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--bench-runs', type=int, default=30)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Local vs Full Attention: Encoder Latency Curve")
+    print("="*60)
+
+    lengths = [int(n) for n in args.lengths.split(',')]
+    tokenizer = CharTokenizer()
+    local_config = dict(FULL_MODEL_CONFIG, attention_window=args.window, global_tokens=args.global_tokens)
+    loaded = {
+        'full': load_model(args.baseline_checkpoint, FULL_MODEL_CONFIG, tokenizer.vocab_size, max(lengths)),
+        'local': load_model(args.checkpoint, local_config, tokenizer.vocab_size, max(lengths)),
+    }
+    models = {name: model for name, (model, _) in loaded.items()}
+    local = models['local']
+    if not local.attention_window:
+        raise ValueError("--checkpoint was not trained with --attention-window")
+    print(f"Local model: window ±{local.attention_window}, {local.num_global_tokens} global tokens")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for seq_len in lengths:
+            row = {'seq_len': seq_len}
+            for name, model in models.items():
+                path = Path(tmp) / f'{name}_{seq_len}.onnx'
+                row[f'{name}_max_diff'] = export_encoder(model, path, seq_len)
+                session = create_session(str(path), threads=args.threads)
+                row[name] = time_session(session, dummy_encoder_inputs(session, seq_len), runs=args.bench_runs)
+            row['speedup'] = row['full']['p50_ms'] / row['local']['p50_ms']
+            rows.append(row)
+            print(f"  ✓ {seq_len:4d} points: full {row['full']['p50_ms']:.2f} ms, "
+                  f"local {row['local']['p50_ms']:.2f} ms (max diff {row['local_max_diff']:.1e})")
+
+    table = [{
+        'seq_len': str(r['seq_len']),
+        'full_p50_ms': f"{r['full']['p50_ms']:.2f}",
+        'local_p50_ms': f"{r['local']['p50_ms']:.2f}",
+        'speedup': f"{r['speedup']:.2f}x",
+    } for r in rows]
+    print(f"\nEncoder latency ({args.threads} thread(s), p50):")
+    print(format_latency_table(table, ['seq_len', 'full_p50_ms', 'local_p50_ms', 'speedup']))
+
+    accuracy = None
+    if args.data and args.checkpoint and args.baseline_checkpoint:
+        accuracy = {}
+        for name, (model, frontend) in loaded.items():
+            dataset = SwipeDataset(args.data, max_samples=args.max_samples, frontend=frontend)
+            loader = DataLoader(dataset, batch_size=64, shuffle=False)
+            accuracy[name] = evaluate_word_accuracy(model, loader, tokenizer, torch.device('cpu'), desc=name)
+        print(f"\nWord accuracy: full {accuracy['full']:.2%}, local {accuracy['local']:.2%}")
+
+    report_path = output_dir / 'latency_curve.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'checkpoint': args.checkpoint,
+            'baseline_checkpoint': args.baseline_checkpoint,
+            'attention_window': local.attention_window,
+            'global_tokens': local.num_global_tokens,
+            'threads': args.threads,
+            'word_accuracy': accuracy,
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+CTC decoding for the encoder-only swipe model.
+
+NumPy only, so it runs directly on ONNX Runtime outputs:
+  - ctc_greedy_decode: best-path decoding for a whole batch at once
+  - ctc_prefix_beam_search: prefix beam search whose per-frame work is
+    vectorized over all beams x vocabulary, optionally constrained to a
+    dictionary trie
+  - CharTrie: dictionary as a dense [num_nodes, vocab] child table so the
+    allowed continuations of every beam are one fancy-indexing lookup
+
+Token ids follow train_character_model.CharTokenizer; <pad> is the CTC blank.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+NEG_INF = -np.inf
+
+
+class CharTrie:
+    """Prefix tree over tokenized dictionary words."""
+
+    def __init__(self, words: Iterable[str], tokenizer):
+        children = [{}]
+        terminal = [False]
+        for word in words:
+            ids = [tokenizer.char_to_idx.get(c) for c in word.lower()]
+            if not ids or any(i is None for i in ids):
+                continue
+            node = 0
+            for i in ids:
+                nxt = children[node].get(i)
+                if nxt is None:
+                    nxt = len(children)
+                    children[node][i] = nxt
+                    children.append({})
+                    terminal.append(False)
+                node = nxt
+            terminal[node] = True
+
+        self.children = np.full((len(children), tokenizer.vocab_size), -1, dtype=np.int32)
+        for node, edges in enumerate(children):
+            for token, child in edges.items():
+                self.children[node, token] = child
+        self.terminal = np.array(terminal, dtype=np.bool_)
+
+    def __len__(self):
+        return int(self.terminal.sum())
+
+
+def label_mask(tokenizer) -> np.ndarray:
+    """Tokens a CTC path may emit: characters only (no specials, blank handled separately)."""
+    mask = np.ones(tokenizer.vocab_size, dtype=np.bool_)
+    for idx in (tokenizer.pad_idx, tokenizer.unk_idx, tokenizer.sos_idx, tokenizer.eos_idx):
+        mask[idx] = False
+    return mask
+
+
+def ctc_greedy_decode(log_probs: np.ndarray, lengths: np.ndarray, tokenizer) -> List[str]:
+    """Best-path decoding: argmax per frame, collapse repeats, drop blanks."""
+    best = log_probs.argmax(axis=-1)
+    T = best.shape[1]
+    prev = np.concatenate([np.full((best.shape[0], 1), -1), best[:, :-1]], axis=1)
+    keep = (best != tokenizer.pad_idx) & (best != prev) & (np.arange(T)[None, :] < np.asarray(lengths)[:, None])
+    keep &= label_mask(tokenizer)[best]
+    return [''.join(tokenizer.idx_to_char[i] for i in row[k]) for row, k in zip(best, keep)]
+
+
+def ctc_prefix_beam_search(log_probs: np.ndarray, tokenizer, beam_size: int = 5,
+                           trie: Optional[CharTrie] = None, token_threshold: float = -10.0,
+                           blank_skip: float = 0.999) -> List[Tuple[str, float]]:
+    """
+    CTC prefix beam search over one sequence.
+
+    Args:
+        log_probs: [seq_len, vocab] log probabilities (valid frames only)
+        beam_size: Number of prefixes kept per frame
+        trie: Restrict prefixes to dictionary paths and results to complete words
+        token_threshold: Tokens below this per-frame log prob are not expanded
+        blank_skip: Frames whose blank probability exceeds this only propagate beams
+
+    Returns:
+        (word, log score) pairs, best first
+    """
+    blank = tokenizer.pad_idx
+    allowed = label_mask(tokenizer)
+    skip_log = np.log(blank_skip)
+    V = log_probs.shape[1]
+
+    prefixes = [()]
+    p_b = np.array([0.0])
+    p_nb = np.array([NEG_INF])
+    nodes = np.array([0])
+
+    for lp in log_probs:
+        total = np.logaddexp(p_b, p_nb)
+        last = np.array([p[-1] if p else -1 for p in prefixes])
+        has_last = last >= 0
+
+        # Paths that keep their prefix: end in blank, or repeat the last character
+        stay_b = total + lp[blank]
+        stay_nb = np.full_like(p_nb, NEG_INF)
+        stay_nb[has_last] = p_nb[has_last] + lp[last[has_last]]
+
+        if lp[blank] > skip_log:
+            p_b, p_nb = stay_b, stay_nb
+            continue
+
+        # Extensions prefix + c for every beam x token at once; repeating the
+        # last character only counts paths separated by a blank
+        ext = total[:, None] + lp[None, :]
+        rows = np.nonzero(has_last)[0]
+        ext[rows, last[rows]] = p_b[rows] + lp[last[rows]]
+        ext[:, ~(allowed & (lp > token_threshold))] = NEG_INF
+        if trie is not None:
+            child = trie.children[nodes]
+            ext[child < 0] = NEG_INF
+
+        flat = ext.ravel()
+        k = min(2 * beam_size, int(np.isfinite(flat).sum()))
+        top = np.argpartition(-flat, k - 1)[:k] if k > 0 else np.array([], dtype=np.int64)
+
+        merged = {p: [stay_b[i], stay_nb[i], nodes[i]] for i, p in enumerate(prefixes)}
+        for idx in top:
+            i, c = divmod(int(idx), V)
+            prefix = prefixes[i] + (c,)
+            entry = merged.get(prefix)
+            if entry is None:
+                merged[prefix] = [NEG_INF, flat[idx], trie.children[nodes[i], c] if trie is not None else 0]
+            else:
+                entry[1] = np.logaddexp(entry[1], flat[idx])
+
+        best = sorted(merged.items(), key=lambda kv: -np.logaddexp(kv[1][0], kv[1][1]))[:beam_size]
+        prefixes = [p for p, _ in best]
+        p_b = np.array([v[0] for _, v in best])
+        p_nb = np.array([v[1] for _, v in best])
+        nodes = np.array([v[2] for _, v in best])
+
+    scores = np.logaddexp(p_b, p_nb)
+    order = np.argsort(-scores)
+    if trie is not None:
+        complete = [i for i in order if trie.terminal[nodes[i]]]
+        # Fall back to unconstrained prefixes when no beam finished a word
+        order = complete or order
+    return [(''.join(tokenizer.idx_to_char[c] for c in prefixes[i]), float(scores[i])) for i in order]
+
+
+def ctc_beam_decode(log_probs: np.ndarray, lengths: np.ndarray, tokenizer, beam_size: int = 5,
+                    trie: Optional[CharTrie] = None) -> List[str]:
+    """Best word per batch row from [batch, seq_len, vocab] log probabilities."""
+    words = []
+    for row, length in zip(log_probs, lengths):
+        results = ctc_prefix_beam_search(row[:int(length)], tokenizer, beam_size, trie)
+        words.append(results[0][0] if results else '')
+    return words
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate swipe detection and corpus deduplication.
+
+Every trajectory is reduced to a fixed-size signature (arc-length resampled
+to a fixed number of points, in keyboard-normalized coordinates). Signatures
+are hashed with Euclidean locality-sensitive hashing (random projections,
+quantized into buckets, grouped into bands). Only samples sharing a bucket in
+some band (and, by default, the same word) are compared exactly, so
+candidate search is sub-quadratic. Signature extraction runs in a process
+pool over byte ranges of the input files.
+
+Inputs are given in priority order: when a duplicate cluster spans several
+inputs, the copy in the earliest input is kept. Listing the evaluation
+splits first therefore removes val/test leakage from the training split.
+Duplicates within a single input are collapsed in every input, evaluation
+splits included, unless the input is named in --protect: protected inputs
+are copied unchanged and only ever cause removals in other inputs.
+
+Usage:
+    python dedup_swipes.py \\
+        --input test=data/combined_dataset/cleaned_english_swipes_test.jsonl \\
+        --input val=data/combined_dataset/cleaned_english_swipes_val.jsonl \\
+        --input train=data/combined_dataset/cleaned_english_swipes_train.jsonl \\
+        --input synthetic=data/synthetic_shards/synthetic-00000.jsonl \\
+        --protect test,val --output-dir data/dedup
+"""
+
+import os
+import json
+import time
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from swipe_records import parse_swipe_record
+
+
+def resample_signature(x: np.ndarray, y: np.ndarray, num_points: int) -> np.ndarray:
+    """Arc-length resample a path to num_points (x, y) pairs, flattened."""
+    if len(x) == 1:
+        return np.tile(np.array([x[0], y[0]], dtype=np.float32), num_points)
+    seg = np.hypot(np.diff(x), np.diff(y))
+    cum = np.concatenate([[0.0], np.cumsum(seg)])
+    if cum[-1] <= 0:
+        return np.tile(np.array([x[0], y[0]], dtype=np.float32), num_points)
+    targets = np.linspace(0.0, cum[-1], num_points)
+    rx = np.interp(targets, cum, x)
+    ry = np.interp(targets, cum, y)
+    return np.stack([rx, ry], axis=1).reshape(-1).astype(np.float32)
+
+
+def chunk_file(path: str, num_chunks: int) -> List[Tuple[int, int]]:
+    """Split a file into byte ranges aligned to line boundaries."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, num_chunks):
+            f.seek(size * i // num_chunks)
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+    return [(bounds[i], bounds[i + 1]) for i in range(num_chunks) if bounds[i] < bounds[i + 1]]
+
+
+def extract_signatures(args) -> Tuple[np.ndarray, List[str], List[int]]:
+    """Worker: parse a byte range and compute signatures for each record line."""
+    path, start, end, num_points, width, height = args
+    signatures, words, line_offsets = [], [], []
+    with open(path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            offset = pos
+            pos += len(line)
+            if not line.strip():
+                continue
+            record = parse_swipe_record(json.loads(line))
+            if record is None or not record['x']:
+                continue
+            x = np.asarray(record['x'], dtype=np.float64) / width
+            y = np.asarray(record['y'], dtype=np.float64) / height
+            signatures.append(resample_signature(x, y, num_points))
+            words.append(record['word'].lower())
+            line_offsets.append(offset)
+    dim = num_points * 2
+    sig = np.stack(signatures) if signatures else np.zeros((0, dim), dtype=np.float32)
+    return sig, words, line_offsets
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = np.arange(n)
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Lower index (= higher priority) becomes the cluster root
+            if ra < rb:
+                self.parent[rb] = ra
+            else:
+                self.parent[ra] = rb
+
+
+def lsh_candidate_groups(signatures: np.ndarray, word_ids: np.ndarray, num_bands: int,
+                         rows_per_band: int, bucket_width: float, seed: int):
+    """
+    Yield arrays of sample indices that share an LSH bucket in some band.
+
+    Each band hashes rows_per_band quantized random projections
+    floor((a . v + b) / w) together with the word id.
+    """
+    rng = np.random.default_rng(seed)
+    dim = signatures.shape[1]
+    for band in range(num_bands):
+        a = rng.normal(0.0, 1.0, (dim, rows_per_band)).astype(np.float32)
+        b = rng.uniform(0.0, bucket_width, rows_per_band).astype(np.float32)
+        codes = np.floor((signatures @ a + b) / bucket_width).astype(np.int64)
+
+        # Combine codes and word id into one 64-bit key per sample
+        key = word_ids.astype(np.int64) * np.int64(0x9E3779B1)
+        for r in range(rows_per_band):
+            key = key * np.int64(1000003) ^ codes[:, r]
+
+        order = np.argsort(key, kind='stable')
+        sorted_keys = key[order]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+        ends = np.concatenate([starts[1:], [len(order)]])
+        for s, e in zip(starts, ends):
+            if e - s > 1:
+                yield order[s:e]
+
+
+def verify_group(group: np.ndarray, signatures: np.ndarray, num_points: int, threshold: float,
+                 block: int):
+    """
+    Exact check of a candidate group in block x block tiles of the upper
+    triangle; yields (i, j) pairs within threshold. Memory is bounded by the
+    tile size, whatever the size of the group.
+    """
+    sig = signatures[group].reshape(len(group), num_points, 2)
+    for lo in range(0, len(group), block):
+        rows = sig[lo:lo + block]
+        for col_lo in range(lo, len(group), block):
+            cols = sig[col_lo:col_lo + block]
+            # Mean per-point distance between resampled paths
+            diff = rows[:, None, :, :] - cols[None, :, :, :]
+            dist = np.sqrt((diff ** 2).sum(-1)).mean(-1)
+            # Global indices: keep only pairs above the diagonal
+            ii, jj = np.nonzero(dist <= threshold)
+            keep = lo + ii < col_lo + jj
+            for i, j in zip(ii[keep], jj[keep]):
+                yield int(group[lo + i]), int(group[col_lo + j])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate swipes and write deduplicated splits')
+    parser.add_argument('--input', action='append', required=True,
+                        help='name=path, repeated in priority order (earlier inputs keep duplicates)')
+    parser.add_argument('--output-dir', default='data/dedup')
+    parser.add_argument('--signature-points', type=int, default=24)
+    parser.add_argument('--threshold', type=float, default=0.015,
+                        help='Max mean point distance (keyboard-normalized) for a duplicate')
+    parser.add_argument('--bands', type=int, default=8)
+    parser.add_argument('--rows-per-band', type=int, default=4)
+    parser.add_argument('--bucket-width', type=float, default=0.25,
+                        help='LSH quantization width in projected units')
+    parser.add_argument('--verify-block', type=int, default=256,
+                        help='Rows/columns per tile when verifying large candidate groups')
+    parser.add_argument('--protect', default='',
+                        help='Comma-separated input names written unchanged (e.g. test,val)')
+    parser.add_argument('--ignore-word', action='store_true',
+                        help='Also match near-identical paths labelled with different words')
+    parser.add_argument('--keyboard-width', type=float, default=360.0)
+    parser.add_argument('--keyboard-height', type=float, default=215.0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    inputs = []
+    for spec in args.input:
+        name, _, path = spec.partition('=')
+        if not path:
+            name, path = Path(spec).stem, spec
+        inputs.append((name, path))
+
+    # One output file per input, named after the input file
+    basenames = Counter(Path(path).name for _, path in inputs)
+    clashes = sorted(b for b, count in basenames.items() if count > 1)
+    if clashes:
+        parser.error(f"inputs share a file name, their outputs would overwrite each other: {', '.join(clashes)}")
+    protected_names = {p for p in args.protect.split(',') if p}
+    unknown = protected_names - {name for name, _ in inputs}
+    if unknown:
+        parser.error(f"--protect names no input: {', '.join(sorted(unknown))}")
+
+    print("=" * 60)
+    print("Swipe Corpus Deduplication")
+    print("=" * 60)
+
+    # --- Signatures (parallel over file chunks) ---
+    start = time.perf_counter()
+    tasks, task_source = [], []
+    for source_idx, (name, path) in enumerate(inputs):
+        chunks = max(1, min(args.workers * 4, os.path.getsize(path) // (8 << 20) + 1))
+        for lo, hi in chunk_file(path, chunks):
+            tasks.append((path, lo, hi, args.signature_points, args.keyboard_width, args.keyboard_height))
+            task_source.append(source_idx)
+
+    all_sigs, all_words, all_offsets, all_sources = [], [], [], []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for source_idx, (sig, words, offsets) in zip(task_source, pool.map(extract_signatures, tasks)):
+            all_sigs.append(sig)
+            all_words.extend(words)
+            all_offsets.extend(offsets)
+            all_sources.extend([source_idx] * len(words))
+
+    signatures = np.concatenate(all_sigs)
+    sources = np.array(all_sources, dtype=np.int32)
+    n = len(signatures)
+    print(f"Signatures: {n:,} samples from {len(inputs)} inputs in {time.perf_counter() - start:.1f}s")
+    if n == 0:
+        print("Nothing to do.")
+        return
+
+    if args.ignore_word:
+        word_ids = np.zeros(n, dtype=np.int64)
+    else:
+        vocab = {}
+        word_ids = np.array([vocab.setdefault(w, len(vocab)) for w in all_words], dtype=np.int64)
+
+    # --- LSH candidates + exact verification ---
+    start = time.perf_counter()
+    uf = UnionFind(n)
+    candidates = 0
+    verified = 0
+    for group in lsh_candidate_groups(signatures, word_ids, args.bands, args.rows_per_band,
+                                      args.bucket_width, args.seed):
+        candidates += len(group) * (len(group) - 1) // 2
+        for i, j in verify_group(group, signatures, args.signature_points, args.threshold, args.verify_block):
+            uf.union(i, j)
+            verified += 1
+    print(f"LSH: {candidates:,} candidate pairs checked (vs {n * (n - 1) // 2:,} brute force), "
+          f"{verified:,} duplicate matches across bands in {time.perf_counter() - start:.1f}s")
+
+    # --- Clusters: keep the highest-priority (lowest index) member ---
+    roots = np.array([uf.find(i) for i in range(n)])
+    protected = np.array([name in protected_names for name, _ in inputs])[sources]
+    removed = (roots != np.arange(n)) & ~protected
+
+    report = {'inputs': [], 'clusters': 0, 'cross_input_clusters': 0, 'leakage': {}, 'top_duplicated_words': []}
+    cluster_sources = defaultdict(set)
+    for i in np.flatnonzero(removed):
+        cluster_sources[roots[i]].add(int(sources[i]))
+    report['clusters'] = len(cluster_sources)
+    for root, srcs in cluster_sources.items():
+        srcs = srcs | {int(sources[root])}
+        if len(srcs) > 1:
+            report['cross_input_clusters'] += 1
+    for i in np.flatnonzero(removed & (sources != sources[roots])):
+        key = f"{inputs[sources[i]][0]}->{inputs[sources[roots[i]]][0]}"
+        report['leakage'][key] = report['leakage'].get(key, 0) + 1
+    dup_words = Counter(all_words[i] for i in np.flatnonzero(removed))
+    report['top_duplicated_words'] = dup_words.most_common(25)
+
+    # --- Write cleaned inputs (original lines, duplicates skipped) ---
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    offsets = np.array(all_offsets, dtype=np.int64)
+    total_removed = 0
+    print("-" * 60)
+    for source_idx, (name, path) in enumerate(inputs):
+        mask = sources == source_idx
+        drop = set(offsets[mask & removed].tolist())
+        total = int(mask.sum())
+        out_path = output_dir / Path(path).name
+        with open(path, 'rb') as src, open(out_path, 'wb') as dst:
+            pos = 0
+            for line in src:
+                if pos not in drop:
+                    dst.write(line)
+                pos += len(line)
+        total_removed += len(drop)
+        fraction = len(drop) / max(total, 1)
+        report['inputs'].append({'name': name, 'path': path, 'output': str(out_path),
+                                 'samples': total, 'removed': len(drop), 'duplicate_fraction': fraction})
+        print(f"  {name:12s} {total:>10,} samples  {len(drop):>9,} removed ({fraction:.1%})  -> {out_path}")
+
+    report['total_samples'] = n
+    report['total_removed'] = total_removed
+    report['duplicate_fraction'] = total_removed / n
+    report['config'] = vars(args)
+
+    report_path = output_dir / 'dedup_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("-" * 60)
+    print(f"Duplicate clusters: {report['clusters']:,} ({report['cross_input_clusters']:,} span several inputs)")
+    for key, count in sorted(report['leakage'].items(), key=lambda kv: -kv[1]):
+        print(f"  leakage {key}: {count:,}")
+    print(f"Removed {total_removed:,}/{n:,} samples ({report['duplicate_fraction']:.1%}); "
+          f"epoch time shrinks by the same fraction")
+    print(f"✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
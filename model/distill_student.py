@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Distill the full character-level model into a smaller, latency-budgeted student.
+
+The student is trained against the teacher's softened per-step character
+distributions (teacher forcing on the same targets), mixed with the usual
+hard-label cross entropy:
+
+    loss = alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * CE
+
+Both models are then exported through export_character_model.export_to_onnx
+and benchmarked with ONNX Runtime, so the report puts word accuracy and
+measured CPU latency side by side.
+"""
+
+import json
+import argparse
+import random
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    build_character_model,
+    create_padding_mask,
+    evaluate_word_accuracy
+)
+from export_character_model import export_to_onnx
+from onnx_benchmark import measure_ort_latency, format_latency_table
+from slim_checkpoints import load_model_checkpoint
+from trajectory_frontend import TrajectoryFrontEnd
+
+
+def load_teacher(checkpoint_path: str, device):
+    """Load a trained checkpoint as the teacher; returns (model, model_config)."""
+    state_dict, info = load_model_checkpoint(checkpoint_path)
+    config = info.get('model_config', FULL_MODEL_CONFIG)
+    model = build_character_model(config, CharTokenizer().vocab_size, dropout=0.0)
+    model.load_state_dict(state_dict)
+    # Teacher runs under no_grad; its parameters are never handed to the optimizer.
+    # (Flipping requires_grad off would route nn.Transformer onto its nested-tensor
+    # fast path, which the ONNX exporter cannot trace.)
+    model.to(device).eval()
+    print(f"Teacher: {checkpoint_path} ({info.get('val_word_acc', 0.0):.1%} val word acc)")
+    return model, config
+
+
+def distillation_loss(student_logits, teacher_logits, targets, pad_idx: int,
+                      temperature: float, alpha: float):
+    """Soft-target KL plus hard-label CE, both over non-pad target positions."""
+    vocab = student_logits.shape[-1]
+    student_flat = student_logits.reshape(-1, vocab)
+    teacher_flat = teacher_logits.reshape(-1, vocab)
+    targets_flat = targets.reshape(-1)
+    valid = targets_flat != pad_idx
+
+    kl = F.kl_div(
+        F.log_softmax(student_flat[valid] / temperature, dim=-1),
+        F.log_softmax(teacher_flat[valid] / temperature, dim=-1),
+        reduction='batchmean',
+        log_target=True
+    ) * (temperature ** 2)
+    ce = F.cross_entropy(student_flat, targets_flat, ignore_index=pad_idx)
+    return alpha * kl + (1 - alpha) * ce, kl, ce
+
+
+def count_parameters(model: nn.Module) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distill the full swipe model into a smaller student')
+    parser.add_argument('--teacher', required=True, help='Teacher checkpoint (.ckpt)')
+    parser.add_argument('--train-data', default='data/combined_dataset/cleaned_english_swipes_train.jsonl')
+    parser.add_argument('--val-data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--output-dir', default='checkpoints/distilled_student')
+    parser.add_argument('--student-d-model', type=int, default=128)
+    parser.add_argument('--student-heads', type=int, default=4)
+    parser.add_argument('--student-encoder-layers', type=int, default=4)
+    parser.add_argument('--student-decoder-layers', type=int, default=2)
+    parser.add_argument('--student-ff', type=int, default=512)
+    parser.add_argument('--temperature', type=float, default=2.0,
+                        help='Softmax temperature applied to both teacher and student logits')
+    parser.add_argument('--alpha', type=float, default=0.7,
+                        help='Weight of the soft-target loss (1 - alpha goes to hard CE)')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--eval-batches', type=int, default=None,
+                        help='Limit validation to this many batches (default: full set)')
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("="*60)
+    print("Knowledge Distillation: Full Model -> Student")
+    print("="*60)
+    print(f"Device: {device}")
+
+    tokenizer = CharTokenizer()
+    teacher, teacher_config = load_teacher(args.teacher, device)
+
+    student_config = {
+        'traj_dim': teacher_config['traj_dim'],
+        'd_model': args.student_d_model,
+        'nhead': args.student_heads,
+        'num_encoder_layers': args.student_encoder_layers,
+        'num_decoder_layers': args.student_decoder_layers,
+        'dim_feedforward': args.student_ff,
+    }
+    # The student sees exactly the teacher's inputs
+    frontend = TrajectoryFrontEnd.from_config(teacher_config)
+    student_config['frontend'] = frontend.to_config()
+    if 'max_seq_len' in teacher_config:
+        student_config['max_seq_len'] = teacher_config['max_seq_len']
+    student = build_character_model(student_config, tokenizer.vocab_size, dropout=0.1).to(device)
+    print(f"Teacher parameters: {count_parameters(teacher):,}")
+    print(f"Student parameters: {count_parameters(student):,}")
+    print("-"*60)
+
+    train_dataset = SwipeDataset(args.train_data, max_samples=args.max_samples, frontend=frontend)
+    val_dataset = SwipeDataset(args.val_data, max_samples=args.max_samples, frontend=frontend)
+    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
+                              num_workers=4, pin_memory=True)
+    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False,
+                            num_workers=4, pin_memory=True)
+    print(f"Train: {len(train_dataset)} samples, Val: {len(val_dataset)} samples")
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=0.01)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(
+        optimizer,
+        max_lr=args.lr,
+        epochs=args.epochs,
+        steps_per_epoch=len(train_loader),
+        pct_start=0.1,
+        anneal_strategy='cos'
+    )
+
+    best_acc = -1.0
+    student_path = output_dir / 'student-best.ckpt'
+    for epoch in range(args.epochs):
+        student.train()
+        totals = {'loss': 0.0, 'kl': 0.0, 'ce': 0.0}
+        pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{args.epochs} [Distill]')
+        for batch_idx, batch in enumerate(pbar):
+            traj_features = batch['traj_features'].to(device)
+            nearest_keys = batch['nearest_keys'].to(device)
+            targets = batch['target'].to(device)
+            src_mask = create_padding_mask(batch['seq_len'], traj_features.shape[1], device)
+            tgt_mask = (targets[:, :-1] == tokenizer.pad_idx)
+
+            with torch.no_grad():
+                teacher_logits = teacher(traj_features, nearest_keys, targets, src_mask, tgt_mask)
+            student_logits = student(traj_features, nearest_keys, targets, src_mask, tgt_mask)
+
+            loss, kl, ce = distillation_loss(
+                student_logits, teacher_logits, targets[:, 1:], tokenizer.pad_idx,
+                args.temperature, args.alpha
+            )
+
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+
+            totals['loss'] += loss.item()
+            totals['kl'] += kl.item()
+            totals['ce'] += ce.item()
+            if batch_idx % 10 == 0:
+                pbar.set_postfix({'loss': f'{loss.item():.4f}', 'kl': f'{kl.item():.4f}', 'ce': f'{ce.item():.4f}'})
+
+        n = max(len(train_loader), 1)
+        val_acc = evaluate_word_accuracy(student, val_loader, tokenizer, device,
+                                         max_batches=args.eval_batches, desc='Val')
+        print(f"\nEpoch {epoch+1}/{args.epochs}")
+        print(f"  Train - Loss: {totals['loss']/n:.4f} (KL {totals['kl']/n:.4f}, CE {totals['ce']/n:.4f})")
+        print(f"  Val   - Word Acc: {val_acc:.2%}")
+
+        if val_acc > best_acc:
+            best_acc = val_acc
+            torch.save({
+                'epoch': epoch,
+                'model_state_dict': student.state_dict(),
+                'val_word_acc': val_acc,
+                'model_config': student_config,
+                'distillation': {
+                    'teacher': str(args.teacher),
+                    'temperature': args.temperature,
+                    'alpha': args.alpha,
+                },
+            }, student_path)
+            print(f"  ✓ New best student saved: {student_path}")
+
+    # Reload the best student for evaluation/export
+    student = build_character_model(student_config, tokenizer.vocab_size, dropout=0.0)
+    student.load_state_dict(load_model_checkpoint(student_path)[0])
+    student.to(device).eval()
+
+    print("\n" + "="*60)
+    print("Evaluation and ONNX latency")
+    print("="*60)
+    rows = []
+    for name, model, config in (('teacher', teacher, teacher_config), ('student', student, student_config)):
+        acc = evaluate_word_accuracy(model, val_loader, tokenizer, device,
+                                     max_batches=args.eval_batches, desc=f'Val [{name}]')
+        model.cpu()
+        onnx_dir = output_dir / f'onnx_{name}'
+        onnx_dir.mkdir(exist_ok=True)
+        onnx_info = export_to_onnx(model, onnx_dir, seq_len=frontend.max_len)
+        latency = measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                      seq_len=frontend.max_len, runs=args.bench_runs, threads=args.bench_threads)
+        rows.append({
+            'model': name,
+            'params': count_parameters(model),
+            'd_model': config['d_model'],
+            'layers': f"{config['num_encoder_layers']}+{config['num_decoder_layers']}",
+            'word_acc': f"{acc:.2%}",
+            'enc_p50_ms': f"{latency['encoder']['p50_ms']:.2f}",
+            'dec_step_p50_ms': f"{latency['decoder_step']['p50_ms']:.2f}",
+            'total_ms': f"{latency['total_ms']:.1f}",
+            'onnx_kb': f"{onnx_info['encoder_size_kb'] + onnx_info['decoder_size_kb']:.0f}",
+            '_raw': {'word_acc': acc, 'latency': latency, 'onnx': onnx_info, 'config': config},
+        })
+
+    columns = ['model', 'params', 'd_model', 'layers', 'word_acc',
+               'enc_p50_ms', 'dec_step_p50_ms', 'total_ms', 'onnx_kb']
+    print("\n" + format_latency_table(rows, columns))
+
+    report = {
+        'teacher': rows[0]['_raw'],
+        'student': rows[1]['_raw'],
+        'speedup': rows[0]['_raw']['latency']['total_ms'] / max(rows[1]['_raw']['latency']['total_ms'], 1e-9),
+        'distillation': {'temperature': args.temperature, 'alpha': args.alpha, 'epochs': args.epochs},
+    }
+    report_path = output_dir / 'distillation_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nStudent speedup (end-to-end estimate): {report['speedup']:.2f}x")
+    print(f"✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
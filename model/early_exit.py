@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Early-exit encoder export and adaptive-depth evaluation.
+
+A model trained with exit layers (train_full_model.py --exit-layers 2,4) is
+exported as a chain of encoder segments, one per exit:
+
+    segment 0: features -> layers[0:e1] -> hidden_states_out, memory, exit_confidence
+    segment 1: hidden_states -> layers[e1:e2] -> hidden_states_out, memory, exit_confidence
+    ...
+    last:      hidden_states -> remaining layers -> memory
+
+The runtime runs segments in order and stops at the first one whose
+exit_confidence clears the threshold in early_exit_config.json, then feeds
+that segment's memory to the (unchanged) decoder. Otherwise hidden_states_out
+becomes the next segment's hidden_states input.
+
+Running this script evaluates accuracy, average executed depth and the ORT
+encoder latency saved for a range of thresholds.
+"""
+
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    CharacterLevelSwipeModel,
+    build_character_model,
+    create_padding_mask
+)
+from export_character_model import export_to_onnx
+from slim_checkpoints import load_model_checkpoint
+from trajectory_frontend import TrajectoryFrontEnd
+from onnx_benchmark import create_session, dummy_encoder_inputs, time_session, format_latency_table
+
+
+class EncoderSegment(nn.Module):
+    """Encoder layers [start, end), optionally preceded by the input embedding and followed by an exit."""
+
+    def __init__(self, model: CharacterLevelSwipeModel, start: int, end: int):
+        super().__init__()
+        self.model = model
+        self.start = start
+        self.end = end
+        self.exit_idx = model.exit_layers.index(end) if end in model.exit_layers else None
+
+    def forward(self, *inputs):
+        if self.start == 0:
+            traj_features, nearest_keys, src_mask = inputs
+            hidden = self.model.embed_trajectory(traj_features, nearest_keys)
+        else:
+            hidden, src_mask = inputs
+        for layer in self.model.encoder.layers[self.start:self.end]:
+            hidden = layer(hidden, src_key_padding_mask=src_mask)
+        if self.exit_idx is None:
+            return hidden
+        memory, confidence = self.model.exit_memory(hidden, src_mask, self.exit_idx)
+        return hidden, memory, torch.sigmoid(confidence)
+
+
+def export_early_exit_onnx(model: CharacterLevelSwipeModel, output_dir: Path,
+                           threshold: float = 0.9, seq_len: int = 150) -> Dict:
+    """Export the decoder plus one ONNX encoder segment per exit."""
+    if not model.exit_layers:
+        raise ValueError("Model has no exit layers")
+    model.eval()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Full-depth encoder and the shared decoder
+    onnx_info = export_to_onnx(model, output_dir, seq_len=seq_len)
+
+    print("\n=== Early-Exit Segment Export ===")
+    batch_size = 1
+    src_mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
+    hidden = torch.randn(batch_size, seq_len, model.d_model)
+    bounds = [0] + model.exit_layers + [len(model.encoder.layers)]
+
+    segments = []
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        segment = EncoderSegment(model, start, end).eval()
+        if start == 0:
+            args = (torch.randn(batch_size, seq_len, model.traj_proj.in_features),
+                    torch.randint(0, 30, (batch_size, seq_len)), src_mask)
+            input_names = ['trajectory_features', 'nearest_keys', 'src_mask']
+        else:
+            args = (hidden, src_mask)
+            input_names = ['hidden_states', 'src_mask']
+        if segment.exit_idx is None:
+            output_names = ['memory']
+        else:
+            output_names = ['hidden_states_out', 'memory', 'exit_confidence']
+
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'}
+                        for name in input_names + output_names if name != 'exit_confidence'}
+        if segment.exit_idx is not None:
+            dynamic_axes['exit_confidence'] = {0: 'batch'}
+
+        path = output_dir / f'swipe_encoder_segment_{i}.onnx'
+        torch.onnx.export(
+            segment,
+            args,
+            path,
+            export_params=True,
+            opset_version=14,
+            do_constant_folding=True,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            verbose=False
+        )
+        segments.append({
+            'file': path.name,
+            'layers': [start, end],
+            'inputs': input_names,
+            'outputs': output_names,
+            'is_exit': segment.exit_idx is not None,
+        })
+        print(f"✓ Segment {i} (layers {start}-{end}) exported: {path}")
+
+    config = {
+        'exit_layers': model.exit_layers,
+        'num_encoder_layers': len(model.encoder.layers),
+        'confidence_threshold': threshold,
+        'segments': segments,
+        'decoder': Path(onnx_info['decoder_path']).name,
+    }
+    config_path = output_dir / 'early_exit_config.json'
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    print(f"✓ Early-exit config saved: {config_path}")
+
+    return {**onnx_info, 'segment_paths': [str(output_dir / s['file']) for s in segments],
+            'config_path': str(config_path)}
+
+
+def time_segments(segment_paths: List[str], seq_len: int = 150, runs: int = 50,
+                  threads: int = 1) -> List[float]:
+    """p50 latency (ms) of each encoder segment, chaining real hidden states between them."""
+    latencies = []
+    hidden = None
+    for i, path in enumerate(segment_paths):
+        session = create_session(path, threads=threads)
+        if i == 0:
+            feeds = dummy_encoder_inputs(session, seq_len)
+            src_mask = feeds['src_mask']
+        else:
+            feeds = {'hidden_states': hidden, 'src_mask': src_mask}
+        latencies.append(time_session(session, feeds, runs)['p50_ms'])
+        hidden = session.run(None, feeds)[0]
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate adaptive-depth early exit')
+    parser.add_argument('--checkpoint', required=True, help='Checkpoint trained with --exit-layers')
+    parser.add_argument('--data', default='swipes.jsonl')
+    parser.add_argument('--output-dir', default='deployment_package/early_exit')
+    parser.add_argument('--thresholds', default='0.5,0.7,0.8,0.9,0.95,0.99')
+    parser.add_argument('--export-threshold', type=float, default=0.9,
+                        help='Threshold written to early_exit_config.json')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.0,
+                        help='Accuracy drop still counted as matched (absolute, e.g. 0.005)')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Early-Exit Adaptive Depth Evaluation")
+    print("="*60)
+
+    tokenizer = CharTokenizer()
+    state_dict, info = load_model_checkpoint(args.checkpoint)
+    model = build_character_model(info['model_config'], tokenizer.vocab_size, dropout=0.0)
+    model.load_state_dict(state_dict)
+    model.eval()
+    if not model.exit_layers:
+        raise ValueError("Checkpoint was not trained with exit layers (see train_full_model.py --exit-layers)")
+    num_layers = len(model.encoder.layers)
+    depths = model.exit_layers + [num_layers]
+    print(f"Exit layers: {model.exit_layers} of {num_layers}")
+
+    frontend = TrajectoryFrontEnd.from_config(info['model_config'])
+    dataset = SwipeDataset(args.data, max_samples=args.max_samples, frontend=frontend)
+    loader = DataLoader(dataset, batch_size=1, shuffle=False)
+    print(f"Samples: {len(dataset)}")
+
+    # Decode every exit once per sample; thresholds then only pick among them
+    samples = []
+    with torch.no_grad():
+        for batch in tqdm(loader, desc='Decode exits'):
+            src_mask = create_padding_mask(batch['seq_len'], batch['traj_features'].shape[1], 'cpu')
+            exits = model.encode_with_exits(batch['traj_features'], batch['nearest_keys'], src_mask)
+            words = [model.beam_decode(memory, tokenizer, beam_size=args.beam_size)[0] for memory, _ in exits]
+            confidences = [torch.sigmoid(c).item() for _, c in exits[:-1]]
+            samples.append({
+                'correct': [word == batch['word'][0] for word in words],
+                'confidence': confidences,
+            })
+
+    onnx_info = export_early_exit_onnx(model, Path(args.output_dir), args.export_threshold,
+                                       seq_len=frontend.max_len)
+    segment_ms = time_segments(onnx_info['segment_paths'], seq_len=frontend.max_len,
+                               runs=args.bench_runs, threads=args.bench_threads)
+    cumulative_ms = np.cumsum(segment_ms)
+    full_ms = float(cumulative_ms[-1])
+
+    full_acc = float(np.mean([s['correct'][-1] for s in samples]))
+    rows = [{'threshold': 'full', 'word_acc': full_acc, 'avg_depth': float(num_layers),
+             'encoder_ms': full_ms, 'saved_ms': 0.0}]
+    for threshold in [float(t) for t in args.thresholds.split(',')]:
+        exit_index = []
+        for s in samples:
+            hit = [i for i, c in enumerate(s['confidence']) if c >= threshold]
+            exit_index.append(hit[0] if hit else len(depths) - 1)
+        acc = float(np.mean([s['correct'][i] for s, i in zip(samples, exit_index)]))
+        encoder_ms = float(np.mean([cumulative_ms[i] for i in exit_index]))
+        rows.append({
+            'threshold': threshold,
+            'word_acc': acc,
+            'avg_depth': float(np.mean([depths[i] for i in exit_index])),
+            'encoder_ms': encoder_ms,
+            'saved_ms': full_ms - encoder_ms,
+        })
+
+    table = [{
+        'threshold': str(r['threshold']),
+        'word_acc': f"{r['word_acc']:.2%}",
+        'avg_depth': f"{r['avg_depth']:.2f}",
+        'encoder_ms': f"{r['encoder_ms']:.2f}",
+        'saved_ms': f"{r['saved_ms']:.2f}",
+        'saved_pct': f"{r['saved_ms'] / full_ms:.1%}",
+    } for r in rows]
+    print("\nSegment p50 latency (ms): " + ", ".join(f"{ms:.2f}" for ms in segment_ms))
+    print("\n" + format_latency_table(table, list(table[0].keys())))
+
+    matched = [r for r in rows[1:] if r['word_acc'] >= full_acc - args.accuracy_tolerance]
+    best = min(matched, key=lambda r: r['encoder_ms']) if matched else None
+    if best:
+        print(f"\nAt matched accuracy ({best['word_acc']:.2%} vs {full_acc:.2%} full depth): "
+              f"threshold {best['threshold']}, avg depth {best['avg_depth']:.2f}/{num_layers}, "
+              f"{best['saved_ms']:.2f} ms ({best['saved_ms'] / full_ms:.1%}) encoder latency saved")
+    else:
+        print("\n⚠ No threshold matched full-depth accuracy")
+
+    report_path = Path(args.output_dir) / 'early_exit_report.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'checkpoint': str(args.checkpoint),
+            'data': args.data,
+            'exit_layers': model.exit_layers,
+            'segment_p50_ms': segment_ms,
+            'results': rows,
+            'matched': best,
+        }, f, indent=2)
+    print(f"✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,55 +16,69 @@ import onnx
 import onnxruntime as ort
 
 # Import the character model components
-from train_character_model import CharacterLevelSwipeModel, CharTokenizer
+from train_character_model import (
+    CharacterLevelSwipeModel,
+    CharTokenizer,
+    FULL_MODEL_CONFIG,
+    build_character_model
+)
+from structured_pruning import apply_pruning_spec
+from quantization_aware import apply_qat_spec, is_qat_model, fold_weight_quantization
+from slim_checkpoints import best_checkpoint, load_model_checkpoint, resolve_checkpoint
+from trajectory_frontend import TrajectoryFrontEnd
+from key_segments import KeySegmenter, SEGMENT_FEATURES
 
 
-def load_best_checkpoint() -> Tuple[CharacterLevelSwipeModel, str]:
-    """Load the best performing checkpoint."""
+def load_best_checkpoint() -> Tuple[CharacterLevelSwipeModel, str, Dict]:
+    """Load the best performing checkpoint; also returns its model_config."""
     checkpoint_dir = Path('checkpoints/full_character_model')
     
-    # Find the best checkpoint (70.1% accuracy)
-    checkpoint_path = checkpoint_dir / 'full-model-14-0.701.ckpt'
+    # Slimmed runs (slim_checkpoints.py) list their checkpoints with accuracy
+    best = best_checkpoint(checkpoint_dir)
+    if best:
+        checkpoint_path = best[0]
+    else:
+        # Find the best checkpoint (70.1% accuracy)
+        checkpoint_path = checkpoint_dir / 'full-model-14-0.701.ckpt'
     
     if not checkpoint_path.exists():
-        # Try to find any checkpoint with >70% accuracy
-        checkpoints = list(checkpoint_dir.glob('*.ckpt'))
-        checkpoints.sort(key=lambda x: float(x.stem.split('-')[-1]), reverse=True)
-        if checkpoints:
-            checkpoint_path = checkpoints[0]
-            print(f"Using checkpoint: {checkpoint_path}")
-        else:
-            raise FileNotFoundError("No checkpoint found! Please train the model first.")
+        # Fall back to the most accurate epoch checkpoint of the run
+        checkpoint_path = resolve_checkpoint(checkpoint_dir)
+        print(f"Using checkpoint: {checkpoint_path}")
     
     print(f"Loading checkpoint: {checkpoint_path}")
-    checkpoint = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+    state_dict, info = load_model_checkpoint(checkpoint_path)
     
     # Initialize model with same architecture as training
+    # (older checkpoints predate 'model_config' and use the full model layout)
     tokenizer = CharTokenizer()
-    model = CharacterLevelSwipeModel(
-        traj_dim=6,
-        d_model=256,
-        nhead=8,
-        num_encoder_layers=6,
-        num_decoder_layers=4,
-        dim_feedforward=1024,
-        dropout=0.0,  # No dropout for inference
-        char_vocab_size=tokenizer.vocab_size,
-        kb_vocab_size=tokenizer.vocab_size
+    model_config = info.get('model_config', FULL_MODEL_CONFIG)
+    model = build_character_model(
+        model_config,
+        tokenizer.vocab_size,
+        dropout=0.0  # No dropout for inference
     )
     
+    # Pruned checkpoints (prune_character_model.py) carry their reduced shapes
+    apply_pruning_spec(model, info.get('pruning'))
+    # QAT checkpoints (train_qat.py) carry fake-quant modules and their ranges
+    apply_qat_spec(model, info.get('quantization'))
+    
     # Load weights
-    model.load_state_dict(checkpoint['model_state_dict'])
+    model.load_state_dict(state_dict)
     model.eval()
     
-    accuracy = checkpoint.get('val_word_acc', 0.0)
+    accuracy = info.get('val_word_acc', 0.0)
     print(f"Model loaded: {accuracy:.1%} word accuracy")
     
-    return model, f"{accuracy:.3f}"
+    return model, f"{accuracy:.3f}", model_config
 
 
-def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
-    """Export model to ONNX format for web deployment."""
+def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path, seq_len: int = 150) -> Dict:
+    """Export model to ONNX format for web deployment.
+    
+    seq_len is the padded trajectory length (the front end's max_len).
+    """
     print("\n=== ONNX Export ===")
     
     onnx_path = output_dir / 'swipe_model_character.onnx'
@@ -82,6 +96,10 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
             # Use the model's encode_trajectory method
             memory = self.model.encode_trajectory(traj_features, nearest_keys, src_mask)
             
+            if self.model.word_head is not None:
+                # Tiny extra output: whole-word probabilities for the fast path
+                word_probs = torch.softmax(self.model.word_logits(memory, src_mask), dim=-1)
+                return memory, word_probs
             return memory
     
     wrapper = ONNXWrapper(model)
@@ -89,8 +107,7 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
     
     # Create sample inputs
     batch_size = 1
-    seq_len = 150  # Max sequence length from model_config.json
-    traj_features = torch.randn(batch_size, seq_len, 6)
+    traj_features = torch.randn(batch_size, seq_len, model.traj_proj.in_features)
     nearest_keys = torch.randint(0, 30, (batch_size, seq_len))  # 2D tensor
     src_mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
     
@@ -101,6 +118,10 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
         'src_mask': {0: 'batch', 1: 'sequence'},
         'encoder_output': {0: 'batch', 1: 'sequence'}
     }
+    output_names = ['encoder_output']
+    if model.word_head is not None:
+        output_names.append('word_probs')
+        dynamic_axes['word_probs'] = {0: 'batch'}
     
     # Export encoder
     torch.onnx.export(
@@ -111,7 +132,7 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
         opset_version=14,
         do_constant_folding=True,
         input_names=['trajectory_features', 'nearest_keys', 'src_mask'],
-        output_names=['encoder_output'],
+        output_names=output_names,
         dynamic_axes=dynamic_axes,
         verbose=False
     )
@@ -132,6 +153,14 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
     print(f"✓ Encoder exported: {onnx_path}")
     print(f"  Output shape: {ort_outputs[0].shape}")
     
+    word_classes_path = None
+    if model.word_head is not None:
+        # Class index -> word; the last class means "decode character by character"
+        word_classes_path = output_dir / 'word_classes.json'
+        with open(word_classes_path, 'w') as f:
+            json.dump({'words': model.word_vocab, 'other_class': len(model.word_vocab)}, f)
+        print(f"✓ Word classes saved: {word_classes_path} ({len(model.word_vocab)} words)")
+    
     # Export decoder separately
     decoder_path = output_dir / 'swipe_decoder_character.onnx'
     
@@ -167,7 +196,7 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
     decoder_wrapper.eval()
     
     # Sample inputs for decoder
-    memory = torch.randn(batch_size, seq_len, 256)
+    memory = torch.randn(batch_size, seq_len, model.d_model)
     tgt_tokens = torch.randint(0, 30, (batch_size, 20))
     src_mask_decoder = torch.zeros(batch_size, seq_len, dtype=torch.bool)
     tgt_mask = torch.zeros(batch_size, 20, dtype=torch.bool)
@@ -198,12 +227,78 @@ def export_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
     return {
         'encoder_path': str(onnx_path),
         'decoder_path': str(decoder_path),
+        'word_classes_path': str(word_classes_path) if word_classes_path else None,
         'encoder_size_kb': os.path.getsize(onnx_path) / 1024,
         'decoder_size_kb': os.path.getsize(decoder_path) / 1024
     }
 
 
-def export_to_executorch(model: CharacterLevelSwipeModel, output_dir: Path) -> Dict:
+def export_ctc_to_onnx(model: CharacterLevelSwipeModel, output_dir: Path, seq_len: int = 150) -> Dict:
+    """Export the encoder + CTC head as a single-pass (decoder-free) ONNX graph."""
+    print("\n=== CTC Encoder Export ===")
+    
+    if model.ctc_proj is None:
+        raise ValueError("Model has no CTC head (train with --ctc-weight or --ctc-only)")
+    
+    onnx_path = output_dir / 'swipe_model_ctc.onnx'
+    
+    class CTCWrapper(nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+        
+        def forward(self, traj_features, nearest_keys, src_mask):
+            memory = self.model.encode_trajectory(traj_features, nearest_keys, src_mask)
+            return self.model.ctc_log_probs(memory)
+    
+    wrapper = CTCWrapper(model)
+    wrapper.eval()
+    
+    batch_size = 1
+    traj_features = torch.randn(batch_size, seq_len, model.traj_proj.in_features)
+    nearest_keys = torch.randint(0, 30, (batch_size, seq_len))
+    src_mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
+    
+    torch.onnx.export(
+        wrapper,
+        (traj_features, nearest_keys, src_mask),
+        onnx_path,
+        export_params=True,
+        opset_version=14,
+        do_constant_folding=True,
+        input_names=['trajectory_features', 'nearest_keys', 'src_mask'],
+        output_names=['ctc_log_probs'],
+        dynamic_axes={
+            'trajectory_features': {0: 'batch', 1: 'sequence'},
+            'nearest_keys': {0: 'batch', 1: 'sequence'},
+            'src_mask': {0: 'batch', 1: 'sequence'},
+            'ctc_log_probs': {0: 'batch', 1: 'sequence'}
+        },
+        verbose=False
+    )
+    
+    onnx.checker.check_model(onnx.load(onnx_path))
+    ort_session = ort.InferenceSession(str(onnx_path))
+    ort_outputs = ort_session.run(None, {
+        'trajectory_features': traj_features.numpy(),
+        'nearest_keys': nearest_keys.numpy(),
+        'src_mask': src_mask.numpy()
+    })
+    with torch.no_grad():
+        torch_output = wrapper(traj_features, nearest_keys, src_mask).numpy()
+    max_diff = np.abs(ort_outputs[0] - torch_output).max()
+    
+    print(f"✓ CTC encoder exported: {onnx_path}")
+    print(f"  Size: {os.path.getsize(onnx_path) / 1024:.1f} KB")
+    print(f"  Max difference: {max_diff:.6f}")
+    
+    return {
+        'ctc_path': str(onnx_path),
+        'ctc_size_kb': os.path.getsize(onnx_path) / 1024
+    }
+
+
+def export_to_executorch(model: CharacterLevelSwipeModel, output_dir: Path, seq_len: int = 150) -> Dict:
     """Export model to ExecuTorch format for mobile deployment."""
     print("\n=== ExecuTorch Export ===")
     
@@ -265,8 +360,8 @@ def export_to_executorch(model: CharacterLevelSwipeModel, output_dir: Path) -> D
         
         # Trace the model
         example_inputs = (
-            torch.randn(1, 150, 6),  # Max sequence length from model_config.json
-            torch.randint(0, 30, (1, 150))  # 2D tensor for nearest_keys
+            torch.randn(1, seq_len, model.traj_proj.in_features),  # max_seq_length in model_config.json
+            torch.randint(0, 30, (1, seq_len))  # 2D tensor for nearest_keys
         )
         
         traced_model = torch.jit.trace(mobile_model, example_inputs)
@@ -324,23 +419,37 @@ def create_tokenizer_config(output_dir: Path):
     return config
 
 
-def create_model_config(output_dir: Path, accuracy: str):
-    """Create model configuration file."""
+def create_model_config(output_dir: Path, accuracy: str, model_config: Optional[Dict] = None,
+                        frontend: Optional[TrajectoryFrontEnd] = None,
+                        segmenter: Optional[KeySegmenter] = None,
+                        model: Optional[CharacterLevelSwipeModel] = None):
+    """
+    Create model configuration file.
+
+    The architecture comes from the checkpoint's model_config (the full model
+    layout for older checkpoints without one); parameter count and size
+    from the exported model when given.
+    """
+    frontend = frontend or TrajectoryFrontEnd()
+    model_config = model_config or FULL_MODEL_CONFIG
+    num_params = sum(p.numel() for p in model.parameters()) if model is not None else 8968510
     config = {
         'model_type': 'character_level_transformer',
         'architecture': {
-            'trajectory_dim': 6,
-            'd_model': 256,
-            'nhead': 8,
-            'num_encoder_layers': 6,
-            'num_decoder_layers': 4,
-            'dim_feedforward': 1024,
+            'trajectory_dim': len(SEGMENT_FEATURES) if segmenter else model_config.get('traj_dim', 6),
+            'd_model': model_config['d_model'],
+            'nhead': model_config['nhead'],
+            'num_encoder_layers': model_config['num_encoder_layers'],
+            'num_decoder_layers': model_config['num_decoder_layers'],
+            'dim_feedforward': model_config['dim_feedforward'],
             'vocab_size': 30,
-            'max_seq_length': 150,
+            'max_seq_length': segmenter.max_segments if segmenter else frontend.max_len,
             'max_word_length': 20
         },
         'feature_extraction': {
             'input_features': ['x', 'y', 'vx', 'vy', 'ax', 'ay'],
+            # Applied to the normalized points before the features (SwipeResampler)
+            'resampling': frontend.to_config(),
             'normalization': {
                 'keyboard_width': 360,
                 'keyboard_height': 215,
@@ -360,8 +469,8 @@ def create_model_config(output_dir: Path, accuracy: str):
         },
         'performance': {
             'word_accuracy': float(accuracy),
-            'model_parameters': 8968510,  # 8.97M
-            'model_size_mb': 34.2
+            'model_parameters': num_params,
+            'model_size_mb': round(num_params * 4 / (1024 * 1024), 1)  # fp32
         },
         'training': {
             'dataset_size': 68848,
@@ -371,6 +480,11 @@ def create_model_config(output_dir: Path, accuracy: str):
         }
     }
     
+    if segmenter:
+        # One input position per key run (key_segments.py); nearest_keys holds the run's key
+        config['feature_extraction']['input_features'] = SEGMENT_FEATURES
+        config['feature_extraction']['key_segments'] = segmenter.to_config()
+    
     config_path = output_dir / 'model_config.json'
     with open(config_path, 'w') as f:
         json.dump(config, f, indent=2)
@@ -1068,14 +1182,28 @@ def main():
     output_dir.mkdir(exist_ok=True)
     
     # Load the trained model
-    model, accuracy = load_best_checkpoint()
-    
-    # Export to ONNX
-    onnx_info = export_to_onnx(model, output_dir)
+    model, accuracy, model_config = load_best_checkpoint()
+    frontend = TrajectoryFrontEnd.from_config(model_config)
+    segmenter = KeySegmenter.from_config(model_config)
+    print(f"Trajectory front end: {frontend.spec}" + (f", {segmenter}" if segmenter else ""))
+    
+    # Export to ONNX at the padded input length (points or key segments)
+    seq_len = segmenter.max_segments if segmenter else frontend.max_len
+    onnx_info = export_to_onnx(model, output_dir, seq_len=seq_len)
+    if model.ctc_proj is not None:
+        onnx_info.update(export_ctc_to_onnx(model, output_dir, seq_len=seq_len))
+    if is_qat_model(model):
+        # Store the QDQ weights as int8 so ORT picks its INT8 kernels
+        for key in ('encoder', 'decoder', 'ctc'):
+            path = onnx_info.get(f'{key}_path')
+            if path:
+                folded = fold_weight_quantization(Path(path))
+                onnx_info[f'{key}_size_kb'] = os.path.getsize(path) / 1024
+                print(f"✓ {Path(path).name}: {folded['folded_weights']} weights stored as int8")
     
     # Export to ExecuTorch (optional - may fail)
     try:
-        et_info = export_to_executorch(model, output_dir)
+        et_info = export_to_executorch(model, output_dir, seq_len=seq_len)
     except Exception as e:
         print(f"⚠ ExecuTorch export failed: {e}")
         print("  Continuing with ONNX export only...")
@@ -1083,7 +1211,7 @@ def main():
     
     # Create configuration files
     create_tokenizer_config(output_dir)
-    create_model_config(output_dir, accuracy)
+    create_model_config(output_dir, accuracy, model_config, frontend, segmenter, model)
     
     # Combine export info
     export_info = {
@@ -1105,6 +1233,8 @@ def main():
     print("\nContents:")
     print("  - swipe_model_character.onnx (encoder)")
     print("  - swipe_decoder_character.onnx (decoder)")
+    if 'ctc_path' in onnx_info:
+        print("  - swipe_model_ctc.onnx (encoder + CTC head)")
     if et_info:
         print("  - swipe_model_character.pte (ExecuTorch)")
     print("  - tokenizer_config.json")
@@ -5,13 +5,14 @@ CRITICAL: Uses shape [batch, sequence, 3] for top-3 nearest keys per point.
 """
 
 import os
+import copy
 import json
 import math
 import torch
 import torch.nn as nn
 import numpy as np
 from pathlib import Path
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
 
 # Optional ONNX validation (not available on some platforms)
 try:
@@ -23,6 +24,10 @@ except ImportError:
 
 import onnxruntime as ort
 
+from trajectory_frontend import TrajectoryFrontEnd
+from slim_checkpoints import load_model_checkpoint
+from structured_pruning import make_prunable
+
 
 # ============================================================================
 # MODEL DEFINITION (from train_character_model.py)
@@ -258,11 +263,16 @@ class KeyboardGrid:
 # EXPORT FUNCTIONS
 # ============================================================================
 
-def load_checkpoint(checkpoint_path: str) -> CharacterLevelSwipeModel:
-    """Load model from checkpoint."""
+def load_checkpoint(checkpoint_path: str) -> Tuple[CharacterLevelSwipeModel, CharTokenizer, float, Dict]:
+    """
+    Load model from a training checkpoint or a slim .safetensors file.
+
+    Returns (model, tokenizer, val accuracy, model_config); model_config is
+    empty for checkpoints that predate it.
+    """
     print(f"Loading checkpoint: {checkpoint_path}")
 
-    checkpoint = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+    state_dict, info = load_model_checkpoint(checkpoint_path)
 
     # Initialize model
     tokenizer = CharTokenizer()
@@ -279,16 +289,16 @@ def load_checkpoint(checkpoint_path: str) -> CharacterLevelSwipeModel:
     )
 
     # Load weights
-    model.load_state_dict(checkpoint['model_state_dict'])
+    model.load_state_dict(state_dict)
     model.eval()
 
-    accuracy = checkpoint.get('val_word_acc', 0.0)
+    accuracy = info.get('val_word_acc', 0.0)
     print(f"Model loaded: {accuracy:.1%} word accuracy")
 
-    return model, tokenizer, accuracy
+    return model, tokenizer, accuracy, info.get('model_config') or {}
 
 
-def export_encoder_onnx(model: CharacterLevelSwipeModel, output_path: str):
+def export_encoder_onnx(model: CharacterLevelSwipeModel, output_path: str, seq_len: int = 150):
     """Export encoder to ONNX with 3D nearest_keys."""
     print("\n=== Exporting Encoder ===")
 
@@ -305,7 +315,6 @@ def export_encoder_onnx(model: CharacterLevelSwipeModel, output_path: str):
 
     # Sample inputs with 3D nearest_keys
     batch_size = 1
-    seq_len = 150
     traj_features = torch.randn(batch_size, seq_len, 6)
     nearest_keys = torch.randint(0, 30, (batch_size, seq_len, 3))  # 3D: top 3 keys
     src_mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
@@ -359,7 +368,7 @@ def export_encoder_onnx(model: CharacterLevelSwipeModel, output_path: str):
     return output_path
 
 
-def export_decoder_onnx(model: CharacterLevelSwipeModel, output_path: str):
+def export_decoder_onnx(model: CharacterLevelSwipeModel, output_path: str, seq_len: int = 150):
     """Export decoder to ONNX."""
     print("\n=== Exporting Decoder ===")
 
@@ -397,7 +406,6 @@ def export_decoder_onnx(model: CharacterLevelSwipeModel, output_path: str):
 
     # Sample inputs
     batch_size = 1
-    seq_len = 150
     tgt_len = 20
     memory = torch.randn(batch_size, seq_len, 256)
     tgt_tokens = torch.randint(0, 30, (batch_size, tgt_len))
@@ -433,6 +441,248 @@ def export_decoder_onnx(model: CharacterLevelSwipeModel, output_path: str):
     return output_path
 
 
+# ============================================================================
+# DYNAMIC-LENGTH EXPORT
+# ============================================================================
+
+def length_padding_mask(reference: torch.Tensor, actual_length: torch.Tensor) -> torch.Tensor:
+    """
+    Padding mask [batch, seq] (True = padding) computed in-graph from lengths.
+
+    Positions come from a cumulative sum over the reference's sequence axis,
+    so the exported graph follows whatever length it is fed. The comparison
+    yields the same boolean key_padding_mask the static graphs take as
+    src_mask; attention turns it into an additive bias with torch.where, the
+    formulation test_masked_fill.py checks against ONNX Runtime.
+    """
+    positions = torch.ones_like(reference, dtype=torch.long).cumsum(1) - 1
+    return positions >= actual_length.unsqueeze(1)
+
+
+def export_dynamic_encoder_onnx(model: CharacterLevelSwipeModel, output_path: str, seq_len: int = 150,
+                                top_k: int = 3):
+    """Export the encoder with dynamic batch and sequence axes and an actual_length input."""
+    print("\n=== Exporting Dynamic-Length Encoder ===")
+
+    class DynamicEncoderWrapper(nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, traj_features, nearest_keys, actual_length):
+            src_mask = length_padding_mask(traj_features[:, :, 0], actual_length)
+            return self.model.encode_trajectory(traj_features, nearest_keys, src_mask)
+
+    # The traced nn.MultiheadAttention bakes the sequence length into its
+    # reshapes; the separate-projection attention traces it symbolically
+    wrapper = DynamicEncoderWrapper(make_prunable(copy.deepcopy(model)))
+    wrapper.eval()
+
+    # Trace with padding present so the mask path is exercised
+    batch_size = 2
+    traj_features = torch.randn(batch_size, seq_len, 6)
+    nearest_keys = torch.randint(4, 30, (batch_size, seq_len, top_k))
+    actual_length = torch.tensor([seq_len, seq_len * 2 // 3], dtype=torch.long)
+
+    # Opset 14 with constant folding (the opset 11 / no folding workarounds
+    # above target the Termux exporter bug, see ONNX_EXPORT_FAILURE_REPORT.md)
+    torch.onnx.export(
+        wrapper,
+        (traj_features, nearest_keys, actual_length),
+        output_path,
+        export_params=True,
+        opset_version=14,
+        do_constant_folding=True,
+        input_names=['trajectory_features', 'nearest_keys', 'actual_length'],
+        output_names=['encoder_output'],
+        dynamic_axes={
+            'trajectory_features': {0: 'batch', 1: 'sequence'},
+            'nearest_keys': {0: 'batch', 1: 'sequence'},
+            'actual_length': {0: 'batch'},
+            'encoder_output': {0: 'batch', 1: 'sequence'}
+        },
+        verbose=False
+    )
+
+    if ONNX_VALIDATION_AVAILABLE:
+        onnx.checker.check_model(onnx.load(output_path))
+        print("   Model validation: ✅ passed")
+
+    print(f"✅ Encoder exported: {output_path}")
+    print(f"   Inputs: trajectory_features [batch, sequence, 6], nearest_keys [batch, sequence, {top_k}], "
+          f"actual_length [batch]")
+    print(f"   Sequence up to {model.pe.shape[1]} points (positional table)")
+
+    return output_path
+
+
+def export_dynamic_decoder_onnx(model: CharacterLevelSwipeModel, output_path: str, seq_len: int = 150):
+    """Export the decoder with dynamic memory/target lengths and an actual_length input."""
+    print("\n=== Exporting Dynamic-Length Decoder ===")
+
+    class DynamicDecoderWrapper(nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+            self.d_model = model.d_model
+
+        def forward(self, memory, tgt_tokens, actual_length, tgt_mask):
+            src_mask = length_padding_mask(memory[:, :, 0], actual_length)
+            tgt_len = tgt_tokens.shape[1]
+
+            tgt_emb = self.model.char_embedding(tgt_tokens) * math.sqrt(self.d_model)
+            tgt_emb = tgt_emb + self.model.pe[:, :tgt_len, :]
+
+            # Causal mask built from positions as well (True = future token)
+            positions = torch.ones_like(tgt_tokens[0]).cumsum(0)
+            causal_mask = positions.unsqueeze(0) > positions.unsqueeze(1)
+
+            output = self.model.decoder(
+                tgt_emb, memory,
+                tgt_mask=causal_mask,
+                memory_key_padding_mask=src_mask,
+                tgt_key_padding_mask=tgt_mask
+            )
+            return self.model.output_proj(output)
+
+    wrapper = DynamicDecoderWrapper(make_prunable(copy.deepcopy(model)))
+    wrapper.eval()
+
+    batch_size = 2
+    tgt_len = 20
+    memory = torch.randn(batch_size, seq_len, model.d_model)
+    tgt_tokens = torch.randint(4, 30, (batch_size, tgt_len))
+    actual_length = torch.tensor([seq_len, seq_len * 2 // 3], dtype=torch.long)
+    tgt_mask = torch.zeros(batch_size, tgt_len, dtype=torch.bool)
+    tgt_mask[1, tgt_len // 2:] = True
+
+    torch.onnx.export(
+        wrapper,
+        (memory, tgt_tokens, actual_length, tgt_mask),
+        output_path,
+        export_params=True,
+        opset_version=14,
+        do_constant_folding=True,
+        input_names=['memory', 'target_tokens', 'actual_length', 'target_mask'],
+        output_names=['logits'],
+        dynamic_axes={
+            'memory': {0: 'batch', 1: 'sequence'},
+            'target_tokens': {0: 'batch', 1: 'dec_sequence'},
+            'actual_length': {0: 'batch'},
+            'target_mask': {0: 'batch', 1: 'dec_sequence'},
+            'logits': {0: 'batch', 1: 'dec_sequence'}
+        },
+        verbose=False
+    )
+
+    if ONNX_VALIDATION_AVAILABLE:
+        onnx.checker.check_model(onnx.load(output_path))
+        print("   Model validation: ✅ passed")
+
+    print(f"✅ Decoder exported: {output_path}")
+    print(f"   Inputs: memory [batch, sequence, {model.d_model}], target_tokens [batch, dec_sequence], "
+          f"actual_length [batch], target_mask [batch, dec_sequence]")
+
+    return output_path
+
+
+def real_swipe_lengths(test_file: str, frontend: TrajectoryFrontEnd) -> List[int]:
+    """Point counts of the swipes in a JSONL file after the trajectory front end."""
+    keyboard = KeyboardGrid()
+    lengths = []
+    with open(test_file, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            curve = json.loads(line)['curve']
+            xs, _, _ = frontend(np.asarray(curve['x'], dtype=np.float32) / keyboard.width,
+                                np.asarray(curve['y'], dtype=np.float32) / keyboard.height,
+                                np.asarray(curve['t'], dtype=np.float32))
+            lengths.append(min(len(xs), frontend.max_len))
+    return lengths
+
+
+def check_dynamic_parity(model: CharacterLevelSwipeModel, encoder_path: str, decoder_path: str,
+                         lengths: List[int], seq_len: int = 150, top_k: int = 3,
+                         tgt_len: int = 6, atol: float = 1e-3) -> List[Dict]:
+    """
+    Compare the dynamic graphs fed unpadded swipes against PyTorch on padded ones.
+
+    For each length the reference is the model run the static way: padded
+    to seq_len with an explicit src_mask. Encoder outputs are compared on
+    the real positions, decoder logits on every target position.
+    """
+    print("\n=== Dynamic-Length Parity ===")
+    encoder_session = ort.InferenceSession(encoder_path, providers=['CPUExecutionProvider'])
+    decoder_session = ort.InferenceSession(decoder_path, providers=['CPUExecutionProvider'])
+    generator = torch.Generator().manual_seed(0)
+    rows = []
+    for length in lengths:
+        traj_features = torch.zeros(1, seq_len, 6)
+        traj_features[:, :length] = torch.randn(1, length, 6, generator=generator)
+        nearest_keys = torch.zeros(1, seq_len, top_k, dtype=torch.long)
+        nearest_keys[:, :length] = torch.randint(4, 30, (1, length, top_k), generator=generator)
+        src_mask = torch.arange(seq_len)[None, :] >= length
+        tokens = torch.randint(4, 30, (1, tgt_len), generator=generator)
+
+        with torch.no_grad():
+            memory = model.encode_trajectory(traj_features, nearest_keys, src_mask)
+            # forward() shifts its targets, so append a token that gets dropped
+            logits = model(traj_features, nearest_keys, torch.cat([tokens, tokens[:, :1]], dim=1), src_mask)
+
+        ort_memory = encoder_session.run(None, {
+            'trajectory_features': traj_features[:, :length].numpy(),
+            'nearest_keys': nearest_keys[:, :length].numpy(),
+            'actual_length': np.array([length], dtype=np.int64),
+        })[0]
+        ort_logits = decoder_session.run(None, {
+            'memory': ort_memory,
+            'target_tokens': tokens.numpy(),
+            'actual_length': np.array([length], dtype=np.int64),
+            'target_mask': np.zeros((1, tgt_len), dtype=np.bool_),
+        })[0]
+
+        encoder_diff = float(np.abs(ort_memory - memory[:, :length].numpy()).max())
+        decoder_diff = float(np.abs(ort_logits - logits.numpy()).max())
+        passed = encoder_diff < atol and decoder_diff < atol
+        rows.append({'length': length, 'encoder_max_diff': encoder_diff,
+                     'decoder_max_diff': decoder_diff, 'passed': passed})
+        print(f"  length {length:3d}: encoder max diff {encoder_diff:.2e}, "
+              f"decoder max diff {decoder_diff:.2e} {'✅' if passed else '❌'}")
+    return rows
+
+
+def benchmark_dynamic_lengths(encoder_path: str, decoder_path: str, lengths: List[int],
+                              seq_len: int = 150, beam_size: int = 5, decoder_seq_len: int = 20,
+                              runs: int = 50, threads: int = 1) -> List[Dict]:
+    """
+    Latency of the dynamic graphs padded to seq_len (what the fixed-length
+    export always pays) vs fed each swipe's real length.
+    """
+    from onnx_benchmark import create_session, dummy_encoder_inputs, dummy_decoder_inputs, time_session
+
+    print("\n=== Dynamic-Length Latency ===")
+    encoder = create_session(encoder_path, threads=threads)
+    decoder = create_session(decoder_path, threads=threads)
+    rows = []
+    for length in lengths:
+        row = {'length': length}
+        for mode, run_len in (('padded', seq_len), ('dynamic', length)):
+            enc_feeds = dummy_encoder_inputs(encoder, run_len)
+            enc_feeds['actual_length'][:] = length
+            memory = encoder.run(None, enc_feeds)[0]
+            # Mid-word step with all beams batched, tokens padded like the app's TensorFactory
+            dec_feeds = dummy_decoder_inputs(decoder, memory, decoder_seq_len // 4, batch_size=beam_size,
+                                             decoder_seq_len=decoder_seq_len)
+            dec_feeds['actual_length'][:] = length
+            row[f'{mode}_encoder_ms'] = time_session(encoder, enc_feeds, runs)['p50_ms']
+            row[f'{mode}_decoder_ms'] = time_session(decoder, dec_feeds, runs)['p50_ms']
+        row['encoder_speedup'] = row['padded_encoder_ms'] / row['dynamic_encoder_ms']
+        row['decoder_speedup'] = row['padded_decoder_ms'] / row['dynamic_decoder_ms']
+        rows.append(row)
+    return rows
+
+
 # ============================================================================
 # TESTING FUNCTIONS
 # ============================================================================
@@ -475,9 +725,47 @@ def extract_features(points_x, points_y, points_t):
     return np.array(features, dtype=np.float32)
 
 
-def test_onnx_models(encoder_path: str, decoder_path: str, test_file: str, tokenizer: CharTokenizer):
-    """Test ONNX models with real swipe data."""
+def swipe_inputs_3d(curve: Dict, keyboard: KeyboardGrid, tokenizer: CharTokenizer,
+                    frontend: TrajectoryFrontEnd, top_k: int = 3) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    Encoder inputs for one recorded swipe: features [1, max_len, 6], top-k
+    nearest keys [1, max_len, top_k] (zero padded) and the real length.
+    """
+    # Resample in normalized coordinates, as the app does
+    xs, ys, ts = frontend(np.asarray(curve['x'], dtype=np.float32) / keyboard.width,
+                          np.asarray(curve['y'], dtype=np.float32) / keyboard.height,
+                          np.asarray(curve['t'], dtype=np.float32))
+    seq_len = frontend.max_len
+    xs, ys, ts = xs[:seq_len] * keyboard.width, ys[:seq_len] * keyboard.height, ts[:seq_len]
+
+    # Extract features
+    features = extract_features(xs, ys, ts)
+
+    # Find nearest keys (top k per point)
+    nearest_keys = []
+    for x, y in zip(xs, ys):
+        top_keys = keyboard.find_nearest_keys(x, y, top_k=top_k)
+        nearest_keys.extend(tokenizer.char_to_idx.get(key, tokenizer.unk_idx) for key in top_keys)
+
+    # Pad to the exported length
+    length = len(features)
+    traj_tensor = np.zeros((1, seq_len, 6), dtype=np.float32)
+    traj_tensor[0, :length] = features
+    keys_tensor = np.zeros((1, seq_len, top_k), dtype=np.int64)
+    keys_tensor[0, :length] = np.array(nearest_keys, dtype=np.int64).reshape(length, top_k)
+    return traj_tensor, keys_tensor, length
+
+
+def test_onnx_models(encoder_path: str, decoder_path: str, test_file: str, tokenizer: CharTokenizer,
+                     frontend: Optional[TrajectoryFrontEnd] = None):
+    """
+    Test ONNX models with real swipe data.
+
+    Swipes go through the trajectory front end (default: the app's
+    SwipeResampler DISCARD at 150 points) and are padded to its max_len.
+    """
     print("\n=== Testing ONNX Models ===")
+    frontend = frontend or TrajectoryFrontEnd('discard', 150)
 
     # Load ONNX models
     encoder_session = ort.InferenceSession(encoder_path)
@@ -494,23 +782,8 @@ def test_onnx_models(encoder_path: str, decoder_path: str, test_file: str, token
     correct = 0
     for idx, sample in enumerate(test_samples[:10]):  # Test first 10
         word = sample['word']
-        curve = sample['curve']
-
-        # Extract features
-        features = extract_features(curve['x'], curve['y'], curve['t'])
-
-        # Find nearest keys (top 3 per point)
-        nearest_keys = []
-        for x, y in zip(curve['x'], curve['y']):
-            top3_keys = keyboard.find_nearest_keys(x, y, top_k=3)
-            top3_indices = [tokenizer.char_to_idx.get(key, tokenizer.unk_idx) for key in top3_keys]
-            nearest_keys.extend(top3_indices)
-
-        # Prepare tensors
-        seq_len = len(features)
-        traj_tensor = features.reshape(1, seq_len, 6)
-        keys_tensor = np.array(nearest_keys, dtype=np.int64).reshape(1, seq_len, 3)
-        mask_tensor = np.zeros((1, seq_len), dtype=np.bool_)
+        traj_tensor, keys_tensor, length = swipe_inputs_3d(sample['curve'], keyboard, tokenizer, frontend)
+        mask_tensor = (np.arange(frontend.max_len) >= length)[None, :]
 
         # Run encoder
         encoder_outputs = encoder_session.run(
@@ -584,13 +857,25 @@ def test_onnx_models(encoder_path: str, decoder_path: str, test_file: str, token
 
 def main():
     """Main export and test function."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export the swipe model to ONNX with 3D nearest_keys')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Training .ckpt or slim .safetensors (default: full-model-49-0.795.ckpt)')
+    parser.add_argument('--dynamic-length', action='store_true',
+                        help='Export with a dynamic sequence axis and an actual_length input, '
+                             'then check parity and time real swipe lengths')
+    parser.add_argument('--runs', type=int, default=50, help='Timed runs per latency measurement')
+    parser.add_argument('--threads', type=int, default=1, help='ORT intra-op threads')
+    args = parser.parse_args()
+
     print("="*70)
     print("ONNX Export with 3D nearest_keys Tensor")
     print("="*70)
 
     # Paths (relative to script location)
     script_dir = Path(__file__).parent
-    checkpoint_path = script_dir / 'full-model-49-0.795.ckpt'
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else script_dir / 'full-model-49-0.795.ckpt'
     output_dir = script_dir / 'onnx_output'
     output_dir.mkdir(exist_ok=True, parents=True)
 
@@ -599,14 +884,26 @@ def main():
     test_file = script_dir / 'swipes.jsonl'
 
     # Load model
-    model, tokenizer, accuracy = load_checkpoint(str(checkpoint_path))
+    model, tokenizer, accuracy, model_config = load_checkpoint(str(checkpoint_path))
+
+    # Preprocess with the front end the model was trained with; checkpoints
+    # without one get the app's SwipeResampler (DISCARD) at 150 points
+    if model_config.get('frontend'):
+        frontend = TrajectoryFrontEnd.from_config(model_config)
+    else:
+        frontend = TrajectoryFrontEnd('discard', 150)
+    print(f"Trajectory front end: {frontend.spec}")
+
+    if args.dynamic_length:
+        export_dynamic_length(model, output_dir, str(test_file), frontend, args.runs, args.threads)
+        return
 
     # Export models
-    export_encoder_onnx(model, encoder_path)
-    export_decoder_onnx(model, decoder_path)
+    export_encoder_onnx(model, encoder_path, seq_len=frontend.max_len)
+    export_decoder_onnx(model, decoder_path, seq_len=frontend.max_len)
 
     # Test models
-    test_accuracy = test_onnx_models(encoder_path, decoder_path, str(test_file), tokenizer)
+    test_accuracy = test_onnx_models(encoder_path, decoder_path, str(test_file), tokenizer, frontend)
 
     print("\n" + "="*70)
     print("✅ Export Complete!")
@@ -617,5 +914,60 @@ def main():
     print("\n✨ Models ready for Android deployment!")
 
 
+def export_dynamic_length(model: CharacterLevelSwipeModel, output_dir: Path, test_file: str,
+                          frontend: TrajectoryFrontEnd, runs: int = 50, threads: int = 1) -> Dict:
+    """Dynamic-length export, parity check and latency table; writes dynamic_length_report.json."""
+    from onnx_benchmark import format_latency_table
+
+    encoder_path = str(output_dir / 'swipe_model_character_dynamic.onnx')
+    decoder_path = str(output_dir / 'swipe_decoder_character_dynamic.onnx')
+    seq_len = frontend.max_len
+    export_dynamic_encoder_onnx(model, encoder_path, seq_len=seq_len)
+    export_dynamic_decoder_onnx(model, decoder_path, seq_len=seq_len)
+
+    # Percentiles of the real (post front end) swipe lengths
+    real_lengths = np.array(real_swipe_lengths(test_file, frontend))
+    percentiles = (10, 25, 50, 75, 90, 100)
+    lengths = sorted({max(1, int(np.percentile(real_lengths, q))) for q in percentiles})
+    print(f"\nReal swipe lengths ({len(real_lengths)} swipes from {test_file}): "
+          + ', '.join(f"p{q} {int(np.percentile(real_lengths, q))}" for q in percentiles))
+
+    parity = check_dynamic_parity(model, encoder_path, decoder_path, sorted(set(lengths) | {seq_len}),
+                                  seq_len=seq_len)
+    latency = benchmark_dynamic_lengths(encoder_path, decoder_path, lengths, seq_len=seq_len,
+                                        runs=runs, threads=threads)
+    table = [{
+        'length': r['length'],
+        'enc padded ms': f"{r['padded_encoder_ms']:.2f}",
+        'enc dynamic ms': f"{r['dynamic_encoder_ms']:.2f}",
+        'enc speedup': f"{r['encoder_speedup']:.2f}x",
+        'dec padded ms': f"{r['padded_decoder_ms']:.2f}",
+        'dec dynamic ms': f"{r['dynamic_decoder_ms']:.2f}",
+        'dec speedup': f"{r['decoder_speedup']:.2f}x",
+    } for r in latency]
+    print(format_latency_table(table, list(table[0].keys())))
+
+    report = {
+        'encoder': encoder_path,
+        'decoder': decoder_path,
+        'max_seq_len': seq_len,
+        'real_lengths': {f'p{q}': float(np.percentile(real_lengths, q)) for q in percentiles},
+        'parity': parity,
+        'latency': latency,
+        'threads': threads,
+    }
+    report_path = output_dir / 'dynamic_length_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "="*70)
+    if all(r['passed'] for r in parity):
+        print("✅ Dynamic-length export matches the padded model at every length")
+    else:
+        print("⚠️  Dynamic-length parity check failed, see the report")
+    print(f"Report: {report_path}")
+    return report
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+High-throughput synthetic swipe trajectory generator.
+
+Words are drawn from a V2 binary dictionary (frequency weighted) and turned
+into trajectories over the key geometry of KeyboardGrid with a kinematic
+model:
+  - per-key aim points scattered around the key centers
+  - Fitts' law segment durations
+  - minimum-jerk position profiles between aim points
+  - coarticulation (corner cutting) by temporal smoothing
+  - per-user noise: speed, aim bias, scatter, tremor and sampling rate
+
+Generation is vectorized over batches of words in NumPy and runs in a process
+pool. Each worker writes its own shard in the combined-dataset JSONL format
+read by SwipeDataset ({"curve": {"x", "y", "t"}, "word"}).
+
+Usage:
+    python generate_synthetic_swipes.py --num-samples 1000000 --output-dir data/synthetic_shards
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from swipe_dictionary import load_v2_dictionary, load_language_dictionary
+
+
+# Coarticulation smoothing kernel (in samples) and Fitts' law defaults (ms)
+SMOOTHING_TAPS = 7
+FITTS_A = 40.0
+FITTS_B = 70.0
+LENGTH_BUCKET = 128
+
+
+class KeyGeometry:
+    """Key centers as arrays, plus a key size estimate for aim scatter."""
+
+    def __init__(self, key_positions: Dict[str, Tuple[float, float]], width: float, height: float):
+        letters = sorted(k for k in key_positions if len(k) == 1 and k.isalpha())
+        self.letters = letters
+        self.char_to_key = {c: i for i, c in enumerate(letters)}
+        self.centers = np.array([key_positions[c] for c in letters], dtype=np.float64)
+        self.width = float(width)
+        self.height = float(height)
+
+        # Key pitch ~ median distance to the nearest neighbouring key center
+        diff = self.centers[:, None, :] - self.centers[None, :, :]
+        dist = np.sqrt((diff ** 2).sum(-1))
+        np.fill_diagonal(dist, np.inf)
+        self.key_size = float(np.median(dist.min(axis=1)))
+
+    @classmethod
+    def from_keyboard_grid(cls, grid_path: str = None) -> 'KeyGeometry':
+        # Imported lazily so pool workers never pay for importing torch
+        from train_character_model import KeyboardGrid
+        grid = KeyboardGrid(grid_path) if grid_path else KeyboardGrid()
+        return cls(grid.key_positions, grid.width, grid.height)
+
+    def to_dict(self) -> Dict:
+        return {
+            'key_positions': {c: tuple(self.centers[i]) for i, c in enumerate(self.letters)},
+            'width': self.width,
+            'height': self.height,
+        }
+
+
+def sample_users(rng: np.random.Generator, n: int, key_size: float) -> Dict[str, np.ndarray]:
+    """Draw per-user kinematic and noise parameters."""
+    return {
+        'speed': rng.lognormal(0.0, 0.25, n),                   # Fitts' law time multiplier
+        'bias': rng.normal(0.0, 0.12 * key_size, (n, 2)),       # systematic aim offset
+        'scatter': rng.uniform(0.10, 0.30, n) * key_size,       # per-key aim spread
+        'tremor': rng.uniform(0.3, 1.5, n),                     # high-frequency jitter (px)
+        'drift': rng.uniform(0.0, 0.08, n) * key_size,          # low-frequency wander
+        'dt': rng.choice([8.0, 11.0, 16.0, 16.7], n),           # touch sampling interval (ms)
+    }
+
+
+def min_jerk(tau: np.ndarray) -> np.ndarray:
+    """Minimum-jerk position profile s(tau) on [0, 1]."""
+    tau = np.clip(tau, 0.0, 1.0)
+    return tau ** 3 * (10.0 - 15.0 * tau + 6.0 * tau ** 2)
+
+
+def smooth_time_axis(values: np.ndarray, taps: int) -> np.ndarray:
+    """Gaussian smoothing along axis 1 of a [B, T, ...] array with edge padding."""
+    if taps <= 1:
+        return values
+    half = taps // 2
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) / (half / 2.0)) ** 2)
+    kernel /= kernel.sum()
+
+    T = values.shape[1]
+    pad = [(0, 0)] * values.ndim
+    pad[1] = (half, half)
+    padded = np.pad(values, pad, mode='edge')
+    out = np.zeros_like(values)
+    for i, weight in enumerate(kernel):
+        out += weight * padded[:, i:i + T]
+    return out
+
+
+def generate_batch(words: List[str], geometry: KeyGeometry, users: Dict[str, np.ndarray],
+                   rng: np.random.Generator) -> List[Dict]:
+    """
+    Generate one trajectory per word, vectorized over the batch.
+
+    Returns:
+        List of {'curve': {'x', 'y', 't'}, 'word'} records
+    """
+    B = len(words)
+    key_ids = [[geometry.char_to_key[c] for c in w] for w in words]
+    num_keys = np.array([len(k) for k in key_ids])
+    K = int(num_keys.max())
+
+    # Aim points: key centers + user bias + per-key scatter, padded by repeating the last key
+    key_idx = np.array([k + [k[-1]] * (K - len(k)) for k in key_ids])
+    aims = geometry.centers[key_idx]
+    aims = aims + users['bias'][:, None, :]
+    aims = aims + rng.normal(0.0, 1.0, (B, K, 2)) * users['scatter'][:, None, None]
+
+    # Fitts' law durations per segment; padded segments get zero length
+    seg_vec = np.diff(aims, axis=1)
+    seg_dist = np.sqrt((seg_vec ** 2).sum(-1))
+    seg_dur = users['speed'][:, None] * (FITTS_A + FITTS_B * np.log2(seg_dist / geometry.key_size + 1.0))
+    seg_valid = np.arange(K - 1)[None, :] < (num_keys[:, None] - 1)
+    seg_dur = np.where(seg_valid, seg_dur, 0.0)
+
+    # Initial touch dwell before moving off the first key
+    dwell = rng.uniform(20.0, 80.0, B)
+    seg_start = dwell[:, None] + np.concatenate([np.zeros((B, 1)), np.cumsum(seg_dur, axis=1)[:, :-1]], axis=1)
+    total = dwell + seg_dur.sum(axis=1) + rng.uniform(10.0, 40.0, B)
+
+    dt = users['dt']
+    lengths = np.maximum(np.ceil(total / dt).astype(np.int64) + 1, 2)
+    T = int(lengths.max())
+    t = np.arange(T)[None, :] * dt[:, None]                              # [B, T]
+
+    # Position: sum of min-jerk displacement contributions of every segment
+    pos = np.repeat(aims[:, :1, :], T, axis=1)                           # start at first aim
+    if K > 1:
+        tau = (t[:, :, None] - seg_start[:, None, :]) / np.maximum(seg_dur[:, None, :], 1e-6)
+        s = min_jerk(tau) * seg_valid[:, None, :]                        # [B, T, K-1]
+        pos = pos + np.einsum('bts,bsd->btd', s, seg_vec)
+
+    # Corner cutting, then low-frequency drift and tremor. Past a row's own
+    # length the path rests on its last aim point, so edge padding the whole
+    # batch is equivalent to padding each row separately.
+    pos = smooth_time_axis(pos, SMOOTHING_TAPS)
+    drift = np.cumsum(rng.normal(0.0, 1.0, (B, T, 2)), axis=1)
+    drift = smooth_time_axis(drift, SMOOTHING_TAPS * 3)
+    drift /= np.maximum(np.abs(drift).max(axis=1, keepdims=True), 1e-6)
+    pos = pos + drift * users['drift'][:, None, None]
+    pos = pos + rng.normal(0.0, 1.0, (B, T, 2)) * users['tremor'][:, None, None]
+
+    pos[..., 0] = np.clip(pos[..., 0], 0.0, geometry.width)
+    pos[..., 1] = np.clip(pos[..., 1], 0.0, geometry.height)
+
+    # Timestamps with small sampling jitter (kept monotonic)
+    t = t + rng.uniform(-0.5, 0.5, (B, T))
+    t[:, 0] = 0.0
+
+    records = []
+    for b in range(B):
+        n = lengths[b]
+        records.append({
+            'curve': {
+                'x': np.round(pos[b, :n, 0], 2).tolist(),
+                'y': np.round(pos[b, :n, 1], 2).tolist(),
+                't': np.round(np.maximum.accumulate(t[b, :n]), 2).tolist(),
+            },
+            'word': words[b],
+        })
+    return records
+
+
+def word_sampling_weights(ranks: np.ndarray, decades: float) -> np.ndarray:
+    """Map V2 frequency ranks (0 = most common) back to relative frequencies."""
+    weights = 10.0 ** (-ranks / 255.0 * decades)
+    return weights / weights.sum()
+
+
+def generate_shard(shard_index: int, num_samples: int, words: List[str], weights: np.ndarray,
+                   geometry_dict: Dict, output_dir: str, seed: int, batch_size: int,
+                   users_per_shard: int) -> Tuple[int, int, float]:
+    """Worker entry point: generate num_samples swipes into one shard file."""
+    start = time.perf_counter()
+    rng = np.random.default_rng([seed, shard_index])
+    geometry = KeyGeometry(geometry_dict['key_positions'], geometry_dict['width'], geometry_dict['height'])
+    user_pool = sample_users(rng, users_per_shard, geometry.key_size)
+
+    shard_path = Path(output_dir) / f'synthetic-{shard_index:05d}.jsonl'
+    tmp_path = shard_path.with_suffix('.jsonl.tmp')
+    written = 0
+    with open(tmp_path, 'w') as f:
+        while written < num_samples:
+            n = min(batch_size, num_samples - written)
+            batch_words = [words[i] for i in rng.choice(len(words), size=n, p=weights)]
+            user_ids = rng.integers(0, users_per_shard, n)
+
+            # Bucket by word length so padded [B, T, K] arrays stay tight
+            order = sorted(range(n), key=lambda i: len(batch_words[i]))
+            for lo in range(0, n, LENGTH_BUCKET):
+                bucket = order[lo:lo + LENGTH_BUCKET]
+                users = {k: v[user_ids[bucket]] for k, v in user_pool.items()}
+                records = generate_batch([batch_words[i] for i in bucket], geometry, users, rng)
+                f.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in records))
+            written += n
+    os.replace(tmp_path, shard_path)
+
+    return shard_index, written, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic swipe trajectories')
+    parser.add_argument('--dictionary', default=None,
+                        help='V2 .bin dictionary (default: bundled en_enhanced.bin)')
+    parser.add_argument('--grid-path', default=None,
+                        help='gridname_to_grid.json for KeyboardGrid (default: KeyboardGrid default)')
+    parser.add_argument('--output-dir', default='data/synthetic_shards')
+    parser.add_argument('--num-samples', type=int, default=1_000_000)
+    parser.add_argument('--samples-per-shard', type=int, default=50_000)
+    parser.add_argument('--top-words', type=int, default=50_000,
+                        help='Restrict sampling to the most frequent N words')
+    parser.add_argument('--frequency-decades', type=float, default=3.0,
+                        help='Dynamic range of rank-based word weights (0 = uniform)')
+    parser.add_argument('--max-word-len', type=int, default=18)
+    parser.add_argument('--users-per-shard', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Synthetic Swipe Trajectory Generation")
+    print("=" * 60)
+
+    if args.dictionary:
+        vocab = load_v2_dictionary(args.dictionary, max_words=args.top_words)
+    else:
+        vocab = load_language_dictionary('en', max_words=args.top_words)
+
+    geometry = KeyGeometry.from_keyboard_grid(args.grid_path)
+    vocab = [(w, r) for w, r in vocab
+             if len(w) <= args.max_word_len and all(c in geometry.char_to_key for c in w)]
+    words = [w for w, _ in vocab]
+    weights = word_sampling_weights(np.array([r for _, r in vocab], dtype=np.float64), args.frequency_decades)
+
+    print(f"Vocabulary: {len(words)} words")
+    print(f"Keyboard: {geometry.width:.0f}x{geometry.height:.0f}, key pitch {geometry.key_size:.1f}px")
+    print(f"Samples: {args.num_samples:,} in shards of {args.samples_per_shard:,} ({args.workers} workers)")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    shard_sizes = []
+    remaining = args.num_samples
+    while remaining > 0:
+        shard_sizes.append(min(args.samples_per_shard, remaining))
+        remaining -= shard_sizes[-1]
+
+    start = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(generate_shard, i, n, words, weights, geometry.to_dict(), str(output_dir),
+                        args.seed, args.batch_size, args.users_per_shard)
+            for i, n in enumerate(shard_sizes)
+        ]
+        for future in as_completed(futures):
+            shard_index, written, seconds = future.result()
+            total += written
+            elapsed = time.perf_counter() - start
+            print(f"  shard {shard_index:05d}: {written:,} swipes in {seconds:.1f}s "
+                  f"({written / seconds:,.0f}/s per worker) | total {total:,} ({total / elapsed:,.0f} swipes/s)")
+
+    elapsed = time.perf_counter() - start
+    print("-" * 60)
+    print(f"✅ Generated {total:,} swipes in {elapsed:.1f}s: {total / elapsed:,.0f} swipes/s")
+    print(f"   Shards written to {output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
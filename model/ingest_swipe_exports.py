@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Incremental ingestion of on-device swipe collections into training shards.
+
+The app stores labelled swipes in SQLite (ml/SwipeMLDataStore.kt, table
+swipe_data, one SwipeMLData JSON blob per row) and exports them as JSON
+({"data": [...]} or {"swipes": [...]}) or NDJSON. Each row is converted to
+the combined-dataset layout read by SwipeDataset:
+
+    {"curve": {"x", "y", "t"}, "word", "trace_id", "source"[, "user"]}
+
+App points are relative to the keyboard view: x normalized by its width
+(the screen width), y by the screen height. y is scaled back to keyboard
+pixels with screen_height_px / keyboard_height_px (minus keyboard_offset_y,
+in pixels, if an export carries it) and mapped into the grid's pixel space;
+t is the running sum of t_delta_ms, starting at 0.
+
+The shard store is a directory of shard-NNNNN.jsonl files plus index.sqlite,
+which holds a content hash per ingested swipe, the committed byte length of
+every shard and a resume position per source:
+
+  - SQLite databases resume after the highest row id already read
+  - NDJSON exports resume at the byte offset already read (they only grow)
+  - JSON exports are skipped when size and mtime are unchanged
+
+so re-running on a growing collection reads only the new rows. Rows whose
+content hash is already in the index (re-exports, the same swipe in the DB
+and in a JSON export) are dropped. Shard lines and index entries are
+committed in one transaction per batch; bytes past the committed length
+(an interrupted run) are truncated on open. SwipeDataset and the other
+tools accept the store directory as a corpus path.
+
+Usage:
+    python ingest_swipe_exports.py swipe_ml_data.db exports/*.ndjson --store data/app_shards
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+SHARD_PATTERN = 'shard-{:05d}.jsonl'
+
+
+def iter_json_array_items(path, keys=('data', 'swipes'), chunk_size: int = 1 << 20) -> Iterator[Dict]:
+    """Stream the elements of the top-level array under one of `keys` without loading the file."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        # Find the array: "<key>" : [
+        while True:
+            starts = [m for m in (buffer.find(f'"{k}"') for k in keys) if m >= 0]
+            bracket = buffer.find('[', min(starts)) if starts else -1
+            if bracket >= 0 and buffer[min(starts):bracket].rstrip().endswith(':'):
+                buffer = buffer[bracket + 1:]
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+
+        pos = 0
+        while True:
+            # Skip separators between elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer):
+                    break
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                buffer, pos = buffer[pos:] + chunk, 0
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield item
+            pos = end
+
+
+def convert_app_record(item: Dict, grid_width: float, grid_height: float) -> Tuple[Optional[Dict], str]:
+    """SwipeMLData JSON -> combined-dataset record, or (None, reason) when unusable."""
+    word = str(item.get('target_word', '')).lower()
+    if not word or not word.isascii() or not word.isalpha():
+        return None, 'word'
+    points = item.get('trace_points') or []
+    if len(points) < 2:
+        return None, 'too_short'
+    meta = item.get('metadata', {})
+    screen_h = meta.get('screen_height_px') or 0
+    kb_h = meta.get('keyboard_height_px') or 0
+    if screen_h <= 0 or kb_h <= 0:
+        return None, 'metadata'
+    offset = meta.get('keyboard_offset_y') or 0
+
+    xs = np.array([p['x'] for p in points], dtype=np.float64)
+    ys = np.array([p['y'] for p in points], dtype=np.float64)
+    ts = np.cumsum([p.get('t_delta_ms', 0) for p in points], dtype=np.float64)
+    # Keyboard-view coordinates normalized by screen width/height -> keyboard grid pixels
+    xs = np.clip(xs, 0.0, 1.0) * grid_width
+    ys = np.clip((ys * screen_h - offset) / kb_h, 0.0, 1.0) * grid_height
+    ts = np.maximum.accumulate(ts - ts[0])
+
+    record = {
+        'curve': {
+            'x': np.round(xs, 2).tolist(),
+            'y': np.round(ys, 2).tolist(),
+            't': np.round(ts, 1).tolist(),
+        },
+        'word': word,
+        'trace_id': item.get('trace_id'),
+        'source': meta.get('collection_source'),
+    }
+    return record, 'ok'
+
+
+def content_hash(record: Dict) -> bytes:
+    """Identity of a swipe: its word and converted curve (not trace_id, which re-imports change)."""
+    payload = json.dumps([record['word'], record['curve']], separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).digest()
+
+
+class SwipeShardStore:
+    """Append-only JSONL shards with a SQLite index of content hashes and source positions."""
+
+    def __init__(self, root, shard_size: int = 50_000):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.db = sqlite3.connect(str(self.root / 'index.sqlite'))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS samples (hash BLOB PRIMARY KEY, shard INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS shards (shard INTEGER PRIMARY KEY, bytes INTEGER NOT NULL,
+                                               records INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, position INTEGER NOT NULL,
+                                                size INTEGER, mtime REAL);
+        """)
+        self._recover()
+        row = self.db.execute("SELECT shard, bytes, records FROM shards ORDER BY shard DESC LIMIT 1").fetchone()
+        self.shard, self.shard_bytes, self.shard_records = row if row else (0, 0, 0)
+        self._file = None
+
+    def _recover(self):
+        """Drop shard bytes written by a run that did not commit them."""
+        committed = dict(self.db.execute("SELECT shard, bytes FROM shards"))
+        for path in self.root.glob('shard-*.jsonl'):
+            shard = int(path.stem.split('-')[1])
+            size = committed.get(shard, 0)
+            if path.stat().st_size > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def source_state(self, source: str) -> Tuple[int, Optional[int], Optional[float]]:
+        row = self.db.execute("SELECT position, size, mtime FROM sources WHERE source = ?", (source,)).fetchone()
+        return row if row else (0, None, None)
+
+    def _current_shard(self):
+        """File of the shard being filled, rolling over to a new one when it is full."""
+        if self.shard_records >= self.shard_size:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            self.shard, self.shard_bytes, self.shard_records = self.shard + 1, 0, 0
+        if self._file is None:
+            self._file = open(self.root / SHARD_PATTERN.format(self.shard), 'ab')
+        return self._file
+
+    def add_batch(self, records, source: str, position: int, size: Optional[int] = None,
+                  mtime: Optional[float] = None) -> int:
+        """Append records not seen before and advance the source position; returns the number added."""
+        added = 0
+        with self.db:
+            for record in records:
+                f = self._current_shard()
+                cursor = self.db.execute("INSERT OR IGNORE INTO samples (hash, shard) VALUES (?, ?)",
+                                         (content_hash(record), self.shard))
+                if cursor.rowcount == 0:
+                    continue
+                line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+                f.write(line)
+                self.shard_bytes += len(line)
+                self.shard_records += 1
+                added += 1
+                self.db.execute("INSERT OR REPLACE INTO shards (shard, bytes, records) VALUES (?, ?, ?)",
+                                (self.shard, self.shard_bytes, self.shard_records))
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self.db.execute("INSERT OR REPLACE INTO sources (source, position, size, mtime) VALUES (?, ?, ?, ?)",
+                            (source, position, size, mtime))
+        return added
+
+    def stats(self) -> Dict:
+        shards, records = self.db.execute("SELECT COUNT(*), COALESCE(SUM(records), 0) FROM shards").fetchone()
+        return {'shards': shards, 'records': records}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self.db.close()
+
+
+def iter_sqlite_rows(path, after_id: int) -> Iterator[Tuple[int, Dict]]:
+    """(row id, SwipeMLData JSON) for rows of the app database past after_id, in id order."""
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        for row_id, blob in db.execute("SELECT id, json_data FROM swipe_data WHERE id > ? ORDER BY id",
+                                       (after_id,)):
+            yield row_id, json.loads(blob)
+    finally:
+        db.close()
+
+
+def iter_ndjson_rows(path, offset: int) -> Iterator[Tuple[int, Dict]]:
+    """(byte offset after the line, SwipeMLData JSON) for complete lines starting at offset."""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # still being written; picked up next run
+            offset += len(line)
+            if line.strip():
+                yield offset, json.loads(line)
+
+
+def ingest_source(store: SwipeShardStore, path: Path, grid_width: float, grid_height: float,
+                  batch_size: int, user: Optional[str] = None) -> Dict:
+    """Ingest the rows of one database or export that the store has not read yet."""
+    source = str(path.resolve())
+    position, size, mtime = store.source_state(source)
+    stat = path.stat()
+    counts = {'read': 0, 'added': 0, 'duplicate': 0, 'skipped': {}}
+
+    if path.suffix in ('.db', '.sqlite', '.sqlite3'):
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        max_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM swipe_data").fetchone()[0]
+        db.close()
+        if max_id < position:
+            position = 0  # database was recreated; content hashes still catch old rows
+        rows = iter_sqlite_rows(path, position)
+        state = dict(size=None, mtime=None)
+    elif path.suffix in ('.ndjson', '.jsonl'):
+        if stat.st_size < position:
+            position = 0  # file was rewritten rather than appended to
+        rows = iter_ndjson_rows(path, position)
+        state = dict(size=None, mtime=None)
+    else:
+        if size == stat.st_size and mtime == stat.st_mtime:
+            return dict(counts, unchanged=True)
+        rows = ((0, item) for item in iter_json_array_items(path))
+        state = dict(size=stat.st_size, mtime=stat.st_mtime)
+
+    batch = []
+    for position, item in rows:
+        counts['read'] += 1
+        record, reason = convert_app_record(item, grid_width, grid_height)
+        if record is None:
+            counts['skipped'][reason] = counts['skipped'].get(reason, 0) + 1
+            continue
+        if user is not None:
+            record['user'] = user
+        batch.append(record)
+        if len(batch) >= batch_size:
+            # size/mtime only mark a JSON export as done once all of it is in
+            added = store.add_batch(batch, source, position)
+            counts['added'] += added
+            counts['duplicate'] += len(batch) - added
+            batch = []
+    added = store.add_batch(batch, source, position, **state)
+    counts['added'] += added
+    counts['duplicate'] += len(batch) - added
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest app swipe databases/exports into training shards')
+    parser.add_argument('sources', nargs='+',
+                        help='swipe_ml_data.db files, JSON exports or NDJSON exports')
+    parser.add_argument('--store', default='data/app_shards', help='Shard store directory')
+    parser.add_argument('--shard-size', type=int, default=50_000, help='Records per shard file')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Records per index transaction')
+    parser.add_argument('--user', default=None, help='Tag every ingested record with this user id')
+    parser.add_argument('--grid', default='data/data_preprocessed/gridname_to_grid.json',
+                        help='Keyboard grid definitions (coordinates are mapped into qwerty_english)')
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)['qwerty_english']
+
+    print("=" * 60)
+    print("Swipe Export Ingestion")
+    print("=" * 60)
+
+    store = SwipeShardStore(args.store, shard_size=args.shard_size)
+    before = store.stats()
+    print(f"Store: {args.store} ({before['records']:,} records in {before['shards']} shards)")
+    start = time.perf_counter()
+    totals = {'read': 0, 'added': 0, 'duplicate': 0}
+    for source in args.sources:
+        counts = ingest_source(store, Path(source), grid['width'], grid['height'], args.batch_size, args.user)
+        if counts.get('unchanged'):
+            print(f"  {source}: unchanged since last run")
+            continue
+        skipped = ', '.join(f"{k} {v}" for k, v in counts['skipped'].items()) or 'none'
+        print(f"  {source}: {counts['read']:,} new rows -> {counts['added']:,} added, "
+              f"{counts['duplicate']:,} duplicates, skipped: {skipped}")
+        for key in totals:
+            totals[key] += counts[key]
+    after = store.stats()
+    store.close()
+
+    print("-" * 60)
+    print(f"✓ {totals['added']:,} records added ({totals['read']:,} rows read, {totals['duplicate']:,} duplicates) "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"✅ Store now holds {after['records']:,} records in {after['shards']} shards")
+
+
+if __name__ == "__main__":
+    main()
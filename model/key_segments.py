@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Key-segment tokenization: one encoder position per key the swipe passes over.
+
+Consecutive trajectory points usually share their nearest key, so the
+150-250 points of a swipe collapse into roughly 10-30 runs. Each run
+becomes one segment token whose nearest_keys entry is the run's key and
+whose features summarize the points of the run:
+
+  entry_x, entry_y   first point of the run (normalized keyboard units)
+  exit_x, exit_y     last point of the run
+  dwell              time from entering the key to entering the next one (s)
+  path_length        path length inside the run (normalized units)
+  turning            absolute heading change at the run's points (/ pi)
+  key_distance       closest approach to the key centre (normalized units)
+
+Single-point excursions onto a neighbouring key that return to the same key
+(A B A, jitter along a key border) are folded back into the surrounding
+run before segmenting. Everything is vectorized with NumPy reductions.
+
+A segmenter is stored under model_config['key_segments'] so evaluation and
+export reproduce the training input; the model itself only sees a different
+traj_dim and a shorter sequence.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+SEGMENT_FEATURES = ['entry_x', 'entry_y', 'exit_x', 'exit_y', 'dwell', 'path_length', 'turning', 'key_distance']
+SEGMENT_DIM = len(SEGMENT_FEATURES)
+
+
+def run_starts(keys: np.ndarray) -> np.ndarray:
+    """Start index of every run of equal consecutive keys."""
+    return np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+
+
+def debounce_keys(keys: np.ndarray, min_points: int) -> np.ndarray:
+    """Fold runs shorter than min_points back into their run when both neighbours share a key."""
+    starts = run_starts(keys)
+    if len(starts) < 3 or min_points <= 1:
+        return keys
+    lengths = np.diff(np.append(starts, len(keys)))
+    run_keys = keys[starts]
+    bounce = np.zeros(len(starts), dtype=np.bool_)
+    bounce[1:-1] = (lengths[1:-1] < min_points) & (run_keys[:-2] == run_keys[2:])
+    if not bounce.any():
+        return keys
+    # In A B A B A only every other run can be the excursion
+    for i in np.flatnonzero(bounce):
+        if bounce[i - 1]:
+            bounce[i] = False
+    run_keys = np.where(bounce, np.roll(run_keys, 1), run_keys)
+    return np.repeat(run_keys, lengths)
+
+
+def point_turning(xs: np.ndarray, ys: np.ndarray, min_step: float = 0.005) -> np.ndarray:
+    """
+    Absolute heading change at each point in radians (0 at the ends).
+
+    Steps shorter than min_step (touch jitter while dwelling) keep the previous heading.
+    """
+    n = len(xs)
+    turning = np.zeros(n, dtype=np.float64)
+    if n < 3:
+        return turning
+    dx, dy = np.diff(xs).astype(np.float64), np.diff(ys).astype(np.float64)
+    moving = np.hypot(dx, dy) >= min_step
+    if not moving.any():
+        return turning
+    # Carry the last heading across short steps
+    last = np.maximum.accumulate(np.where(moving, np.arange(n - 1), -1))
+    last[last < 0] = np.flatnonzero(moving)[0]
+    heading = np.arctan2(dy, dx)[last]
+    turn = np.diff(heading)
+    turning[1:-1] = np.abs((turn + np.pi) % (2 * np.pi) - np.pi)
+    return turning
+
+
+def segment_features(xs: np.ndarray, ys: np.ndarray, ts: np.ndarray, keys: np.ndarray,
+                     key_xy: np.ndarray, min_points: int = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collapse a swipe into key segments.
+
+    Args:
+        xs, ys: Normalized point coordinates
+        ts: Timestamps in milliseconds
+        keys: Nearest-key index of every point
+        key_xy: [num_keys, 2] normalized key centres indexed by key index
+        min_points: Runs shorter than this between two runs of one key are jitter
+
+    Returns:
+        (features [S, SEGMENT_DIM] float32, segment keys [S] int64, entry times [S])
+    """
+    n = len(xs)
+    keys = debounce_keys(np.asarray(keys, dtype=np.int64), min_points)
+    starts = run_starts(keys)
+    ends = np.append(starts[1:], n) - 1
+
+    # Time until the next key is entered (the last run ends with the swipe)
+    leave = np.append(starts[1:], n - 1)
+    dwell = (ts[leave] - ts[starts]) / 1000.0
+
+    step = np.concatenate([[0.0], np.hypot(np.diff(xs), np.diff(ys))])
+    step[starts] = 0.0  # steps into a run belong to the transition, not the run
+    path_length = np.add.reduceat(step, starts)
+    turning = np.add.reduceat(point_turning(xs, ys), starts) / np.pi
+
+    centre = key_xy[keys]
+    key_distance = np.minimum.reduceat(np.hypot(xs - centre[:, 0], ys - centre[:, 1]), starts)
+
+    features = np.stack([xs[starts], ys[starts], xs[ends], ys[ends],
+                         dwell, path_length, turning, key_distance], axis=1).astype(np.float32)
+    return features, keys[starts], ts[starts]
+
+
+class KeySegmenter:
+    """Turns per-point nearest keys into at most max_segments segment tokens."""
+
+    def __init__(self, max_segments: int = 48, min_points: int = 2):
+        if max_segments < 1:
+            raise ValueError(f"max_segments must be positive, got {max_segments}")
+        self.max_segments = max_segments
+        self.min_points = min_points
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> Optional['KeySegmenter']:
+        """Segmenter stored in a checkpoint's model_config, None for per-point models."""
+        segments = (config or {}).get('key_segments')
+        return cls(**segments) if segments else None
+
+    def to_config(self) -> Dict:
+        return {'max_segments': self.max_segments, 'min_points': self.min_points}
+
+    def __repr__(self):
+        return f"KeySegmenter(max_segments={self.max_segments}, min_points={self.min_points})"
+
+    def __call__(self, xs: np.ndarray, ys: np.ndarray, ts: np.ndarray, keys: np.ndarray,
+                 key_xy: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return segment_features(xs, ys, ts, keys, key_xy, self.min_points)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Sliding-window self-attention with global tokens for the trajectory encoder.
+
+Full self-attention costs O(L^2) in the number of trajectory points. Here
+each point attends only to points within `window` positions of itself plus
+a few learned global tokens prepended to the sequence; the global tokens
+attend to everything. Cost is O(L * (window + num_global)).
+
+The window is computed blockwise so the ONNX graph only needs
+Pad/Reshape/Slice/Concat/MatMul/Softmax: the sequence is cut into blocks of
+`window` points and each block scores its own and its two neighbouring
+blocks, with a static band mask trimming the result to |i - j| <= window.
+
+LocalWindowAttention subclasses PrunableMultiheadAttention, so it drops into
+nn.TransformerEncoderLayer the same way and head pruning still applies.
+"""
+
+import math
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from structured_pruning import PrunableMultiheadAttention
+
+
+# Finite so rows whose keys are all masked (padding) stay NaN-free
+MASKED_SCORE = -1e9
+
+
+def local_window_mask(seq_len: int, window: int, num_global: int = 0) -> torch.Tensor:
+    """Dense [seq_len, seq_len] bool mask (True = blocked) equivalent to LocalWindowAttention."""
+    pos = torch.arange(seq_len)
+    mask = (pos[:, None] - pos[None, :]).abs() > window
+    mask[:num_global, :] = False
+    mask[:, :num_global] = False
+    return mask
+
+
+class LocalWindowAttention(PrunableMultiheadAttention):
+    """
+    Self-attention restricted to a sliding window, with the first
+    `num_global` positions attending and attended to globally.
+
+    Only self-attention is supported (query, key and value are the same
+    sequence) and no attention weights are returned.
+    """
+
+    def __init__(self, embed_dim: int, num_heads: int, head_dim: int, window: int,
+                 num_global: int = 0, dropout: float = 0.0):
+        super().__init__(embed_dim, num_heads, head_dim, dropout)
+        if window < 1:
+            raise ValueError(f"Attention window must be positive, got {window}")
+        self.window = window
+        self.num_global = num_global
+        # Query i of a block sees keys [block-1, block, block+1]; keep |i - j| <= window
+        offsets = torch.arange(3 * window)[None, :] - window - torch.arange(window)[:, None]
+        band_bias = torch.zeros(window, 3 * window + num_global)
+        band_bias[:, :3 * window].masked_fill_(offsets.abs() > window, MASKED_SCORE)
+        self.register_buffer('band_bias', band_bias, persistent=False)
+
+    def forward(self, query, key, value, key_padding_mask=None, need_weights=False,
+                attn_mask=None, average_attn_weights=True, is_causal=False):
+        if attn_mask is not None or is_causal:
+            raise ValueError("LocalWindowAttention does not take an attention mask")
+        batch_size, seq_len, _ = query.shape
+        G, w = self.num_global, self.window
+        L = seq_len - G
+
+        # One packed projection and transpose for q/k/v (the weight concat is
+        # constant-folded on export)
+        weight = torch.cat([self.q_proj.weight, self.k_proj.weight, self.v_proj.weight])
+        bias = torch.cat([self.q_proj.bias, self.k_proj.bias, self.v_proj.bias])
+        qkv = F.linear(query, weight, bias).reshape(batch_size, seq_len, 3, self.num_heads, self.head_dim)
+        q, k, v = qkv.permute(2, 0, 3, 1, 4).unbind(0)
+        q = q / math.sqrt(self.head_dim)
+
+        if key_padding_mask is None:
+            pad = torch.zeros(batch_size, seq_len, dtype=torch.bool, device=query.device)
+        elif key_padding_mask.dtype == torch.bool:
+            pad = key_padding_mask
+        else:
+            # nn.TransformerEncoder hands over an additive float mask (-inf = padding)
+            pad = key_padding_mask != 0
+        pad_bias = torch.where(pad, torch.tensor(MASKED_SCORE, dtype=q.dtype, device=q.device),
+                               torch.tensor(0.0, dtype=q.dtype, device=q.device))
+
+        outputs = []
+        if G > 0:
+            scores = torch.matmul(q[:, :, :G], k.transpose(-2, -1)) + pad_bias[:, None, None, :]
+            outputs.append(torch.matmul(self._softmax(scores), v))
+
+        # Blocked local attention over the non-global positions: every query
+        # block scores its neighbour key blocks followed by the global keys
+        num_blocks = (L + w - 1) // w
+        extra = num_blocks * w - L
+        q_blocks = F.pad(q[:, :, G:], (0, 0, 0, extra)).reshape(
+            batch_size, self.num_heads, num_blocks, w, self.head_dim)
+        k_blocks = self._neighbour_blocks(F.pad(k[:, :, G:], (0, 0, w, extra + w)), k[:, :, :G], num_blocks)
+        v_blocks = self._neighbour_blocks(F.pad(v[:, :, G:], (0, 0, w, extra + w)), v[:, :, :G], num_blocks)
+
+        # Additive mask [batch, 1, num_blocks, w, 3w + G]: padding and edge blocks, plus the band
+        masked = torch.tensor(MASKED_SCORE, dtype=q.dtype, device=q.device)
+        edge = masked.expand(batch_size, w)
+        local_bias = torch.cat([edge, pad_bias[:, G:], masked.expand(batch_size, extra + w)], dim=1)
+        local_bias = local_bias.reshape(batch_size, num_blocks + 2, w)
+        parts = [local_bias[:, :-2], local_bias[:, 1:-1], local_bias[:, 2:]]
+        if G > 0:
+            parts.append(pad_bias[:, None, :G].expand(batch_size, num_blocks, G))
+        local_bias = torch.cat(parts, dim=2)
+        local_bias = local_bias[:, None, :, None, :] + self.band_bias
+
+        scores = torch.matmul(q_blocks, k_blocks.transpose(-2, -1)) + local_bias
+        local_out = torch.matmul(self._softmax(scores), v_blocks)
+        outputs.append(local_out.reshape(batch_size, self.num_heads, num_blocks * w, self.head_dim)[:, :, :L])
+
+        out = torch.cat(outputs, dim=2) if G > 0 else outputs[0]
+        out = out.transpose(1, 2).reshape(batch_size, seq_len, self.num_heads * self.head_dim)
+        return self.out_proj(out), None
+
+    def _softmax(self, scores: torch.Tensor) -> torch.Tensor:
+        # Lift masked scores to row max - 30 (weight ~1e-13, far below float
+        # precision of the result). Far-negative inputs send ONNX Runtime's
+        # Softmax down a much slower exp path, and tinier weights produce
+        # denormals in the following MatMul.
+        floor = scores.amax(dim=-1, keepdim=True) - 30.0
+        weights = F.softmax(torch.maximum(scores, floor), dim=-1)
+        return F.dropout(weights, p=self.dropout, training=self.training)
+
+    def _neighbour_blocks(self, x: torch.Tensor, global_x: torch.Tensor, num_blocks: int) -> torch.Tensor:
+        """[B, H, (num_blocks + 2) * w, d] -> [B, H, num_blocks, 3w + G, d] (previous, own, next block, globals)."""
+        blocks = x.reshape(x.shape[0], x.shape[1], num_blocks + 2, self.window, x.shape[-1])
+        parts = [blocks[:, :, :-2], blocks[:, :, 1:-1], blocks[:, :, 2:]]
+        if self.num_global > 0:
+            parts.append(global_x[:, :, None].expand(-1, -1, num_blocks, -1, -1))
+        return torch.cat(parts, dim=3)
+
+
+def use_local_attention(encoder: nn.TransformerEncoder, window: int, num_global: int = 0,
+                        dropout: float = 0.0):
+    """Replace the self-attention of every encoder layer with LocalWindowAttention (in place)."""
+    for layer in encoder.layers:
+        attn = layer.self_attn
+        layer.self_attn = LocalWindowAttention(attn.embed_dim, attn.num_heads, attn.head_dim,
+                                               window, num_global, dropout)
+    # The nested-tensor fast path assumes nn.MultiheadAttention
+    encoder.use_nested_tensor = False
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Memory-lean training: per-layer activation checkpointing and gradient
+accumulation.
+
+At sequence length 150, the activations the 6 encoder and 4 decoder layers
+keep for backward dominate training memory, so the micro-batch that fits
+in RAM caps the batch size. Two levers trade compute for memory:
+
+- Activation checkpointing keeps only each transformer layer's input and
+  recomputes the layer's internals during backward. Activation memory drops
+  from O(layers x per-layer activations) to roughly one layer's worth plus
+  the layer inputs, at the cost of one extra forward pass (~30% slower).
+- Gradient accumulation runs several micro-batches per optimizer step, so
+  the effective batch (and the optimization trajectory) stays that of a
+  large batch while only one micro-batch is resident at a time.
+
+enable_activation_checkpointing() wraps the layers in place without
+changing parameter names, so checkpoints stay interchangeable with normal
+runs. train_full_model.py exposes both via --activation-checkpointing and
+--micro-batch. This script measures the trade-off:
+
+    python memory_lean.py --effective-batch 256 --micro-batches 256,64,16
+
+Each configuration trains a few steps on synthetic full-model batches in
+a fresh process. It reports the peak memory above the loaded model (RSS
+on CPU, allocator peak on CUDA) and the throughput.
+"""
+
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+import torch.nn as nn
+from torch.utils.checkpoint import checkpoint
+
+
+def _checkpointed(forward):
+    def run(*args, **kwargs):
+        # Only worth it when autograd would keep the activations
+        if torch.is_grad_enabled():
+            return checkpoint(forward, *args, use_reentrant=False, **kwargs)
+        return forward(*args, **kwargs)
+    return run
+
+
+def enable_activation_checkpointing(model: nn.Module) -> int:
+    """
+    Recompute every encoder/decoder layer in backward instead of storing its
+    activations (in place); returns the number of layers wrapped.
+
+    The wrapper is set on the layer instance, so state_dict keys and the
+    module tree are unchanged. Dropout masks are reproduced in the
+    recomputation because checkpoint() restores the RNG state.
+    """
+    wrapped = 0
+    for stack in (model.encoder, model.decoder):
+        for layer in stack.layers:
+            if getattr(layer, 'activation_checkpointing', False):
+                continue
+            layer.forward = _checkpointed(layer.forward)
+            layer.activation_checkpointing = True
+            wrapped += 1
+    return wrapped
+
+
+def accumulation_steps(effective_batch: int, micro_batch: int) -> int:
+    """Micro-batches per optimizer step to reach at least effective_batch samples."""
+    if micro_batch <= 0 or effective_batch <= 0:
+        raise ValueError("Batch sizes must be positive")
+    return -(-effective_batch // micro_batch)
+
+
+def current_rss_mb() -> float:
+    """Resident set size right now in MB (Linux; falls back to the peak elsewhere)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    from training_instrumentation import peak_rss_mb
+    return peak_rss_mb()
+
+
+def synthetic_batch(batch_size: int, seq_len: int, traj_dim: int, tokenizer, max_word_len: int = 20) -> Dict:
+    """Random full-length swipes with random 3-12 letter words, shaped like SwipeDataset batches."""
+    traj_features = torch.randn(batch_size, seq_len, traj_dim)
+    nearest_keys = torch.randint(4, tokenizer.vocab_size, (batch_size, seq_len))
+    targets = torch.full((batch_size, max_word_len), tokenizer.pad_idx, dtype=torch.long)
+    for i in range(batch_size):
+        n = int(torch.randint(3, 13, ()))
+        targets[i, 0] = tokenizer.sos_idx
+        targets[i, 1:n + 1] = torch.randint(4, tokenizer.vocab_size, (n,))
+        targets[i, n + 1] = tokenizer.eos_idx
+    src_mask = torch.zeros(batch_size, seq_len, dtype=torch.bool)
+    return {'traj_features': traj_features, 'nearest_keys': nearest_keys, 'target': targets, 'src_mask': src_mask}
+
+
+def measure_configuration(task) -> Dict:
+    """Worker: train a few optimizer steps of one configuration; returns memory and throughput."""
+    config, effective_batch, micro_batch, use_checkpointing, steps, seq_len, device_name, threads = task
+    from train_character_model import CharTokenizer, build_character_model
+
+    torch.manual_seed(0)
+    if threads:
+        torch.set_num_threads(threads)
+    device = torch.device(device_name)
+    tokenizer = CharTokenizer()
+    model = build_character_model(dict(config, max_seq_len=max(seq_len, config.get('max_seq_len', 150))),
+                                  tokenizer.vocab_size, dropout=0.1).to(device)
+    if use_checkpointing:
+        enable_activation_checkpointing(model)
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    criterion = nn.CrossEntropyLoss(ignore_index=tokenizer.pad_idx)
+    accum = accumulation_steps(effective_batch, micro_batch)
+    batches = [synthetic_batch(micro_batch, seq_len, config['traj_dim'], tokenizer) for _ in range(accum)]
+    batches = [{k: v.to(device) for k, v in b.items()} for b in batches]
+
+    def train_step():
+        optimizer.zero_grad()
+        for batch in batches:
+            targets = batch['target']
+            logits = model(batch['traj_features'], batch['nearest_keys'], targets, batch['src_mask'],
+                           targets[:, :-1] == tokenizer.pad_idx)
+            loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1)) / accum
+            loss.backward()
+        torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+        optimizer.step()
+
+    # Baseline before the first step: the delta covers activations plus
+    # gradients and optimizer state, the latter being equal across configurations
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        baseline = torch.cuda.memory_allocated(device) / (1024 * 1024)
+        torch.cuda.reset_peak_memory_stats(device)
+    else:
+        baseline = current_rss_mb()
+    train_step()  # warm-up, untimed
+    start = time.perf_counter()
+    for _ in range(steps):
+        train_step()
+    if device.type == 'cuda':
+        torch.cuda.synchronize(device)
+        peak = torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+    else:
+        from training_instrumentation import peak_rss_mb
+        peak = peak_rss_mb()
+    seconds = time.perf_counter() - start
+    return {
+        'micro_batch': micro_batch,
+        'accumulation_steps': accum,
+        'effective_batch': micro_batch * accum,
+        'activation_checkpointing': use_checkpointing,
+        'peak_memory_mb': peak - baseline,
+        'baseline_mb': baseline,
+        'samples_per_sec': steps * micro_batch * accum / seconds,
+        'step_seconds': seconds / steps,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Peak memory / throughput of activation checkpointing and gradient accumulation')
+    parser.add_argument('--effective-batch', type=int, default=64, help='Samples per optimizer step')
+    parser.add_argument('--micro-batches', default=None,
+                        help='Comma-separated micro-batch sizes (default: effective batch, /4, /16)')
+    parser.add_argument('--seq-len', type=int, default=150, help='Trajectory length of the synthetic swipes')
+    parser.add_argument('--config', default=None, help='JSON model config (default: the full model)')
+    parser.add_argument('--steps', type=int, default=3, help='Timed optimizer steps per configuration')
+    parser.add_argument('--threads', type=int, default=0, help='torch intra-op threads (0 = default)')
+    parser.add_argument('--device', default='cuda' if torch.cuda.is_available() else 'cpu')
+    parser.add_argument('--output', default='memory_lean_report.json')
+    args = parser.parse_args()
+
+    from train_character_model import FULL_MODEL_CONFIG
+    config = json.loads(Path(args.config).read_text()) if args.config else dict(FULL_MODEL_CONFIG)
+    if args.micro_batches:
+        micro_batches = [int(m) for m in args.micro_batches.split(',')]
+    else:
+        micro_batches = sorted({max(1, args.effective_batch // d) for d in (1, 4, 16)}, reverse=True)
+
+    print("=" * 60)
+    print("Memory-Lean Training Trade-offs")
+    print("=" * 60)
+    print(f"Model: d_model {config['d_model']}, {config['num_encoder_layers']} encoder / "
+          f"{config['num_decoder_layers']} decoder layers; seq len {args.seq_len}; "
+          f"effective batch {args.effective_batch}; device {args.device}")
+
+    # One fresh process per configuration: peak RSS cannot be reset within a process
+    context = mp.get_context('spawn')
+    rows: List[Dict] = []
+    for micro_batch in micro_batches:
+        for use_checkpointing in (False, True):
+            task = (config, args.effective_batch, micro_batch, use_checkpointing,
+                    args.steps, args.seq_len, args.device, args.threads)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                row = pool.submit(measure_configuration, task).result()
+            rows.append(row)
+            print(f"  micro-batch {micro_batch:4d} x {row['accumulation_steps']:3d}"
+                  f"{' + checkpointing' if use_checkpointing else '':16s} "
+                  f"peak {row['peak_memory_mb']:8.1f} MB, {row['samples_per_sec']:7.1f} samples/s")
+
+    reference = rows[0]
+    print("-" * 60)
+    print(f"{'micro':>6s} {'accum':>6s} {'ckpt':>5s} {'peak MB':>9s} {'mem':>6s} {'samples/s':>10s} {'speed':>6s}")
+    for row in rows:
+        row['memory_vs_reference'] = row['peak_memory_mb'] / max(reference['peak_memory_mb'], 1e-9)
+        row['speed_vs_reference'] = row['samples_per_sec'] / reference['samples_per_sec']
+        print(f"{row['micro_batch']:6d} {row['accumulation_steps']:6d} "
+              f"{'yes' if row['activation_checkpointing'] else 'no':>5s} {row['peak_memory_mb']:9.1f} "
+              f"{row['memory_vs_reference']:5.0%} {row['samples_per_sec']:10.1f} {row['speed_vs_reference']:5.0%}")
+
+    report = {
+        'model_config': config,
+        'seq_len': args.seq_len,
+        'effective_batch': args.effective_batch,
+        'device': args.device,
+        'steps': args.steps,
+        'reference': 'first row (largest micro-batch, no checkpointing)',
+        'rows': rows,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("-" * 60)
+    print(f"✅ Report saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
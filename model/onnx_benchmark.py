@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime latency measurement for exported encoder/decoder pairs.
+
+Input names, ranks and static dimensions are read from the sessions, so the
+same helpers work for the graphs written by export_character_model.py
+(2D nearest_keys) and export_onnx_3d.py (3D top-3 nearest_keys, and its
+dynamic-length graphs that take actual_length instead of src_mask).
+
+The reported end-to-end estimate models the app's decoding loop: one
+encoder run per swipe, then `decoder_steps` decoder runs with all beams
+batched together.
+"""
+
+import os
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import onnxruntime as ort
+
+
+def create_session(model_path: str, threads: int = 1,
+                   optimization_level=ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+                   enable_profiling: bool = False,
+                   profile_prefix: Optional[str] = None) -> ort.InferenceSession:
+    """Create a CPU inference session with a fixed thread budget."""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = optimization_level
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    if enable_profiling:
+        options.enable_profiling = True
+        if profile_prefix:
+            options.profile_file_prefix = profile_prefix
+    return ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+
+
+def _static_dim(shape, axis: int, default: int) -> int:
+    dim = shape[axis] if len(shape) > axis else None
+    return dim if isinstance(dim, int) else default
+
+
+def dummy_encoder_inputs(session: ort.InferenceSession, seq_len: int, batch_size: int = 1,
+                         seed: int = 0) -> Dict[str, np.ndarray]:
+    """Random but well-formed inputs for an encoder session."""
+    rng = np.random.default_rng(seed)
+    feeds = {}
+    for inp in session.get_inputs():
+        if inp.name == 'trajectory_features':
+            dim = _static_dim(inp.shape, 2, 6)
+            feeds[inp.name] = rng.uniform(-1, 1, (batch_size, seq_len, dim)).astype(np.float32)
+        elif inp.name == 'nearest_keys':
+            shape = (batch_size, seq_len) if len(inp.shape) == 2 else (batch_size, seq_len, _static_dim(inp.shape, 2, 3))
+            feeds[inp.name] = rng.integers(4, 30, shape).astype(np.int64)
+        elif inp.name == 'src_mask':
+            feeds[inp.name] = np.zeros((batch_size, seq_len), dtype=np.bool_)
+        elif inp.name == 'actual_length':
+            # Dynamic-length graphs derive the padding mask from the length
+            feeds[inp.name] = np.full(batch_size, seq_len, dtype=np.int64)
+        else:
+            raise ValueError(f"Unknown encoder input: {inp.name}")
+    return feeds
+
+
+def dummy_decoder_inputs(session: ort.InferenceSession, memory: np.ndarray, tgt_len: int,
+                         batch_size: int = 1, seed: int = 0,
+                         decoder_seq_len: int = 20) -> Dict[str, np.ndarray]:
+    """
+    Decoder inputs for a prefix of tgt_len tokens, with memory tiled to batch_size beams.
+
+    Like the app (TensorFactory), tokens are padded to a fixed decoder_seq_len
+    and the padding is flagged in target_mask.
+    """
+    rng = np.random.default_rng(seed)
+    padding = np.arange(decoder_seq_len)[None, :] >= tgt_len
+    memory = np.repeat(memory[:1], batch_size, axis=0)
+    enc_len = memory.shape[1]
+    feeds = {}
+    for inp in session.get_inputs():
+        if inp.name == 'memory':
+            feeds[inp.name] = memory
+        elif inp.name == 'target_tokens':
+            tokens = rng.integers(4, 30, (batch_size, decoder_seq_len)).astype(np.int64)
+            feeds[inp.name] = np.where(padding, 0, tokens)
+        elif inp.name == 'src_mask':
+            feeds[inp.name] = np.zeros((batch_size, enc_len), dtype=np.bool_)
+        elif inp.name == 'actual_length':
+            feeds[inp.name] = np.full(batch_size, enc_len, dtype=np.int64)
+        elif inp.name == 'target_mask':
+            feeds[inp.name] = np.repeat(padding, batch_size, axis=0)
+        else:
+            raise ValueError(f"Unknown decoder input: {inp.name}")
+    return feeds
+
+
+def swipe_encoder_inputs(session: ort.InferenceSession, data_path: str,
+                         max_samples: int = 64) -> List[Tuple[Dict[str, np.ndarray], np.ndarray]]:
+    """
+    (encoder feeds, target tokens) for real swipes, one swipe per batch.
+
+    Features come from the training pipeline (SwipeDataset), padded to the
+    graph's static trajectory length (150 for dynamic graphs). Only graphs
+    with 2D nearest_keys are supported; export_onnx_3d.py has its own
+    top-3 key features.
+    """
+    from train_character_model import SwipeDataset
+
+    inputs = {inp.name: inp for inp in session.get_inputs()}
+    if len(inputs['nearest_keys'].shape) != 2:
+        raise ValueError("swipe_encoder_inputs() needs a graph with 2D nearest_keys")
+    seq_len = _static_dim(inputs['trajectory_features'].shape, 1, 150)
+    dataset = SwipeDataset(data_path, max_seq_len=seq_len, max_samples=max_samples)
+    samples = []
+    for i in range(len(dataset)):
+        item = dataset[i]
+        length = min(item['seq_len'], seq_len)
+        feeds = {'trajectory_features': item['traj_features'].numpy()[None],
+                 'nearest_keys': item['nearest_keys'].numpy()[None]}
+        if 'src_mask' in inputs:
+            feeds['src_mask'] = (np.arange(seq_len) >= length)[None]
+        if 'actual_length' in inputs:
+            feeds['actual_length'] = np.array([length], dtype=np.int64)
+        samples.append((feeds, item['target'].numpy()))
+    return samples
+
+
+def teacher_forced_decoder_inputs(session: ort.InferenceSession, memory: np.ndarray,
+                                  encoder_feeds: Dict[str, np.ndarray], target: np.ndarray,
+                                  pad_idx: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Decoder inputs for the full target word of one swipe (teacher forcing).
+
+    With the causal mask this covers every decoding step of the word in one
+    run, so the activations are those the decoder sees during beam search.
+    """
+    feeds = {}
+    for inp in session.get_inputs():
+        if inp.name == 'memory':
+            feeds[inp.name] = memory
+        elif inp.name == 'target_tokens':
+            feeds[inp.name] = target[None].astype(np.int64)
+        elif inp.name == 'target_mask':
+            feeds[inp.name] = (target == pad_idx)[None]
+        elif inp.name in ('src_mask', 'actual_length'):
+            feeds[inp.name] = encoder_feeds[inp.name]
+        else:
+            raise ValueError(f"Unknown decoder input: {inp.name}")
+    return feeds
+
+
+def time_session(session: ort.InferenceSession, feeds: Dict[str, np.ndarray],
+                 runs: int = 50, warmup: int = 5) -> Dict[str, float]:
+    """Run a session repeatedly and return latency percentiles in milliseconds."""
+    for _ in range(warmup):
+        session.run(None, feeds)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, feeds)
+        times.append((time.perf_counter() - start) * 1000)
+    times = np.array(times)
+    return {
+        'mean_ms': float(times.mean()),
+        'p50_ms': float(np.percentile(times, 50)),
+        'p90_ms': float(np.percentile(times, 90)),
+    }
+
+
+def measure_ort_latency(encoder_path: str, decoder_path: Optional[str] = None,
+                        seq_len: int = 150, decoder_steps: int = 8, beam_size: int = 5,
+                        runs: int = 50, threads: int = 1) -> Dict:
+    """
+    Measure encoder latency, per-step decoder latency and an end-to-end estimate.
+
+    Returns:
+        Dict with 'encoder', 'decoder_step' (p50/p90/mean ms) and 'total_ms'
+    """
+    encoder = create_session(encoder_path, threads=threads)
+    enc_feeds = dummy_encoder_inputs(encoder, seq_len)
+    result = {'seq_len': seq_len, 'threads': threads, 'encoder': time_session(encoder, enc_feeds, runs)}
+    result['total_ms'] = result['encoder']['p50_ms']
+
+    if decoder_path:
+        memory = encoder.run(None, enc_feeds)[0]
+        decoder = create_session(decoder_path, threads=threads)
+        # Mid-word prefix length is representative of an average decoder step
+        step_len = max(1, decoder_steps // 2)
+        dec_feeds = dummy_decoder_inputs(decoder, memory, step_len, batch_size=beam_size)
+        result['decoder_step'] = time_session(decoder, dec_feeds, runs)
+        result['decoder_steps'] = decoder_steps
+        result['beam_size'] = beam_size
+        result['total_ms'] += decoder_steps * result['decoder_step']['p50_ms']
+
+    return result
+
+
+def parse_profile_trace(trace_path: str, skip_runs: int = 0) -> Dict:
+    """
+    Per-op-type and per-node kernel time (ms per run) from an ORT profiling trace.
+
+    The first skip_runs model runs (warm-up) are left out. Node entries also
+    carry the bytes of their outputs, the per-node share of the activation
+    memory.
+    """
+    with open(trace_path) as f:
+        events = json.load(f)
+    starts = sorted(e['ts'] for e in events if e.get('cat') == 'Session' and e['name'] == 'model_run')
+    runs = len(starts) - skip_runs
+    if runs <= 0:
+        raise ValueError(f"{trace_path} has {len(starts)} runs, cannot skip {skip_runs}")
+    first_ts = starts[skip_runs]
+
+    op_types: Dict[str, Dict] = {}
+    nodes: Dict[str, Dict] = {}
+    for event in events:
+        if (event.get('cat') != 'Node' or not event['name'].endswith('_kernel_time')
+                or event['ts'] < first_ts):
+            continue
+        op_type = event['args']['op_name']
+        node = event['name'][:-len('_kernel_time')]
+        ms = event['dur'] / 1000
+        stats = op_types.setdefault(op_type, {'ms_per_run': 0.0, 'calls_per_run': 0})
+        stats['ms_per_run'] += ms / runs
+        stats['calls_per_run'] += 1
+        stats = nodes.setdefault(node, {'op_type': op_type, 'ms_per_run': 0.0, 'calls_per_run': 0,
+                                        'output_bytes': 0})
+        stats['ms_per_run'] += ms / runs
+        stats['calls_per_run'] += 1
+        stats['output_bytes'] = max(stats['output_bytes'], int(event['args'].get('output_size', 0)))
+    for stats in list(op_types.values()) + list(nodes.values()):
+        stats['calls_per_run'] /= runs
+    return {'runs': runs, 'total_ms_per_run': sum(s['ms_per_run'] for s in op_types.values()),
+            'op_types': op_types, 'nodes': nodes}
+
+
+def profile_session(model_path: str, feeds_list: List[Dict[str, np.ndarray]], threads: int = 1,
+                    warmup: int = 2, profile_prefix: Optional[str] = None) -> Dict:
+    """
+    Per-op-type and per-node kernel time (ms per run) of a model over a list of feeds.
+
+    The first `warmup` feeds are run an extra time up front and left out of
+    the statistics. The trace file is removed afterwards unless
+    profile_prefix is given.
+    """
+    session = create_session(model_path, threads=threads, enable_profiling=True,
+                             profile_prefix=profile_prefix or 'ort_profile')
+    warmup = min(warmup, len(feeds_list))
+    for feeds in feeds_list[:warmup] + feeds_list:
+        session.run(None, feeds)
+    trace_path = session.end_profiling()
+    result = parse_profile_trace(trace_path, skip_runs=warmup)
+    if not profile_prefix:
+        os.remove(trace_path)
+    result.update(threads=threads, trace=trace_path if profile_prefix else None)
+    return result
+
+
+def format_latency_table(rows: List[Dict], columns: List[str]) -> str:
+    """Render a list of dicts as a fixed-width text table."""
+    widths = [max(len(c), *(len(str(r.get(c, ''))) for r in rows)) for c in columns]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(columns, widths)),
+             '  '.join('-' * w for w in widths)]
+    for r in rows:
+        lines.append('  '.join(str(r.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
+    return '\n'.join(lines)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Per-operator ONNX Runtime profile of the export_onnx_3d.py encoder/decoder.
+
+Real swipes go through the same features as the export's test
+(swipe_inputs_3d: front end, 6D features, top-3 nearest keys). Each model
+then runs over them with ORT profiling enabled, once per thread count, and
+the JSON trace is reduced to:
+
+- time per op type (ms per run, calls per run, share of the kernel time)
+- time per node (the top nodes are printed, all are kept in the JSON)
+- memory-arena peak: growth of the process RSS while the session runs.
+  The CPU arena keeps what it allocated, so this is the arena high-water
+  mark plus the kernels' scratch buffers; each measurement runs in a fresh
+  process so earlier runs do not hide it.
+
+Decoder runs replay the app's beam search shape: for every swipe, one run
+per step of its word, with the prefix batched across the beams and padded
+to the exported target length. Graphs with a dynamic sequence axis
+(--dynamic-length exports) get each swipe at its real length.
+
+The JSON artifact is keyed by op type / node name with sorted keys, so two
+reports of different model versions diff cleanly; --baseline prints the
+per-op-type change against an earlier report directly.
+
+Usage:
+    python profile_onnx_ops.py --threads 1,2,4 --sort ms --baseline old_profile_report.json
+"""
+
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from onnx_benchmark import create_session, parse_profile_trace, format_latency_table
+
+
+SORT_KEYS = {
+    'ms': lambda item: -item[1]['ms_per_run'],
+    'calls': lambda item: -item[1]['calls_per_run'],
+    'name': lambda item: item[0],
+}
+
+
+def swipe_feeds(encoder_path: str, decoder_path: str, data_path: str, max_samples: int,
+                beam_size: int = 5) -> Tuple[List[Dict], List[Dict]]:
+    """Encoder inputs of real swipes and the decoder inputs of every beam-search step of their words."""
+    from export_onnx_3d import CharTokenizer, KeyboardGrid, swipe_inputs_3d
+    from trajectory_frontend import TrajectoryFrontEnd
+
+    tokenizer, keyboard = CharTokenizer(), KeyboardGrid()
+    encoder = create_session(encoder_path)
+    decoder = create_session(decoder_path)
+    encoder_inputs = {inp.name: inp for inp in encoder.get_inputs()}
+    decoder_inputs = {inp.name: inp for inp in decoder.get_inputs()}
+    traj_shape = encoder_inputs['trajectory_features'].shape
+    seq_len = traj_shape[1] if isinstance(traj_shape[1], int) else 150
+    top_k = encoder_inputs['nearest_keys'].shape[2]
+    tgt_shape = decoder_inputs['target_tokens'].shape
+    decoder_seq_len = tgt_shape[1] if isinstance(tgt_shape[1], int) else 20
+    # The app resamples long swipes with SwipeResampler (DISCARD), as in the export
+    frontend = TrajectoryFrontEnd('discard', seq_len)
+    dynamic = 'actual_length' in encoder_inputs
+
+    encoder_feeds, decoder_feeds = [], []
+    with open(data_path) as f:
+        for line in f:
+            if len(encoder_feeds) >= max_samples:
+                break
+            if not line.strip():
+                continue
+            sample = json.loads(line)
+            traj, keys, length = swipe_inputs_3d(sample['curve'], keyboard, tokenizer, frontend, top_k)
+            if dynamic:
+                feeds = {'trajectory_features': traj[:, :length], 'nearest_keys': keys[:, :length],
+                         'actual_length': np.array([length], dtype=np.int64)}
+            else:
+                feeds = {'trajectory_features': traj, 'nearest_keys': keys,
+                         'src_mask': (np.arange(seq_len) >= length)[None, :]}
+            encoder_feeds.append(feeds)
+
+            memory = np.repeat(encoder.run(None, feeds)[0], beam_size, axis=0)
+            word = tokenizer.encode(sample['word'])[:decoder_seq_len]
+            for step in range(1, len(word)):
+                tokens = np.zeros((beam_size, decoder_seq_len), dtype=np.int64)
+                tokens[:, :step] = word[:step]
+                step_feeds = {'memory': memory, 'target_tokens': tokens,
+                              'target_mask': np.repeat((np.arange(decoder_seq_len) >= step)[None], beam_size, 0)}
+                if dynamic:
+                    step_feeds['actual_length'] = np.full(beam_size, length, dtype=np.int64)
+                else:
+                    step_feeds['src_mask'] = np.repeat(feeds['src_mask'], beam_size, axis=0)
+                decoder_feeds.append(step_feeds)
+    return encoder_feeds, decoder_feeds
+
+
+def profile_worker(task) -> Dict:
+    """Worker: profile one model at one thread count in a fresh process."""
+    from memory_lean import current_rss_mb
+
+    model_path, feeds_list, threads, warmup, trace_dir = task
+    session = create_session(model_path, threads=threads, enable_profiling=True,
+                             profile_prefix=str(Path(trace_dir) / f"{Path(model_path).stem}_t{threads}"))
+    rss_before = current_rss_mb()
+    warmup = min(warmup, len(feeds_list))
+    times = []
+    for i, feeds in enumerate(feeds_list[:warmup] + feeds_list):
+        start = time.perf_counter()
+        session.run(None, feeds)
+        if i >= warmup:
+            times.append((time.perf_counter() - start) * 1000)
+    arena_peak = current_rss_mb() - rss_before
+    trace_path = session.end_profiling()
+
+    result = parse_profile_trace(trace_path, skip_runs=warmup)
+    result.update(threads=threads, trace=trace_path, arena_peak_mb=arena_peak,
+                  wall_p50_ms=float(np.percentile(times, 50)), wall_p90_ms=float(np.percentile(times, 90)))
+    return result
+
+
+def op_type_table(profiles: Dict[int, Dict], sort: str) -> List[Dict]:
+    """
+    One row per op type seen at any thread count, with its time at each.
+
+    ORT may pick different kernels per thread count, so an op type can be
+    missing from some runs; calls and share come from the first run that
+    has it.
+    """
+    op_types = {}
+    for _, profile in sorted(profiles.items()):
+        for op_type, stats in profile['op_types'].items():
+            op_types.setdefault(op_type, (stats, profile['total_ms_per_run']))
+    order = sorted(op_types, key=lambda op_type: SORT_KEYS[sort]((op_type, op_types[op_type][0])))
+    rows = []
+    for op_type in order:
+        stats, total_ms = op_types[op_type]
+        row = {'op_type': op_type, 'calls': f"{stats['calls_per_run']:.1f}",
+               'share': f"{stats['ms_per_run'] / max(total_ms, 1e-9):.1%}"}
+        for threads, profile in sorted(profiles.items()):
+            ms = profile['op_types'].get(op_type, {}).get('ms_per_run', 0.0)
+            row[f'ms @{threads}t'] = f"{ms:.3f}"
+        rows.append(row)
+    return rows
+
+
+def node_table(profile: Dict, sort: str, top: int) -> List[Dict]:
+    return [{'node': name, 'op_type': stats['op_type'], 'ms': f"{stats['ms_per_run']:.3f}",
+             'share': f"{stats['ms_per_run'] / max(profile['total_ms_per_run'], 1e-9):.1%}",
+             'output KB': f"{stats['output_bytes'] / 1024:.1f}"}
+            for name, stats in sorted(profile['nodes'].items(), key=SORT_KEYS[sort])[:top]]
+
+
+def baseline_table(report: Dict, baseline: Dict, model: str, threads: int) -> List[Dict]:
+    """Per-op-type ms change against an earlier report (same model, same thread count)."""
+    new = report['models'][model]['threads'].get(str(threads))
+    old = baseline.get('models', {}).get(model, {}).get('threads', {}).get(str(threads))
+    if not new or not old:
+        return []
+    rows = []
+    for op_type in sorted(set(new['op_types']) | set(old['op_types'])):
+        before = old['op_types'].get(op_type, {}).get('ms_per_run', 0.0)
+        after = new['op_types'].get(op_type, {}).get('ms_per_run', 0.0)
+        rows.append({'op_type': op_type, 'baseline ms': f"{before:.3f}", 'ms': f"{after:.3f}",
+                     'delta ms': f"{after - before:+.3f}", '_delta': after - before})
+    rows.sort(key=lambda r: -abs(r['_delta']))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-operator ORT profile of the encoder and decoder')
+    parser.add_argument('--encoder', default='onnx_output/swipe_model_character_quant.onnx')
+    parser.add_argument('--decoder', default='onnx_output/swipe_decoder_character_quant.onnx')
+    parser.add_argument('--data', default='swipes.jsonl', help='Real swipes to run')
+    parser.add_argument('--samples', type=int, default=32, help='Swipes profiled')
+    parser.add_argument('--threads', default='1,2,4', help='Comma-separated intra-op thread counts')
+    parser.add_argument('--beam-size', type=int, default=5, help='Beams batched per decoder step')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed runs per session')
+    parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='ms', help='Table sort order')
+    parser.add_argument('--top', type=int, default=15, help='Nodes listed per model')
+    parser.add_argument('--trace-dir', default='onnx_output/profiles', help='Where the raw ORT traces go')
+    parser.add_argument('--baseline', default=None, help='Earlier report to compare op-type times with')
+    parser.add_argument('--output', default='onnx_output/profile_report.json')
+    args = parser.parse_args()
+
+    thread_counts = [int(t) for t in args.threads.split(',')]
+    Path(args.trace_dir).mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print("ONNX Runtime Per-Operator Profile")
+    print("=" * 60)
+    encoder_feeds, decoder_feeds = swipe_feeds(args.encoder, args.decoder, args.data, args.samples, args.beam_size)
+    print(f"{len(encoder_feeds)} swipes from {args.data}: {len(encoder_feeds)} encoder runs, "
+          f"{len(decoder_feeds)} decoder steps x {args.beam_size} beams")
+
+    report = {
+        'data': args.data,
+        'swipes': len(encoder_feeds),
+        'beam_size': args.beam_size,
+        'models': {},
+    }
+    context = mp.get_context('spawn')
+    for model, path, feeds_list in (('encoder', args.encoder, encoder_feeds),
+                                    ('decoder', args.decoder, decoder_feeds)):
+        profiles = {}
+        for threads in thread_counts:
+            task = (path, feeds_list, threads, args.warmup, args.trace_dir)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                profiles[threads] = pool.submit(profile_worker, task).result()
+
+        print(f"\n=== {model}: {path} ===")
+        for threads, p in sorted(profiles.items()):
+            print(f"  {threads} thread(s): wall p50 {p['wall_p50_ms']:.2f} ms, p90 {p['wall_p90_ms']:.2f} ms, "
+                  f"kernels {p['total_ms_per_run']:.2f} ms/run, arena peak {p['arena_peak_mb']:.1f} MB")
+        rows = op_type_table(profiles, args.sort)
+        print()
+        print(format_latency_table(rows, list(rows[0].keys())))
+        first = min(profiles)
+        rows = node_table(profiles[first], args.sort, args.top)
+        print(f"\nTop {len(rows)} nodes ({first} thread(s)):")
+        print(format_latency_table(rows, list(rows[0].keys())))
+
+        report['models'][model] = {
+            'path': path,
+            'size_mb': Path(path).stat().st_size / (1024 * 1024),
+            'runs': profiles[first]['runs'],
+            'threads': {str(t): {k: p[k] for k in ('wall_p50_ms', 'wall_p90_ms', 'total_ms_per_run',
+                                                   'arena_peak_mb', 'trace', 'op_types', 'nodes')}
+                        for t, p in profiles.items()},
+        }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for model in report['models']:
+            rows = baseline_table(report, baseline, model, thread_counts[0])
+            if rows:
+                print(f"\n=== {model} vs {args.baseline} ({thread_counts[0]} thread(s)) ===")
+                print(format_latency_table(rows, ['op_type', 'baseline ms', 'ms', 'delta ms']))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print("\n" + "=" * 60)
+    print(f"✅ Report saved: {args.output} (raw traces in {args.trace_dir})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Structured pruning sweep for CharacterLevelSwipeModel checkpoints.
+
+For each pruning ratio the tool:
+  1. ranks attention heads and FFN channels by Taylor importance
+     (computed once on the unpruned model),
+  2. physically removes the lowest-ranked ones in every layer,
+  3. fine-tunes briefly with the normal teacher-forced CE loss,
+  4. evaluates word accuracy, exports to ONNX and measures ORT latency.
+
+The result is an accuracy / latency / size table with the Pareto-optimal
+ratios marked, plus a JSON report and one pruned checkpoint per ratio.
+"""
+
+import copy
+import json
+import argparse
+import random
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    build_character_model,
+    create_padding_mask,
+    evaluate_word_accuracy
+)
+from export_character_model import export_to_onnx
+from onnx_benchmark import measure_ort_latency, format_latency_table
+from slim_checkpoints import load_model_checkpoint
+from structured_pruning import make_prunable, compute_importance, prune_model, apply_pruning_spec
+from trajectory_frontend import TrajectoryFrontEnd
+
+
+def teacher_forced_loss(model, batch, criterion, tokenizer, device):
+    traj_features = batch['traj_features'].to(device)
+    nearest_keys = batch['nearest_keys'].to(device)
+    targets = batch['target'].to(device)
+    src_mask = create_padding_mask(batch['seq_len'], traj_features.shape[1], device)
+    tgt_mask = (targets[:, :-1] == tokenizer.pad_idx)
+    logits = model(traj_features, nearest_keys, targets, src_mask, tgt_mask)
+    return criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
+
+
+def fine_tune(model, train_loader, criterion, tokenizer, device, steps: int, lr: float):
+    """Short recovery fine-tune after pruning."""
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=0.01)
+    model.train()
+    step = 0
+    pbar = tqdm(total=steps, desc='Fine-tune')
+    while step < steps:
+        for batch in train_loader:
+            loss = teacher_forced_loss(model, batch, criterion, tokenizer, device)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            step += 1
+            pbar.update(1)
+            pbar.set_postfix({'loss': f'{loss.item():.4f}'})
+            if step >= steps:
+                break
+    pbar.close()
+
+
+def pareto_front(rows, maximize: str, minimize: tuple) -> None:
+    """Flag rows not dominated on (max `maximize`, min each of `minimize`)."""
+    for row in rows:
+        dominated = False
+        for other in rows:
+            if other is row:
+                continue
+            no_worse = other[maximize] >= row[maximize] and all(other[m] <= row[m] for m in minimize)
+            better = other[maximize] > row[maximize] or any(other[m] < row[m] for m in minimize)
+            if no_worse and better:
+                dominated = True
+                break
+        row['pareto'] = '' if dominated else '*'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Structured head/FFN pruning sweep')
+    parser.add_argument('--checkpoint', required=True, help='Trained model checkpoint (.ckpt)')
+    parser.add_argument('--train-data', default='data/combined_dataset/cleaned_english_swipes_train.jsonl')
+    parser.add_argument('--val-data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--output-dir', default='checkpoints/pruned_character_model')
+    parser.add_argument('--ratios', default='0,0.25,0.5,0.625,0.75',
+                        help='Comma-separated fractions of heads/FFN channels to remove per layer')
+    parser.add_argument('--target', choices=['both', 'heads', 'ffn'], default='both',
+                        help='Which structures the ratio applies to')
+    parser.add_argument('--ffn-multiple', type=int, default=8,
+                        help='Round kept FFN width up to a multiple of this (GEMM friendly)')
+    parser.add_argument('--importance-batches', type=int, default=32)
+    parser.add_argument('--finetune-steps', type=int, default=500)
+    parser.add_argument('--finetune-lr', type=float, default=1e-4)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--eval-batches', type=int, default=None,
+                        help='Limit validation to this many batches (default: full set)')
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ratios = [float(r) for r in args.ratios.split(',')]
+
+    print("="*60)
+    print("Structured Pruning Sweep")
+    print("="*60)
+    print(f"Device: {device}")
+    print(f"Ratios: {ratios} ({args.target})")
+
+    tokenizer = CharTokenizer()
+    state_dict, info = load_model_checkpoint(args.checkpoint)
+    model_config = info.get('model_config', FULL_MODEL_CONFIG)
+    base = build_character_model(model_config, tokenizer.vocab_size, dropout=0.1)
+    apply_pruning_spec(base, info.get('pruning'))
+    base.load_state_dict(state_dict)
+    base = make_prunable(base).to(device)
+
+    frontend = TrajectoryFrontEnd.from_config(model_config)
+    train_dataset = SwipeDataset(args.train_data, max_samples=args.max_samples, frontend=frontend)
+    val_dataset = SwipeDataset(args.val_data, max_samples=args.max_samples, frontend=frontend)
+    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
+                              num_workers=4, pin_memory=True)
+    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False,
+                            num_workers=4, pin_memory=True)
+    print(f"Train: {len(train_dataset)} samples, Val: {len(val_dataset)} samples")
+    print("-"*60)
+
+    criterion = nn.CrossEntropyLoss(ignore_index=tokenizer.pad_idx)
+    print(f"Scoring heads and FFN channels over {args.importance_batches} batches...")
+    importance = compute_importance(
+        base,
+        islice(train_loader, args.importance_batches),
+        lambda m, batch: teacher_forced_loss(m, batch, criterion, tokenizer, device)
+    )
+
+    rows = []
+    for ratio in ratios:
+        print("\n" + "="*60)
+        print(f"Pruning ratio {ratio:.3f}")
+        print("="*60)
+        model = copy.deepcopy(base)
+        spec = prune_model(
+            model, importance,
+            head_ratio=ratio if args.target in ('both', 'heads') else 0.0,
+            ffn_ratio=ratio if args.target in ('both', 'ffn') else 0.0,
+            ffn_multiple=args.ffn_multiple
+        )
+        if ratio > 0 and args.finetune_steps > 0:
+            fine_tune(model, train_loader, criterion, tokenizer, device,
+                      args.finetune_steps, args.finetune_lr)
+
+        acc = evaluate_word_accuracy(model, val_loader, tokenizer, device,
+                                     max_batches=args.eval_batches, desc='Val')
+        params = sum(p.numel() for p in model.parameters())
+
+        tag = f'ratio_{ratio:.3f}'
+        torch.save({
+            'model_state_dict': model.state_dict(),
+            'model_config': model_config,
+            'pruning': spec,
+            'val_word_acc': acc,
+            'source_checkpoint': str(args.checkpoint),
+        }, output_dir / f'pruned-{tag}.ckpt')
+
+        model.cpu().eval()
+        onnx_dir = output_dir / f'onnx_{tag}'
+        onnx_dir.mkdir(exist_ok=True)
+        onnx_info = export_to_onnx(model, onnx_dir, seq_len=frontend.max_len)
+        latency = measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                      seq_len=frontend.max_len, runs=args.bench_runs, threads=args.bench_threads)
+
+        heads = list(spec['heads'].values())
+        widths = list(spec['ffn'].values())
+        rows.append({
+            'ratio': ratio,
+            'heads': f"{min(heads)}-{max(heads)}" if min(heads) != max(heads) else str(heads[0]),
+            'ffn': f"{min(widths)}-{max(widths)}" if min(widths) != max(widths) else str(widths[0]),
+            'params': params,
+            'word_acc': acc,
+            'total_ms': latency['total_ms'],
+            'onnx_kb': onnx_info['encoder_size_kb'] + onnx_info['decoder_size_kb'],
+            'latency': latency,
+            'pruning': spec,
+        })
+        print(f"  Word Acc: {acc:.2%}, end-to-end {latency['total_ms']:.1f} ms, {params:,} params")
+
+    pareto_front(rows, maximize='word_acc', minimize=('total_ms', 'onnx_kb'))
+
+    table = [{
+        'ratio': f"{r['ratio']:.3f}",
+        'heads': r['heads'],
+        'ffn': r['ffn'],
+        'params': f"{r['params']:,}",
+        'word_acc': f"{r['word_acc']:.2%}",
+        'enc_p50_ms': f"{r['latency']['encoder']['p50_ms']:.2f}",
+        'dec_step_p50_ms': f"{r['latency']['decoder_step']['p50_ms']:.2f}",
+        'total_ms': f"{r['total_ms']:.1f}",
+        'onnx_kb': f"{r['onnx_kb']:.0f}",
+        'pareto': r['pareto'],
+    } for r in rows]
+    print("\n" + format_latency_table(table, list(table[0].keys())))
+    print("(* = Pareto-optimal on accuracy / latency / size)")
+
+    report_path = output_dir / 'pruning_report.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'source_checkpoint': str(args.checkpoint),
+            'target': args.target,
+            'finetune_steps': args.finetune_steps,
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
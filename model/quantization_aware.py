@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Quantization-aware training (QAT) for CharacterLevelSwipeModel.
+
+Post-training dynamic quantization (quantize_models.py) rounds weights the
+model never saw during training. Here every nn.Linear and nn.Embedding is
+swapped for a fake-quantized version so fine-tuning learns weights that
+survive INT8:
+
+  - weights: symmetric per-output-channel int8 (per row for embeddings)
+  - linear inputs: asymmetric per-tensor uint8, moving-average min/max
+    observers
+
+Attention runs through PrunableMultiheadAttention (structured_pruning.py)
+so q/k/v/out projections are ordinary linears.
+
+Once observers are frozen the fake-quant ops export as ONNX
+QuantizeLinear/DequantizeLinear pairs (QDQ format). fold_weight_quantization()
+then stores the weights as int8 initializers, and ONNX Runtime fuses
+DQ -> MatMul -> Q into its INT8 kernels when it loads the graph.
+
+A QAT checkpoint stores {'quantization': qat_spec()} and is rebuilt with
+apply_qat_spec() (after apply_pruning_spec) before load_state_dict().
+"""
+
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import onnx
+from onnx import numpy_helper
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.ao.quantization import (
+    FakeQuantize,
+    MovingAverageMinMaxObserver,
+    MovingAveragePerChannelMinMaxObserver,
+    disable_observer,
+    enable_observer
+)
+
+from structured_pruning import make_prunable
+from local_attention import LocalWindowAttention
+
+
+def weight_fake_quant(axis: int = 0) -> FakeQuantize:
+    """Symmetric per-channel int8 (zero point 0, as ORT's QDQ weights expect)."""
+    return FakeQuantize(observer=MovingAveragePerChannelMinMaxObserver, quant_min=-128, quant_max=127,
+                        dtype=torch.qint8, qscheme=torch.per_channel_symmetric, ch_axis=axis)
+
+
+def activation_fake_quant() -> FakeQuantize:
+    """Asymmetric per-tensor uint8, the activation type of ORT's U8S8 CPU kernels."""
+    return FakeQuantize(observer=MovingAverageMinMaxObserver, quant_min=0, quant_max=255,
+                        dtype=torch.quint8, qscheme=torch.per_tensor_affine)
+
+
+class QATLinear(nn.Linear):
+    """nn.Linear with fake-quantized input activations and weights."""
+
+    @classmethod
+    def from_float(cls, linear: nn.Linear) -> 'QATLinear':
+        module = cls(linear.in_features, linear.out_features, bias=linear.bias is not None)
+        module.to(linear.weight.device)
+        with torch.no_grad():
+            module.weight.copy_(linear.weight)
+            if linear.bias is not None:
+                module.bias.copy_(linear.bias)
+        return module
+
+    def __init__(self, in_features: int, out_features: int, bias: bool = True):
+        super().__init__(in_features, out_features, bias=bias)
+        self.input_fake_quant = activation_fake_quant()
+        self.weight_fake_quant = weight_fake_quant(axis=0)
+
+    def forward(self, x):
+        return F.linear(self.input_fake_quant(x), self.weight_fake_quant(self.weight), self.bias)
+
+
+class QATEmbedding(nn.Embedding):
+    """nn.Embedding with a per-row fake-quantized int8 table."""
+
+    @classmethod
+    def from_float(cls, embedding: nn.Embedding) -> 'QATEmbedding':
+        module = cls(embedding.num_embeddings, embedding.embedding_dim, padding_idx=embedding.padding_idx)
+        module.to(embedding.weight.device)
+        with torch.no_grad():
+            module.weight.copy_(embedding.weight)
+        return module
+
+    def __init__(self, num_embeddings: int, embedding_dim: int, padding_idx: Optional[int] = None):
+        super().__init__(num_embeddings, embedding_dim, padding_idx=padding_idx)
+        self.weight_fake_quant = weight_fake_quant(axis=0)
+
+    def forward(self, indices):
+        return F.embedding(indices, self.weight_fake_quant(self.weight), self.padding_idx)
+
+
+def _swap_modules(module: nn.Module):
+    for name, child in module.named_children():
+        if isinstance(child, (QATLinear, QATEmbedding)):
+            continue
+        if isinstance(child, nn.Linear):
+            setattr(module, name, QATLinear.from_float(child))
+        elif isinstance(child, nn.Embedding):
+            setattr(module, name, QATEmbedding.from_float(child))
+        else:
+            _swap_modules(child)
+
+
+def prepare_qat(model: nn.Module) -> nn.Module:
+    """Insert fake quantization into every linear layer and embedding (in place)."""
+    if any(isinstance(m, LocalWindowAttention) for m in model.modules()):
+        # Its packed q/k/v projection bypasses the per-layer fake quantization
+        raise ValueError("QAT does not support sliding-window attention")
+    make_prunable(model)
+    _swap_modules(model)
+    return model
+
+
+def qat_spec() -> Dict:
+    return {'scheme': 'qat_int8', 'weights': 'int8_per_channel_symmetric', 'activations': 'uint8_per_tensor'}
+
+
+def apply_qat_spec(model: nn.Module, spec: Optional[Dict]) -> nn.Module:
+    """Rebuild a QAT checkpoint's module layout before load_state_dict()."""
+    if spec:
+        prepare_qat(model)
+    return model
+
+
+def is_qat_model(model: nn.Module) -> bool:
+    return any(isinstance(m, (QATLinear, QATEmbedding)) for m in model.modules())
+
+
+def freeze_observers(model: nn.Module):
+    """Stop updating ranges; fake quantization keeps using the last scales."""
+    model.apply(disable_observer)
+
+
+def unfreeze_observers(model: nn.Module):
+    model.apply(enable_observer)
+
+
+def fold_weight_quantization(onnx_path: Path) -> Dict:
+    """
+    Replace QuantizeLinear(float initializer) with the quantized int8 initializer.
+
+    The exporter emits weights as float -> Q -> DQ; storing them already
+    quantized shrinks the file about 4x and leaves ORT the canonical QDQ
+    weight pattern.
+    """
+    model = onnx.load(str(onnx_path))
+    graph = model.graph
+    inits = {init.name: init for init in graph.initializer}
+    consts, aliases = {}, {}
+    for node in graph.node:
+        if node.op_type == 'Constant':
+            consts[node.output[0]] = numpy_helper.to_array(node.attribute[0].t)
+        elif node.op_type == 'Identity':
+            # The exporter deduplicates shared constants behind Identity nodes
+            aliases[node.output[0]] = node.input[0]
+
+    def value(name):
+        while name in aliases:
+            name = aliases[name]
+        if name in inits:
+            return numpy_helper.to_array(inits[name])
+        return consts.get(name)
+
+    folded, removed = 0, []
+    for node in graph.node:
+        if node.op_type != 'QuantizeLinear':
+            continue
+        weight, scale = value(node.input[0]), value(node.input[1])
+        zero_point = value(node.input[2]) if len(node.input) > 2 else None
+        if weight is None or scale is None or zero_point is None or weight.dtype != np.float32:
+            continue
+        axis = next((a.i for a in node.attribute if a.name == 'axis'), 1)
+        if scale.ndim == 1:
+            shape = [1] * weight.ndim
+            shape[axis] = -1
+            scale, zero_point = scale.reshape(shape), zero_point.reshape(shape)
+        info = np.iinfo(zero_point.dtype)
+        q = np.clip(np.round(weight / scale) + zero_point.astype(np.int32), info.min, info.max)
+        graph.initializer.append(numpy_helper.from_array(q.astype(zero_point.dtype), node.output[0]))
+        removed.append(node)
+        folded += 1
+
+    for node in removed:
+        graph.node.remove(node)
+    # Drop the float weights (and their aliases) nothing reads any more
+    outputs = {o.name for o in graph.output}
+    while True:
+        used = {name for node in graph.node for name in node.input} | outputs
+        dead = [n for n in graph.node if n.op_type in ('Identity', 'Constant') and n.output[0] not in used]
+        if not dead:
+            break
+        for node in dead:
+            graph.node.remove(node)
+    for init in [i for i in graph.initializer if i.name not in used and i.name in inits]:
+        graph.initializer.remove(init)
+    onnx.checker.check_model(model)
+    onnx.save(model, str(onnx_path))
+    return {'folded_weights': folded}
@@ -1,11 +1,57 @@
 #!/usr/bin/env python3
 """
 Quantize ONNX models to reduce size for web deployment.
+
+Two INT8 variants are written for each model:
+
+- dynamic (quantize_dynamic): INT8 weights, activation scales computed at
+  runtime, so only MatMul/Gemm-style ops run in INT8.
+- static QDQ (quantize_static): activation scales fixed offline from
+  calibration data, QuantizeLinear/DequantizeLinear pairs around every
+  quantized tensor. Calibration feeds real swipes from a swipes.jsonl file
+  through the training feature pipeline: encoder inputs, and for the decoder
+  the step-by-step inputs recorded while greedily decoding those swipes with
+  the fp32 models. MinMax, Entropy and Percentile calibration are available;
+  op types or nodes that lose too much accuracy can be kept in fp32.
+  Nodes on the -inf attention-mask paths are always kept in fp32: a
+  tensor with infinite values has no usable INT8 scale.
+
+A report compares fp32, dynamic and static on word accuracy, latency and
+size (quantization_report.json).
+
+Usage:
+    python quantize_models.py --calibration-data swipes.jsonl --calibrate entropy \\
+        --exclude-ops Softmax
 """
 
 import os
+import json
+import tempfile
+import argparse
 from pathlib import Path
-from onnxruntime.quantization import quantize_dynamic, QuantType
+from typing import Dict, List, Tuple
+
+import numpy as np
+import onnx
+from onnx import numpy_helper
+import onnxruntime as ort
+from onnxruntime.quantization import (quantize_dynamic, quantize_static, QuantType, QuantFormat,
+                                      CalibrationDataReader, CalibrationMethod, create_calibrator)
+from onnxruntime.quantization.registry import QDQRegistry
+
+from onnx_benchmark import create_session, swipe_encoder_inputs, time_session
+
+
+CALIBRATION_METHODS = {
+    'minmax': CalibrationMethod.MinMax,
+    'entropy': CalibrationMethod.Entropy,
+    'percentile': CalibrationMethod.Percentile,
+}
+# Entropy needs a histogram much finer than its 128 quantized bins: with ORT's
+# default of 128 bins the KL threshold search has a single candidate, the
+# full (MinMax) range. quantize_static does not pass bin counts on to its
+# calibrator, so entropy_ranges() runs the calibrator itself.
+ENTROPY_OPTIONS = {'num_bins': 2048, 'num_quantized_bins': 128}
 
 
 def quantize_model(input_path: Path, output_path: Path):
@@ -31,14 +77,233 @@ def quantize_model(input_path: Path, output_path: Path):
     return original_size, quantized_size
 
 
+def greedy_decode(decoder, memory: np.ndarray, encoder_feeds: Dict[str, np.ndarray], tokenizer,
+                  max_len: int = 20) -> Tuple[str, List[Dict[str, np.ndarray]]]:
+    """
+    Greedy word for one swipe, plus the decoder inputs of every step.
+
+    Like the app, each step feeds the prefix padded to max_len tokens with
+    the padding flagged in target_mask.
+    """
+    tokens = [tokenizer.sos_idx]
+    steps = []
+    while len(tokens) < max_len:
+        padded = np.full((1, max_len), tokenizer.pad_idx, dtype=np.int64)
+        padded[0, :len(tokens)] = tokens
+        feeds = {'memory': memory, 'target_tokens': padded,
+                 'target_mask': (np.arange(max_len) >= len(tokens))[None]}
+        for name in ('src_mask', 'actual_length'):
+            if name in encoder_feeds:
+                feeds[name] = encoder_feeds[name]
+        steps.append(feeds)
+        logits = decoder.run(None, feeds)[0]
+        next_token = int(logits[0, len(tokens) - 1].argmax())
+        if next_token == tokenizer.eos_idx:
+            break
+        tokens.append(next_token)
+    return tokenizer.decode(tokens[1:]), steps
+
+
+class SwipeCalibrationReader(CalibrationDataReader):
+    """Feeds recorded model inputs to the calibrator, one swipe (or decoder step) at a time."""
+
+    def __init__(self, feeds_list: List[Dict[str, np.ndarray]]):
+        self.feeds_list = feeds_list
+        self.rewind()
+
+    def get_next(self):
+        return next(self._iter, None)
+
+    def rewind(self):
+        self._iter = iter(self.feeds_list)
+
+
+def record_calibration_feeds(encoder_path: Path, decoder_path: Path, data_path: str,
+                             max_samples: int) -> Tuple[List[Dict], List[Dict]]:
+    """Encoder inputs of real swipes and the decoder inputs of greedily decoding them (fp32)."""
+    from train_character_model import CharTokenizer
+
+    tokenizer = CharTokenizer()
+    encoder, decoder = create_session(str(encoder_path)), create_session(str(decoder_path))
+    encoder_feeds, decoder_feeds = [], []
+    for feeds, _ in swipe_encoder_inputs(encoder, data_path, max_samples=max_samples):
+        memory = encoder.run(None, feeds)[0]
+        encoder_feeds.append(feeds)
+        decoder_feeds += greedy_decode(decoder, memory, feeds, tokenizer)[1]
+    return encoder_feeds, decoder_feeds
+
+
+# Finite stand-in for the -inf of the attention masks in the graph that is
+# calibrated and quantized. exp() of a score 1000 below the row maximum is
+# exactly 0 in fp32, so softmax is unchanged, and the histogram calibrators
+# (Entropy, Percentile) can bin the mask tensors: numpy widens a constant
+# tensor's range by +-0.5, which float32 can only split into 2048 bins
+# below a magnitude of ~4096
+MASK_FILL = -1e3
+
+
+def mask_nodes(model_path: Path, feeds_list: List[Dict]) -> List[str]:
+    """
+    Names of the nodes producing or consuming float tensors that hold
+    inf/NaN on any of the feeds.
+
+    These are the attention-mask paths (-inf at padded or future positions).
+    A tensor with infinite values has no usable INT8 scale, so these nodes
+    stay fp32 while the other nodes of the same op types are still
+    quantized.
+    """
+    model = onnx.shape_inference.infer_shapes(onnx.load(str(model_path)))
+    floats = {v.name for v in model.graph.value_info if v.type.tensor_type.elem_type == onnx.TensorProto.FLOAT}
+    names = [o for n in model.graph.node for o in n.output if o in floats]
+    del model.graph.output[:]
+    model.graph.output.extend(onnx.helper.make_tensor_value_info(name, onnx.TensorProto.FLOAT, None)
+                              for name in names)
+    session = ort.InferenceSession(model.SerializeToString(), providers=['CPUExecutionProvider'])
+    nonfinite = set()
+    for feeds in feeds_list:
+        for name, value in zip(names, session.run(names, feeds)):
+            if name not in nonfinite and not np.isfinite(value).all():
+                nonfinite.add(name)
+    return sorted(n.name for n in model.graph.node if n.name and nonfinite & (set(n.input) | set(n.output)))
+
+
+def finite_mask_constants(model: onnx.ModelProto) -> int:
+    """Replace -inf in float initializers and Constant/ConstantOfShape values with MASK_FILL (in place)."""
+    tensors = list(model.graph.initializer)
+    tensors += [a.t for n in model.graph.node if n.op_type in ('Constant', 'ConstantOfShape')
+                for a in n.attribute if a.name == 'value']
+    replaced = 0
+    for tensor in tensors:
+        value = numpy_helper.to_array(tensor)
+        if value.dtype.kind == 'f' and np.isneginf(value).any():
+            finite = np.where(np.isneginf(value), MASK_FILL, value).astype(value.dtype)
+            tensor.CopyFrom(numpy_helper.from_array(finite, tensor.name))
+            replaced += 1
+    return replaced
+
+
+def entropy_ranges(model_path: Path, op_types: List[str], feeds_list: List[Dict]) -> Dict[str, Tuple]:
+    """Entropy (KL) calibrated (rmin, rmax) of the activations of op_types, from ENTROPY_OPTIONS histograms."""
+    with tempfile.TemporaryDirectory() as tmp:
+        calibrator = create_calibrator(Path(model_path), op_types,
+                                       augmented_model_path=str(Path(tmp) / 'augmented.onnx'),
+                                       calibrate_method=CalibrationMethod.Entropy,
+                                       extra_options=ENTROPY_OPTIONS)
+        calibrator.collect_data(SwipeCalibrationReader(feeds_list))
+        ranges = calibrator.compute_data()
+    return {name: tuple(np.asarray(v, dtype=np.float32) for v in data.range_value) for name, data in ranges.items()}
+
+
+def qdq_scales(model_path: Path) -> Dict[str, np.ndarray]:
+    """Scale initializer of every QuantizeLinear in a QDQ model, by node name."""
+    graph = onnx.load(str(model_path)).graph
+    inits = {init.name: numpy_helper.to_array(init) for init in graph.initializer}
+    return {n.name: inits[n.input[1]] for n in graph.node if n.op_type == 'QuantizeLinear' and n.input[1] in inits}
+
+
+def quantize_model_static(input_path: Path, output_path: Path, feeds_list: List[Dict],
+                          method: str = 'minmax', exclude_ops: Tuple[str, ...] = (),
+                          exclude_nodes: Tuple[str, ...] = (), per_channel: bool = False,
+                          percentile: float = 99.999):
+    """
+    Static INT8 QDQ quantization calibrated on recorded inputs.
+
+    Excluded op types and nodes stay fp32, as do the nodes on the
+    attention-mask paths (mask_nodes()), whose -inf constants become
+    MASK_FILL; returns (original MB, quantized MB, nodes kept in fp32).
+    """
+    print(f"Statically quantizing {input_path.name} ({method}, {len(feeds_list)} calibration inputs)")
+    
+    original_size = os.path.getsize(input_path) / (1024 * 1024)
+    print(f"  Original size: {original_size:.2f} MB")
+    
+    model = onnx.load(str(input_path))
+    graph_ops = {n.op_type for n in model.graph.node}
+    masks = mask_nodes(input_path, feeds_list)
+    kept_fp32 = sorted(set(masks) | set(exclude_nodes))
+    op_types_to_quantize = sorted((graph_ops & set(QDQRegistry)) - set(exclude_ops))
+    finite_mask_constants(model)
+    print(f"  Quantized op types: {', '.join(op_types_to_quantize)}")
+    print(f"  Kept in fp32: {len(kept_fp32)} nodes ({len(masks)} on attention masks)"
+          + (f" and op types {', '.join(exclude_ops)}" if exclude_ops else ''))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        calibrated_path = Path(tmp) / input_path.name
+        onnx.save(model, str(calibrated_path))
+        calibrate_method, extra_options = CALIBRATION_METHODS[method], {}
+        if method == 'percentile':
+            extra_options['CalibPercentile'] = percentile
+        elif method == 'entropy':
+            # Entropy ranges go in as per-tensor overrides of a plain MinMax pass
+            ranges = entropy_ranges(calibrated_path, op_types_to_quantize, feeds_list)
+            extra_options['TensorQuantOverrides'] = {name: [{'rmin': lo, 'rmax': hi}]
+                                                     for name, (lo, hi) in ranges.items()}
+            calibrate_method = CalibrationMethod.MinMax
+        quantize_static(
+            str(calibrated_path),
+            str(output_path),
+            SwipeCalibrationReader(feeds_list),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,  # U8S8: the fast path of ORT's x86/ARM kernels
+            weight_type=QuantType.QInt8,
+            per_channel=per_channel,
+            op_types_to_quantize=op_types_to_quantize,
+            nodes_to_exclude=kept_fp32,
+            calibrate_method=calibrate_method,
+            extra_options=extra_options,
+        )
+    
+    quantized_size = os.path.getsize(output_path) / (1024 * 1024)
+    print(f"  Quantized size: {quantized_size:.2f} MB")
+    print(f"  Size reduction: {(1 - quantized_size/original_size)*100:.1f}%")
+    
+    return original_size, quantized_size, kept_fp32
+
+
+def evaluate_variant(encoder_path: Path, decoder_path: Path, samples: List, tokenizer,
+                     reference_words: List[str] = None, runs: int = 20) -> Tuple[Dict, List[str]]:
+    """Greedy word accuracy, agreement with the fp32 words, latency and size of one model pair."""
+    encoder, decoder = create_session(str(encoder_path)), create_session(str(decoder_path))
+    words, correct, step_feeds = [], 0, None
+    for feeds, target in samples:
+        memory = encoder.run(None, feeds)[0]
+        word, steps = greedy_decode(decoder, memory, feeds, tokenizer)
+        words.append(word)
+        correct += word == tokenizer.decode(target.tolist()[1:])
+        step_feeds = step_feeds or steps[len(steps) // 2]
+    result = {
+        'word_accuracy': correct / max(len(samples), 1),
+        'encoder_p50_ms': time_session(encoder, samples[0][0], runs)['p50_ms'],
+        'decoder_step_p50_ms': time_session(decoder, step_feeds, runs)['p50_ms'],
+        'size_mb': (os.path.getsize(encoder_path) + os.path.getsize(decoder_path)) / (1024 * 1024),
+    }
+    if reference_words is not None:
+        result['agreement_with_fp32'] = float(np.mean([a == b for a, b in zip(words, reference_words)]))
+    return result, words
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Dynamic and static (QDQ) INT8 quantization of the ONNX models')
+    parser.add_argument('--calibration-data', default='swipes.jsonl', help='Real swipes for calibration')
+    parser.add_argument('--calibration-samples', type=int, default=64, help='Swipes recorded for calibration')
+    parser.add_argument('--eval-data', default='data/combined_dataset/cleaned_english_swipes_test.jsonl',
+                        help='Held-out swipes for the accuracy comparison')
+    parser.add_argument('--eval-samples', type=int, default=200)
+    parser.add_argument('--calibrate', choices=sorted(CALIBRATION_METHODS), default='minmax',
+                        help='Activation range calibration method')
+    parser.add_argument('--percentile', type=float, default=99.999, help='Percentile for --calibrate percentile')
+    parser.add_argument('--exclude-ops', default='', help='Comma-separated op types kept in fp32 (e.g. Softmax)')
+    parser.add_argument('--exclude-nodes', default='', help='Comma-separated node names kept in fp32')
+    parser.add_argument('--per-channel', action='store_true', help='Per-channel weight scales in the static models')
+    args = parser.parse_args()
+
     deployment_dir = Path("deployment_package")
     web_demo_dir = Path("web-demo/public/models")
     
     # Models to quantize
     models = [
-        ("swipe_model_character.onnx", "swipe_model_character_quant.onnx"),
-        ("swipe_decoder_character.onnx", "swipe_decoder_character_quant.onnx"),
+        ("swipe_model_character.onnx", "swipe_model_character_quant.onnx", "swipe_model_character_static.onnx"),
+        ("swipe_decoder_character.onnx", "swipe_decoder_character_quant.onnx", "swipe_decoder_character_static.onnx"),
     ]
     
     print("=" * 60)
@@ -48,7 +313,7 @@ def main():
     total_original = 0
     total_quantized = 0
     
-    for input_name, output_name in models:
+    for input_name, output_name, _ in models:
         input_path = deployment_dir / input_name
         output_path = deployment_dir / output_name
         
@@ -65,6 +330,57 @@ def main():
     print(f"Total quantized size: {total_quantized:.2f} MB")
     print(f"Total reduction: {(1 - total_quantized/total_original)*100:.1f}%")
     
+    # Static QDQ quantization calibrated on real swipes
+    encoder_path, decoder_path = (deployment_dir / m[0] for m in models)
+    if not (encoder_path.exists() and decoder_path.exists()):
+        print("\n⚠ Static quantization needs both encoder and decoder, skipping")
+        return
+    print("\n" + "=" * 60)
+    print(f"Static QDQ Quantization ({args.calibrate} calibration on {args.calibration_data})")
+    print("=" * 60)
+    encoder_feeds, decoder_feeds = record_calibration_feeds(
+        encoder_path, decoder_path, args.calibration_data, args.calibration_samples)
+    exclude_ops = tuple(op for op in args.exclude_ops.split(',') if op)
+    exclude_nodes = tuple(n for n in args.exclude_nodes.split(',') if n)
+    kept_fp32 = {}
+    for (input_name, _, static_name), feeds_list in zip(models, (encoder_feeds, decoder_feeds)):
+        kept_fp32[static_name] = quantize_model_static(
+            deployment_dir / input_name, deployment_dir / static_name, feeds_list,
+            args.calibrate, exclude_ops, exclude_nodes, args.per_channel, args.percentile)[2]
+    
+    # Dynamic vs static on held-out swipes
+    print("\n" + "=" * 60)
+    print(f"Dynamic vs Static ({args.eval_data})")
+    print("=" * 60)
+    from train_character_model import CharTokenizer
+    tokenizer = CharTokenizer()
+    samples = swipe_encoder_inputs(create_session(str(encoder_path)), args.eval_data, max_samples=args.eval_samples)
+    results = {}
+    results['fp32'], reference_words = evaluate_variant(encoder_path, decoder_path, samples, tokenizer)
+    for variant, column in (('dynamic', 1), ('static', 2)):
+        results[variant], _ = evaluate_variant(deployment_dir / models[0][column], deployment_dir / models[1][column],
+                                               samples, tokenizer, reference_words)
+    print(f"{'variant':8s} {'word acc':>9s} {'= fp32':>7s} {'enc p50':>9s} {'dec step':>9s} {'size':>8s}")
+    for variant, r in results.items():
+        agreement = f"{r['agreement_with_fp32']:7.1%}" if 'agreement_with_fp32' in r else f"{'-':>7s}"
+        print(f"{variant:8s} {r['word_accuracy']:9.1%} {agreement} {r['encoder_p50_ms']:7.2f}ms "
+              f"{r['decoder_step_p50_ms']:7.2f}ms {r['size_mb']:6.2f}MB")
+    
+    report_path = deployment_dir / "quantization_report.json"
+    with open(report_path, 'w') as f:
+        json.dump({
+            'calibration': {'data': args.calibration_data, 'swipes': len(encoder_feeds),
+                            'decoder_steps': len(decoder_feeds), 'method': args.calibrate,
+                            'percentile': args.percentile if args.calibrate == 'percentile' else None},
+            'exclude_ops': list(exclude_ops),
+            'exclude_nodes': list(exclude_nodes),
+            'kept_fp32': kept_fp32,
+            'per_channel': args.per_channel,
+            'eval': {'data': args.eval_data, 'swipes': len(samples)},
+            'results': results,
+        }, f, indent=2)
+    print(f"\n✓ Report saved: {report_path}")
+    
     # Note about deployment
     print("\n⚠ Note: Quantized models require ONNX Runtime with quantization support.")
     print("For web deployment, test thoroughly as browser support may vary.")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Slim, memory-mappable checkpoints for export and evaluation.
+
+Training checkpoints (.ckpt) are pickles carrying optimizer and scheduler
+state; reading one means unpickling all of it. Slimming keeps the model
+weights only, optionally stored as fp16, in the safetensors layout:
+
+    8-byte little-endian header length | JSON header | tensor bytes
+
+The header maps every tensor name to {dtype, shape, data_offsets} plus a
+__metadata__ dict of strings (model_config, pruning, quantization as JSON,
+val_word_acc, source checkpoint). Files written here open with the
+safetensors library as well, but loading does not need it: the file is
+memory mapped and the tensors are NumPy views of the mapping, so loading
+costs a header parse and load_state_dict() pages in the bytes it copies.
+fp16 weights are upcast by load_state_dict() into the model's fp32
+parameters.
+
+Every run directory gets an index.json listing each slim checkpoint with
+its accuracy, architecture and source. Export and eval tools load either
+format through load_model_checkpoint(), and given a run directory pick the
+best entry from the index (best_checkpoint()) instead of globbing and
+parsing .ckpt file names.
+
+Usage:
+    python slim_checkpoints.py checkpoints/full_character_model [--fp16]
+"""
+
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+from checkpointing import LAST_CHECKPOINT
+
+
+INDEX_FILE = 'index.json'
+SLIM_SUFFIX = '.safetensors'
+
+# safetensors dtype names; bf16 is stored as raw uint16 and viewed back
+DTYPES = {
+    torch.float32: 'F32', torch.float16: 'F16', torch.bfloat16: 'BF16', torch.float64: 'F64',
+    torch.int64: 'I64', torch.int32: 'I32', torch.int16: 'I16', torch.int8: 'I8',
+    torch.uint8: 'U8', torch.bool: 'BOOL',
+}
+NUMPY_DTYPES = {
+    'F32': np.float32, 'F16': np.float16, 'BF16': np.uint16, 'F64': np.float64,
+    'I64': np.int64, 'I32': np.int32, 'I16': np.int16, 'I8': np.int8, 'U8': np.uint8, 'BOOL': np.bool_,
+}
+# Checkpoint entries copied into the metadata (as JSON) besides the weights
+METADATA_KEYS = ('model_config', 'pruning', 'quantization', 'dual_encoder_config', 'ctc_only')
+
+
+def save_slim(state_dict: Dict[str, torch.Tensor], path, metadata: Optional[Dict] = None,
+              fp16: bool = False) -> int:
+    """Write a state dict in the safetensors layout; returns the file size."""
+    header, tensors, offset = {}, [], 0
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().cpu().contiguous()
+        if fp16 and tensor.dtype == torch.float32:
+            tensor = tensor.half()
+        data = tensor.view(torch.uint16) if tensor.dtype == torch.bfloat16 else tensor
+        raw = data.numpy().tobytes()
+        header[name] = {'dtype': DTYPES[tensor.dtype], 'shape': list(tensor.shape),
+                        'data_offsets': [offset, offset + len(raw)]}
+        tensors.append(raw)
+        offset += len(raw)
+    if metadata:
+        header['__metadata__'] = {k: v if isinstance(v, str) else json.dumps(v) for k, v in metadata.items()}
+    blob = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    blob += b' ' * (-len(blob) % 8)  # keep tensor data 8-byte aligned
+
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(len(blob).to_bytes(8, 'little'))
+        f.write(blob)
+        for raw in tensors:
+            f.write(raw)
+    os.replace(tmp_path, path)
+    return path.stat().st_size
+
+
+def read_metadata(path) -> Dict:
+    """Decoded __metadata__ of a slim checkpoint (JSON values parsed back)."""
+    with open(path, 'rb') as f:
+        size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(size))
+    return _decode_metadata(header.get('__metadata__', {}))
+
+
+def _decode_metadata(raw: Dict[str, str]) -> Dict:
+    metadata = {}
+    for key, value in raw.items():
+        try:
+            metadata[key] = json.loads(value)
+        except json.JSONDecodeError:
+            metadata[key] = value
+    return metadata
+
+
+def load_slim(path) -> Tuple[Dict[str, torch.Tensor], Dict]:
+    """Memory-map a slim checkpoint; returns (state_dict of mapped tensors, metadata)."""
+    # Copy-on-write mapping: tensors are writable views, nothing is read until used
+    buf = np.memmap(path, dtype=np.uint8, mode='c')
+    size = int.from_bytes(buf[:8].tobytes(), 'little')
+    header = json.loads(buf[8:8 + size].tobytes())
+    metadata = _decode_metadata(header.pop('__metadata__', {}))
+    base = 8 + size
+    state_dict = {}
+    for name, info in header.items():
+        begin, end = info['data_offsets']
+        array = buf[base + begin:base + end].view(NUMPY_DTYPES[info['dtype']]).reshape(info['shape'])
+        tensor = torch.from_numpy(array)
+        state_dict[name] = tensor.view(torch.bfloat16) if info['dtype'] == 'BF16' else tensor
+    return state_dict, metadata
+
+
+def load_model_checkpoint(path) -> Tuple[Dict[str, torch.Tensor], Dict]:
+    """
+    (state_dict, checkpoint info) from a slim .safetensors or a training .ckpt.
+
+    The info dict holds model_config / pruning / quantization / val_word_acc
+    when the checkpoint has them, so callers treat both formats alike. A run
+    directory loads its best checkpoint (resolve_checkpoint()).
+    """
+    path = resolve_checkpoint(path)
+    if path.suffix == SLIM_SUFFIX:
+        return load_slim(path)
+    checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+    info = {k: v for k, v in checkpoint.items() if k in METADATA_KEYS or k in ('val_word_acc', 'epoch')}
+    return checkpoint['model_state_dict'], info
+
+
+def read_index(checkpoint_dir) -> Dict:
+    path = Path(checkpoint_dir) / INDEX_FILE
+    if not path.exists():
+        return {'checkpoints': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def best_checkpoint(checkpoint_dir) -> Optional[Tuple[Path, Dict]]:
+    """(path, index entry) of the most accurate slim checkpoint in a run directory."""
+    entries = [e for e in read_index(checkpoint_dir)['checkpoints']
+               if (Path(checkpoint_dir) / e['file']).exists()]
+    if not entries:
+        return None
+    best = max(entries, key=lambda e: e.get('val_word_acc') or 0.0)
+    return Path(checkpoint_dir) / best['file'], best
+
+
+def resolve_checkpoint(path) -> Path:
+    """
+    A checkpoint file as is; for a run directory, the best entry of its index,
+    or else the epoch checkpoint with the highest accuracy in its file name
+    (*-<acc>.ckpt; the rolling resume checkpoint is never picked).
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return path
+    best = best_checkpoint(path)
+    if best:
+        return best[0]
+    accuracies = {}
+    for ckpt in path.glob('*.ckpt'):
+        try:
+            accuracies[ckpt] = float(ckpt.stem.split('-')[-1])
+        except ValueError:
+            continue
+    if not accuracies:
+        raise FileNotFoundError(f"No checkpoint found in {path}")
+    return max(accuracies, key=accuracies.get)
+
+
+def slim_checkpoint(ckpt_path, output_dir=None, fp16: bool = False) -> Dict:
+    """Slim one training checkpoint and record it in its directory's index; returns the entry."""
+    ckpt_path = Path(ckpt_path)
+    output_dir = Path(output_dir) if output_dir else ckpt_path.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = torch.load(ckpt_path, map_location='cpu', weights_only=False)
+    if 'model_state_dict' not in checkpoint:
+        raise ValueError(f"{ckpt_path} has no model_state_dict")
+    metadata = {k: checkpoint[k] for k in METADATA_KEYS if checkpoint.get(k) is not None}
+    for key in ('val_word_acc', 'epoch'):
+        if key in checkpoint:
+            metadata[key] = float(checkpoint[key]) if key == 'val_word_acc' else int(checkpoint[key])
+    metadata['source'] = ckpt_path.name
+    metadata['dtype'] = 'fp16' if fp16 else 'fp32'
+
+    slim_path = output_dir / (ckpt_path.stem + SLIM_SUFFIX)
+    size = save_slim(checkpoint['model_state_dict'], slim_path, metadata, fp16=fp16)
+    stat = ckpt_path.stat()
+    entry = {
+        'file': slim_path.name,
+        'val_word_acc': metadata.get('val_word_acc'),
+        'epoch': metadata.get('epoch'),
+        'model_config': metadata.get('model_config'),
+        'pruning': metadata.get('pruning'),
+        'quantization': metadata.get('quantization'),
+        'dtype': metadata['dtype'],
+        'size_bytes': size,
+        'source': str(ckpt_path),
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+    }
+    index = read_index(output_dir)
+    index['checkpoints'] = [e for e in index['checkpoints'] if e['file'] != entry['file']] + [entry]
+    index['checkpoints'].sort(key=lambda e: e['file'])
+    tmp_path = output_dir / (INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, output_dir / INDEX_FILE)
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Slim training checkpoints into memory-mappable weight files')
+    parser.add_argument('inputs', nargs='+', help='.ckpt files or run directories')
+    parser.add_argument('--output-dir', default=None, help='Where slim files and index go (default: alongside)')
+    parser.add_argument('--fp16', action='store_true', help='Store floating-point weights as fp16')
+    parser.add_argument('--include-last', action='store_true',
+                        help="Also slim the rolling resume checkpoint (last.ckpt)")
+    parser.add_argument('--force', action='store_true', help='Re-slim checkpoints already in the index')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Checkpoint Slimming")
+    print("=" * 60)
+
+    paths = []
+    for item in args.inputs:
+        p = Path(item)
+        paths += sorted(p.glob('*.ckpt')) if p.is_dir() else [p]
+    if not args.include_last:
+        paths = [p for p in paths if p.name != LAST_CHECKPOINT]
+
+    for path in paths:
+        out_dir = Path(args.output_dir) if args.output_dir else path.parent
+        known = {e['source']: e for e in read_index(out_dir)['checkpoints']}
+        stat = path.stat()
+        entry = known.get(str(path))
+        if (entry and not args.force and entry['source_size'] == stat.st_size
+                and entry['source_mtime'] == stat.st_mtime and (out_dir / entry['file']).exists()):
+            print(f"  {path.name}: up to date")
+            continue
+        entry = slim_checkpoint(path, out_dir, fp16=args.fp16)
+
+        # Load time of the slim file vs the pickle, on the files just written
+        start = time.perf_counter()
+        load_slim(out_dir / entry['file'])
+        slim_ms = (time.perf_counter() - start) * 1000
+        acc = f"{entry['val_word_acc']:.1%}" if entry['val_word_acc'] is not None else 'n/a'
+        print(f"  {path.name}: {stat.st_size / 1e6:.1f} MB -> {entry['file']} "
+              f"{entry['size_bytes'] / 1e6:.1f} MB ({entry['dtype']}), acc {acc}, loads in {slim_ms:.1f} ms")
+
+    for directory in sorted({Path(args.output_dir) if args.output_dir else p.parent for p in paths}):
+        best = best_checkpoint(directory)
+        if best:
+            print(f"✅ Best in {directory}: {best[0].name} ({best[1]['val_word_acc']:.1%})"
+                  if best[1].get('val_word_acc') is not None else f"✅ Index: {directory / INDEX_FILE}")
+
+
+if __name__ == "__main__":
+    main()
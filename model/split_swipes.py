@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Streaming train/val/test splitter for swipe corpora of any size.
+
+Every sample goes to a split by a stable hash of its key:
+
+  word       all swipes of a word land in one split (no word leakage)
+  user       all swipes of a user land in one split (no user leakage)
+  word+user  one split per (word, user) pair
+  sample     the record itself (plain random split)
+
+The hash (BLAKE2b of salt + key, mapped to [0, 1)) does not depend on input
+order, file layout or the number of workers, so re-running on a grown
+corpus keeps every existing sample in its split. Inputs are cut into
+line-aligned byte ranges (record ranges for .swc) that a process pool
+streams in parallel. Each range writes its own part file per split, and the
+parts are concatenated in input order. Memory stays constant in the number
+of samples; only the per-split word and user sets behind the statistics
+grow, and those are bounded by the vocabulary.
+
+JSONL lines are copied verbatim; .swc records (swipe_codec.py) are written
+in the combined-dataset layout. The user id is read from a record's 'user'
+or 'user_id' field (ingest_swipe_exports.py --user, synthetic shards).
+
+Usage:
+    python split_swipes.py data/all_swipes.jsonl data/app_shards --by word \\
+        --output-dir data/combined_dataset --prefix cleaned_english_swipes
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from swipe_records import parse_swipe_record
+from dedup_swipes import chunk_file
+
+
+SPLITS = ('train', 'val', 'test')
+KEY_MODES = ('word', 'user', 'word+user', 'sample')
+
+
+def split_key(item: Dict, record: Dict, mode: str, line: Optional[bytes] = None) -> str:
+    user = item.get('user', item.get('user_id'))
+    if mode == 'word':
+        return record['word']
+    if mode == 'user':
+        if user is None:
+            raise ValueError("--by user needs a 'user' or 'user_id' field in every record")
+        return str(user)
+    if mode == 'word+user':
+        return f"{record['word']}\x1f{user}"
+    return line.decode('utf-8') if line is not None else json.dumps(item, sort_keys=True)
+
+
+def assign_split(key: str, salt: str, bounds: Tuple[float, float]) -> int:
+    """Split index of a key: hash -> uniform [0, 1) -> train/val/test by cumulative fraction."""
+    digest = hashlib.blake2b(f"{salt}\x1f{key}".encode('utf-8'), digest_size=8).digest()
+    u = int.from_bytes(digest, 'little') / 2.0 ** 64
+    return 0 if u < bounds[0] else (1 if u < bounds[1] else 2)
+
+
+def split_chunk(task) -> Dict:
+    """Worker: stream one input range into per-split part files; returns its statistics."""
+    path, start, end, part_paths, mode, salt, bounds = task
+    stats = [{'samples': 0, 'points': 0, 'words': set(), 'users': set()} for _ in SPLITS]
+    skipped = 0
+    outputs = [open(p, 'wb') for p in part_paths]
+    try:
+        if path.endswith('.swc'):
+            from swipe_codec import SwipeCorpus
+            corpus = SwipeCorpus(path)
+            for record in corpus.decode(start, end):
+                user = record.get('user')
+                out = {'curve': {k: np.round(record[k].astype(np.float64), 2).tolist() for k in ('x', 'y', 't')},
+                       'word': record['word']}
+                if user is not None:
+                    out['user'] = user
+                line = json.dumps(out, separators=(',', ':')).encode('utf-8')
+                split = assign_split(split_key(out, record, mode, line), salt, bounds)
+                outputs[split].write(line + b'\n')
+                _count(stats[split], record, user)
+        else:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                pos = start
+                while pos < end:
+                    line = f.readline()
+                    if not line:
+                        break
+                    pos += len(line)
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    record = parse_swipe_record(item)
+                    if record is None:
+                        skipped += 1
+                        continue
+                    split = assign_split(split_key(item, record, mode, line.rstrip(b'\r\n')), salt, bounds)
+                    outputs[split].write(line if line.endswith(b'\n') else line + b'\n')
+                    _count(stats[split], record, item.get('user', item.get('user_id')))
+    finally:
+        for f in outputs:
+            f.close()
+    return {'splits': stats, 'skipped': skipped}
+
+
+def _count(stats: Dict, record: Dict, user):
+    stats['samples'] += 1
+    stats['points'] += len(record['x'])
+    stats['words'].add(record['word'])
+    if user is not None:
+        stats['users'].add(str(user))
+
+
+def input_tasks(paths: List[str], chunks_per_file: int) -> List[Tuple[str, int, int]]:
+    """(file, start, end) ranges in input order; directories expand to their shards."""
+    files = []
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            files += sorted(str(f) for f in p.iterdir() if f.suffix in ('.jsonl', '.swc'))
+        else:
+            files.append(str(p))
+    tasks = []
+    for path in files:
+        if path.endswith('.swc'):
+            from swipe_codec import SwipeCorpus
+            count = len(SwipeCorpus(path))
+            step = max(1, -(-count // chunks_per_file))
+            tasks += [(path, lo, min(lo + step, count)) for lo in range(0, count, step)]
+        else:
+            chunks = max(1, min(chunks_per_file, os.path.getsize(path) // (8 << 20) + 1))
+            tasks += [(path, lo, hi) for lo, hi in chunk_file(path, chunks)]
+    return tasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stable hash-based train/val/test split in one streaming pass')
+    parser.add_argument('inputs', nargs='+', help='Corpus files (.jsonl/.swc) or shard directories')
+    parser.add_argument('--by', choices=KEY_MODES, default='word',
+                        help='Key hashed to choose the split (default: word, i.e. no word leakage)')
+    parser.add_argument('--val', type=float, default=0.1, help='Validation fraction')
+    parser.add_argument('--test', type=float, default=0.1, help='Test fraction')
+    parser.add_argument('--salt', default='cleverkeys-split-v1', help='Changing it reshuffles every split')
+    parser.add_argument('--output-dir', default='data/splits')
+    parser.add_argument('--prefix', default='cleaned_english_swipes',
+                        help='Outputs are <prefix>_{train,val,test}.jsonl')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.val < 0 or args.test < 0 or args.val + args.test >= 1:
+        parser.error("--val and --test must be non-negative and sum to less than 1")
+    bounds = (1.0 - args.val - args.test, 1.0 - args.test)
+    output_dir = Path(args.output_dir)
+    parts_dir = output_dir / f'.{args.prefix}_parts'
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print("Streaming Corpus Split")
+    print("=" * 60)
+    print(f"Key: {args.by}, fractions train/val/test: "
+          f"{bounds[0]:.2f}/{args.val:.2f}/{args.test:.2f}, salt '{args.salt}'")
+
+    start = time.perf_counter()
+    ranges = input_tasks(args.inputs, args.workers * 4)
+    tasks = [(path, lo, hi, [str(parts_dir / f'{i:05d}.{split}') for split in SPLITS], args.by, args.salt, bounds)
+             for i, (path, lo, hi) in enumerate(ranges)]
+    totals = [{'samples': 0, 'points': 0, 'words': set(), 'users': set()} for _ in SPLITS]
+    skipped = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for result in pool.map(split_chunk, tasks):
+            skipped += result['skipped']
+            for total, part in zip(totals, result['splits']):
+                total['samples'] += part['samples']
+                total['points'] += part['points']
+                total['words'] |= part['words']
+                total['users'] |= part['users']
+
+    # Concatenate the parts in input order
+    outputs = {}
+    for s, split in enumerate(SPLITS):
+        outputs[split] = output_dir / f'{args.prefix}_{split}.jsonl'
+        with open(outputs[split], 'wb') as dst:
+            for task in tasks:
+                with open(task[3][s], 'rb') as src:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+    shutil.rmtree(parts_dir)
+    seconds = time.perf_counter() - start
+
+    n = sum(t['samples'] for t in totals)
+    report = {
+        'inputs': args.inputs,
+        'by': args.by,
+        'salt': args.salt,
+        'fractions': {'train': bounds[0], 'val': args.val, 'test': args.test},
+        'total_samples': n,
+        'skipped_records': skipped,
+        'seconds': seconds,
+        'splits': {},
+        'leakage': {},
+    }
+    print("-" * 60)
+    for split, total in zip(SPLITS, totals):
+        report['splits'][split] = {
+            'path': str(outputs[split]),
+            'samples': total['samples'],
+            'fraction': total['samples'] / max(n, 1),
+            'mean_points': total['points'] / max(total['samples'], 1),
+            'distinct_words': len(total['words']),
+            'distinct_users': len(total['users']),
+        }
+        print(f"  {split:5s} {total['samples']:>10,} samples ({total['samples'] / max(n, 1):.1%}), "
+              f"{len(total['words']):,} words, {len(total['users']):,} users -> {outputs[split]}")
+    for a in range(len(SPLITS)):
+        for b in range(a + 1, len(SPLITS)):
+            key = f"{SPLITS[a]}/{SPLITS[b]}"
+            report['leakage'][key] = {
+                'shared_words': len(totals[a]['words'] & totals[b]['words']),
+                'shared_users': len(totals[a]['users'] & totals[b]['users']),
+            }
+    shared = ', '.join(f"{k} {v['shared_words']:,} words / {v['shared_users']:,} users"
+                       for k, v in report['leakage'].items())
+    print(f"  shared across splits: {shared}")
+
+    report_path = output_dir / f'{args.prefix}_split_stats.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("-" * 60)
+    print(f"✓ {n:,} samples split in one pass in {seconds:.1f}s ({n / max(seconds, 1e-9):,.0f} samples/s, "
+          f"{len(tasks)} ranges on {args.workers} workers); {skipped:,} unsupported records skipped")
+    print(f"✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
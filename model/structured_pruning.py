@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Structured pruning of attention heads and feed-forward channels.
+
+nn.MultiheadAttention ties its inner width to d_model (num_heads * head_dim
+== embed_dim), so heads cannot be physically removed from it. The layers of
+CharacterLevelSwipeModel are therefore converted to PrunableMultiheadAttention,
+which keeps head_dim fixed and lets the head count shrink. Feed-forward
+channels are removed by slicing linear1 rows and linear2 columns.
+
+Importance is the first-order Taylor estimate |w * dL/dw| summed over the
+weights belonging to each head / FFN channel, accumulated over a few batches.
+
+A pruned checkpoint stores its shapes under 'pruning' so it can be rebuilt
+with apply_pruning_spec() before load_state_dict().
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class PrunableMultiheadAttention(nn.Module):
+    """
+    Batch-first multi-head attention with separate q/k/v projections.
+
+    Call-compatible with nn.MultiheadAttention as used by nn.Transformer*Layer.
+    The class attributes below make the encoder layer skip its fused fast
+    path, which only knows about nn.MultiheadAttention's packed weights.
+    """
+
+    batch_first = True
+    _qkv_same_embed_dim = False
+    in_proj_bias = None
+
+    def __init__(self, embed_dim: int, num_heads: int, head_dim: int, dropout: float = 0.0):
+        super().__init__()
+        self.embed_dim = embed_dim
+        self.num_heads = num_heads
+        self.head_dim = head_dim
+        self.dropout = dropout
+        inner_dim = num_heads * head_dim
+        self.q_proj = nn.Linear(embed_dim, inner_dim)
+        self.k_proj = nn.Linear(embed_dim, inner_dim)
+        self.v_proj = nn.Linear(embed_dim, inner_dim)
+        self.out_proj = nn.Linear(inner_dim, embed_dim)
+
+    @classmethod
+    def from_torch(cls, mha: nn.MultiheadAttention) -> 'PrunableMultiheadAttention':
+        """Copy the weights of a batch-first nn.MultiheadAttention."""
+        if not mha.batch_first or not mha._qkv_same_embed_dim:
+            raise ValueError("Only batch-first attention with packed q/k/v weights is supported")
+        embed_dim = mha.embed_dim
+        module = cls(embed_dim, mha.num_heads, mha.head_dim, mha.dropout)
+        weights = mha.in_proj_weight.detach().chunk(3, dim=0)
+        biases = mha.in_proj_bias.detach().chunk(3, dim=0)
+        with torch.no_grad():
+            for proj, w, b in zip((module.q_proj, module.k_proj, module.v_proj), weights, biases):
+                proj.weight.copy_(w)
+                proj.bias.copy_(b)
+            module.out_proj.weight.copy_(mha.out_proj.weight)
+            module.out_proj.bias.copy_(mha.out_proj.bias)
+        return module
+
+    def _split_heads(self, x: torch.Tensor) -> torch.Tensor:
+        batch_size, length, _ = x.shape
+        return x.reshape(batch_size, length, self.num_heads, self.head_dim).transpose(1, 2)
+
+    @staticmethod
+    def _additive(mask: torch.Tensor, dtype) -> torch.Tensor:
+        if mask.dtype == torch.bool:
+            # torch.where rather than masked_fill keeps the ONNX graph simple
+            return torch.where(mask, torch.tensor(float('-inf'), dtype=dtype), torch.tensor(0.0, dtype=dtype))
+        return mask.to(dtype)
+
+    def forward(self, query, key, value, key_padding_mask=None, need_weights=False,
+                attn_mask=None, average_attn_weights=True, is_causal=False):
+        batch_size, tgt_len, _ = query.shape
+        q = self._split_heads(self.q_proj(query))
+        k = self._split_heads(self.k_proj(key))
+        v = self._split_heads(self.v_proj(value))
+
+        scores = torch.matmul(q, k.transpose(-2, -1)) / math.sqrt(self.head_dim)
+        if attn_mask is None and is_causal:
+            attn_mask = nn.Transformer.generate_square_subsequent_mask(tgt_len, device=query.device)
+        if attn_mask is not None:
+            scores = scores + self._additive(attn_mask, scores.dtype)
+        if key_padding_mask is not None:
+            scores = scores + self._additive(key_padding_mask, scores.dtype)[:, None, None, :]
+
+        weights = F.softmax(scores, dim=-1)
+        weights = F.dropout(weights, p=self.dropout, training=self.training)
+        out = torch.matmul(weights, v).transpose(1, 2).reshape(batch_size, tgt_len, self.num_heads * self.head_dim)
+        out = self.out_proj(out)
+
+        if need_weights:
+            return out, weights.mean(dim=1) if average_attn_weights else weights
+        return out, None
+
+    def prune_heads(self, keep: torch.Tensor):
+        """Keep only the given head indices, shrinking all projections."""
+        keep = torch.as_tensor(keep, dtype=torch.long).sort().values
+        rows = (keep[:, None] * self.head_dim + torch.arange(self.head_dim)).reshape(-1)
+        self.q_proj = _slice_linear(self.q_proj, rows, dim=0)
+        self.k_proj = _slice_linear(self.k_proj, rows, dim=0)
+        self.v_proj = _slice_linear(self.v_proj, rows, dim=0)
+        self.out_proj = _slice_linear(self.out_proj, rows, dim=1)
+        self.num_heads = len(keep)
+
+    def head_importance(self) -> torch.Tensor:
+        """Per-head sum of |w * grad| over the head's q/k/v rows and out_proj columns."""
+        score = torch.zeros(self.num_heads, device=self.out_proj.weight.device)
+        for proj in (self.q_proj, self.k_proj, self.v_proj):
+            score += _taylor(proj.weight).sum(dim=1).view(self.num_heads, self.head_dim).sum(dim=1)
+            score += _taylor(proj.bias).view(self.num_heads, self.head_dim).sum(dim=1)
+        score += _taylor(self.out_proj.weight).sum(dim=0).view(self.num_heads, self.head_dim).sum(dim=1)
+        return score
+
+
+def _taylor(param: nn.Parameter) -> torch.Tensor:
+    if param.grad is None:
+        return torch.zeros_like(param)
+    return (param.detach() * param.grad.detach()).abs()
+
+
+def _slice_linear(linear: nn.Linear, index: torch.Tensor, dim: int) -> nn.Linear:
+    """New nn.Linear keeping `index` along output (dim=0) or input (dim=1) features."""
+    index = index.to(linear.weight.device)
+    weight = linear.weight.detach().index_select(dim, index)
+    out_features, in_features = weight.shape
+    new = nn.Linear(in_features, out_features, bias=linear.bias is not None).to(linear.weight.device)
+    with torch.no_grad():
+        new.weight.copy_(weight)
+        if linear.bias is not None:
+            new.bias.copy_(linear.bias.detach() if dim == 1 else linear.bias.detach().index_select(0, index))
+    return new
+
+
+def attention_modules(model: nn.Module) -> Dict[str, nn.Module]:
+    """All attention submodules of the encoder and decoder, keyed by module path."""
+    modules = {}
+    for i, layer in enumerate(model.encoder.layers):
+        modules[f'encoder.layers.{i}.self_attn'] = layer.self_attn
+    for i, layer in enumerate(model.decoder.layers):
+        modules[f'decoder.layers.{i}.self_attn'] = layer.self_attn
+        modules[f'decoder.layers.{i}.multihead_attn'] = layer.multihead_attn
+    return modules
+
+
+def ffn_layers(model: nn.Module) -> Dict[str, nn.Module]:
+    """Encoder/decoder layers whose linear1/linear2 form a prunable FFN."""
+    layers = {f'encoder.layers.{i}': layer for i, layer in enumerate(model.encoder.layers)}
+    layers.update({f'decoder.layers.{i}': layer for i, layer in enumerate(model.decoder.layers)})
+    return layers
+
+
+def _set_submodule(model: nn.Module, path: str, module: nn.Module):
+    parent_path, _, name = path.rpartition('.')
+    setattr(model.get_submodule(parent_path), name, module)
+
+
+def make_prunable(model: nn.Module) -> nn.Module:
+    """Swap every nn.MultiheadAttention for an equivalent PrunableMultiheadAttention (in place)."""
+    for path, module in attention_modules(model).items():
+        if isinstance(module, nn.MultiheadAttention):
+            _set_submodule(model, path, PrunableMultiheadAttention.from_torch(module))
+    # The nested-tensor path also assumes packed nn.MultiheadAttention weights
+    model.encoder.use_nested_tensor = False
+    return model
+
+
+def prune_ffn(layer: nn.Module, keep: torch.Tensor):
+    """Keep only the given feed-forward channels of a transformer layer."""
+    keep = torch.as_tensor(keep, dtype=torch.long).sort().values
+    layer.linear1 = _slice_linear(layer.linear1, keep, dim=0)
+    layer.linear2 = _slice_linear(layer.linear2, keep, dim=1)
+
+
+def ffn_importance(layer: nn.Module) -> torch.Tensor:
+    """Per-channel sum of |w * grad| over linear1 rows/bias and linear2 columns."""
+    return (_taylor(layer.linear1.weight).sum(dim=1) + _taylor(layer.linear1.bias)
+            + _taylor(layer.linear2.weight).sum(dim=0))
+
+
+def compute_importance(model: nn.Module, batches: Iterable, loss_fn) -> Dict[str, Dict[str, torch.Tensor]]:
+    """
+    Accumulate head and FFN channel importance over batches.
+
+    Args:
+        model: Prunable model (see make_prunable)
+        batches: Iterable of training batches
+        loss_fn: Callable (model, batch) -> scalar loss
+    """
+    heads = {path: None for path in attention_modules(model)}
+    ffn = {path: None for path in ffn_layers(model)}
+    model.train()
+    for batch in batches:
+        model.zero_grad()
+        loss_fn(model, batch).backward()
+        for path, module in attention_modules(model).items():
+            score = module.head_importance()
+            heads[path] = score if heads[path] is None else heads[path] + score
+        for path, layer in ffn_layers(model).items():
+            score = ffn_importance(layer)
+            ffn[path] = score if ffn[path] is None else ffn[path] + score
+    model.zero_grad()
+    return {'heads': heads, 'ffn': ffn}
+
+
+def _keep_count(total: int, ratio: float, multiple: int = 1) -> int:
+    keep = int(round(total * (1.0 - ratio)))
+    if multiple > 1:
+        keep = int(math.ceil(keep / multiple) * multiple)
+    return max(1, min(total, keep))
+
+
+def prune_model(model: nn.Module, importance: Dict, head_ratio: float, ffn_ratio: float,
+                ffn_multiple: int = 8) -> Dict:
+    """
+    Remove the least important heads and FFN channels uniformly per layer (in place).
+
+    Returns:
+        Pruning spec {'heads': {path: n}, 'ffn': {path: n}} for apply_pruning_spec
+    """
+    spec = {'heads': {}, 'ffn': {}}
+    for path, module in attention_modules(model).items():
+        n = _keep_count(module.num_heads, head_ratio)
+        if n < module.num_heads:
+            module.prune_heads(importance['heads'][path].topk(n).indices.cpu())
+        spec['heads'][path] = module.num_heads
+    for path, layer in ffn_layers(model).items():
+        width = layer.linear1.out_features
+        n = _keep_count(width, ffn_ratio, ffn_multiple)
+        if n < width:
+            prune_ffn(layer, importance['ffn'][path].topk(n).indices.cpu())
+        spec['ffn'][path] = layer.linear1.out_features
+    return spec
+
+
+def apply_pruning_spec(model: nn.Module, spec: Optional[Dict]) -> nn.Module:
+    """Reshape a freshly built model to a pruned checkpoint's shapes (weights are then loaded)."""
+    if not spec:
+        return model
+    make_prunable(model)
+    modules = attention_modules(model)
+    for path, n in spec['heads'].items():
+        if n < modules[path].num_heads:
+            modules[path].prune_heads(torch.arange(n))
+    layers = ffn_layers(model)
+    for path, n in spec['ffn'].items():
+        if n < layers[path].linear1.out_features:
+            prune_ffn(layers[path], torch.arange(n))
+    return model
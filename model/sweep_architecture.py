@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Architecture / hyperparameter sweep with ASHA early stopping and ONNX latency.
+
+Trials sample d_model, nhead, encoder/decoder depth, dim_feedforward and the
+learning rate from SEARCH_SPACE (or a --space JSON file with the same keys)
+and train in a process pool. Asynchronous successive halving (ASHA) decides
+how far each trial gets: every trial first trains for --min-steps, and a
+trial is promoted to the next rung (eta times the steps) as soon as it is in
+the top 1/eta of the trials finished at its rung. Weak trials stop after the
+first rung, so most of the budget goes to the promising ones, and no worker
+ever waits for a rung to fill up.
+
+Trials that reach the last rung are exported to ONNX and their encoder and
+per-step decoder latency is measured with ONNX Runtime after the pool has
+shut down (so training does not skew the timings). The report is the word
+accuracy / end-to-end latency Pareto front. With --latency-budget-ms,
+sampled architectures are timed before training (latency only depends on the
+shapes) and candidates over the budget never start.
+"""
+
+import os
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    build_character_model,
+    evaluate_word_accuracy
+)
+from trajectory_frontend import TrajectoryFrontEnd, add_frontend_argument
+from export_character_model import export_to_onnx
+from onnx_benchmark import measure_ort_latency, format_latency_table
+from prune_character_model import teacher_forced_loss, pareto_front
+
+
+# Architecture choices and the log-uniform learning-rate range
+SEARCH_SPACE = {
+    'd_model': [128, 192, 256],
+    'nhead': [4, 8],
+    'num_encoder_layers': [2, 4, 6],
+    'num_decoder_layers': [2, 3, 4],
+    'dim_feedforward': [256, 512, 1024],
+    'learning_rate': [1e-4, 1e-3],
+}
+
+
+def sample_trial(rng: random.Random, space: Dict) -> Dict:
+    """Draw one configuration; nhead always divides d_model."""
+    while True:
+        arch = {key: rng.choice(space[key]) for key in space if key != 'learning_rate'}
+        if arch['d_model'] % arch['nhead'] == 0:
+            break
+    low, high = space['learning_rate']
+    arch['learning_rate'] = math.exp(rng.uniform(math.log(low), math.log(high)))
+    return arch
+
+
+def trial_model_config(trial: Dict, frontend: TrajectoryFrontEnd) -> Dict:
+    config = dict(FULL_MODEL_CONFIG, frontend=frontend.to_config())
+    config.update({k: v for k, v in trial.items() if k in FULL_MODEL_CONFIG})
+    if frontend.max_len > 150:
+        config['max_seq_len'] = frontend.max_len
+    return config
+
+
+class ASHAScheduler:
+    """
+    Asynchronous successive halving (Li et al., 2018).
+
+    Rung k trains to min_steps * eta**k steps (the last rung to max_steps).
+    next_promotion() hands out a trial from the top 1/eta of a rung's finished
+    trials that has not been promoted yet, highest rung first; when there is
+    none the caller starts a new trial at rung 0.
+    """
+
+    def __init__(self, min_steps: int, max_steps: int, eta: int = 3):
+        if eta < 2:
+            raise ValueError(f"eta must be at least 2, got {eta}")
+        self.eta = eta
+        self.budgets = []
+        steps = min_steps
+        while steps < max_steps:
+            self.budgets.append(steps)
+            steps *= eta
+        self.budgets.append(max_steps)
+        self.results = [dict() for _ in self.budgets]
+        self.promoted = [set() for _ in self.budgets]
+
+    @property
+    def top_rung(self) -> int:
+        return len(self.budgets) - 1
+
+    def record(self, trial_id: int, rung: int, score: float):
+        self.results[rung][trial_id] = score
+
+    def next_promotion(self) -> Optional[Tuple[int, int]]:
+        for rung in reversed(range(self.top_rung)):
+            finished = self.results[rung]
+            ranked = sorted(finished, key=finished.get, reverse=True)[:len(finished) // self.eta]
+            for trial_id in ranked:
+                if trial_id not in self.promoted[rung]:
+                    self.promoted[rung].add(trial_id)
+                    return trial_id, rung + 1
+        return None
+
+
+# Per-process state of pool workers (datasets are loaded once per worker)
+_WORKER = {}
+
+
+def _init_worker(train_data: str, val_data: str, frontend_spec: str, max_samples: Optional[int],
+                 batch_size: int, eval_batches: Optional[int], threads: int):
+    torch.set_num_threads(threads)
+    frontend = TrajectoryFrontEnd.from_spec(frontend_spec)
+    _WORKER.update({
+        'tokenizer': CharTokenizer(),
+        'train': SwipeDataset(train_data, max_samples=max_samples, frontend=frontend),
+        'val': SwipeDataset(val_data, max_samples=max_samples, frontend=frontend),
+        'batch_size': batch_size,
+        'eval_batches': eval_batches,
+        'device': torch.device('cuda' if torch.cuda.is_available() else 'cpu'),
+    })
+
+
+def run_trial(trial: Dict, budget: int, state_path: str, warmup_steps: int = 100) -> Dict:
+    """Train a trial up to `budget` total steps (continuing its saved state) and evaluate it."""
+    tokenizer, device = _WORKER['tokenizer'], _WORKER['device']
+    start = time.perf_counter()
+    model = build_character_model(trial['model_config'], tokenizer.vocab_size, dropout=0.1).to(device)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=trial['learning_rate'], weight_decay=0.01)
+    steps_done = 0
+    if os.path.exists(state_path):
+        state = torch.load(state_path, map_location=device, weights_only=False)
+        model.load_state_dict(state['model_state_dict'])
+        optimizer.load_state_dict(state['optimizer_state_dict'])
+        steps_done = state['steps']
+
+    # Seeded per trial and rung so a rerun of the sweep sees the same batches
+    generator = torch.Generator().manual_seed(trial['seed'] * 1000003 + steps_done)
+    train_loader = DataLoader(_WORKER['train'], batch_size=_WORKER['batch_size'], shuffle=True,
+                              generator=generator)
+    criterion = nn.CrossEntropyLoss(ignore_index=tokenizer.pad_idx)
+    model.train()
+    losses = []
+    while steps_done < budget:
+        for batch in train_loader:
+            for group in optimizer.param_groups:
+                group['lr'] = trial['learning_rate'] * min(1.0, (steps_done + 1) / warmup_steps)
+            loss = teacher_forced_loss(model, batch, criterion, tokenizer, device)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            losses.append(loss.item())
+            steps_done += 1
+            if steps_done >= budget:
+                break
+
+    val_loader = DataLoader(_WORKER['val'], batch_size=_WORKER['batch_size'], shuffle=False)
+    word_acc = evaluate_word_accuracy(model, val_loader, tokenizer, device,
+                                      max_batches=_WORKER['eval_batches'],
+                                      desc=f"Trial {trial['id']} @ {steps_done}")
+    torch.save({
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+        'steps': steps_done,
+        'model_config': trial['model_config'],
+        'val_word_acc': word_acc,
+    }, state_path)
+    return {
+        'trial_id': trial['id'],
+        'steps': steps_done,
+        'word_acc': word_acc,
+        'train_loss': float(np.mean(losses[-50:])) if losses else None,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def architecture_latency(model_config: Dict, seq_len: int, runs: int, threads: int) -> Dict:
+    """ORT latency of an untrained model; it only depends on the architecture."""
+    model = build_character_model(model_config, CharTokenizer().vocab_size, dropout=0.0).eval()
+    with tempfile.TemporaryDirectory() as tmp:
+        onnx_info = export_to_onnx(model, Path(tmp), seq_len=seq_len)
+        return measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                   seq_len=seq_len, runs=runs, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ASHA architecture sweep with ONNX latency in the loop')
+    parser.add_argument('--train-data', default='data/combined_dataset/cleaned_english_swipes_train.jsonl')
+    parser.add_argument('--val-data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--output-dir', default='checkpoints/architecture_sweep')
+    parser.add_argument('--space', default=None, help='JSON file overriding SEARCH_SPACE entries')
+    parser.add_argument('--trials', type=int, default=27, help='Number of configurations to sample')
+    parser.add_argument('--workers', type=int, default=2, help='Trials training in parallel')
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--min-steps', type=int, default=500, help='Steps of the first rung')
+    parser.add_argument('--max-steps', type=int, default=13500, help='Steps of the last rung')
+    parser.add_argument('--eta', type=int, default=3, help='Promote the top 1/eta of each rung')
+    parser.add_argument('--latency-budget-ms', type=float, default=None,
+                        help='Skip architectures whose end-to-end ORT estimate exceeds this')
+    add_frontend_argument(parser)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--eval-batches', type=int, default=20,
+                        help='Validation batches per rung evaluation (default: 20)')
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    space = dict(SEARCH_SPACE)
+    if args.space:
+        with open(args.space) as f:
+            space.update(json.load(f))
+    frontend = TrajectoryFrontEnd.from_spec(args.frontend)
+    output_dir = Path(args.output_dir)
+    trial_dir = output_dir / 'trials'
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    scheduler = ASHAScheduler(args.min_steps, args.max_steps, args.eta)
+
+    print("="*60)
+    print("Architecture Sweep (ASHA)")
+    print("="*60)
+    print(f"Trials: {args.trials}, workers: {args.workers}, rungs (steps): {scheduler.budgets}")
+    print(f"Trajectory front end: {frontend.spec}")
+
+    rng = random.Random(args.seed)
+    candidates = []
+    for _ in range(args.trials):
+        trial = sample_trial(rng, space)
+        trial['model_config'] = trial_model_config(trial, frontend)
+        candidates.append(trial)
+
+    # Latency is a property of the shapes: drop slow architectures before training them
+    if args.latency_budget_ms is not None:
+        print(f"\nTiming sampled architectures (budget {args.latency_budget_ms:.1f} ms)...")
+        timed = {}
+        kept = []
+        for trial in candidates:
+            key = json.dumps({k: trial[k] for k in trial if k in FULL_MODEL_CONFIG}, sort_keys=True)
+            if key not in timed:
+                timed[key] = architecture_latency(trial['model_config'], frontend.max_len,
+                                                  runs=max(args.bench_runs // 5, 3), threads=args.bench_threads)
+            if timed[key]['total_ms'] <= args.latency_budget_ms:
+                kept.append(trial)
+        print(f"✓ {len(kept)}/{len(candidates)} candidates within budget")
+        candidates = kept
+
+    trials = []
+    for i, trial in enumerate(candidates):
+        trial.update(id=i, seed=args.seed + i, state_path=str(trial_dir / f'trial-{i:03d}.ckpt'), history=[])
+        Path(trial['state_path']).unlink(missing_ok=True)  # rung states of an earlier sweep
+        trials.append(trial)
+
+    print("-"*60)
+    started = 0
+    pending = {}
+    initargs = (args.train_data, args.val_data, frontend.spec, args.max_samples,
+                args.batch_size, args.eval_batches, args.threads_per_worker)
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context('spawn'),
+                             initializer=_init_worker, initargs=initargs) as pool:
+        while True:
+            while len(pending) < args.workers:
+                job = scheduler.next_promotion()
+                if job is None and started < len(trials):
+                    job = (started, 0)
+                    started += 1
+                if job is None:
+                    break
+                trial_id, rung = job
+                trial = trials[trial_id]
+                job_trial = {k: v for k, v in trial.items() if k != 'history'}
+                future = pool.submit(run_trial, job_trial, scheduler.budgets[rung], trial['state_path'])
+                pending[future] = (trial_id, rung)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial_id, rung = pending.pop(future)
+                trial = trials[trial_id]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠ Trial {trial_id} failed at rung {rung}: {e}")
+                    trial['error'] = str(e)
+                    continue
+                scheduler.record(trial_id, rung, result['word_acc'])
+                trial['history'].append(dict(result, rung=rung))
+                arch = '/'.join(str(trial[k]) for k in ('d_model', 'nhead', 'num_encoder_layers',
+                                                         'num_decoder_layers', 'dim_feedforward'))
+                print(f"✓ Trial {trial_id:3d} [{arch}, lr {trial['learning_rate']:.1e}] rung {rung} "
+                      f"({result['steps']} steps): word acc {result['word_acc']:.2%} "
+                      f"in {result['seconds']:.0f}s")
+
+    # Survivors: everything that reached the highest rung any trial reached
+    finished = [rung for rung in range(len(scheduler.budgets)) if scheduler.results[rung]]
+    if not finished:
+        print("⚠ No trial finished; nothing to export")
+        return
+    final_rung = finished[-1]
+    survivors = sorted(scheduler.results[final_rung])
+    print(f"\n{len(survivors)} trial(s) reached rung {final_rung} ({scheduler.budgets[final_rung]} steps)")
+
+    tokenizer = CharTokenizer()
+    rows = []
+    for trial_id in survivors:
+        trial = trials[trial_id]
+        state = torch.load(trial['state_path'], map_location='cpu', weights_only=False)
+        model = build_character_model(state['model_config'], tokenizer.vocab_size, dropout=0.0)
+        model.load_state_dict(state['model_state_dict'])
+        model.eval()
+        onnx_dir = output_dir / 'onnx' / f'trial-{trial_id:03d}'
+        onnx_dir.mkdir(parents=True, exist_ok=True)
+        onnx_info = export_to_onnx(model, onnx_dir, seq_len=frontend.max_len)
+        latency = measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                      seq_len=frontend.max_len, runs=args.bench_runs, threads=args.bench_threads)
+        rows.append({
+            'trial': trial_id,
+            'model_config': state['model_config'],
+            'learning_rate': trial['learning_rate'],
+            'params': sum(p.numel() for p in model.parameters()),
+            'steps': state['steps'],
+            'word_acc': state['val_word_acc'],
+            'encoder_ms': latency['encoder']['p50_ms'],
+            'decoder_step_ms': latency['decoder_step']['p50_ms'],
+            'total_ms': latency['total_ms'],
+            'latency': latency,
+            'onnx_dir': str(onnx_dir),
+        })
+
+    pareto_front(rows, maximize='word_acc', minimize=('total_ms',))
+    rows.sort(key=lambda r: r['total_ms'])
+    table = [{
+        'trial': str(r['trial']),
+        'd/h/enc/dec/ffn': '/'.join(str(r['model_config'][k]) for k in ('d_model', 'nhead', 'num_encoder_layers',
+                                                                          'num_decoder_layers', 'dim_feedforward')),
+        'lr': f"{r['learning_rate']:.1e}",
+        'params': f"{r['params'] / 1e6:.2f}M",
+        'word_acc': f"{r['word_acc']:.2%}",
+        'enc_p50_ms': f"{r['encoder_ms']:.2f}",
+        'dec_step_p50_ms': f"{r['decoder_step_ms']:.2f}",
+        'total_ms': f"{r['total_ms']:.1f}",
+        'pareto': r['pareto'],
+    } for r in rows]
+    print(f"\nAccuracy vs latency ({args.bench_threads} thread(s), p50; * = Pareto-optimal):")
+    print(format_latency_table(table, list(table[0].keys())))
+
+    report_path = output_dir / 'architecture_sweep.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'search_space': space,
+            'rungs': scheduler.budgets,
+            'eta': args.eta,
+            'frontend': frontend.spec,
+            'latency_budget_ms': args.latency_budget_ms,
+            'threads': args.bench_threads,
+            'trials': [{k: v for k, v in t.items() if k != 'state_path'} for t in trials],
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
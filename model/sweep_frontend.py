@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Trajectory front-end sweep: word accuracy vs encoder cost per sequence length.
+
+Every front end in --configs (see trajectory_frontend.py) is applied to the
+validation swipes; the checkpoint is evaluated on them, optionally after a
+short fine-tune on training swipes reduced the same way (a model trained on
+150 raw points usually needs one before it reads arclength:32). The encoder
+is exported at the front end's padded length N and timed with ONNX Runtime,
+so the table shows what each N costs on device and what it costs in
+accuracy. Fine-tuned checkpoints carry the front end in model_config.
+"""
+
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    evaluate_word_accuracy
+)
+from trajectory_frontend import TrajectoryFrontEnd
+from compare_local_attention import load_model, export_encoder
+from prune_character_model import fine_tune, pareto_front
+from onnx_benchmark import create_session, dummy_encoder_inputs, time_session, format_latency_table
+from slim_checkpoints import load_model_checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep trajectory front ends: accuracy vs encoder cost')
+    parser.add_argument('--checkpoint', required=True, help='Trained model checkpoint (.ckpt)')
+    parser.add_argument('--configs', default='truncate:150,discard:100,arclength:64,arclength:48,'
+                                             'arclength:32,merge:64,rdp:64:0.01',
+                        help='Comma-separated front-end specs mode[:max_len[:tolerance]]')
+    parser.add_argument('--train-data', default='data/combined_dataset/cleaned_english_swipes_train.jsonl')
+    parser.add_argument('--val-data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--output-dir', default='checkpoints/frontend_sweep')
+    parser.add_argument('--finetune-steps', type=int, default=0,
+                        help='Fine-tune a copy of the model per front end before evaluating (0 = evaluate only)')
+    parser.add_argument('--finetune-lr', type=float, default=1e-4)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--eval-batches', type=int, default=None)
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    frontends = [TrajectoryFrontEnd.from_spec(spec) for spec in args.configs.split(',')]
+
+    print("="*60)
+    print("Trajectory Front-End Sweep")
+    print("="*60)
+    print(f"Device: {device}")
+    print(f"Front ends: {', '.join(fe.spec for fe in frontends)}")
+
+    tokenizer = CharTokenizer()
+    criterion = nn.CrossEntropyLoss(ignore_index=tokenizer.pad_idx)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for frontend in frontends:
+            print("\n" + "="*60)
+            print(f"Front end {frontend.spec}")
+            print("="*60)
+            model, trained_frontend = load_model(args.checkpoint, FULL_MODEL_CONFIG, tokenizer.vocab_size,
+                                                 max(150, frontend.max_len))
+            if frontend.spec != trained_frontend.spec and not args.finetune_steps:
+                print(f"⚠ Checkpoint was trained with {trained_frontend.spec}; consider --finetune-steps")
+
+            val_dataset = SwipeDataset(args.val_data, max_samples=args.max_samples, frontend=frontend)
+            val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False)
+            model.to(device)
+            if args.finetune_steps > 0:
+                train_dataset = SwipeDataset(args.train_data, max_samples=args.max_samples, frontend=frontend)
+                train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
+                                          num_workers=4, pin_memory=True)
+                fine_tune(model, train_loader, criterion, tokenizer, device,
+                          args.finetune_steps, args.finetune_lr)
+
+            acc = evaluate_word_accuracy(model, val_loader, tokenizer, device,
+                                         max_batches=args.eval_batches, desc='Val')
+            lengths = np.array([val_dataset[i]['seq_len'] for i in range(len(val_dataset))])
+
+            if args.finetune_steps > 0:
+                model_config = dict(load_model_checkpoint(args.checkpoint)[1].get('model_config', FULL_MODEL_CONFIG),
+                                    frontend=frontend.to_config())
+                if frontend.max_len > 150:
+                    model_config['max_seq_len'] = frontend.max_len
+                tag = frontend.spec.replace(':', '_')
+                torch.save({
+                    'model_state_dict': model.state_dict(),
+                    'model_config': model_config,
+                    'val_word_acc': acc,
+                    'source_checkpoint': str(args.checkpoint),
+                }, output_dir / f'frontend-{tag}.ckpt')
+
+            # The app pads to the static length, so N (not the mean) sets the cost
+            model.cpu().eval()
+            onnx_path = Path(tmp) / 'encoder.onnx'
+            max_diff = export_encoder(model, onnx_path, frontend.max_len)
+            session = create_session(str(onnx_path), threads=args.bench_threads)
+            encoder = time_session(session, dummy_encoder_inputs(session, frontend.max_len), runs=args.bench_runs)
+
+            rows.append({
+                'frontend': frontend.spec,
+                'seq_len': frontend.max_len,
+                'mean_points': float(lengths.mean()),
+                'max_points': int(lengths.max()),
+                'word_acc': acc,
+                'encoder_ms': encoder['p50_ms'],
+                'encoder': encoder,
+                'onnx_max_diff': max_diff,
+            })
+            print(f"  Word Acc: {acc:.2%}, {lengths.mean():.1f} points on average, "
+                  f"encoder {encoder['p50_ms']:.2f} ms at N={frontend.max_len}")
+
+    pareto_front(rows, maximize='word_acc', minimize=('encoder_ms',))
+    base_ms = rows[0]['encoder_ms']
+    table = [{
+        'frontend': r['frontend'],
+        'N': str(r['seq_len']),
+        'mean_points': f"{r['mean_points']:.1f}",
+        'word_acc': f"{r['word_acc']:.2%}",
+        'encoder_ms': f"{r['encoder_ms']:.2f}",
+        'vs_first': f"{base_ms / r['encoder_ms']:.2f}x",
+        'pareto': r['pareto'],
+    } for r in rows]
+    print(f"\nAccuracy vs encoder cost ({args.bench_threads} thread(s), p50; * = Pareto-optimal):")
+    print(format_latency_table(table, list(table[0].keys())))
+
+    report_path = output_dir / 'frontend_sweep.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'checkpoint': str(args.checkpoint),
+            'val_data': args.val_data,
+            'finetune_steps': args.finetune_steps,
+            'threads': args.bench_threads,
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Compact columnar swipe corpus format (.swc).
+
+JSONL corpora spend ~20 bytes of decimal text per coordinate and are parsed
+one float at a time. An .swc file stores the same records as:
+
+  header      magic, version, record count, quantization steps, section offsets
+  payload     per record: x, y, t as quantized integer streams, each delta
+              coded twice (changes of the per-sample step, which stay near 0
+              along a smooth stroke), zigzag mapped and LEB128 varint packed;
+              almost every value fits in a single byte
+  words       word table (UTF-8, newline separated) + uint32 word id per record
+  users       optional user table + uint32 user id per record (0xFFFFFFFF = none)
+  lengths     uint32 points per record
+  index       uint64 payload offset of every record (+ end), for random access
+
+Coordinates are quantized to --xy-step keyboard pixels and timestamps to
+--t-step milliseconds (0.1 px / 1 ms by default, far below touch noise and
+sampling jitter). Decoding is vectorized over many records at once: varint
+boundaries come from the continuation bits, values from one masked pass per
+byte position, and the deltas from cumulative sums, so bulk loading runs at
+NumPy speed over a memory map. iter_swipe_records() (swipe_records.py) reads .swc files
+transparently, so every tool that takes a corpus path accepts them.
+
+Usage:
+    python swipe_codec.py encode data/combined_dataset/cleaned_english_swipes_train.jsonl train.swc
+    python swipe_codec.py decode train.swc train.jsonl
+    python swipe_codec.py info train.swc
+"""
+
+import os
+import json
+import time
+import struct
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from swipe_records import parse_swipe_record
+
+
+MAGIC = b'SWC1'
+VERSION = 1
+FLAG_USERS = 1
+NO_USER = 0xFFFFFFFF
+DELTA_ORDER = 2
+# magic, version, flags, records, xy_step, t_step,
+# offsets of: words, word ids, users, user ids, lengths, index, end of file
+HEADER = struct.Struct('<4sHHQdd7Q')
+
+
+def zigzag_varint_encode(values: np.ndarray) -> np.ndarray:
+    """Signed int64 values -> concatenated LEB128 varints of their zigzag mapping (uint8)."""
+    z = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+    nbytes = np.ones(len(z), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += z >= np.uint64(1 << (7 * k))
+    width = int(nbytes.max()) if len(z) else 1
+    shifts = (7 * np.arange(width)).astype(np.uint64)
+    groups = ((z[:, None] >> shifts) & np.uint64(0x7F)).astype(np.uint8)
+    k = np.arange(width)
+    groups |= np.where(k < nbytes[:, None] - 1, 0x80, 0).astype(np.uint8)
+    return groups[k < nbytes[:, None]]
+
+
+def zigzag_varint_decode(data: np.ndarray) -> np.ndarray:
+    """Inverse of zigzag_varint_encode for a buffer of complete varints."""
+    data = np.asarray(data, dtype=np.uint8)
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    nbytes = ends - starts + 1
+    z = (data[starts] & 0x7F).astype(np.int64)
+    # One pass per byte position; almost every value is done after the first
+    for k in range(1, int(nbytes.max())):
+        longer = np.flatnonzero(nbytes > k)
+        z[longer] |= (data[starts[longer] + k] & 0x7F).astype(np.int64) << (7 * k)
+    return (z >> 1) ^ -(z & 1)
+
+
+def _stream_starts(lengths: np.ndarray) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(np.repeat(lengths, 3))[:-1]]).astype(np.int64)
+
+
+def _delta_encode(q: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Second-order deltas within every stream (smooth strokes leave values near 0)."""
+    for _ in range(DELTA_ORDER):
+        d = np.diff(q, prepend=0)
+        d[starts] = q[starts]
+        q = d
+    return q
+
+
+def _delta_decode(d: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Running sums restarted at every stream start, DELTA_ORDER times."""
+    stream_lengths = np.repeat(lengths, 3)
+    starts = _stream_starts(lengths)
+    for _ in range(DELTA_ORDER):
+        total = np.cumsum(d)
+        d = total - np.repeat(total[starts] - d[starts], stream_lengths)
+    return d
+
+
+class SwipeCorpusWriter:
+    """Streams records into an .swc file; the tables are written by close()."""
+
+    def __init__(self, path, xy_step: float = 0.1, t_step: float = 1.0, batch_size: int = 4096):
+        self.path = Path(path)
+        self.xy_step = xy_step
+        self.t_step = t_step
+        self.batch_size = batch_size
+        self._file = open(self.path, 'wb')
+        self._file.write(b'\0' * HEADER.size)
+        self._words: Dict[str, int] = {}
+        self._users: Dict[str, int] = {}
+        self._word_ids: List[int] = []
+        self._user_ids: List[int] = []
+        self._lengths: List[int] = []
+        self._offsets: List[int] = [0]
+        self._pending: List[Dict] = []
+
+    def add(self, record: Dict, user: Optional[str] = None):
+        """Add a normalized record ({'x', 'y', 't', 'word'}) from parse_swipe_record()."""
+        lengths = {len(record['x']), len(record['y']), len(record['t'])}
+        if len(lengths) != 1 or 0 in lengths:
+            raise ValueError(f"Swipe for {record['word']!r} needs the same non-zero number of x/y/t samples, "
+                             f"got {len(record['x'])}/{len(record['y'])}/{len(record['t'])}")
+        self._word_ids.append(self._words.setdefault(record['word'], len(self._words)))
+        self._user_ids.append(NO_USER if user is None else self._users.setdefault(str(user), len(self._users)))
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        lengths = np.array([len(r['x']) for r in self._pending], dtype=np.int64)
+        streams = []
+        for r in self._pending:
+            streams += [np.asarray(r['x'], dtype=np.float64) / self.xy_step,
+                        np.asarray(r['y'], dtype=np.float64) / self.xy_step,
+                        np.asarray(r['t'], dtype=np.float64) / self.t_step]
+        q = np.rint(np.concatenate(streams)).astype(np.int64)
+        encoded = zigzag_varint_encode(_delta_encode(q, _stream_starts(lengths)))
+
+        # Record byte sizes from the per-value sizes
+        value_bytes = np.diff(np.concatenate([[0], np.flatnonzero(encoded < 0x80) + 1]))
+        record_bytes = np.add.reduceat(value_bytes, np.concatenate([[0], np.cumsum(3 * lengths)[:-1]]))
+        self._offsets.extend((self._offsets[-1] + np.cumsum(record_bytes)).tolist())
+        self._lengths.extend(lengths.tolist())
+        self._file.write(encoded.tobytes())
+        self._pending = []
+
+    def _write_section(self, data: bytes) -> int:
+        pad = -self._file.tell() % 8
+        self._file.write(b'\0' * pad)
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset
+
+    def close(self) -> int:
+        """Write the tables and header; returns the number of records."""
+        self._flush()
+        has_users = any(u != NO_USER for u in self._user_ids)
+        table = lambda names: '\n'.join(sorted(names, key=names.get)).encode('utf-8')
+        words_table = table(self._words)
+        offsets = [
+            self._write_section(struct.pack('<Q', len(words_table)) + words_table),
+            self._write_section(np.array(self._word_ids, dtype=np.uint32).tobytes()),
+        ]
+        if has_users:
+            users_table = table(self._users)
+            offsets.append(self._write_section(struct.pack('<Q', len(users_table)) + users_table))
+            offsets.append(self._write_section(np.array(self._user_ids, dtype=np.uint32).tobytes()))
+        else:
+            offsets += [0, 0]
+        offsets.append(self._write_section(np.array(self._lengths, dtype=np.uint32).tobytes()))
+        offsets.append(self._write_section(np.array(self._offsets, dtype=np.uint64).tobytes()))
+        offsets.append(self._file.tell())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, FLAG_USERS if has_users else 0, len(self._lengths),
+                                     self.xy_step, self.t_step, *offsets))
+        self._file.close()
+        return len(self._lengths)
+
+
+class SwipeCorpus:
+    """Memory-mapped .swc reader with random access and vectorized bulk decoding."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._buf = np.memmap(self.path, dtype=np.uint8, mode='r')
+        (magic, version, flags, count, self.xy_step, self.t_step,
+         words_off, word_ids_off, users_off, user_ids_off,
+         lengths_off, index_off, end) = HEADER.unpack(self._buf[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an .swc swipe corpus")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported .swc version {version}")
+        self.count = count
+        self.words = self._table(words_off)
+        self.word_ids = self._array(word_ids_off, np.uint32, count)
+        self.users = self._table(users_off) if flags & FLAG_USERS else None
+        self.user_ids = self._array(user_ids_off, np.uint32, count) if flags & FLAG_USERS else None
+        self.lengths = self._array(lengths_off, np.uint32, count).astype(np.int64)
+        self.index = self._array(index_off, np.uint64, count + 1).astype(np.int64)
+
+    def _array(self, offset: int, dtype, count: int) -> np.ndarray:
+        return np.frombuffer(self._buf, dtype=dtype, count=count, offset=offset)
+
+    def _table(self, offset: int) -> List[str]:
+        size = struct.unpack('<Q', self._buf[offset:offset + 8].tobytes())[0]
+        text = self._buf[offset + 8:offset + 8 + size].tobytes().decode('utf-8')
+        return text.split('\n') if size else []
+
+    def __len__(self):
+        return self.count
+
+    def decode(self, start: int, stop: int) -> List[Dict]:
+        """Decode records [start, stop) in one vectorized pass."""
+        stop = min(stop, self.count)
+        if start >= stop:
+            return []
+        payload = self._buf[HEADER.size + self.index[start]:HEADER.size + self.index[stop]]
+        lengths = self.lengths[start:stop]
+        values = _delta_decode(zigzag_varint_decode(payload), lengths)
+        bounds = np.cumsum(np.repeat(lengths, 3))[:-1]
+        streams = np.split(values, bounds)
+        xy = np.float32(self.xy_step)
+        records = []
+        for i in range(stop - start):
+            record = {
+                'x': streams[3 * i].astype(np.float32) * xy,
+                'y': streams[3 * i + 1].astype(np.float32) * xy,
+                # float64: absolute epoch-ms timestamps need more than float32's 24 bits
+                't': streams[3 * i + 2] * self.t_step,
+                'word': self.words[self.word_ids[start + i]],
+                'grid_name': 'qwerty_english',
+            }
+            if self.user_ids is not None and self.user_ids[start + i] != NO_USER:
+                record['user'] = self.users[self.user_ids[start + i]]
+            records.append(record)
+        return records
+
+    def __getitem__(self, idx: int) -> Dict:
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError(idx)
+        return self.decode(idx, idx + 1)[0]
+
+    def iter_records(self, batch_size: int = 8192) -> Iterator[Dict]:
+        for start in range(0, self.count, batch_size):
+            yield from self.decode(start, start + batch_size)
+
+
+def iter_swc_records(path, max_samples: Optional[int] = None) -> Iterator[Dict]:
+    """Normalized records of an .swc file (numpy float32 x/y, float64 t)."""
+    corpus = SwipeCorpus(path)
+    count = min(len(corpus), max_samples) if max_samples else len(corpus)
+    for start in range(0, count, 8192):
+        yield from corpus.decode(start, min(start + 8192, count))
+
+
+def encode_jsonl(input_path, output_path, xy_step: float = 0.1, t_step: float = 1.0) -> int:
+    """Convert a JSONL corpus (any layout parse_swipe_record() accepts) to .swc; empty swipes are dropped."""
+    writer = SwipeCorpusWriter(output_path, xy_step=xy_step, t_step=t_step)
+    with open(input_path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            record = parse_swipe_record(item)
+            if record is not None and len(record['x']):
+                writer.add(record, user=item.get('user'))
+    return writer.close()
+
+
+def decode_to_jsonl(input_path, output_path) -> int:
+    """Write an .swc corpus back out in the combined-dataset JSONL layout."""
+    corpus = SwipeCorpus(input_path)
+    decimals = max(0, -int(np.floor(np.log10(min(corpus.xy_step, corpus.t_step)))))
+    with open(output_path, 'w') as f:
+        for record in corpus.iter_records():
+            out = {
+                'curve': {k: np.round(record[k].astype(np.float64), decimals).tolist() for k in ('x', 'y', 't')},
+                'word': record['word'],
+            }
+            if 'user' in record:
+                out['user'] = record['user']
+            f.write(json.dumps(out, separators=(',', ':')) + '\n')
+    return len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert swipe corpora between JSONL and columnar .swc')
+    parser.add_argument('command', choices=['encode', 'decode', 'info'])
+    parser.add_argument('input', help='Input corpus (.jsonl for encode, .swc otherwise)')
+    parser.add_argument('output', nargs='?', help='Output path (encode/decode)')
+    parser.add_argument('--xy-step', type=float, default=0.1, help='Coordinate quantization in keyboard pixels')
+    parser.add_argument('--t-step', type=float, default=1.0, help='Timestamp quantization in milliseconds')
+    args = parser.parse_args()
+
+    if args.command != 'info' and not args.output:
+        parser.error(f"{args.command} needs an output path")
+
+    start = time.perf_counter()
+    if args.command == 'encode':
+        count = encode_jsonl(args.input, args.output, args.xy_step, args.t_step)
+        seconds = time.perf_counter() - start
+        in_size, out_size = os.path.getsize(args.input), os.path.getsize(args.output)
+        print(f"✓ Encoded {count:,} swipes in {seconds:.1f}s: {in_size / 1e6:.1f} MB -> {out_size / 1e6:.2f} MB "
+              f"({in_size / max(out_size, 1):.1f}x smaller)")
+    elif args.command == 'decode':
+        count = decode_to_jsonl(args.input, args.output)
+        print(f"✓ Decoded {count:,} swipes to {args.output} in {time.perf_counter() - start:.1f}s")
+    else:
+        corpus = SwipeCorpus(args.input)
+        points = int(corpus.lengths.sum())
+        size = os.path.getsize(args.input)
+        start = time.perf_counter()
+        for _ in corpus.iter_records():
+            pass
+        seconds = time.perf_counter() - start
+        print(f"{args.input}: {len(corpus):,} swipes, {points:,} points, {len(corpus.words):,} distinct words"
+              + (f", {len(corpus.users):,} users" if corpus.users is not None else ""))
+        print(f"  quantization: {corpus.xy_step} px, {corpus.t_step} ms; {size / max(points, 1):.2f} bytes/point")
+        print(f"  full decode: {seconds * 1000:.0f} ms ({size / 1e6 / max(seconds, 1e-9):.0f} MB/s, "
+              f"{len(corpus) / max(seconds, 1e-9):,.0f} swipes/s)")
+
+
+if __name__ == "__main__":
+    main()
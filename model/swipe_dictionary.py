@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Reader for the V2 binary dictionary format (.bin) shipped with the app.
+
+The format is written by scripts/build_dictionary.py (write_v2_binary):
+
+Header (48 bytes, little endian):
+  - Magic: uint32 0x54444B43 ("CKDT")
+  - Version: uint32 = 2
+  - Language: 4 bytes (NUL padded)
+  - Word count: uint32
+  - Canonical offset, normalized offset, accent map offset: uint32 each
+  - Reserved: 20 bytes
+
+Canonical section (word_count entries):
+  - uint16 byte length, UTF-8 word bytes, uint8 frequency rank
+    (0 = most common, 255 = least common)
+"""
+
+import struct
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+V2_MAGIC = 0x54444B43
+V2_VERSION = 2
+V2_HEADER = struct.Struct('<II4sIIII')
+
+
+def load_v2_dictionary(path, ascii_only: bool = True, max_words: Optional[int] = None) -> List[Tuple[str, int]]:
+    """
+    Load (word, rank) pairs from a V2 binary dictionary.
+
+    Args:
+        path: Path to the .bin dictionary
+        ascii_only: Keep only words made of a-z (what the character model can emit)
+        max_words: Keep only the max_words most frequent words
+
+    Returns:
+        List of (word, rank) tuples sorted from most to least frequent
+    """
+    data = Path(path).read_bytes()
+    magic, version, _lang, word_count, canonical_offset, _, _ = V2_HEADER.unpack_from(data, 0)
+    if magic != V2_MAGIC:
+        raise ValueError(f"{path}: not a V2 dictionary (bad magic 0x{magic:08x})")
+    if version != V2_VERSION:
+        raise ValueError(f"{path}: unsupported dictionary version {version}")
+
+    words = []
+    pos = canonical_offset
+    for _ in range(word_count):
+        (length,) = struct.unpack_from('<H', data, pos)
+        pos += 2
+        word = data[pos:pos + length].decode('utf-8')
+        pos += length
+        rank = data[pos]
+        pos += 1
+
+        word = word.lower()
+        if ascii_only and not (word.isascii() and word.isalpha()):
+            continue
+        words.append((word, rank))
+
+    # Stable sort keeps the dictionary's own order within a rank bucket
+    words.sort(key=lambda item: item[1])
+    if max_words:
+        words = words[:max_words]
+    return words
+
+
+def load_language_dictionary(lang: str = 'en', max_words: Optional[int] = None) -> List[Tuple[str, int]]:
+    """Load the app's bundled <lang>_enhanced.bin dictionary."""
+    repo_root = Path(__file__).resolve().parent.parent
+    path = repo_root / 'src' / 'main' / 'assets' / 'dictionaries' / f'{lang}_enhanced.bin'
+    return load_v2_dictionary(path, max_words=max_words)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Parsing of the swipe corpus formats used across the training tools.
+
+Three JSONL layouts are in use:
+  - combined dataset: {"curve": {"x", "y", "t"}, "word"}
+  - synthetic traces: {"word_seq": {"x", "y", "time"}, "word"}
+  - flat records:     {"x", "y", "t", "word", "grid_name": "qwerty_english"}
+
+All of them are normalized to flat {'x', 'y', 't', 'word', 'grid_name'} dicts.
+Columnar .swc corpora (swipe_codec.py) decode to the same flat dicts with
+NumPy x/y/t arrays. A corpus path may also be a directory of *.jsonl / *.swc
+shards (e.g. the store written by ingest_swipe_exports.py), read in file
+name order.
+This module deliberately has no torch dependency so data tools stay light.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+def parse_swipe_record(item: Dict) -> Optional[Dict]:
+    """Normalize one raw corpus record; returns None for unsupported records."""
+    # Handle combined dataset format with curve field
+    if 'curve' in item and 'word' in item:
+        curve = item['curve']
+        if 'x' in curve and 'y' in curve and 't' in curve:
+            return {
+                'x': curve['x'],
+                'y': curve['y'],
+                't': curve['t'],
+                'word': item['word'],
+                'grid_name': 'qwerty_english'
+            }
+    # Handle synthetic trace format
+    elif 'word_seq' in item:
+        word_seq = item['word_seq']
+        if 'x' in word_seq and 'y' in word_seq and 'time' in word_seq:
+            return {
+                'x': word_seq['x'],
+                'y': word_seq['y'],
+                't': word_seq['time'],
+                'word': item.get('word', 'unknown'),
+                'grid_name': 'qwerty_english'
+            }
+    elif 'grid_name' in item and item['grid_name'] == 'qwerty_english':
+        return item
+    return None
+
+
+def iter_swipe_records(path, max_samples: Optional[int] = None) -> Iterator[Dict]:
+    """Stream normalized swipe records from a corpus file or shard directory."""
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix in ('.jsonl', '.swc'))
+    else:
+        files = [path]
+    count = 0
+    for file in files:
+        if file.suffix == '.swc':
+            # Imported here: swipe_codec builds on parse_swipe_record
+            from swipe_codec import iter_swc_records
+            for record in iter_swc_records(file, max_samples - count if max_samples else None):
+                yield record
+                count += 1
+            if max_samples and count >= max_samples:
+                return
+            continue
+        with open(file, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = parse_swipe_record(json.loads(line))
+                if record is None:
+                    continue
+                yield record
+                count += 1
+                # Limit samples if specified (for faster iteration during development)
+                if max_samples and count >= max_samples:
+                    return
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Dual-encoder swipe/word embeddings for candidate retrieval.
+
+  - Swipe tower: CharacterLevelSwipeModel.encode_trajectory, masked mean
+    pooling and a linear projection.
+  - Word tower: a small transformer over each word's characters together
+    with its ideal path (the key centers it passes through, normalized like
+    the swipe coordinates).
+
+Both towers output L2-normalized vectors and are trained with a symmetric
+in-batch contrastive loss (learned temperature). Words are embedded once
+offline into a word_index.py IVF/PQ index; at runtime only the swipe tower
+runs, followed by a top-k index search.
+"""
+
+import math
+from typing import Dict, List, Optional
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from train_character_model import (
+    KeyboardGrid,
+    CharTokenizer,
+    CharacterLevelSwipeModel,
+    build_character_model
+)
+from slim_checkpoints import load_model_checkpoint
+
+
+class WordTensorizer:
+    """Turns words into padded character ids and ideal-path key coordinates."""
+
+    def __init__(self, keyboard: KeyboardGrid, tokenizer: CharTokenizer, max_word_len: int = 20):
+        self.tokenizer = tokenizer
+        self.max_word_len = max_word_len
+        self.key_xy = torch.zeros(tokenizer.vocab_size, 2)
+        for char, idx in tokenizer.char_to_idx.items():
+            if char in keyboard.key_positions and not char.startswith('<'):
+                x, y = keyboard.key_positions[char]
+                self.key_xy[idx] = torch.tensor([x / keyboard.width, y / keyboard.height])
+
+    def __call__(self, words: List[str]) -> Dict[str, torch.Tensor]:
+        tokens = torch.full((len(words), self.max_word_len), self.tokenizer.pad_idx, dtype=torch.long)
+        for i, word in enumerate(words):
+            ids = self.tokenizer.encode_word(word)[1:-1][:self.max_word_len]
+            tokens[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        return {
+            'tokens': tokens,
+            'key_xy': self.key_xy[tokens],
+            'mask': tokens == self.tokenizer.pad_idx,
+        }
+
+
+class WordEncoder(nn.Module):
+    """Character + ideal-path transformer producing one embedding per word."""
+
+    def __init__(self, vocab_size: int, embed_dim: int = 128, d_model: int = 128,
+                 nhead: int = 4, num_layers: int = 2, max_word_len: int = 20, dropout: float = 0.1):
+        super().__init__()
+        self.char_embedding = nn.Embedding(vocab_size, d_model)
+        self.path_proj = nn.Linear(2, d_model)
+        self.pos_embedding = nn.Parameter(torch.zeros(1, max_word_len, d_model))
+        layer = nn.TransformerEncoderLayer(
+            d_model=d_model,
+            nhead=nhead,
+            dim_feedforward=d_model * 4,
+            dropout=dropout,
+            batch_first=True
+        )
+        self.encoder = nn.TransformerEncoder(layer, num_layers)
+        self.proj = nn.Linear(d_model, embed_dim)
+        nn.init.normal_(self.pos_embedding, std=0.02)
+
+    def forward(self, tokens, key_xy, mask):
+        x = self.char_embedding(tokens) + self.path_proj(key_xy) + self.pos_embedding[:, :tokens.shape[1]]
+        x = self.encoder(x, src_key_padding_mask=mask)
+        return F.normalize(self.proj(CharacterLevelSwipeModel.pool_memory(x, mask)), dim=-1)
+
+
+class DualEncoder(nn.Module):
+    """Swipe tower (encode_trajectory + pooling) and word tower sharing an embedding space."""
+
+    def __init__(self, swipe_model: CharacterLevelSwipeModel, vocab_size: int,
+                 embed_dim: int = 128, word_d_model: int = 128, word_layers: int = 2):
+        super().__init__()
+        self.embed_dim = embed_dim
+        self.swipe_model = swipe_model
+        self.swipe_proj = nn.Linear(swipe_model.d_model, embed_dim)
+        self.word_encoder = WordEncoder(vocab_size, embed_dim, word_d_model, num_layers=word_layers)
+        # CLIP-style learned temperature, initialized to 1/0.07
+        self.logit_scale = nn.Parameter(torch.tensor(math.log(1 / 0.07)))
+
+    def embed_swipes(self, traj_features, nearest_keys, src_mask=None):
+        memory = self.swipe_model.encode_trajectory(traj_features, nearest_keys, src_mask)
+        pooled = self.swipe_model.pool_memory(memory, src_mask)
+        return F.normalize(self.swipe_proj(pooled), dim=-1)
+
+    def embed_words(self, tokens, key_xy, mask):
+        return self.word_encoder(tokens, key_xy, mask)
+
+
+def contrastive_loss(swipe_emb, word_emb, words: List[str], logit_scale):
+    """
+    Symmetric InfoNCE over the batch.
+
+    Repeated words in a batch are all treated as positives for each other
+    instead of as negatives.
+    """
+    logits = logit_scale.exp().clamp(max=100) * swipe_emb @ word_emb.t()
+    ids = {w: i for i, w in enumerate(dict.fromkeys(words))}
+    labels = torch.tensor([ids[w] for w in words], device=logits.device)
+    positives = labels[:, None] == labels[None, :]
+
+    def multi_positive_nll(l):
+        return -(torch.logsumexp(l.masked_fill(~positives, float('-inf')), dim=1)
+                 - torch.logsumexp(l, dim=1)).mean()
+
+    return 0.5 * (multi_positive_nll(logits) + multi_positive_nll(logits.t()))
+
+
+def dual_encoder_config(swipe_config: Dict, embed_dim: int, word_d_model: int, word_layers: int) -> Dict:
+    return {
+        'swipe_model': swipe_config,
+        'embed_dim': embed_dim,
+        'word_d_model': word_d_model,
+        'word_layers': word_layers,
+    }
+
+
+def build_dual_encoder(config: Dict, vocab_size: int, dropout: float = 0.1) -> DualEncoder:
+    """Instantiate a DualEncoder from the 'dual_encoder_config' stored in its checkpoint."""
+    swipe_model = build_character_model(config['swipe_model'], vocab_size, dropout=dropout)
+    return DualEncoder(swipe_model, vocab_size, config['embed_dim'],
+                       config['word_d_model'], config['word_layers'])
+
+
+def load_dual_encoder(checkpoint_path: str, device: Optional[torch.device] = None) -> DualEncoder:
+    state_dict, info = load_model_checkpoint(checkpoint_path)
+    model = build_dual_encoder(info['dual_encoder_config'], CharTokenizer().vocab_size, dropout=0.0)
+    model.load_state_dict(state_dict)
+    return model.to(device or 'cpu').eval()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""convert_app_record on an app-shaped SwipeMLData record."""
+
+import numpy as np
+
+from ingest_swipe_exports import convert_app_record
+
+GRID_WIDTH, GRID_HEIGHT = 360.0, 215.0
+
+
+def app_record():
+    # "hello" on a 1080x2400 screen with an 800 px keyboard: x / screen width,
+    # y relative to the keyboard view / screen height (as SwipeMLData stores them)
+    screen_w, screen_h, kb_h = 1080, 2400, 800
+    keys_px = [(600, 400), (250, 130), (930, 400), (930, 400), (870, 130)]  # h e l l o
+    points = [{'x': x / screen_w, 'y': y / screen_h, 't_delta_ms': 0 if i == 0 else 40}
+              for i, (x, y) in enumerate(keys_px)]
+    return {
+        'trace_id': 'test-1',
+        'target_word': 'Hello',
+        'trace_points': points,
+        'metadata': {
+            'screen_width_px': screen_w,
+            'screen_height_px': screen_h,
+            'keyboard_height_px': kb_h,
+            'collection_source': 'user_selection',
+        },
+    }
+
+
+def test_app_record_y_is_not_degenerate():
+    record, reason = convert_app_record(app_record(), GRID_WIDTH, GRID_HEIGHT)
+    assert reason == 'ok'
+    ys = np.array(record['curve']['y'])
+    assert np.all(ys > 0) and np.all(ys < GRID_HEIGHT)
+    # Middle row (h, l) vs top row (e, o) of the keyboard
+    np.testing.assert_allclose(ys, np.array([0.5, 130 / 800, 0.5, 0.5, 130 / 800]) * GRID_HEIGHT, atol=0.01)
+    assert record['word'] == 'hello'
+    assert record['curve']['t'] == [0.0, 40.0, 80.0, 120.0, 160.0]
+
+
+def test_keyboard_offset_is_subtracted():
+    item = app_record()
+    item['metadata']['keyboard_offset_y'] = 80
+    record, _ = convert_app_record(item, GRID_WIDTH, GRID_HEIGHT)
+    np.testing.assert_allclose(record['curve']['y'][0], (400 - 80) / 800 * GRID_HEIGHT, atol=0.01)
+
+
+if __name__ == "__main__":
+    test_app_record_y_is_not_degenerate()
+    test_keyboard_offset_is_subtracted()
+    print("✅ App record conversion passed")
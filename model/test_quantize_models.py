@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Static QDQ calibration methods of quantize_models.py."""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnx import helper, numpy_helper, TensorProto
+
+from quantize_models import quantize_model_static, qdq_scales
+
+
+def masked_mlp(path: Path):
+    """x -> MatMul -> Relu -> MatMul, plus a -inf padding mask added before a Softmax."""
+    rng = np.random.default_rng(0)
+    w1 = numpy_helper.from_array(rng.normal(size=(16, 32)).astype(np.float32), 'w1')
+    w2 = numpy_helper.from_array(rng.normal(size=(32, 8)).astype(np.float32), 'w2')
+    neg_inf = numpy_helper.from_array(np.array(-np.inf, dtype=np.float32), 'neg_inf')
+    zero = numpy_helper.from_array(np.array(0.0, dtype=np.float32), 'zero')
+    nodes = [
+        helper.make_node('MatMul', ['x', 'w1'], ['h'], name='fc1'),
+        helper.make_node('Relu', ['h'], ['r'], name='relu'),
+        helper.make_node('MatMul', ['r', 'w2'], ['scores'], name='fc2'),
+        helper.make_node('Where', ['mask', 'neg_inf', 'zero'], ['additive'], name='mask_fill'),
+        helper.make_node('Add', ['scores', 'additive'], ['masked'], name='mask_add'),
+        helper.make_node('Softmax', ['masked'], ['y'], name='softmax', axis=-1),
+    ]
+    graph = helper.make_graph(
+        nodes, 'masked_mlp',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [1, 16]),
+         helper.make_tensor_value_info('mask', TensorProto.BOOL, [1, 8])],
+        [helper.make_tensor_value_info('y', TensorProto.FLOAT, [1, 8])],
+        [w1, w2, neg_inf, zero])
+    onnx.save(helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)], ir_version=8), str(path))
+
+
+def calibration_feeds(count: int = 64):
+    # Heavy-tailed activations: MinMax spends its range on rare outliers
+    rng = np.random.default_rng(1)
+    mask = np.zeros((1, 8), dtype=bool)
+    mask[0, 6:] = True
+    return [{'x': rng.standard_t(2, size=(1, 16)).astype(np.float32), 'mask': mask} for _ in range(count)]
+
+
+def test_entropy_scales_differ_from_minmax():
+    feeds = calibration_feeds()
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = Path(tmp) / 'mlp.onnx'
+        masked_mlp(model_path)
+        scales = {}
+        for method in ('minmax', 'entropy', 'percentile'):
+            output = Path(tmp) / f'mlp_{method}.onnx'
+            _, _, kept = quantize_model_static(model_path, output, feeds, method=method)
+            assert {'mask_fill', 'mask_add', 'softmax'} <= set(kept)
+            scales[method] = qdq_scales(output)
+    assert scales['minmax'].keys() == scales['entropy'].keys()
+    changed = [name for name in scales['minmax']
+               if not np.allclose(scales['minmax'][name], scales['entropy'][name])]
+    assert changed, "entropy calibration produced the MinMax scales"
+
+
+if __name__ == "__main__":
+    test_entropy_scales_differ_from_minmax()
+    print("✅ Entropy calibration differs from MinMax")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Round trips of the .swc swipe corpus format."""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from swipe_codec import SwipeCorpus, SwipeCorpusWriter
+
+
+def record(word, n, t0=0.0):
+    x = np.linspace(10.0, 300.0, n)
+    return {'x': x.tolist(), 'y': (100 + 20 * np.sin(x / 40)).tolist(),
+            't': (t0 + 16.0 * np.arange(n)).tolist(), 'word': word}
+
+
+def test_empty_record_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = SwipeCorpusWriter(Path(tmp) / 'c.swc', batch_size=2)
+        writer.add(record('the', 5))
+        with pytest.raises(ValueError, match='non-zero'):
+            writer.add({'x': [], 'y': [], 't': [], 'word': 'and'})
+        writer.add(record('and', 7))
+        assert writer.close() == 2
+        corpus = SwipeCorpus(Path(tmp) / 'c.swc')
+        assert [r['word'] for r in corpus.iter_records()] == ['the', 'and']
+        assert len(corpus[1]['x']) == 7
+
+
+def test_epoch_timestamps_survive_decoding():
+    t0 = 1_700_000_000_123.0  # epoch ms, far beyond float32's 24-bit mantissa
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = SwipeCorpusWriter(Path(tmp) / 'c.swc')
+        writer.add(record('hello', 40, t0=t0))
+        writer.close()
+        decoded = SwipeCorpus(Path(tmp) / 'c.swc')[0]
+    expected = t0 + 16.0 * np.arange(40)
+    np.testing.assert_array_equal(decoded['t'], expected)
+    np.testing.assert_allclose(decoded['x'], np.linspace(10.0, 300.0, 40), atol=0.05)
+
+
+if __name__ == "__main__":
+    test_empty_record_is_rejected()
+    test_epoch_timestamps_survive_decoding()
+    print("✅ .swc round trips passed")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""QAT export of a model with CTC, word and early-exit heads."""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from train_character_model import CharTokenizer, build_character_model
+from export_character_model import export_to_onnx
+from onnx_benchmark import create_session
+from quantization_aware import prepare_qat, freeze_observers, fold_weight_quantization
+from train_qat import qat_loss
+
+SEQ_LEN = 32
+WORDS = ['the', 'and', 'hello', 'swipe', 'keyboard', 'quantize']
+
+
+def synthetic_batch(tokenizer, batch_size: int = 6):
+    generator = torch.Generator().manual_seed(0)
+    words = [WORDS[i % len(WORDS)] for i in range(batch_size)]
+    targets = torch.full((batch_size, 12), tokenizer.pad_idx, dtype=torch.long)
+    for i, word in enumerate(words):
+        tokens = tokenizer.encode_word(word)
+        targets[i, :len(tokens)] = torch.tensor(tokens)
+    return {
+        'traj_features': torch.randn(batch_size, SEQ_LEN, 6, generator=generator),
+        'nearest_keys': torch.randint(4, tokenizer.vocab_size, (batch_size, SEQ_LEN), generator=generator),
+        'target': targets,
+        'seq_len': torch.tensor([SEQ_LEN - 3 * i for i in range(batch_size)]),
+        'word': words,
+    }
+
+
+def test_qat_export_with_auxiliary_heads():
+    torch.manual_seed(0)
+    tokenizer = CharTokenizer()
+    config = {'traj_dim': 6, 'd_model': 32, 'nhead': 2, 'num_encoder_layers': 2, 'num_decoder_layers': 1,
+              'dim_feedforward': 64, 'ctc_head': True, 'word_vocab': WORDS[:4], 'exit_layers': [1]}
+    model = prepare_qat(build_character_model(config, tokenizer.vocab_size, dropout=0.0))
+    criterion = nn.CrossEntropyLoss(ignore_index=tokenizer.pad_idx)
+    batch = synthetic_batch(tokenizer)
+
+    # Calibration as in train_qat.main: observers only
+    model.eval()
+    with torch.no_grad():
+        for _ in range(3):
+            loss = qat_loss(model, batch, criterion, tokenizer, torch.device('cpu'))
+    assert torch.isfinite(loss)
+    freeze_observers(model)
+
+    for name in ('ctc_proj', 'word_head', 'exit_heads.0'):
+        observer = model.get_submodule(name).input_fake_quant.activation_post_process
+        assert torch.isfinite(observer.min_val).all(), f"{name} observer never saw data"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        info = export_to_onnx(model, Path(tmp), seq_len=SEQ_LEN)
+        fold_weight_quantization(Path(info['encoder_path']))
+        session = create_session(info['encoder_path'])
+        mask = (np.arange(SEQ_LEN) >= 20)[None, :]
+        memory, word_probs = session.run(None, {
+            'trajectory_features': batch['traj_features'][:1].numpy(),
+            'nearest_keys': batch['nearest_keys'][:1].numpy(),
+            'src_mask': mask,
+        })
+    assert memory.shape == (1, SEQ_LEN, 32)
+    assert word_probs.shape == (1, len(config['word_vocab']) + 1)
+    assert np.isclose(word_probs.sum(), 1.0, atol=1e-3)
+
+
+if __name__ == "__main__":
+    test_qat_export_with_auxiliary_heads()
+    print("✅ QAT export with auxiliary heads passed")
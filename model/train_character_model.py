@@ -18,6 +18,12 @@ from pathlib import Path
 from tqdm import tqdm
 import random
 
+from swipe_records import iter_swipe_records
+from ctc_decoding import ctc_beam_decode
+from local_attention import use_local_attention
+from trajectory_frontend import TrajectoryFrontEnd, add_frontend_argument
+from key_segments import KeySegmenter, SEGMENT_DIM
+
 
 class KeyboardGrid:
     """Load and use the actual keyboard grid layout."""
@@ -105,51 +111,33 @@ class CharTokenizer:
 class SwipeDataset(Dataset):
     """Dataset for swipe trajectories with character-level targets."""
     
-    def __init__(self, data_path: str, max_seq_len: int = 150, max_word_len: int = 20, max_samples: int = None):
-        self.max_seq_len = max_seq_len
+    def __init__(self, data_path: str, max_seq_len: int = 150, max_word_len: int = 20, max_samples: int = None,
+                 frontend: Optional[TrajectoryFrontEnd] = None, segmenter: Optional[KeySegmenter] = None):
+        # The front end (resampling / simplification) also fixes the padded length,
+        # unless points are collapsed into key segments (see key_segments.py)
+        self.frontend = frontend or TrajectoryFrontEnd('truncate', max_seq_len)
+        self.segmenter = segmenter
+        self.max_seq_len = segmenter.max_segments if segmenter else self.frontend.max_len
         self.max_word_len = max_word_len
         
         # Load keyboard grid
         self.keyboard = KeyboardGrid()
         self.tokenizer = CharTokenizer()
         
-        # Load data
-        self.data = []
-        with open(data_path, 'r') as f:
-            for line in f:
-                item = json.loads(line)
-                # Handle combined dataset format with curve field
-                if 'curve' in item and 'word' in item:
-                    curve = item['curve']
-                    if 'x' in curve and 'y' in curve and 't' in curve:
-                        processed_item = {
-                            'x': curve['x'],
-                            'y': curve['y'],
-                            't': curve['t'],
-                            'word': item['word'],
-                            'grid_name': 'qwerty_english'
-                        }
-                        self.data.append(processed_item)
-                # Handle synthetic trace format
-                elif 'word_seq' in item:
-                    word_seq = item['word_seq']
-                    if 'x' in word_seq and 'y' in word_seq and 'time' in word_seq:
-                        processed_item = {
-                            'x': word_seq['x'],
-                            'y': word_seq['y'],
-                            't': word_seq['time'],
-                            'word': item.get('word', 'unknown'),
-                            'grid_name': 'qwerty_english'
-                        }
-                        self.data.append(processed_item)
-                elif 'grid_name' in item and item['grid_name'] == 'qwerty_english':
-                    self.data.append(item)
-                
-                # Limit samples if specified (for faster iteration during development)
-                if max_samples and len(self.data) >= max_samples:
-                    break
+        # Normalized key centres indexed by token (segment key distances)
+        unk_xy = self.keyboard.key_positions['<unk>']
+        self.key_xy = np.array([self.keyboard.key_positions.get(c, unk_xy) for c in self.tokenizer.vocab],
+                               dtype=np.float32) / np.array([self.keyboard.width, self.keyboard.height],
+                                                            dtype=np.float32)
+        
+        # Load data (combined dataset, synthetic trace and flat record formats)
+        self.data = list(iter_swipe_records(data_path, max_samples=max_samples))
         
         print(f"Loaded {len(self.data)} swipe examples")
+        if self.frontend.mode != 'truncate':
+            print(f"  Trajectory front end: {self.frontend.spec}")
+        if self.segmenter:
+            print(f"  Key segments: up to {self.segmenter.max_segments} per swipe")
     
     def __len__(self):
         return len(self.data)
@@ -166,6 +154,9 @@ class SwipeDataset(Dataset):
         xs = xs / self.keyboard.width
         ys = ys / self.keyboard.height
         
+        # Sequence-length reduction on the normalized points, as in the app
+        xs, ys, ts = self.frontend(xs, ys, ts)
+        
         # Compute velocities and accelerations
         dt = np.diff(ts, prepend=ts[0])
         dt = np.maximum(dt, 1e-6)  # Avoid division by zero
@@ -188,23 +179,35 @@ class SwipeDataset(Dataset):
         
         # Get nearest keys for each point
         nearest_keys = []
-        for x, y in zip(item['x'], item['y']):
+        for x, y in zip(xs * self.keyboard.width, ys * self.keyboard.height):
             key = self.keyboard.get_nearest_key(x, y)
             nearest_keys.append(self.tokenizer.char_to_idx.get(key, self.tokenizer.unk_idx))
         
         # Stack trajectory features
         traj_features = np.stack([xs, ys, vx, vy, ax, ay], axis=1)
         
+        # Timestamps relative to the first point (used by batch augmentation)
+        timestamps = ts - ts[0]
+        
+        if self.segmenter:
+            # One token per key run instead of one per point
+            traj_features, segment_keys, entry_ts = self.segmenter(
+                xs, ys, ts, np.array(nearest_keys, dtype=np.int64), self.key_xy)
+            nearest_keys = segment_keys.tolist()
+            timestamps = entry_ts - ts[0]
+        
         # Pad or truncate to max_seq_len
-        seq_len = len(xs)
+        seq_len = len(traj_features)
         if seq_len > self.max_seq_len:
             traj_features = traj_features[:self.max_seq_len]
             nearest_keys = nearest_keys[:self.max_seq_len]
+            timestamps = timestamps[:self.max_seq_len]
             seq_len = self.max_seq_len
         elif seq_len < self.max_seq_len:
             pad_len = self.max_seq_len - seq_len
             traj_features = np.pad(traj_features, ((0, pad_len), (0, 0)), mode='constant')
             nearest_keys = nearest_keys + [self.tokenizer.pad_idx] * pad_len
+            timestamps = np.pad(timestamps, (0, pad_len), mode='edge')
         
         # Encode target word
         word = item['word']
@@ -221,6 +224,7 @@ class SwipeDataset(Dataset):
             'traj_features': torch.tensor(traj_features, dtype=torch.float32),
             'nearest_keys': torch.tensor(nearest_keys, dtype=torch.long),
             'target': torch.tensor(target_indices, dtype=torch.long),
+            'timestamps': torch.tensor(timestamps, dtype=torch.float32),
             'seq_len': seq_len,
             'word': word
         }
@@ -239,11 +243,31 @@ class CharacterLevelSwipeModel(nn.Module):
                  dropout: float = 0.1,
                  kb_vocab_size: int = 30,
                  char_vocab_size: int = 30,
-                 max_seq_len: int = 150):
+                 max_seq_len: int = 150,
+                 exit_layers: Optional[List[int]] = None,
+                 ctc_head: bool = False,
+                 word_vocab: Optional[List[str]] = None,
+                 attention_window: Optional[int] = None,
+                 global_tokens: int = 0,
+                 key_segments: bool = False):
         super().__init__()
         
         self.d_model = d_model
         
+        # Early exits: number of encoder layers after which the runtime may stop
+        self.exit_layers = sorted(exit_layers) if exit_layers else []
+        for n in self.exit_layers:
+            if not 0 < n < num_encoder_layers:
+                raise ValueError(f"Exit after layer {n} must be within 1..{num_encoder_layers - 1}")
+        
+        # Key-segment inputs (key_segments.py): one position per key run
+        # carrying segment summaries instead of per-point kinematics
+        self.key_segments = key_segments
+        if key_segments and traj_dim != SEGMENT_DIM:
+            raise ValueError(f"Key segments have {SEGMENT_DIM} features, got traj_dim={traj_dim}")
+        if key_segments and ctc_head:
+            raise ValueError("CTC needs a frame per character; key segments merge repeated letters")
+        
         # Encoder: Process trajectory
         self.traj_proj = nn.Linear(traj_dim, d_model // 2)
         self.kb_embedding = nn.Embedding(kb_vocab_size, d_model // 2)
@@ -268,6 +292,18 @@ class CharacterLevelSwipeModel(nn.Module):
         )
         self.encoder = nn.TransformerEncoder(encoder_layer, num_encoder_layers)
         
+        # Optional sliding-window encoder attention (see local_attention.py);
+        # global tokens are learned embeddings prepended to the trajectory
+        self.attention_window = attention_window
+        self.num_global_tokens = global_tokens
+        if global_tokens and not attention_window:
+            raise ValueError("Global tokens require a local attention window")
+        if global_tokens and self.exit_layers:
+            raise ValueError("Early exits are not supported together with global tokens")
+        if attention_window:
+            use_local_attention(self.encoder, attention_window, global_tokens, dropout)
+        self.global_tokens = nn.Parameter(torch.zeros(1, global_tokens, d_model)) if global_tokens else None
+        
         # Decoder: Generate characters
         self.char_embedding = nn.Embedding(char_vocab_size, d_model)
         decoder_layer = nn.TransformerDecoderLayer(
@@ -282,15 +318,34 @@ class CharacterLevelSwipeModel(nn.Module):
         # Output projection
         self.output_proj = nn.Linear(d_model, char_vocab_size)
         
+        # Optional non-autoregressive head: per-frame character distribution
+        # over the encoder memory, with <pad> doubling as the CTC blank
+        self.ctc_proj = nn.Linear(d_model, char_vocab_size) if ctc_head else None
+        
+        # Optional whole-word classifier over frequent words; the extra last
+        # class stands for "any other word" and always falls back to decoding
+        self.word_vocab = list(word_vocab) if word_vocab else []
+        self.word_head = nn.Linear(d_model, len(self.word_vocab) + 1) if self.word_vocab else None
+        
+        if self.exit_layers:
+            # Shared norm maps every intermediate exit into the decoder's memory space;
+            # one linear confidence head per exit scores the pooled exit memory
+            self.exit_norm = nn.LayerNorm(d_model)
+            self.exit_heads = nn.ModuleList([nn.Linear(d_model, 1) for _ in self.exit_layers])
+        
         self._init_weights()
+        if self.global_tokens is not None:
+            # Global tokens carry no positional encoding: only distinct initial
+            # values keep them from receiving identical gradients
+            nn.init.normal_(self.global_tokens, std=0.02)
     
     def _init_weights(self):
         for p in self.parameters():
             if p.dim() > 1:
                 nn.init.xavier_uniform_(p)
     
-    def encode_trajectory(self, traj_features, nearest_keys, src_mask=None):
-        """Encode the swipe trajectory."""
+    def embed_trajectory(self, traj_features, nearest_keys):
+        """Encoder input embeddings (before the transformer layers)."""
         batch_size, seq_len, _ = traj_features.shape
         
         # Project features
@@ -302,18 +357,96 @@ class CharacterLevelSwipeModel(nn.Module):
         combined = self.encoder_norm(combined)
         
         # Add positional encoding
-        combined = combined + self.pe[:, :seq_len, :]
+        return combined + self.pe[:, :seq_len, :]
+    
+    def encode_trajectory(self, traj_features, nearest_keys, src_mask=None):
+        """Encode the swipe trajectory."""
+        combined = self.embed_trajectory(traj_features, nearest_keys)
+        
+        if self.global_tokens is not None:
+            # Global tokens take part in every layer and are dropped from the memory
+            batch_size, num_global = combined.shape[0], self.num_global_tokens
+            combined = torch.cat([self.global_tokens.expand(batch_size, -1, -1), combined], dim=1)
+            if src_mask is not None:
+                src_mask = torch.cat([src_mask.new_zeros(batch_size, num_global), src_mask], dim=1)
+            return self.encoder(combined, src_key_padding_mask=src_mask)[:, num_global:]
         
         # Encode
         memory = self.encoder(combined, src_key_padding_mask=src_mask)
         
         return memory
     
+    def ctc_log_probs(self, memory):
+        """Per-frame CTC log probabilities [batch, seq_len, vocab] (blank = <pad>)."""
+        return F.log_softmax(self.ctc_proj(memory), dim=-1)
+    
+    @staticmethod
+    def pool_memory(memory, src_mask=None):
+        """Mean of the memory over valid (non-padded) positions: [batch, d_model]."""
+        if src_mask is None:
+            return memory.mean(dim=1)
+        valid = (~src_mask).unsqueeze(-1).to(memory.dtype)
+        return (memory * valid).sum(dim=1) / valid.sum(dim=1).clamp(min=1.0)
+    
+    def word_logits(self, memory, src_mask=None):
+        """Whole-word classifier logits [batch, len(word_vocab) + 1]."""
+        return self.word_head(self.pool_memory(memory, src_mask))
+    
+    def exit_memory(self, hidden, src_mask, exit_idx: int):
+        """Normalized memory and confidence logit [batch] at an intermediate exit."""
+        memory = self.exit_norm(hidden)
+        pooled = self.pool_memory(memory, src_mask)
+        return memory, self.exit_heads[exit_idx](pooled).squeeze(-1)
+    
+    def encode_with_exits(self, traj_features, nearest_keys, src_mask=None):
+        """
+        Run every encoder layer, collecting each exit along the way.
+        
+        Returns:
+            List of (memory, confidence_logit) per exit, ending with the
+            full-depth (memory, None)
+        """
+        hidden = self.embed_trajectory(traj_features, nearest_keys)
+        outputs = []
+        for depth, layer in enumerate(self.encoder.layers, start=1):
+            hidden = layer(hidden, src_key_padding_mask=src_mask)
+            if depth in self.exit_layers:
+                outputs.append(self.exit_memory(hidden, src_mask, self.exit_layers.index(depth)))
+        outputs.append((hidden, None))
+        return outputs
+    
+    @torch.no_grad()
+    def encode_adaptive(self, traj_features, nearest_keys, src_mask=None, threshold: float = 0.9):
+        """
+        Encode, stopping at the first exit where every sample's confidence clears threshold.
+        
+        Returns:
+            (memory, executed encoder depth)
+        """
+        hidden = self.embed_trajectory(traj_features, nearest_keys)
+        for depth, layer in enumerate(self.encoder.layers, start=1):
+            hidden = layer(hidden, src_key_padding_mask=src_mask)
+            if depth in self.exit_layers:
+                memory, confidence = self.exit_memory(hidden, src_mask, self.exit_layers.index(depth))
+                if bool((torch.sigmoid(confidence) >= threshold).all()):
+                    return memory, depth
+        return hidden, len(self.encoder.layers)
+    
     def forward(self, traj_features, nearest_keys, targets, src_mask=None, tgt_mask=None):
         """Forward pass with teacher forcing."""
         # Encode trajectory
         memory = self.encode_trajectory(traj_features, nearest_keys, src_mask)
-        
+        return self.decode_logits(memory, targets, src_mask, tgt_mask)
+    
+    def forward_with_exits(self, traj_features, nearest_keys, targets, src_mask=None, tgt_mask=None):
+        """Teacher-forced logits for every exit (final depth last) plus exit confidence logits."""
+        exits = self.encode_with_exits(traj_features, nearest_keys, src_mask)
+        logits = [self.decode_logits(memory, targets, src_mask, tgt_mask) for memory, _ in exits]
+        confidences = [confidence for _, confidence in exits[:-1]]
+        return logits, confidences
+    
+    def decode_logits(self, memory, targets, src_mask=None, tgt_mask=None):
+        """Teacher-forced decoder logits for a given encoder memory."""
         # Prepare target input (shift right, add <sos>)
         batch_size, tgt_len = targets.shape
         tgt_input = targets[:, :-1]  # Remove last token
@@ -346,6 +479,34 @@ class CharacterLevelSwipeModel(nn.Module):
         
         # Encode trajectory
         memory = self.encode_trajectory(traj_features, nearest_keys, src_mask)
+        return self.beam_decode(memory, tokenizer, beam_size, max_len)
+    
+    @torch.no_grad()
+    def generate_with_word_head(self, traj_features, nearest_keys, tokenizer, src_mask=None,
+                                threshold: float = 0.9, beam_size=5, max_len=20):
+        """
+        Answer confident swipes from the word classifier, beam search the rest.
+        
+        Returns:
+            (words, list of bools: True where the classifier answered)
+        """
+        self.eval()
+        memory = self.encode_trajectory(traj_features, nearest_keys, src_mask)
+        probs = F.softmax(self.word_logits(memory, src_mask), dim=-1)
+        top_prob, top_class = probs.max(dim=-1)
+        accepted = (top_prob >= threshold) & (top_class < len(self.word_vocab))
+        
+        words = [self.word_vocab[c] if a else None for c, a in zip(top_class.tolist(), accepted.tolist())]
+        fallback = (~accepted).nonzero().squeeze(-1)
+        if len(fallback) > 0:
+            decoded = self.beam_decode(memory[fallback], tokenizer, beam_size, max_len)
+            for i, word in zip(fallback.tolist(), decoded):
+                words[i] = word
+        return words, accepted.tolist()
+    
+    @torch.no_grad()
+    def beam_decode(self, memory, tokenizer, beam_size=5, max_len=20):
+        """Beam search over the decoder for an already encoded trajectory."""
         batch_size = memory.shape[0]
         
         # Initialize beams
@@ -400,8 +561,128 @@ class CharacterLevelSwipeModel(nn.Module):
         return results
 
 
-def train_model():
-    """Train the character-level swipe model."""
+# Architecture of the deployed full model (see train_full_model.py)
+FULL_MODEL_CONFIG = {
+    'traj_dim': 6,
+    'd_model': 256,
+    'nhead': 8,
+    'num_encoder_layers': 6,
+    'num_decoder_layers': 4,
+    'dim_feedforward': 1024,
+}
+
+
+def build_character_model(config: Dict, vocab_size: int, dropout: float = 0.1) -> CharacterLevelSwipeModel:
+    """Instantiate CharacterLevelSwipeModel from an architecture config dict."""
+    return CharacterLevelSwipeModel(
+        traj_dim=config['traj_dim'],
+        d_model=config['d_model'],
+        nhead=config['nhead'],
+        num_encoder_layers=config['num_encoder_layers'],
+        num_decoder_layers=config['num_decoder_layers'],
+        dim_feedforward=config['dim_feedforward'],
+        dropout=dropout,
+        char_vocab_size=vocab_size,
+        kb_vocab_size=vocab_size,
+        exit_layers=config.get('exit_layers'),
+        ctc_head=config.get('ctc_head', False),
+        word_vocab=config.get('word_vocab'),
+        max_seq_len=config.get('max_seq_len', 150),
+        attention_window=config.get('attention_window'),
+        global_tokens=config.get('global_tokens', 0),
+        key_segments=bool(config.get('key_segments'))
+    )
+
+
+def early_exit_loss(exit_logits, exit_confidences, targets, pad_idx: int, criterion,
+                    exit_weight: float = 0.5):
+    """
+    Joint loss for an early-exit model.
+    
+    Final-depth CE, plus exit_weight times the mean CE of the intermediate
+    exits, plus BCE training each confidence head to predict whether its exit
+    already gets every target character right under teacher forcing.
+    """
+    flat_targets = targets.reshape(-1)
+    valid = targets != pad_idx
+    final = criterion(exit_logits[-1].reshape(-1, exit_logits[-1].shape[-1]), flat_targets)
+    if not exit_confidences:
+        return final
+    
+    exit_ce = 0.0
+    confidence_loss = 0.0
+    for logits, confidence in zip(exit_logits[:-1], exit_confidences):
+        exit_ce = exit_ce + criterion(logits.reshape(-1, logits.shape[-1]), flat_targets)
+        correct = ((logits.argmax(dim=-1) == targets) | ~valid).all(dim=1).to(confidence.dtype)
+        confidence_loss = confidence_loss + F.binary_cross_entropy_with_logits(confidence, correct)
+    n = len(exit_confidences)
+    return final + exit_weight * exit_ce / n + confidence_loss / n
+
+
+def ctc_loss(log_probs, targets, seq_lens, tokenizer: CharTokenizer):
+    """
+    CTC loss of encoder log probabilities against word targets.
+    
+    Args:
+        log_probs: [batch, seq_len, vocab] from CharacterLevelSwipeModel.ctc_log_probs
+        targets: [batch, word_len] token ids as produced by SwipeDataset (<sos> ... <eos> <pad>...)
+        seq_lens: Valid trajectory lengths
+    """
+    labels = targets[:, 1:]
+    valid = (labels != tokenizer.pad_idx) & (labels != tokenizer.eos_idx)
+    input_lengths = torch.as_tensor(seq_lens, device=log_probs.device).clamp(max=log_probs.shape[1])
+    return F.ctc_loss(
+        log_probs.transpose(0, 1),
+        torch.where(valid, labels, torch.zeros_like(labels)),
+        input_lengths,
+        valid.sum(dim=1),
+        blank=tokenizer.pad_idx,
+        zero_infinity=True
+    )
+
+
+def create_padding_mask(seq_lens, max_len: int, device) -> torch.Tensor:
+    """Boolean [batch, max_len] mask that is True on padded positions."""
+    seq_lens = torch.as_tensor(seq_lens, device=device)
+    return torch.arange(max_len, device=device)[None, :] >= seq_lens[:, None]
+
+
+def evaluate_word_accuracy(model, data_loader, tokenizer, device, beam_size: int = 5,
+                           max_batches: Optional[int] = None, desc: str = 'Eval') -> float:
+    """Word-level accuracy of beam search decoding over a data loader."""
+    model.eval()
+    correct = 0
+    total = 0
+    with torch.no_grad():
+        for batch_idx, batch in enumerate(tqdm(data_loader, desc=desc)):
+            if max_batches is not None and batch_idx >= max_batches:
+                break
+            traj_features = batch['traj_features'].to(device)
+            nearest_keys = batch['nearest_keys'].to(device)
+            src_mask = create_padding_mask(batch['seq_len'], traj_features.shape[1], device)
+            
+            generated_words = model.generate_beam(
+                traj_features, nearest_keys, tokenizer, src_mask, beam_size=beam_size
+            )
+            for gen_word, true_word in zip(generated_words, batch['word']):
+                total += 1
+                correct += int(gen_word == true_word)
+    return correct / max(total, 1)
+
+
+def train_model(ctc_weight: float = 0.0, ctc_only: bool = False,
+                attention_window: int = 0, global_tokens: int = 0,
+                frontend: Optional[str] = None, key_segments: int = 0):
+    """Train the character-level swipe model.
+    
+    Args:
+        ctc_weight: Weight of an auxiliary CTC head's loss (0 = no CTC head)
+        ctc_only: Train only the encoder + CTC head (no autoregressive decoder loss)
+        attention_window: Sliding-window radius of encoder self-attention (0 = full attention)
+        global_tokens: Learned global tokens for the windowed encoder
+        frontend: Trajectory front end spec, e.g. 'arclength:64' (default: truncate at 150)
+        key_segments: Encode at most this many key segments instead of points (0 = per point)
+    """
     # Configuration
     batch_size = 32
     learning_rate = 1e-4
@@ -433,18 +714,49 @@ def train_model():
     
     # Create dataset and dataloader
     # Use max_samples=10000 for faster initial training, remove for full dataset
-    train_dataset = SwipeDataset(train_data_path, max_samples=10000)  # Start with 10k samples
-    val_dataset = SwipeDataset(val_data_path, max_samples=1000)  # 1k validation samples
+    trajectory_frontend = TrajectoryFrontEnd.from_spec(frontend)
+    segmenter = KeySegmenter(key_segments) if key_segments else None
+    train_dataset = SwipeDataset(train_data_path, max_samples=10000, frontend=trajectory_frontend,
+                                 segmenter=segmenter)  # Start with 10k samples
+    val_dataset = SwipeDataset(val_data_path, max_samples=1000, frontend=trajectory_frontend,
+                               segmenter=segmenter)  # 1k validation samples
     
     train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
     val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
     
     # Create model
     tokenizer = CharTokenizer()
+    use_ctc = ctc_only or ctc_weight > 0
     model = CharacterLevelSwipeModel(
+        traj_dim=SEGMENT_DIM if segmenter else 6,
         char_vocab_size=tokenizer.vocab_size,
-        kb_vocab_size=tokenizer.vocab_size
+        kb_vocab_size=tokenizer.vocab_size,
+        ctc_head=use_ctc,
+        attention_window=attention_window or None,
+        global_tokens=global_tokens,
+        max_seq_len=max(150, train_dataset.max_seq_len),
+        key_segments=segmenter is not None
     ).to(device)
+    model_config = {
+        'traj_dim': model.traj_proj.in_features,
+        'd_model': model.d_model,
+        'nhead': model.encoder.layers[0].self_attn.num_heads,
+        'num_encoder_layers': len(model.encoder.layers),
+        'num_decoder_layers': len(model.decoder.layers),
+        'dim_feedforward': model.encoder.layers[0].linear1.out_features,
+        'ctc_head': use_ctc,
+        'frontend': trajectory_frontend.to_config(),
+    }
+    if train_dataset.max_seq_len > 150:
+        model_config['max_seq_len'] = train_dataset.max_seq_len
+    if segmenter:
+        model_config['key_segments'] = segmenter.to_config()
+    if attention_window:
+        model_config['attention_window'] = attention_window
+        model_config['global_tokens'] = global_tokens
+        print(f"Encoder attention: window ±{attention_window}, {global_tokens} global tokens")
+    if use_ctc:
+        print(f"CTC head: {'standalone' if ctc_only else f'joint (weight {ctc_weight})'}")
     
     # Count parameters
     param_count = sum(p.numel() for p in model.parameters() if p.requires_grad)
@@ -483,10 +795,16 @@ def train_model():
             tgt_mask = (targets[:, :-1] == tokenizer.pad_idx)
             
             # Forward pass
-            logits = model(traj_features, nearest_keys, targets, src_mask, tgt_mask)
-            
-            # Compute loss
-            loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
+            memory = model.encode_trajectory(traj_features, nearest_keys, src_mask)
+            if ctc_only:
+                loss = ctc_loss(model.ctc_log_probs(memory), targets, seq_lens, tokenizer)
+            else:
+                logits = model.decode_logits(memory, targets, src_mask, tgt_mask)
+                
+                # Compute loss
+                loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
+                if ctc_weight > 0:
+                    loss = loss + ctc_weight * ctc_loss(model.ctc_log_probs(memory), targets, seq_lens, tokenizer)
             
             # Backward pass
             optimizer.zero_grad()
@@ -494,18 +812,19 @@ def train_model():
             torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
             optimizer.step()
             
-            # Track metrics
+            # Track metrics (decoder character accuracy; none for CTC-only)
             train_loss += loss.item()
-            predictions = logits.argmax(dim=-1)
-            mask = (targets[:, 1:] != tokenizer.pad_idx)
-            train_correct += ((predictions == targets[:, 1:]) & mask).sum().item()
-            train_total += mask.sum().item()
+            if not ctc_only:
+                predictions = logits.argmax(dim=-1)
+                mask = (targets[:, 1:] != tokenizer.pad_idx)
+                train_correct += ((predictions == targets[:, 1:]) & mask).sum().item()
+                train_total += mask.sum().item()
             
             # Update progress bar
             acc = train_correct / max(train_total, 1)
             pbar.set_postfix({'loss': f'{loss.item():.4f}', 'acc': f'{acc:.2%}'})
         
-        train_acc = train_correct / train_total
+        train_acc = train_correct / max(train_total, 1)
         avg_train_loss = train_loss / len(train_loader)
         
         # Validation
@@ -530,9 +849,15 @@ def train_model():
                     src_mask[i, seq_len:] = True
                 
                 # Generate with beam search
-                generated_words = model.generate_beam(
-                    traj_features, nearest_keys, tokenizer, src_mask, beam_size=5
-                )
+                if ctc_only:
+                    memory = model.encode_trajectory(traj_features, nearest_keys, src_mask)
+                    generated_words = ctc_beam_decode(
+                        model.ctc_log_probs(memory).cpu().numpy(), seq_lens.numpy(), tokenizer, beam_size=5
+                    )
+                else:
+                    generated_words = model.generate_beam(
+                        traj_features, nearest_keys, tokenizer, src_mask, beam_size=5
+                    )
                 
                 # Compute accuracy
                 for gen_word, true_word in zip(generated_words, words):
@@ -560,6 +885,8 @@ def train_model():
                 'optimizer_state_dict': optimizer.state_dict(),
                 'val_word_acc': val_word_acc,
                 'train_acc': train_acc,
+                'model_config': model_config,
+                'ctc_only': ctc_only,
             }, checkpoint_path)
             print(f"  Saved checkpoint: {checkpoint_path}")
         
@@ -575,4 +902,22 @@ def train_model():
 
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train the character-level swipe model')
+    parser.add_argument('--ctc-weight', type=float, default=0.0,
+                        help='Add a CTC head trained jointly with this loss weight')
+    parser.add_argument('--ctc-only', action='store_true',
+                        help='Train the encoder with only the CTC head (non-autoregressive)')
+    parser.add_argument('--attention-window', type=int, default=0,
+                        help='Sliding-window radius for encoder self-attention (0 = full attention)')
+    parser.add_argument('--global-tokens', type=int, default=0,
+                        help='Global tokens attending the whole trajectory (with --attention-window)')
+    add_frontend_argument(parser)
+    parser.add_argument('--key-segments', type=int, default=0, metavar='MAX_SEGMENTS',
+                        help='Encode up to this many key segments per swipe instead of points (0 = per point)')
+    args = parser.parse_args()
+    
+    train_model(ctc_weight=args.ctc_weight, ctc_only=args.ctc_only,
+                attention_window=args.attention_window, global_tokens=args.global_tokens,
+                frontend=args.frontend, key_segments=args.key_segments)
\ No newline at end of file
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Contrastive training of the swipe/word dual encoder (see swipe_retrieval.py).
+
+The swipe tower can start from a trained character-model checkpoint so the
+encoder is already tuned; its decoder weights are carried along unused.
+Validation embeds the dictionary and reports retrieval recall@1/@10 of the
+validation swipes with exact (brute-force) search.
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    create_padding_mask
+)
+from swipe_dictionary import load_language_dictionary
+from trajectory_frontend import TrajectoryFrontEnd, add_frontend_argument
+from swipe_retrieval import (
+    WordTensorizer,
+    build_dual_encoder,
+    contrastive_loss,
+    dual_encoder_config
+)
+from slim_checkpoints import load_model_checkpoint
+
+
+@torch.no_grad()
+def embed_vocabulary(model, tensorizer: WordTensorizer, words, device, batch_size: int = 1024):
+    model.eval()
+    chunks = []
+    for start in range(0, len(words), batch_size):
+        batch = tensorizer(words[start:start + batch_size])
+        chunks.append(model.embed_words(batch['tokens'].to(device), batch['key_xy'].to(device),
+                                        batch['mask'].to(device)))
+    return torch.cat(chunks)
+
+
+@torch.no_grad()
+def evaluate_recall(model, loader, vocab_emb, vocab_index, device, max_batches=None):
+    """Exact top-1/top-10 retrieval accuracy of swipes against the embedded vocabulary."""
+    model.eval()
+    hits1 = hits10 = total = 0
+    for batch_idx, batch in enumerate(loader):
+        if max_batches is not None and batch_idx >= max_batches:
+            break
+        traj_features = batch['traj_features'].to(device)
+        src_mask = create_padding_mask(batch['seq_len'], traj_features.shape[1], device)
+        emb = model.embed_swipes(traj_features, batch['nearest_keys'].to(device), src_mask)
+        top = (emb @ vocab_emb.t()).topk(10, dim=-1).indices.cpu()
+        target = torch.tensor([vocab_index.get(w, -1) for w in batch['word']])
+        hits1 += (top[:, 0] == target).sum().item()
+        hits10 += (top == target[:, None]).any(dim=1).sum().item()
+        total += len(target)
+    return hits1 / max(total, 1), hits10 / max(total, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the swipe/word dual encoder')
+    parser.add_argument('--train-data', default='data/combined_dataset/cleaned_english_swipes_train.jsonl')
+    parser.add_argument('--val-data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--init-checkpoint', default=None,
+                        help='Character-model checkpoint to initialize the swipe tower from')
+    parser.add_argument('--output-dir', default='checkpoints/dual_encoder')
+    parser.add_argument('--embed-dim', type=int, default=128)
+    parser.add_argument('--word-d-model', type=int, default=128)
+    parser.add_argument('--word-layers', type=int, default=2)
+    parser.add_argument('--vocab-size', type=int, default=50000,
+                        help='Dictionary words embedded for validation recall')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=256,
+                        help='Larger batches give more in-batch negatives')
+    parser.add_argument('--lr', type=float, default=5e-4)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--eval-batches', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    add_frontend_argument(parser)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print("="*60)
+    print("Dual-Encoder Retrieval Training")
+    print("="*60)
+    print(f"Device: {device}")
+
+    tokenizer = CharTokenizer()
+    init_state = None
+    if args.init_checkpoint:
+        init_state, info = load_model_checkpoint(args.init_checkpoint)
+        swipe_config = info.get('model_config', FULL_MODEL_CONFIG)
+        print(f"Swipe tower initialized from {args.init_checkpoint}")
+    else:
+        # Only the encoder is used; keep the unused decoder minimal
+        swipe_config = dict(FULL_MODEL_CONFIG, num_decoder_layers=1)
+    if args.frontend:
+        frontend = TrajectoryFrontEnd.from_spec(args.frontend)
+        swipe_config = dict(swipe_config, frontend=frontend.to_config(),
+                            max_seq_len=max(swipe_config.get('max_seq_len', 150), frontend.max_len))
+    else:
+        frontend = TrajectoryFrontEnd.from_config(swipe_config)
+    config = dual_encoder_config(swipe_config, args.embed_dim, args.word_d_model, args.word_layers)
+    model = build_dual_encoder(config, tokenizer.vocab_size)
+    if init_state is not None:
+        if init_state['pe'].shape != model.swipe_model.pe.shape:
+            # The sinusoidal table is rebuilt for a longer --frontend
+            init_state = dict(init_state, pe=model.swipe_model.pe)
+        model.swipe_model.load_state_dict(init_state)
+    model.to(device)
+    print(f"Parameters: {sum(p.numel() for p in model.parameters()):,}")
+
+    train_dataset = SwipeDataset(args.train_data, max_samples=args.max_samples, frontend=frontend)
+    val_dataset = SwipeDataset(args.val_data, max_samples=args.max_samples, frontend=frontend)
+    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
+                              num_workers=4, pin_memory=True, drop_last=True)
+    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False,
+                            num_workers=4, pin_memory=True)
+    tensorizer = WordTensorizer(train_dataset.keyboard, tokenizer)
+
+    vocabulary = [w for w, _ in load_language_dictionary('en', max_words=args.vocab_size)]
+    vocab_index = {w: i for i, w in enumerate(vocabulary)}
+    covered = sum(item['word'] in vocab_index for item in val_dataset.data) / max(len(val_dataset), 1)
+    print(f"Train: {len(train_dataset)}, Val: {len(val_dataset)} ({covered:.1%} in {len(vocabulary)}-word vocabulary)")
+    print("-"*60)
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=0.01)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(
+        optimizer,
+        max_lr=args.lr,
+        epochs=args.epochs,
+        steps_per_epoch=max(len(train_loader), 1),
+        pct_start=0.1,
+        anneal_strategy='cos'
+    )
+
+    best_recall = -1.0
+    for epoch in range(args.epochs):
+        model.train()
+        total_loss = 0.0
+        pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{args.epochs} [Train]')
+        for batch_idx, batch in enumerate(pbar):
+            traj_features = batch['traj_features'].to(device)
+            src_mask = create_padding_mask(batch['seq_len'], traj_features.shape[1], device)
+            words = tensorizer(batch['word'])
+
+            swipe_emb = model.embed_swipes(traj_features, batch['nearest_keys'].to(device), src_mask)
+            word_emb = model.embed_words(words['tokens'].to(device), words['key_xy'].to(device),
+                                         words['mask'].to(device))
+            loss = contrastive_loss(swipe_emb, word_emb, batch['word'], model.logit_scale)
+
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+
+            total_loss += loss.item()
+            if batch_idx % 10 == 0:
+                pbar.set_postfix({'loss': f'{loss.item():.4f}', 'scale': f'{model.logit_scale.exp().item():.1f}'})
+
+        vocab_emb = embed_vocabulary(model, tensorizer, vocabulary, device)
+        recall1, recall10 = evaluate_recall(model, val_loader, vocab_emb, vocab_index, device, args.eval_batches)
+        print(f"\nEpoch {epoch+1}/{args.epochs}")
+        print(f"  Train - Loss: {total_loss / max(len(train_loader), 1):.4f}")
+        print(f"  Val   - Recall@1: {recall1:.2%}, Recall@10: {recall10:.2%}")
+
+        if recall1 > best_recall:
+            best_recall = recall1
+            checkpoint_path = output_dir / f'dual-encoder-{epoch+1:02d}-{recall1:.3f}.ckpt'
+            torch.save({
+                'epoch': epoch,
+                'model_state_dict': model.state_dict(),
+                'dual_encoder_config': config,
+                'val_recall_at_1': recall1,
+                'val_recall_at_10': recall10,
+            }, checkpoint_path)
+            print(f"  ✓ New best model saved: {checkpoint_path}")
+
+    print(f"\nTraining complete. Best recall@1: {best_recall:.2%}")
+
+
+if __name__ == "__main__":
+    main()
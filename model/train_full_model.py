@@ -23,25 +23,94 @@ from train_character_model import (
     KeyboardGrid, 
     CharTokenizer, 
     SwipeDataset,
-    CharacterLevelSwipeModel
+    CharacterLevelSwipeModel,
+    FULL_MODEL_CONFIG,
+    build_character_model,
+    early_exit_loss
 )
+from swipe_dictionary import load_language_dictionary
+from trajectory_frontend import TrajectoryFrontEnd, add_frontend_argument
+from key_segments import KeySegmenter, SEGMENT_DIM
+from training_instrumentation import StepInstrumentation
+from batch_augmentation import BatchTrajectoryAugmenter, AugmentingCollate
+from memory_lean import enable_activation_checkpointing, accumulation_steps
+from checkpointing import (
+    AsyncCheckpointWriter,
+    ResumableRandomSampler,
+    capture_rng_state,
+    restore_rng_state,
+    find_resume_checkpoint,
+    load_resume_checkpoint
+)
+
 
+def train_full_model(metrics_log: Optional[str] = None,
+                     log_every: int = 50,
+                     profile_start: int = 0,
+                     profile_steps: int = 0,
+                     profile_dir: str = 'profiles',
+                     resume: Optional[str] = None,
+                     checkpoint_every: int = 500,
+                     seed: int = 42,
+                     augment: bool = False,
+                     exit_layers: Optional[List[int]] = None,
+                     exit_weight: float = 0.5,
+                     word_head: int = 0,
+                     word_weight: float = 0.5,
+                     attention_window: int = 0,
+                     global_tokens: int = 0,
+                     frontend: Optional[str] = None,
+                     key_segments: int = 0,
+                     batch_size: int = 64,
+                     micro_batch: int = 0,
+                     activation_checkpointing: bool = False):
+    """Train on full dataset to achieve target 70% accuracy.
 
-def train_full_model():
-    """Train on full dataset to achieve target 70% accuracy."""
+    Args:
+        metrics_log: JSONL file receiving per-step timing/throughput/memory records
+        log_every: Number of steps aggregated into each metrics record
+        profile_start: Global step at which the torch.profiler window starts
+        profile_steps: Number of steps to profile (0 disables the profiler)
+        profile_dir: Directory for exported profiler traces
+        resume: Checkpoint to resume from, or 'auto' for the run's last.ckpt
+        checkpoint_every: Steps between rolling resumable checkpoints (0 = epoch end only)
+        seed: Seed for model init, RNGs and the resumable sampler order
+        augment: Apply batched trajectory augmentation in the training collate path
+        exit_layers: Encoder depths with early exits trained jointly (e.g. [2, 4])
+        exit_weight: Weight of the intermediate exits' CE relative to the final one
+        word_head: Train a whole-word classifier over the N most frequent dictionary words (0 = off)
+        word_weight: Loss weight of the word classifier
+        attention_window: Sliding-window radius of encoder self-attention (0 = full attention)
+        global_tokens: Learned global tokens for the windowed encoder
+        frontend: Trajectory front end spec, e.g. 'arclength:64' (default: truncate at 150)
+        key_segments: Encode at most this many key segments instead of points (0 = per point)
+        batch_size: Effective batch, i.e. samples per optimizer step
+        micro_batch: Samples per forward/backward pass; gradients of batch_size / micro_batch
+            passes are accumulated per optimizer step (0 = the whole batch at once)
+        activation_checkpointing: Recompute each transformer layer in backward instead of
+            storing its activations (lower peak memory, ~30% more compute)
+    """
     
     # Configuration for full training
-    batch_size = 64  # Larger batch for better gradient estimates
+    # (batch_size 64 by default: larger batch for better gradient estimates)
+    micro_batch = micro_batch or batch_size
+    accum_steps = accumulation_steps(batch_size, micro_batch)
     learning_rate = 5e-4  # Slightly higher LR for faster convergence
     num_epochs = 50  # More epochs to reach target
     patience = 15  # Early stopping patience
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    
     print("="*60)
     print("Training Full Character-Level Swipe Model")
     print("="*60)
     print(f"Device: {device}")
     print(f"Target: 70% word accuracy (matching original model)")
+    if accum_steps > 1:
+        print(f"Batch: {micro_batch} x {accum_steps} accumulated = {micro_batch * accum_steps} per step")
     print("-"*60)
     
     # Use full combined dataset
@@ -57,9 +126,15 @@ def train_full_model():
     print(f"Loading datasets...")
     
     # Load full datasets - no max_samples limit
-    train_dataset = SwipeDataset(train_data_path)  # Full 68k samples
-    val_dataset = SwipeDataset(val_data_path)      # Full validation set
-    test_dataset = SwipeDataset(test_data_path)    # Test set for final eval
+    trajectory_frontend = TrajectoryFrontEnd.from_spec(frontend)
+    print(f"Trajectory front end: {trajectory_frontend.spec}")
+    segmenter = KeySegmenter(key_segments) if key_segments else None
+    if segmenter and augment:
+        raise ValueError("Batch augmentation works on trajectory points, not key segments")
+    inputs = dict(frontend=trajectory_frontend, segmenter=segmenter)
+    train_dataset = SwipeDataset(train_data_path, **inputs)  # Full 68k samples
+    val_dataset = SwipeDataset(val_data_path, **inputs)      # Full validation set
+    test_dataset = SwipeDataset(test_data_path, **inputs)    # Test set for final eval
     
     print(f"Train: {len(train_dataset)} samples")
     print(f"Val: {len(val_dataset)} samples")
@@ -67,41 +142,70 @@ def train_full_model():
     print("-"*60)
     
     # Create dataloaders with num_workers for faster loading
+    # The sampler order depends only on (seed, epoch) so a run can resume mid-epoch
+    train_sampler = ResumableRandomSampler(train_dataset, seed=seed)
+    train_collate = None
+    if augment:
+        # Augment whole padded batches in the loader workers, not per sample
+        train_collate = AugmentingCollate(
+            BatchTrajectoryAugmenter(train_dataset.keyboard, train_dataset.tokenizer)
+        )
+        print("Batch augmentation: enabled")
     train_loader = DataLoader(
         train_dataset, 
-        batch_size=batch_size, 
-        shuffle=True,
+        batch_size=micro_batch, 
+        sampler=train_sampler,
+        collate_fn=train_collate,
         num_workers=4,
         pin_memory=True
     )
     val_loader = DataLoader(
         val_dataset, 
-        batch_size=batch_size, 
+        batch_size=micro_batch, 
         shuffle=False,
         num_workers=4,
         pin_memory=True
     )
     test_loader = DataLoader(
         test_dataset,
-        batch_size=batch_size,
+        batch_size=micro_batch,
         shuffle=False,
         num_workers=4,
         pin_memory=True
     )
     
     # Create model with optimal architecture
+    # (d_model 256, 6 encoder / 4 decoder layers, 1024 feedforward)
     tokenizer = CharTokenizer()
-    model = CharacterLevelSwipeModel(
-        traj_dim=6,
-        d_model=256,  # Larger model for better capacity
-        nhead=8,
-        num_encoder_layers=6,  # Deeper encoder
-        num_decoder_layers=4,  # Deeper decoder
-        dim_feedforward=1024,  # Larger feedforward
-        dropout=0.1,
-        char_vocab_size=tokenizer.vocab_size,
-        kb_vocab_size=tokenizer.vocab_size
-    ).to(device)
+    model_config = dict(FULL_MODEL_CONFIG, frontend=trajectory_frontend.to_config())
+    if train_dataset.max_seq_len > 150:
+        model_config['max_seq_len'] = train_dataset.max_seq_len
+    if segmenter:
+        model_config['traj_dim'] = SEGMENT_DIM
+        model_config['key_segments'] = segmenter.to_config()
+        print(f"Key segments: up to {segmenter.max_segments} per swipe")
+    if exit_layers:
+        model_config['exit_layers'] = list(exit_layers)
+    if word_head:
+        model_config['word_vocab'] = [w for w, _ in load_language_dictionary('en', max_words=word_head)]
+    if attention_window:
+        model_config['attention_window'] = attention_window
+        model_config['global_tokens'] = global_tokens
+    model = build_character_model(model_config, tokenizer.vocab_size, dropout=0.1).to(device)
+    if exit_layers:
+        print(f"Early exits after encoder layers: {model.exit_layers}")
+    if attention_window:
+        print(f"Encoder attention: window ±{attention_window}, {global_tokens} global tokens")
+    if activation_checkpointing:
+        # Layer internals are recomputed in backward; parameter names are unchanged
+        layers = enable_activation_checkpointing(model)
+        print(f"Activation checkpointing: {layers} transformer layers")
+    if word_head:
+        # Words outside the vocabulary map to the extra "other" class
+        word_index = {w: i for i, w in enumerate(model.word_vocab)}
+        other_class = len(model.word_vocab)
+        covered = sum(item['word'] in word_index for item in train_dataset.data) / max(len(train_dataset), 1)
+        print(f"Word classifier: top {len(model.word_vocab)} words ({covered:.1%} of training swipes)")
     
     # Count parameters
     param_count = sum(p.numel() for p in model.parameters() if p.requires_grad)
@@ -119,7 +223,7 @@ def train_full_model():
         optimizer,
         max_lr=learning_rate,
         epochs=num_epochs,
-        steps_per_epoch=len(train_loader),
+        steps_per_epoch=math.ceil(len(train_loader) / accum_steps),
         pct_start=warmup_epochs/num_epochs,
         anneal_strategy='cos'
     )
@@ -129,19 +233,98 @@ def train_full_model():
     patience_counter = 0
     checkpoint_dir = Path('checkpoints/full_character_model')
     checkpoint_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_writer = AsyncCheckpointWriter(checkpoint_dir)
+    
+    # Restore full training state when resuming
+    start_epoch = 0
+    global_step = 0
+    epoch_progress = None
+    resume_path = find_resume_checkpoint(checkpoint_dir) if resume == 'auto' else resume
+    if resume_path:
+        state = load_resume_checkpoint(resume_path)
+        model.load_state_dict(state['model_state_dict'])
+        optimizer.load_state_dict(state['optimizer_state_dict'])
+        scheduler.load_state_dict(state['scheduler_state_dict'])
+        best_val_acc = state['best_val_acc']
+        patience_counter = state['patience_counter']
+        global_step = state['global_step']
+        train_sampler.load_state_dict(state['sampler_state'])
+        start_epoch = state['sampler_state']['epoch']
+        epoch_progress = state['epoch_progress']
+        restore_rng_state(state['rng_state'])
+        print(f"Resumed at epoch {start_epoch+1}, sample {train_sampler.start_index} (step {global_step})")
+    elif resume == 'auto':
+        print("No resumable checkpoint found, starting from scratch")
+    
+    def training_state(epoch, samples_done, progress):
+        """Everything needed to continue this run from the current step."""
+        return {
+            'epoch': epoch,
+            'model_state_dict': model.state_dict(),
+            'optimizer_state_dict': optimizer.state_dict(),
+            'scheduler_state_dict': scheduler.state_dict(),
+            'sampler_state': {'seed': seed, 'epoch': epoch, 'start_index': samples_done},
+            'rng_state': capture_rng_state(),
+            'epoch_progress': progress,
+            'global_step': global_step,
+            'best_val_acc': best_val_acc,
+            'patience_counter': patience_counter,
+        }
+    
+    # Step timing, throughput and memory instrumentation
+    instrumentation = StepInstrumentation(
+        log_path=metrics_log,
+        device=device,
+        log_every=log_every,
+        profile_start=profile_start,
+        profile_steps=profile_steps,
+        profile_dir=profile_dir,
+        run_config={
+            'batch_size': batch_size,
+            'micro_batch': micro_batch,
+            'accumulation_steps': accum_steps,
+            'activation_checkpointing': activation_checkpointing,
+            'learning_rate': learning_rate,
+            'num_epochs': num_epochs,
+            'param_count': param_count,
+            'device': str(device),
+        }
+    )
+    # Instrumentation counts forward/backward passes, not optimizer steps
+    instrumentation.global_step = global_step * accum_steps
     
     print("Starting training...")
     print("="*60)
     
-    for epoch in range(num_epochs):
+    for epoch in range(start_epoch, num_epochs):
         # Training phase
         model.train()
         train_loss = 0
         train_correct = 0
         train_total = 0
+        train_batches = 0
+        samples_done = 0
         
+        if epoch_progress is not None:
+            # Continue the interrupted epoch with its running metrics
+            train_loss = epoch_progress['train_loss']
+            train_correct = epoch_progress['train_correct']
+            train_total = epoch_progress['train_total']
+            train_batches = epoch_progress['train_batches']
+            samples_done = train_sampler.start_index
+            epoch_progress = None
+        else:
+            train_sampler.set_epoch(epoch)
+        
+        instrumentation.start_epoch(epoch)
         pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{num_epochs} [Train]')
+        num_batches = len(train_loader)
         for batch_idx, batch in enumerate(pbar):
+            # Position in the gradient accumulation cycle (the epoch's last cycle may be short);
+            # resumable checkpoints are only written at cycle boundaries
+            cycle_index = batch_idx % accum_steps
+            cycle_size = min(accum_steps, num_batches - (batch_idx - cycle_index))
+            last_in_cycle = cycle_index == cycle_size - 1
             traj_features = batch['traj_features'].to(device)
             nearest_keys = batch['nearest_keys'].to(device)
             targets = batch['target'].to(device)
@@ -153,38 +336,83 @@ def train_full_model():
                 src_mask[i, seq_len:] = True
             
             tgt_mask = (targets[:, :-1] == tokenizer.pad_idx)
+            instrumentation.data_ready()
             
-            # Forward pass
-            logits = model(traj_features, nearest_keys, targets, src_mask, tgt_mask)
+            with instrumentation.phase('forward'):
+                # Forward pass
+                if word_head:
+                    word_targets = torch.tensor(
+                        [word_index.get(w, other_class) for w in batch['word']], device=device
+                    )
+                if exit_layers:
+                    exits = model.encode_with_exits(traj_features, nearest_keys, src_mask)
+                    exit_logits = [model.decode_logits(memory, targets, src_mask, tgt_mask) for memory, _ in exits]
+                    exit_confidences = [confidence for _, confidence in exits[:-1]]
+                    logits = exit_logits[-1]
+                    loss = early_exit_loss(exit_logits, exit_confidences, targets[:, 1:],
+                                           tokenizer.pad_idx, criterion, exit_weight)
+                    if word_head:
+                        # The word head reads the full-depth memory
+                        loss = loss + word_weight * F.cross_entropy(model.word_logits(exits[-1][0], src_mask),
+                                                                    word_targets)
+                elif word_head:
+                    memory = model.encode_trajectory(traj_features, nearest_keys, src_mask)
+                    logits = model.decode_logits(memory, targets, src_mask, tgt_mask)
+                    loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
+                    loss = loss + word_weight * F.cross_entropy(model.word_logits(memory, src_mask), word_targets)
+                else:
+                    logits = model(traj_features, nearest_keys, targets, src_mask, tgt_mask)
+                    
+                    # Compute loss
+                    loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
             
-            # Compute loss
-            loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
+            with instrumentation.phase('backward'):
+                # Backward pass (accumulating into the cycle's gradients)
+                if cycle_index == 0:
+                    optimizer.zero_grad()
+                (loss / cycle_size if cycle_size > 1 else loss).backward()
             
-            # Backward pass
-            optimizer.zero_grad()
-            loss.backward()
-            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
-            optimizer.step()
-            scheduler.step()
+            if last_in_cycle:
+                with instrumentation.phase('step'):
+                    torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+                    optimizer.step()
+                    scheduler.step()
             
             # Track metrics
-            train_loss += loss.item()
+            loss_value = loss.item()
+            train_loss += loss_value
             predictions = logits.argmax(dim=-1)
             mask = (targets[:, 1:] != tokenizer.pad_idx)
             train_correct += ((predictions == targets[:, 1:]) & mask).sum().item()
             train_total += mask.sum().item()
+            instrumentation.end_step(traj_features.shape[0], loss=loss_value)
+            train_batches += 1
+            samples_done += traj_features.shape[0]
+            if last_in_cycle:
+                global_step += 1
+            
+            # Rolling resumable checkpoint, serialized off the training thread
+            if last_in_cycle and checkpoint_every and global_step % checkpoint_every == 0:
+                checkpoint_writer.save(training_state(epoch, samples_done, {
+                    'train_loss': train_loss,
+                    'train_correct': train_correct,
+                    'train_total': train_total,
+                    'train_batches': train_batches,
+                }), 'last.ckpt')
             
             # Update progress
             if batch_idx % 10 == 0:
                 acc = train_correct / max(train_total, 1)
                 pbar.set_postfix({
-                    'loss': f'{loss.item():.4f}', 
+                    'loss': f'{loss_value:.4f}', 
                     'acc': f'{acc:.2%}',
-                    'lr': f'{scheduler.get_last_lr()[0]:.2e}'
+                    'lr': f'{scheduler.get_last_lr()[0]:.2e}',
+                    'sps': f'{instrumentation.samples_per_sec:.0f}'
                 })
         
         train_acc = train_correct / train_total
-        avg_train_loss = train_loss / len(train_loader)
+        avg_train_loss = train_loss / max(train_batches, 1)
+        epoch_stats = instrumentation.end_epoch()
         
         # Validation phase
         model.eval()
@@ -226,6 +454,7 @@ def train_full_model():
         print(f"\nEpoch {epoch+1}/{num_epochs}")
         print(f"  Train - Loss: {avg_train_loss:.4f}, Char Acc: {train_acc:.2%}")
         print(f"  Val   - Word Acc: {val_word_acc:.2%}")
+        print(f"  Time  - {instrumentation.format_summary(epoch_stats)}")
         
         # Save checkpoint if improved
         if val_word_acc > best_val_acc:
@@ -233,14 +462,15 @@ def train_full_model():
             patience_counter = 0
             
             checkpoint_path = checkpoint_dir / f'full-model-{epoch+1:02d}-{val_word_acc:.3f}.ckpt'
-            torch.save({
+            checkpoint_writer.save({
                 'epoch': epoch,
                 'model_state_dict': model.state_dict(),
                 'optimizer_state_dict': optimizer.state_dict(),
                 'scheduler_state_dict': scheduler.state_dict(),
                 'val_word_acc': val_word_acc,
                 'train_acc': train_acc,
-            }, checkpoint_path)
+                'model_config': model_config,
+            }, checkpoint_path.name)
             print(f"  ✓ New best model saved: {checkpoint_path}")
             
             # Check if target reached
@@ -285,8 +515,15 @@ def train_full_model():
                 print(f"Best validation accuracy: {best_val_acc:.2%}")
                 break
         
+        # Epoch boundary: the next run resumes at the start of the following epoch
+        train_sampler.set_epoch(epoch + 1)
+        checkpoint_writer.save(training_state(epoch + 1, 0, None), 'last.ckpt')
+        
         print("-"*60)
     
+    checkpoint_writer.close()
+    instrumentation.close()
+    
     if best_val_acc < 0.70:
         print(f"\nTraining complete. Best validation accuracy: {best_val_acc:.2%}")
         print("Consider:")
@@ -296,4 +533,69 @@ def train_full_model():
 
 
 if __name__ == "__main__":
-    train_full_model()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Train the full character-level swipe model')
+    parser.add_argument('--metrics-log', default=None,
+                        help='JSONL file for per-step timing, throughput and memory metrics')
+    parser.add_argument('--log-every', type=int, default=50,
+                        help='Steps aggregated into each metrics record')
+    parser.add_argument('--profile-start', type=int, default=0,
+                        help='Global step at which to start the torch.profiler window')
+    parser.add_argument('--profile-steps', type=int, default=0,
+                        help='Number of steps to capture with torch.profiler (0 = off)')
+    parser.add_argument('--profile-dir', default='profiles',
+                        help='Directory for exported profiler traces')
+    parser.add_argument('--resume', nargs='?', const='auto', default=None,
+                        help="Resume from a checkpoint (no value = the run's last.ckpt)")
+    parser.add_argument('--checkpoint-every', type=int, default=500,
+                        help='Steps between resumable checkpoints (0 = only at epoch end)')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for initialization and data order')
+    parser.add_argument('--augment', action='store_true',
+                        help='Enable batched on-the-fly trajectory augmentation')
+    parser.add_argument('--exit-layers', default=None,
+                        help='Comma-separated encoder depths for early exits, e.g. 2,4')
+    parser.add_argument('--exit-weight', type=float, default=0.5,
+                        help='Loss weight of the intermediate exits')
+    parser.add_argument('--word-head', type=int, default=0,
+                        help='Train a word classifier over the N most frequent dictionary words')
+    parser.add_argument('--word-weight', type=float, default=0.5,
+                        help='Loss weight of the word classifier')
+    parser.add_argument('--attention-window', type=int, default=0,
+                        help='Sliding-window radius for encoder self-attention (0 = full attention)')
+    parser.add_argument('--global-tokens', type=int, default=0,
+                        help='Global tokens attending the whole trajectory (with --attention-window)')
+    add_frontend_argument(parser)
+    parser.add_argument('--key-segments', type=int, default=0, metavar='MAX_SEGMENTS',
+                        help='Encode up to this many key segments per swipe instead of points (0 = per point)')
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help='Effective batch size (samples per optimizer step)')
+    parser.add_argument('--micro-batch', type=int, default=0,
+                        help='Samples per forward/backward pass, accumulated to --batch-size (0 = no accumulation)')
+    parser.add_argument('--activation-checkpointing', action='store_true',
+                        help='Recompute transformer layers in backward to cut activation memory')
+    args = parser.parse_args()
+    
+    train_full_model(
+        metrics_log=args.metrics_log,
+        log_every=args.log_every,
+        profile_start=args.profile_start,
+        profile_steps=args.profile_steps,
+        profile_dir=args.profile_dir,
+        resume=args.resume,
+        checkpoint_every=args.checkpoint_every,
+        seed=args.seed,
+        augment=args.augment,
+        exit_layers=[int(n) for n in args.exit_layers.split(',')] if args.exit_layers else None,
+        exit_weight=args.exit_weight,
+        word_head=args.word_head,
+        word_weight=args.word_weight,
+        attention_window=args.attention_window,
+        global_tokens=args.global_tokens,
+        frontend=args.frontend,
+        key_segments=args.key_segments,
+        batch_size=args.batch_size,
+        micro_batch=args.micro_batch,
+        activation_checkpointing=args.activation_checkpointing
+    )
\ No newline at end of file
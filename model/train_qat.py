@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Quantization-aware fine-tuning and INT8 QDQ export (see quantization_aware.py).
+
+Starting from a trained checkpoint, the model gets fake-quantized linears
+and embeddings. Observers first calibrate on a few batches, then the model
+is fine-tuned with fake quantization in the loop. The observers are frozen
+for the last part of fine-tuning so the weights settle on the final scales.
+
+The result is exported as QDQ ONNX with int8 weights. It is checked against
+the PyTorch fake-quant model and against the int8 kernels ORT actually
+selects, and compared with the FP32 export and with the dynamically
+quantized export (quantize_models.py) on size and latency. Word accuracy of
+the dynamic variant is measured with PyTorch's dynamic quantization of the
+same linears, a close proxy for ORT's.
+"""
+
+import copy
+import json
+import random
+import argparse
+import tempfile
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    FULL_MODEL_CONFIG,
+    build_character_model,
+    create_padding_mask,
+    ctc_loss,
+    early_exit_loss,
+    evaluate_word_accuracy
+)
+from export_character_model import export_to_onnx
+from onnx_benchmark import create_session, measure_ort_latency, format_latency_table
+from quantization_aware import prepare_qat, freeze_observers, fold_weight_quantization, qat_spec
+from quantize_models import quantize_model
+from slim_checkpoints import load_model_checkpoint
+from structured_pruning import apply_pruning_spec, make_prunable
+from trajectory_frontend import TrajectoryFrontEnd
+from key_segments import KeySegmenter
+
+
+# ORT kernels that execute quantized matrix products
+INT8_KERNELS = {'QLinearMatMul', 'MatMulInteger', 'MatMulIntegerToFloat', 'DynamicQuantizeMatMul', 'QGemm'}
+
+
+def int8_kernel_counts(onnx_path: str) -> Counter:
+    """Op types of the graph ORT actually runs that are INT8 kernels."""
+    with tempfile.TemporaryDirectory() as tmp:
+        options = ort.SessionOptions()
+        options.optimized_model_filepath = str(Path(tmp) / 'optimized.onnx')
+        options.log_severity_level = 3  # the optimized graph is only inspected, never deployed
+        ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        graph = onnx.load(options.optimized_model_filepath).graph
+    return Counter(node.op_type for node in graph.node if node.op_type in INT8_KERNELS)
+
+
+def qat_loss(model, batch, criterion, tokenizer, device, aux_weight: float = 0.5):
+    """
+    Teacher-forced decoder loss plus the loss of every auxiliary head.
+
+    A head's observers only see data when the head runs, and an observer
+    that never ran has no valid scale, so the CTC, word and early-exit
+    heads all take part in calibration and fine-tuning.
+    """
+    traj_features = batch['traj_features'].to(device)
+    nearest_keys = batch['nearest_keys'].to(device)
+    targets = batch['target'].to(device)
+    src_mask = create_padding_mask(batch['seq_len'], traj_features.shape[1], device)
+    tgt_mask = (targets[:, :-1] == tokenizer.pad_idx)
+    if model.exit_layers:
+        exits = model.encode_with_exits(traj_features, nearest_keys, src_mask)
+        memory = exits[-1][0]
+        exit_logits = [model.decode_logits(m, targets, src_mask, tgt_mask) for m, _ in exits]
+        loss = early_exit_loss(exit_logits, [confidence for _, confidence in exits[:-1]], targets[:, 1:],
+                               tokenizer.pad_idx, criterion, aux_weight)
+    else:
+        memory = model.encode_trajectory(traj_features, nearest_keys, src_mask)
+        logits = model.decode_logits(memory, targets, src_mask, tgt_mask)
+        loss = criterion(logits.reshape(-1, logits.shape[-1]), targets[:, 1:].reshape(-1))
+    if model.ctc_proj is not None:
+        loss = loss + aux_weight * ctc_loss(model.ctc_log_probs(memory), targets, batch['seq_len'], tokenizer)
+    if model.word_head is not None:
+        word_index = {w: i for i, w in enumerate(model.word_vocab)}
+        word_targets = torch.tensor([word_index.get(w, len(model.word_vocab)) for w in batch['word']],
+                                    device=device)
+        loss = loss + aux_weight * F.cross_entropy(model.word_logits(memory, src_mask), word_targets)
+    return loss
+
+
+def encoder_parity(model, encoder_path: str, loader, batches: int = 4) -> float:
+    """Max |ORT - PyTorch| of the encoder output over real (unpadded) positions."""
+    session = create_session(encoder_path)
+    max_diff = 0.0
+    model.eval()
+    with torch.no_grad():
+        for batch in islice(loader, batches):
+            for i in range(len(batch['word'])):
+                traj = batch['traj_features'][i:i + 1]
+                keys = batch['nearest_keys'][i:i + 1]
+                mask = torch.arange(traj.shape[1])[None, :] >= batch['seq_len'][i]
+                expected = model.encode_trajectory(traj, keys, mask).numpy()
+                actual = session.run(None, {'trajectory_features': traj.numpy(), 'nearest_keys': keys.numpy(),
+                                            'src_mask': mask.numpy()})[0]
+                valid = ~mask[0].numpy()
+                max_diff = max(max_diff, float(np.abs(actual[:, valid] - expected[:, valid]).max()))
+    return max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantization-aware fine-tuning with INT8 QDQ export')
+    parser.add_argument('--checkpoint', required=True, help='Trained model checkpoint (.ckpt)')
+    parser.add_argument('--train-data', default='data/combined_dataset/cleaned_english_swipes_train.jsonl')
+    parser.add_argument('--val-data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--output-dir', default='checkpoints/qat_character_model')
+    parser.add_argument('--export-dir', default='deployment_package/qat',
+                        help='Where the QDQ encoder/decoder ONNX files are written')
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--lr', type=float, default=2e-5)
+    parser.add_argument('--calibration-batches', type=int, default=32,
+                        help='Observer-only batches before fine-tuning')
+    parser.add_argument('--freeze-observers', type=float, default=0.7,
+                        help='Fraction of fine-tuning steps after which ranges are frozen')
+    parser.add_argument('--aux-weight', type=float, default=0.5,
+                        help='Loss weight of the CTC, word and early-exit heads')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--eval-batches', type=int, default=None,
+                        help='Limit validation to this many batches (default: full set)')
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    export_dir = Path(args.export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+
+    print("="*60)
+    print("Quantization-Aware Training (INT8)")
+    print("="*60)
+    print(f"Device: {device}")
+
+    tokenizer = CharTokenizer()
+    state_dict, info = load_model_checkpoint(args.checkpoint)
+    model_config = info.get('model_config', FULL_MODEL_CONFIG)
+    model = build_character_model(model_config, tokenizer.vocab_size, dropout=0.1)
+    apply_pruning_spec(model, info.get('pruning'))
+    model.load_state_dict(state_dict)
+    model.eval()
+
+    frontend = TrajectoryFrontEnd.from_config(model_config)
+    segmenter = KeySegmenter.from_config(model_config)
+    seq_len = segmenter.max_segments if segmenter else frontend.max_len
+    train_dataset = SwipeDataset(args.train_data, max_samples=args.max_samples,
+                                 frontend=frontend, segmenter=segmenter)
+    val_dataset = SwipeDataset(args.val_data, max_samples=args.max_samples,
+                               frontend=frontend, segmenter=segmenter)
+    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True,
+                              num_workers=4, pin_memory=True)
+    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False,
+                            num_workers=4, pin_memory=True)
+    print(f"Train: {len(train_dataset)} samples, Val: {len(val_dataset)} samples")
+    print("-"*60)
+
+    rows = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # FP32 baseline and post-training dynamic quantization of the same export
+        fp32_acc = evaluate_word_accuracy(model.to(device), val_loader, tokenizer, device,
+                                          max_batches=args.eval_batches, desc='Val [fp32]')
+        model.cpu()
+        fp32_info = export_to_onnx(model, Path(tmp), seq_len=seq_len)
+        ptq_paths = {}
+        for key in ('encoder_path', 'decoder_path'):
+            ptq_paths[key] = str(Path(tmp) / Path(fp32_info[key]).name.replace('.onnx', '_quant.onnx'))
+            quantize_model(Path(fp32_info[key]), Path(ptq_paths[key]))
+        ptq_model = torch.ao.quantization.quantize_dynamic(make_prunable(copy.deepcopy(model)),
+                                                           {nn.Linear}, dtype=torch.qint8)
+        ptq_acc = evaluate_word_accuracy(ptq_model, val_loader, tokenizer, torch.device('cpu'),
+                                         max_batches=args.eval_batches, desc='Val [ptq dynamic]')
+        for name, paths, acc in (('fp32', fp32_info, fp32_acc), ('ptq_dynamic', ptq_paths, ptq_acc)):
+            rows[name] = {
+                'word_acc': acc,
+                'latency': measure_ort_latency(paths['encoder_path'], paths['decoder_path'], seq_len=seq_len,
+                                               runs=args.bench_runs, threads=args.bench_threads),
+                'onnx_kb': sum(Path(paths[k]).stat().st_size for k in ('encoder_path', 'decoder_path')) / 1024,
+            }
+
+    # Fake quantization in the loop
+    model = prepare_qat(model).to(device)
+    criterion = nn.CrossEntropyLoss(ignore_index=tokenizer.pad_idx)
+    print(f"\nCalibrating observers on {args.calibration_batches} batches...")
+    model.eval()
+    with torch.no_grad():
+        for batch in islice(train_loader, args.calibration_batches):
+            qat_loss(model, batch, criterion, tokenizer, device, args.aux_weight)
+
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.lr, weight_decay=0.01)
+    freeze_step = int(args.steps * args.freeze_observers)
+    model.train()
+    step = 0
+    pbar = tqdm(total=args.steps, desc='QAT')
+    while step < args.steps:
+        for batch in train_loader:
+            if step == freeze_step:
+                freeze_observers(model)
+            loss = qat_loss(model, batch, criterion, tokenizer, device, args.aux_weight)
+            optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            step += 1
+            pbar.update(1)
+            pbar.set_postfix({'loss': f'{loss.item():.4f}'})
+            if step >= args.steps:
+                break
+    pbar.close()
+    freeze_observers(model)
+
+    qat_acc = evaluate_word_accuracy(model, val_loader, tokenizer, device,
+                                     max_batches=args.eval_batches, desc='Val [qat]')
+    checkpoint_path = output_dir / 'qat-best.ckpt'
+    torch.save({
+        'model_state_dict': model.state_dict(),
+        'model_config': model_config,
+        'pruning': info.get('pruning'),
+        'quantization': qat_spec(),
+        'val_word_acc': qat_acc,
+        'source_checkpoint': str(args.checkpoint),
+    }, checkpoint_path)
+    print(f"✓ QAT checkpoint saved: {checkpoint_path}")
+
+    model.cpu().eval()
+    qat_info = export_to_onnx(model, export_dir, seq_len=seq_len)
+    for key in ('encoder_path', 'decoder_path'):
+        folded = fold_weight_quantization(Path(qat_info[key]))
+        print(f"✓ {Path(qat_info[key]).name}: {folded['folded_weights']} weights stored as int8")
+    kernels = {key: dict(int8_kernel_counts(qat_info[key])) for key in ('encoder_path', 'decoder_path')}
+    max_diff = encoder_parity(model, qat_info['encoder_path'], val_loader)
+    print(f"  INT8 kernels selected by ORT: {kernels}")
+    print(f"  Encoder ORT vs fake-quant PyTorch: max diff {max_diff:.2e}")
+    rows['qat_int8'] = {
+        'word_acc': qat_acc,
+        'latency': measure_ort_latency(qat_info['encoder_path'], qat_info['decoder_path'], seq_len=seq_len,
+                                       runs=args.bench_runs, threads=args.bench_threads),
+        'onnx_kb': sum(Path(qat_info[k]).stat().st_size for k in ('encoder_path', 'decoder_path')) / 1024,
+        'int8_kernels': kernels,
+        'encoder_max_diff': max_diff,
+    }
+
+    table = [{
+        'model': name,
+        'word_acc': f"{r['word_acc']:.2%}",
+        'enc_p50_ms': f"{r['latency']['encoder']['p50_ms']:.2f}",
+        'dec_step_p50_ms': f"{r['latency']['decoder_step']['p50_ms']:.2f}",
+        'total_ms': f"{r['latency']['total_ms']:.1f}",
+        'onnx_kb': f"{r['onnx_kb']:.0f}",
+    } for name, r in rows.items()]
+    print("\n" + format_latency_table(table, list(table[0].keys())))
+    print(f"QAT vs FP32 accuracy: {qat_acc - fp32_acc:+.2%} (dynamic PTQ: {ptq_acc - fp32_acc:+.2%})")
+
+    report_path = output_dir / 'qat_report.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'source_checkpoint': str(args.checkpoint),
+            'steps': args.steps,
+            'freeze_observers_step': freeze_step,
+            'export_dir': str(export_dir),
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
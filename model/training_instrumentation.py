@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Per-step instrumentation for the swipe model training loops.
+Times data-wait, forward, backward and optimizer step for every iteration,
+tracks throughput and peak memory, and can wrap a window of steps in
+torch.profiler. Metrics are appended to a JSONL log so runs can be plotted
+against each other.
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import torch
+
+
+PHASES = ('data_wait', 'forward', 'backward', 'step')
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class StepInstrumentation:
+    """
+    Collects timing and memory metrics around each training step.
+
+    Usage inside a training loop:
+
+        instr.start_epoch(epoch)
+        for batch in loader:
+            ...move batch to device...
+            instr.data_ready()
+            with instr.phase('forward'):
+                ...
+            with instr.phase('backward'):
+                ...
+            with instr.phase('step'):
+                ...
+            instr.end_step(batch_size, loss=loss.item())
+        instr.end_epoch()
+    """
+
+    def __init__(self,
+                 log_path: Optional[str] = None,
+                 device: Optional[torch.device] = None,
+                 log_every: int = 50,
+                 profile_start: int = 0,
+                 profile_steps: int = 0,
+                 profile_dir: Optional[str] = None,
+                 run_config: Optional[Dict] = None):
+        self.device = device or torch.device('cpu')
+        self.sync_cuda = self.device.type == 'cuda'
+        self.log_every = max(1, log_every)
+        self.run_id = time.strftime('%Y%m%d-%H%M%S')
+
+        self.log_file = None
+        if log_path:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            self.log_file = open(log_path, 'a')
+            self._write({'type': 'run', 'config': run_config or {}, 'pid': os.getpid()})
+
+        # Optional torch.profiler window: skip profile_start steps, warm up for
+        # one step, then record profile_steps steps and export a Chrome trace
+        self.profiler = None
+        if profile_steps > 0:
+            self.profile_dir = Path(profile_dir or 'profiles')
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if self.sync_cuda:
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self.profiler = torch.profiler.profile(
+                activities=activities,
+                schedule=torch.profiler.schedule(
+                    skip_first=profile_start, wait=0, warmup=1, active=profile_steps, repeat=1
+                ),
+                on_trace_ready=self._export_trace,
+                record_shapes=True,
+                profile_memory=True,
+            )
+            self.profiler.start()
+
+        self.global_step = 0
+        self.epoch = 0
+        self._reset_window()
+        self._reset_epoch_totals()
+        self._last_mark = time.perf_counter()
+
+    # ------------------------------------------------------------------
+    # Loop hooks
+    # ------------------------------------------------------------------
+
+    def start_epoch(self, epoch: int):
+        """Reset per-epoch totals; the first data wait is measured from here."""
+        self.epoch = epoch
+        self._reset_window()
+        self._reset_epoch_totals()
+        self._last_mark = time.perf_counter()
+
+    def data_ready(self):
+        """Close the data-wait phase (time since the previous step finished)."""
+        self._sync()
+        now = time.perf_counter()
+        self._window['data_wait'] += now - self._last_mark
+        self._last_mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time one of the forward/backward/step phases."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._sync()
+            end = time.perf_counter()
+            self._window[name] += end - start
+            self._last_mark = end
+
+    def end_step(self, batch_size: int, loss: Optional[float] = None):
+        """Account for a finished step and flush a log record every log_every steps."""
+        self._last_mark = time.perf_counter()
+        self.global_step += 1
+        self._window_steps += 1
+        self._window_samples += batch_size
+        if loss is not None:
+            self._window_loss += loss
+
+        if self.profiler is not None:
+            self.profiler.step()
+
+        if self._window_steps >= self.log_every:
+            self._flush_window()
+
+    def end_epoch(self) -> Dict:
+        """Flush pending steps and return (and log) the epoch summary."""
+        if self._window_steps:
+            self._flush_window()
+
+        totals = self._epoch_totals
+        busy = sum(totals[p] for p in PHASES)
+        summary = {
+            'type': 'epoch',
+            'epoch': self.epoch,
+            'steps': totals['steps'],
+            'samples': totals['samples'],
+            'seconds': busy,
+            'samples_per_sec': totals['samples'] / busy if busy > 0 else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        for p in PHASES:
+            summary[f'{p}_fraction'] = totals[p] / busy if busy > 0 else 0.0
+        if self.sync_cuda:
+            summary['cuda_peak_mb'] = torch.cuda.max_memory_allocated(self.device) / (1024 * 1024)
+        self._write(summary)
+        return summary
+
+    def format_summary(self, summary: Dict) -> str:
+        """One-line human readable rendering of an epoch summary."""
+        split = ' | '.join(f"{p} {summary[f'{p}_fraction']:.0%}" for p in PHASES)
+        line = f"{split} | {summary['samples_per_sec']:.0f} samples/s | peak RSS {summary['peak_rss_mb']:.0f} MB"
+        if 'cuda_peak_mb' in summary:
+            line += f" | CUDA peak {summary['cuda_peak_mb']:.0f} MB"
+        return line
+
+    @property
+    def samples_per_sec(self) -> float:
+        """Throughput of the current epoch so far."""
+        totals = self._epoch_totals
+        busy = sum(totals[p] for p in PHASES) + sum(self._window[p] for p in PHASES)
+        samples = totals['samples'] + self._window_samples
+        return samples / busy if busy > 0 else 0.0
+
+    def close(self):
+        """Stop the profiler (if still running) and close the log."""
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler = None
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _sync(self):
+        if self.sync_cuda:
+            torch.cuda.synchronize(self.device)
+
+    def _reset_window(self):
+        self._window = {p: 0.0 for p in PHASES}
+        self._window_steps = 0
+        self._window_samples = 0
+        self._window_loss = 0.0
+
+    def _reset_epoch_totals(self):
+        self._epoch_totals = {p: 0.0 for p in PHASES}
+        self._epoch_totals['steps'] = 0
+        self._epoch_totals['samples'] = 0
+
+    def _flush_window(self):
+        steps = self._window_steps
+        busy = sum(self._window[p] for p in PHASES)
+        record = {
+            'type': 'steps',
+            'epoch': self.epoch,
+            'global_step': self.global_step,
+            'steps': steps,
+            'samples': self._window_samples,
+            'samples_per_sec': self._window_samples / busy if busy > 0 else 0.0,
+            'loss': self._window_loss / steps,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        for p in PHASES:
+            record[f'{p}_ms'] = self._window[p] / steps * 1000
+        if self.sync_cuda:
+            record['cuda_peak_mb'] = torch.cuda.max_memory_allocated(self.device) / (1024 * 1024)
+        self._write(record)
+
+        for p in PHASES:
+            self._epoch_totals[p] += self._window[p]
+        self._epoch_totals['steps'] += steps
+        self._epoch_totals['samples'] += self._window_samples
+        self._reset_window()
+
+    def _export_trace(self, prof):
+        trace_path = self.profile_dir / f'trace-{self.run_id}-step{self.global_step}.json'
+        prof.export_chrome_trace(str(trace_path))
+        print(f"\n  Profiler trace written: {trace_path}")
+        print(prof.key_averages().table(sort_by='self_cpu_time_total', row_limit=15))
+        self._write({'type': 'profile', 'global_step': self.global_step, 'trace': str(trace_path)})
+
+    def _write(self, record: Dict):
+        if self.log_file is None:
+            return
+        record = {'run_id': self.run_id, 'time': time.time(), **record}
+        self.log_file.write(json.dumps(record) + '\n')
+        self.log_file.flush()
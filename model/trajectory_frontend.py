@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Trajectory front end: sequence-length reduction before feature extraction.
+
+Raw swipes carry many redundant points (slow segments, dwell on keys) that
+all become encoder positions. The front end maps the (x, y, t) points of a
+swipe to a shorter sequence before velocities, accelerations and nearest
+keys are computed, exactly where the app's SwipeTrajectoryProcessor runs
+SwipeResampler.
+
+Modes (NumPy, vectorized):
+  - truncate:  keep the first max_len points (app default when disabled)
+  - discard:   SwipeResampler.DISCARD, keep first/last and a 35/30/35 spread
+  - merge:     SwipeResampler.MERGE, average consecutive runs of points
+  - arclength: resample to exactly max_len points equally spaced along the path
+  - rdp:       Ramer-Douglas-Peucker simplification with a tolerance in the
+               input's coordinate units (normalized keyboard units in
+               SwipeDataset), then truncated to max_len
+
+truncate/discard/merge only act on swipes longer than max_len and, like the
+app, map timestamps with a linear index ramp (see SwipeTrajectoryProcessor).
+
+A front end is written as a spec string such as "arclength:64" or
+"rdp:64:0.01" and stored under model_config['frontend'] in checkpoints, so
+evaluation and export reproduce the training input pipeline.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+MODES = ('truncate', 'discard', 'merge', 'arclength', 'rdp')
+
+
+def app_timestamp_indices(original_len: int, new_len: int) -> np.ndarray:
+    """Timestamp source index per output point, as SwipeTrajectoryProcessor resamples them."""
+    if new_len <= 1:
+        return np.zeros(new_len, dtype=np.int64)
+    return np.arange(new_len, dtype=np.int64) * (original_len - 1) // (new_len - 1)
+
+
+def discard_indices(original_len: int, target_len: int) -> np.ndarray:
+    """Point indices kept by SwipeResampler.resampleDiscard."""
+    if target_len == 1:
+        return np.array([0])
+    if target_len == 2:
+        return np.array([0, original_len - 1])
+
+    num_middle = target_len - 2
+    available = original_len - 2
+    if available <= num_middle:
+        middle = np.arange(1, original_len - 1)
+    else:
+        # selectMiddleIndices: 35% of the points from the first 30% of the
+        # swipe, 30% from the middle 40%, 35% from the last 30%
+        start_zone_end = 1 + int(available * 0.3)
+        end_zone_start = original_len - 1 - int(available * 0.3)
+        in_start = int(num_middle * 0.35)
+        in_end = int(num_middle * 0.35)
+        in_middle = num_middle - in_start - in_end
+
+        parts = []
+        if in_start > 0:
+            parts.append(1 + np.arange(in_start) * (start_zone_end - 1) // in_start)
+        if in_middle > 0:
+            parts.append(start_zone_end + np.arange(in_middle) * (end_zone_start - start_zone_end) // in_middle)
+        if in_end > 0:
+            parts.append(end_zone_start + np.arange(in_end) * ((original_len - 1) - end_zone_start) // in_end)
+        middle = np.concatenate(parts)
+
+    indices = np.empty(len(middle) + 2, dtype=np.int64)
+    indices[0], indices[1:-1], indices[-1] = 0, middle, original_len - 1
+    return indices
+
+
+def merge_points(points: np.ndarray, target_len: int) -> np.ndarray:
+    """SwipeResampler.resampleMerge: mean of each float32-computed source range."""
+    original_len = len(points)
+    factor = np.float32(original_len) / np.float32(target_len)
+    idx = np.arange(target_len, dtype=np.float32)
+    starts = (idx * factor).astype(np.int64)
+    ends = np.minimum(np.ceil((idx + 1) * factor).astype(np.int64), original_len)
+    csum = np.concatenate([np.zeros((1, points.shape[1])), np.cumsum(points, axis=0, dtype=np.float64)])
+    return ((csum[ends] - csum[starts]) / (ends - starts)[:, None]).astype(points.dtype)
+
+
+def arclength_resample(xs: np.ndarray, ys: np.ndarray, ts: np.ndarray,
+                       num_points: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Resample to num_points equally spaced along the path; time is interpolated too."""
+    step = np.hypot(np.diff(xs), np.diff(ys))
+    moving = np.concatenate([[True], step > 0])
+    dist = np.concatenate([[0.0], np.cumsum(step)])[moving]
+    if dist[-1] <= 0:
+        # A tap: all points coincide
+        return (np.full(num_points, xs[0], dtype=xs.dtype), np.full(num_points, ys[0], dtype=ys.dtype),
+                np.linspace(ts[0], ts[-1], num_points).astype(ts.dtype))
+    target = np.linspace(0.0, dist[-1], num_points)
+    return (np.interp(target, dist, xs[moving]).astype(xs.dtype),
+            np.interp(target, dist, ys[moving]).astype(ys.dtype),
+            np.interp(target, dist, ts[moving]).astype(ts.dtype))
+
+
+def rdp_mask(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Ramer-Douglas-Peucker: boolean mask of the points kept.
+
+    All open segments of one recursion level are processed together, so the
+    Python loop runs once per level rather than once per segment.
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=np.bool_)
+    keep[0] = keep[-1] = True
+    starts, ends = np.array([0]), np.array([n - 1])
+    while len(starts):
+        counts = ends - starts - 1
+        open_ = counts > 0
+        starts, ends, counts = starts[open_], ends[open_], counts[open_]
+        if not len(starts):
+            break
+
+        seg = np.repeat(np.arange(len(starts)), counts)
+        first = np.cumsum(counts) - counts
+        idx = starts[seg] + 1 + np.arange(counts.sum()) - first[seg]
+
+        a, b = points[starts[seg]], points[ends[seg]]
+        ab, ap = b - a, points[idx] - a
+        norm = np.hypot(ab[:, 0], ab[:, 1])
+        cross = np.abs(ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0])
+        dist = np.where(norm > 0, cross / np.maximum(norm, 1e-12), np.hypot(ap[:, 0], ap[:, 1]))
+
+        seg_max = np.maximum.reduceat(dist, first)
+        at_max = np.nonzero(dist == seg_max[seg])[0]
+        _, first_hit = np.unique(seg[at_max], return_index=True)
+        split = idx[at_max[first_hit]]
+
+        far = seg_max > tolerance
+        keep[split[far]] = True
+        starts, ends = (np.concatenate([starts[far], split[far]]),
+                        np.concatenate([split[far], ends[far]]))
+    return keep
+
+
+class TrajectoryFrontEnd:
+    """Configurable sequence-length reduction applied to a swipe's points."""
+
+    def __init__(self, mode: str = 'truncate', max_len: int = 150, tolerance: float = 0.01):
+        if mode not in MODES:
+            raise ValueError(f"Unknown front end mode '{mode}' (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.max_len = max_len
+        self.tolerance = tolerance
+
+    @classmethod
+    def from_spec(cls, spec: Optional[str]) -> 'TrajectoryFrontEnd':
+        """Parse 'mode[:max_len[:tolerance]]', e.g. 'arclength:64' or 'rdp:64:0.01'."""
+        if not spec:
+            return cls()
+        parts = spec.split(':')
+        kwargs = {'mode': parts[0]}
+        if len(parts) > 1:
+            kwargs['max_len'] = int(parts[1])
+        if len(parts) > 2:
+            kwargs['tolerance'] = float(parts[2])
+        return cls(**kwargs)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> 'TrajectoryFrontEnd':
+        """Front end stored in a checkpoint's model_config (older checkpoints: truncate at 150)."""
+        frontend = (config or {}).get('frontend')
+        return cls(**frontend) if frontend else cls()
+
+    def to_config(self) -> Dict:
+        return {'mode': self.mode, 'max_len': self.max_len, 'tolerance': self.tolerance}
+
+    @property
+    def spec(self) -> str:
+        if self.mode == 'rdp':
+            return f"rdp:{self.max_len}:{self.tolerance:g}"
+        return f"{self.mode}:{self.max_len}"
+
+    def __repr__(self):
+        return f"TrajectoryFrontEnd({self.spec})"
+
+    def __call__(self, xs: np.ndarray, ys: np.ndarray,
+                 ts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Reduce the points of one swipe; outputs may still exceed max_len only for rdp."""
+        n = len(xs)
+        if n == 0:
+            return xs, ys, ts
+        if self.mode == 'arclength':
+            return arclength_resample(xs, ys, ts, self.max_len)
+        if self.mode == 'rdp':
+            if n <= 2:
+                return xs, ys, ts
+            keep = rdp_mask(np.stack([xs, ys], axis=1).astype(np.float64), self.tolerance)
+            return xs[keep], ys[keep], ts[keep]
+        if n <= self.max_len or self.mode == 'truncate':
+            return xs, ys, ts
+
+        t_idx = app_timestamp_indices(n, self.max_len)
+        if self.mode == 'discard':
+            idx = discard_indices(n, self.max_len)
+            return xs[idx], ys[idx], ts[t_idx]
+        merged = merge_points(np.stack([xs, ys], axis=1), self.max_len)
+        return merged[:, 0], merged[:, 1], ts[t_idx]
+
+
+def add_frontend_argument(parser, default: Optional[str] = None):
+    parser.add_argument('--frontend', default=default,
+                        help="Trajectory front end 'mode[:max_len[:tolerance]]' with mode in "
+                             f"{'/'.join(MODES)}, e.g. arclength:64 or rdp:64:0.01 "
+                             "(default: truncate:150, or the loaded checkpoint's)")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Evaluate the whole-word classifier fast path.
+
+A model trained with train_full_model.py --word-head N carries a classifier
+over the N most frequent dictionary words. At decode time the classifier's
+answer is returned directly when its probability clears a threshold;
+everything else (including the "other word" class) falls back to beam search.
+
+For each threshold this reports accuracy, fallback rate, the classifier's
+precision on the swipes it answered, and the ORT latency saved: the encoder
+(with the extra word_probs output) always runs, while the autoregressive
+decoder only runs for fallbacks.
+"""
+
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+
+from train_character_model import (
+    CharTokenizer,
+    SwipeDataset,
+    build_character_model,
+    create_padding_mask
+)
+from export_character_model import export_to_onnx
+from onnx_benchmark import measure_ort_latency, format_latency_table
+from slim_checkpoints import load_model_checkpoint
+from trajectory_frontend import TrajectoryFrontEnd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Word classifier fast path: fallback rate and latency')
+    parser.add_argument('--checkpoint', required=True, help='Checkpoint trained with --word-head')
+    parser.add_argument('--data', default='data/combined_dataset/cleaned_english_swipes_val.jsonl')
+    parser.add_argument('--max-samples', type=int, default=None)
+    parser.add_argument('--thresholds', default='0.5,0.7,0.8,0.9,0.95,0.99')
+    parser.add_argument('--beam-size', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--output-dir', default='deployment_package/word_head')
+    parser.add_argument('--bench-runs', type=int, default=50)
+    parser.add_argument('--bench-threads', type=int, default=1)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Word Classifier Fast Path Evaluation")
+    print("="*60)
+
+    tokenizer = CharTokenizer()
+    state_dict, info = load_model_checkpoint(args.checkpoint)
+    model = build_character_model(info['model_config'], tokenizer.vocab_size, dropout=0.0)
+    model.load_state_dict(state_dict)
+    model.eval()
+    if model.word_head is None:
+        raise ValueError("Checkpoint has no word classifier (see train_full_model.py --word-head)")
+    print(f"Word classes: {len(model.word_vocab)} + other")
+
+    frontend = TrajectoryFrontEnd.from_config(info['model_config'])
+    dataset = SwipeDataset(args.data, max_samples=args.max_samples, frontend=frontend)
+    loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=False)
+    word_index = {w: i for i, w in enumerate(model.word_vocab)}
+    coverage = sum(item['word'] in word_index for item in dataset.data) / max(len(dataset), 1)
+    print(f"Samples: {len(dataset)} ({coverage:.1%} in classifier vocabulary)")
+
+    # Beam search every swipe once; each threshold then only decides who falls back
+    top_prob, top_word, beam_correct, true_words = [], [], [], []
+    with torch.no_grad():
+        for batch in tqdm(loader, desc='Decode'):
+            src_mask = create_padding_mask(batch['seq_len'], batch['traj_features'].shape[1], 'cpu')
+            memory = model.encode_trajectory(batch['traj_features'], batch['nearest_keys'], src_mask)
+            probs = F.softmax(model.word_logits(memory, src_mask), dim=-1)
+            prob, cls = probs.max(dim=-1)
+            beam_words = model.beam_decode(memory, tokenizer, beam_size=args.beam_size)
+            for p, c, beam_word, word in zip(prob.tolist(), cls.tolist(), beam_words, batch['word']):
+                top_prob.append(p)
+                top_word.append(model.word_vocab[c] if c < len(model.word_vocab) else None)
+                beam_correct.append(beam_word == word)
+                true_words.append(word)
+
+    top_prob = np.array(top_prob)
+    beam_correct = np.array(beam_correct)
+    head_correct = np.array([w is not None and w == t for w, t in zip(top_word, true_words)])
+    is_word_class = np.array([w is not None for w in top_word])
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    onnx_info = export_to_onnx(model, output_dir, seq_len=frontend.max_len)
+    decoder_steps = int(round(np.mean([len(w) for w in true_words]))) + 1
+    latency = measure_ort_latency(onnx_info['encoder_path'], onnx_info['decoder_path'],
+                                  seq_len=frontend.max_len, decoder_steps=decoder_steps,
+                                  beam_size=args.beam_size,
+                                  runs=args.bench_runs, threads=args.bench_threads)
+    encoder_ms = latency['encoder']['p50_ms']
+    decode_ms = decoder_steps * latency['decoder_step']['p50_ms']
+    baseline_ms = encoder_ms + decode_ms
+
+    rows = [{'threshold': 'beam only', 'word_acc': float(beam_correct.mean()), 'fallback_rate': 1.0,
+             'head_precision': None, 'avg_ms': baseline_ms, 'saved_ms': 0.0}]
+    for threshold in [float(t) for t in args.thresholds.split(',')]:
+        accepted = is_word_class & (top_prob >= threshold)
+        correct = np.where(accepted, head_correct, beam_correct)
+        fallback_rate = 1.0 - accepted.mean()
+        avg_ms = encoder_ms + fallback_rate * decode_ms
+        rows.append({
+            'threshold': threshold,
+            'word_acc': float(correct.mean()),
+            'fallback_rate': float(fallback_rate),
+            'head_precision': float(head_correct[accepted].mean()) if accepted.any() else None,
+            'avg_ms': float(avg_ms),
+            'saved_ms': float(baseline_ms - avg_ms),
+        })
+
+    table = [{
+        'threshold': str(r['threshold']),
+        'word_acc': f"{r['word_acc']:.2%}",
+        'fallback': f"{r['fallback_rate']:.1%}",
+        'head_precision': f"{r['head_precision']:.2%}" if r['head_precision'] is not None else '-',
+        'avg_ms': f"{r['avg_ms']:.2f}",
+        'saved_ms': f"{r['saved_ms']:.2f}",
+        'saved_pct': f"{r['saved_ms'] / baseline_ms:.1%}",
+    } for r in rows]
+    print(f"\nEncoder {encoder_ms:.2f} ms, decoder {decoder_steps} steps x "
+          f"{latency['decoder_step']['p50_ms']:.2f} ms (beam {args.beam_size}, p50)")
+    print("\n" + format_latency_table(table, list(table[0].keys())))
+
+    report_path = output_dir / 'word_head_report.json'
+    with open(report_path, 'w') as f:
+        json.dump({
+            'checkpoint': str(args.checkpoint),
+            'data': args.data,
+            'samples': len(dataset),
+            'vocab_size': len(model.word_vocab),
+            'vocab_coverage': coverage,
+            'latency': latency,
+            'results': rows,
+        }, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+IVF-PQ nearest-neighbour index over dual-encoder word embeddings.
+
+Offline, every dictionary word is embedded with the word tower of a
+train_dual_encoder.py checkpoint and compressed:
+  - IVF: k-means coarse quantizer; each word is stored in the inverted list
+    of its nearest centroid, lists laid out contiguously
+  - PQ: the residual to that centroid is split into M subvectors, each
+    encoded as one byte (256 centroids per subspace)
+  - optional float16 copy of the vectors to re-rank the PQ shortlist exactly
+
+Everything is saved as plain .npy files, so WordIndex.load can memory-map
+the index (np.load(mmap_mode='r')) instead of reading it into RAM.
+
+Search is inner product with asymmetric distance computation: per query one
+[M, 256] lookup table, then each candidate costs M table lookups. Scanning
+nprobe of nlist lists keeps top-10 over a 50k vocabulary well under 1 ms on
+one CPU core.
+
+NumPy only at search time; torch is only needed to embed the dictionary.
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+INDEX_FILES = ('coarse_centroids', 'pq_codebooks', 'codes', 'list_offsets', 'word_ids')
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means (squared L2); empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = assign_nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def assign_nearest(x: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for every row of x."""
+    c_norm = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), chunk):
+        block = x[start:start + chunk]
+        out[start:start + chunk] = (c_norm[None, :] - 2.0 * block @ centroids.T).argmin(axis=1)
+    return out
+
+
+def build_ivfpq_index(embeddings: np.ndarray, words: List[str], output_dir,
+                      nlist: int = 256, num_subspaces: int = 16, kmeans_iters: int = 20,
+                      store_vectors: bool = True, seed: int = 0) -> dict:
+    """
+    Build and save an IVF-PQ index.
+
+    Args:
+        embeddings: [num_words, dim] L2-normalized word embeddings
+        words: Word for each embedding row
+        nlist: Number of inverted lists (coarse centroids)
+        num_subspaces: PQ subvectors per embedding; must divide dim
+        store_vectors: Also save float16 vectors for exact re-ranking
+
+    Returns:
+        Index metadata (also written to index_meta.json)
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    num_words, dim = embeddings.shape
+    if dim % num_subspaces != 0:
+        raise ValueError(f"Embedding dim {dim} is not divisible by {num_subspaces} subspaces")
+    dsub = dim // num_subspaces
+    ksub = min(256, num_words)
+
+    coarse = kmeans(embeddings, nlist, kmeans_iters, seed)
+    nlist = len(coarse)
+    assign = assign_nearest(embeddings, coarse)
+    residuals = embeddings - coarse[assign]
+
+    codebooks = np.zeros((num_subspaces, ksub, dsub), dtype=np.float32)
+    codes = np.zeros((num_words, num_subspaces), dtype=np.uint8)
+    for m in range(num_subspaces):
+        sub = residuals[:, m * dsub:(m + 1) * dsub]
+        codebooks[m] = kmeans(sub, ksub, kmeans_iters, seed + m + 1)
+        codes[:, m] = assign_nearest(sub, codebooks[m])
+
+    # Lay out inverted lists contiguously: list i is rows list_offsets[i]:list_offsets[i+1]
+    order = np.argsort(assign, kind='stable')
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    np.save(output_dir / 'coarse_centroids.npy', coarse)
+    np.save(output_dir / 'pq_codebooks.npy', codebooks)
+    np.save(output_dir / 'codes.npy', np.ascontiguousarray(codes[order]))
+    np.save(output_dir / 'list_offsets.npy', list_offsets)
+    np.save(output_dir / 'word_ids.npy', order.astype(np.int32))
+    if store_vectors:
+        np.save(output_dir / 'vectors.npy', embeddings[order].astype(np.float16))
+    with open(output_dir / 'words.txt', 'w') as f:
+        f.write('\n'.join(words) + '\n')
+
+    # Reconstruction quality of the compressed vectors
+    recon = coarse[assign] + np.concatenate(
+        [codebooks[m][codes[:, m]] for m in range(num_subspaces)], axis=1)
+    meta = {
+        'format': 'ivfpq-v1',
+        'metric': 'inner_product',
+        'num_words': num_words,
+        'dim': dim,
+        'nlist': nlist,
+        'num_subspaces': num_subspaces,
+        'ksub': ksub,
+        'has_vectors': store_vectors,
+        'max_list_size': int(np.diff(list_offsets).max()),
+        'pq_mse': float(((recon - embeddings) ** 2).sum(axis=1).mean()),
+    }
+    with open(output_dir / 'index_meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class WordIndex:
+    """Memory-mappable IVF-PQ index with top-k inner-product search."""
+
+    def __init__(self, meta: dict, words: List[str], coarse_centroids: np.ndarray,
+                 pq_codebooks: np.ndarray, codes: np.ndarray, list_offsets: np.ndarray,
+                 word_ids: np.ndarray, vectors: Optional[np.ndarray] = None):
+        self.meta = meta
+        self.words = words
+        self.coarse_centroids = coarse_centroids
+        self.pq_codebooks = pq_codebooks
+        self.codes = codes
+        self.list_offsets = list_offsets
+        self.word_ids = word_ids
+        self.vectors = vectors
+        self.num_subspaces = meta['num_subspaces']
+        self.dsub = meta['dim'] // self.num_subspaces
+        self._subspace = np.arange(self.num_subspaces)
+
+    @classmethod
+    def load(cls, index_dir, mmap_mode: Optional[str] = 'r') -> 'WordIndex':
+        index_dir = Path(index_dir)
+        with open(index_dir / 'index_meta.json') as f:
+            meta = json.load(f)
+        with open(index_dir / 'words.txt') as f:
+            words = f.read().splitlines()
+        arrays = {name: np.load(index_dir / f'{name}.npy', mmap_mode=mmap_mode) for name in INDEX_FILES}
+        # Small, touched on every query: keep in RAM
+        arrays['coarse_centroids'] = np.ascontiguousarray(arrays['coarse_centroids'])
+        arrays['pq_codebooks'] = np.ascontiguousarray(arrays['pq_codebooks'])
+        arrays['list_offsets'] = np.asarray(arrays['list_offsets'])
+        vectors = None
+        if meta.get('has_vectors') and (index_dir / 'vectors.npy').exists():
+            vectors = np.load(index_dir / 'vectors.npy', mmap_mode=mmap_mode)
+        return cls(meta, words, vectors=vectors, **arrays)
+
+    def __len__(self):
+        return self.meta['num_words']
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 8,
+               rerank: int = 0) -> List[Tuple[str, float]]:
+        """
+        Top-k words for one [dim] query embedding.
+
+        Args:
+            nprobe: Inverted lists scanned (closest coarse centroids by inner product)
+            rerank: Re-score this many PQ candidates with the stored float16
+                vectors (0 = return PQ scores)
+
+        Returns:
+            (word, score) pairs, best first
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        coarse_scores = self.coarse_centroids @ query
+        nprobe = min(nprobe, len(coarse_scores))
+        probe = np.argpartition(-coarse_scores, nprobe - 1)[:nprobe]
+
+        starts, ends = self.list_offsets[probe], self.list_offsets[probe + 1]
+        sizes = ends - starts
+        rows = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        if len(rows) == 0:
+            return []
+
+        # ADC: score = q.centroid + sum_m q_m . codebook[m, code_m]
+        lut = np.einsum('mkd,md->mk', self.pq_codebooks, query.reshape(self.num_subspaces, self.dsub))
+        scores = np.repeat(coarse_scores[probe], sizes) + lut[self._subspace, self.codes[rows]].sum(axis=1)
+
+        if rerank and self.vectors is not None:
+            n = min(max(rerank, k), len(rows))
+            shortlist = np.argpartition(-scores, n - 1)[:n]
+            rows = rows[shortlist]
+            scores = self.vectors[rows].astype(np.float32) @ query
+
+        n = min(k, len(rows))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        ids = self.word_ids[rows[top]]
+        return [(self.words[i], float(s)) for i, s in zip(ids, scores[top])]
+
+
+def benchmark_index(index: WordIndex, queries: np.ndarray, embeddings: np.ndarray,
+                    k: int = 10, nprobe: int = 8, rerank: int = 0, warmup: int = 20) -> dict:
+    """Per-query search latency and recall@k against exact inner-product search."""
+    for q in queries[:warmup]:
+        index.search(q, k, nprobe, rerank)
+
+    times, recall = [], []
+    exact = np.argsort(-(queries @ embeddings.T), axis=1)[:, :k]
+    for q, truth in zip(queries, exact):
+        start = time.perf_counter()
+        results = index.search(q, k, nprobe, rerank)
+        times.append((time.perf_counter() - start) * 1000)
+        found = {w for w, _ in results}
+        recall.append(sum(index.words[i] in found for i in truth) / k)
+
+    times = np.array(times)
+    return {
+        'nprobe': nprobe,
+        'rerank': rerank,
+        'mean_ms': float(times.mean()),
+        'p50_ms': float(np.percentile(times, 50)),
+        'p90_ms': float(np.percentile(times, 90)),
+        f'recall@{k}': float(np.mean(recall)),
+    }
+
+
+def main():
+    import torch
+    from torch.utils.data import DataLoader
+
+    from train_character_model import CharTokenizer, KeyboardGrid, SwipeDataset, create_padding_mask
+    from swipe_dictionary import load_language_dictionary
+    from swipe_retrieval import WordTensorizer, load_dual_encoder
+    from train_dual_encoder import embed_vocabulary
+    from onnx_benchmark import format_latency_table
+    from trajectory_frontend import TrajectoryFrontEnd
+    from slim_checkpoints import load_model_checkpoint
+
+    parser = argparse.ArgumentParser(description='Build an IVF-PQ word index from a dual-encoder checkpoint')
+    parser.add_argument('--checkpoint', required=True, help='train_dual_encoder.py checkpoint')
+    parser.add_argument('--lang', default='en')
+    parser.add_argument('--max-words', type=int, default=50000)
+    parser.add_argument('--output-dir', default='deployment_package/word_index')
+    parser.add_argument('--nlist', type=int, default=256)
+    parser.add_argument('--subspaces', type=int, default=16)
+    parser.add_argument('--no-vectors', action='store_true', help='Do not store float16 vectors for re-ranking')
+    parser.add_argument('--data', default=None,
+                        help='Swipe JSONL whose embeddings are used as benchmark queries '
+                             '(default: perturbed word embeddings)')
+    parser.add_argument('--bench-queries', type=int, default=1000)
+    parser.add_argument('--nprobe', default='4,8,16')
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("IVF-PQ Word Index Builder")
+    print("="*60)
+
+    model = load_dual_encoder(args.checkpoint)
+    tokenizer = CharTokenizer()
+    tensorizer = WordTensorizer(KeyboardGrid(), tokenizer)
+    words = [w for w, _ in load_language_dictionary(args.lang, max_words=args.max_words)]
+    print(f"Embedding {len(words):,} words...")
+    embeddings = embed_vocabulary(model, tensorizer, words, torch.device('cpu')).numpy()
+
+    start = time.perf_counter()
+    meta = build_ivfpq_index(embeddings, words, args.output_dir, nlist=args.nlist,
+                             num_subspaces=args.subspaces, store_vectors=not args.no_vectors)
+    print(f"✓ Index built in {time.perf_counter() - start:.1f}s: {meta['nlist']} lists "
+          f"(max {meta['max_list_size']}), {meta['num_subspaces']} x 8-bit PQ, mse {meta['pq_mse']:.4f}")
+    index_bytes = sum(p.stat().st_size for p in Path(args.output_dir).glob('*.npy'))
+    print(f"  Size on disk: {index_bytes / 1024:.1f} KB ({Path(args.output_dir)})")
+
+    if args.data:
+        config = load_model_checkpoint(args.checkpoint)[1]['dual_encoder_config']
+        frontend = TrajectoryFrontEnd.from_config(config['swipe_model'])
+        dataset = SwipeDataset(args.data, max_samples=args.bench_queries, frontend=frontend)
+        loader = DataLoader(dataset, batch_size=256, shuffle=False)
+        chunks = []
+        with torch.no_grad():
+            for batch in loader:
+                src_mask = create_padding_mask(batch['seq_len'], batch['traj_features'].shape[1], 'cpu')
+                chunks.append(model.embed_swipes(batch['traj_features'], batch['nearest_keys'], src_mask))
+        queries = torch.cat(chunks).numpy()
+    else:
+        rng = np.random.default_rng(0)
+        queries = embeddings[rng.choice(len(embeddings), min(args.bench_queries, len(embeddings)), replace=False)]
+        queries = queries + rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    index = WordIndex.load(args.output_dir)
+    rows = []
+    for nprobe in [int(n) for n in args.nprobe.split(',')]:
+        rows.append(benchmark_index(index, queries, embeddings, args.k, nprobe))
+        if index.vectors is not None:
+            rows.append(benchmark_index(index, queries, embeddings, args.k, nprobe, rerank=4 * args.k))
+
+    recall_key = f'recall@{args.k}'
+    table = [{
+        'nprobe': str(r['nprobe']),
+        'rerank': str(r['rerank']),
+        'p50_ms': f"{r['p50_ms']:.3f}",
+        'p90_ms': f"{r['p90_ms']:.3f}",
+        recall_key: f"{r[recall_key]:.2%}",
+    } for r in rows]
+    print(f"\nSearch over {len(queries)} queries (1 thread, recall vs exact search):")
+    print(format_latency_table(table, ['nprobe', 'rerank', 'p50_ms', 'p90_ms', recall_key]))
+
+    report_path = Path(args.output_dir) / 'index_benchmark.json'
+    with open(report_path, 'w') as f:
+        json.dump({'checkpoint': str(args.checkpoint), 'index': meta, 'results': rows}, f, indent=2)
+    print(f"\n✅ Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()